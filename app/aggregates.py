@@ -0,0 +1,433 @@
+"""
+Streaming n-ary aggregates computed with single-pass online algorithms.
+
+Each accumulator consumes values one at a time (or in NumPy chunks) in
+constant memory, so operand lists can be streamed straight from a request
+body without being materialized:
+
+- Sum: Neumaier (improved Kahan) compensated summation
+- Mean / Variance: Welford's algorithm
+- Min / Max: running extremes
+- Percentile: the P-squared algorithm of Jain & Chlamtac (exact below 5 values)
+
+The streamed percentile is an estimate (exact for p=0 and p=100, which
+are the running extremes). ``aggregate`` gets operand lists that are
+already in memory, so it computes the percentile exactly instead.
+"""
+import math
+import re
+import zlib
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Type
+
+import numpy as np
+
+from app.metrics import CALCULATIONS
+
+AGGREGATE_TYPES = ("Sum", "Mean", "Variance", "Min", "Max", "Percentile")
+MAX_AGGREGATE_OPERANDS = 100_000  # JSON operand lists; larger inputs should be streamed
+
+FLOAT64 = np.dtype("<f8")
+MAX_TEXT_TOKEN = 64  # bytes; no float literal worth parsing is longer
+_SEPARATORS = re.compile(rb"[\s,;]+")
+
+
+class Accumulator(ABC):
+    """
+    Abstract base class for online aggregates.
+
+    Each concrete accumulator must implement update and result. Accumulators
+    may override update_many with a chunked kernel; the default loops over
+    update.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    @abstractmethod
+    def update(self, value: float) -> None:
+        """Consume one value."""
+        pass
+
+    def update_many(self, values: Iterable[float]) -> None:
+        """Consume a chunk of values."""
+        for value in values:
+            self.update(float(value))
+
+    @abstractmethod
+    def result(self) -> float:
+        """
+        Return the aggregate of the values consumed so far.
+
+        Raises:
+            ValueError: If too few values were consumed
+        """
+        pass
+
+    def _require(self, minimum: int) -> None:
+        if self.count < minimum:
+            raise ValueError(f"At least {minimum} operand(s) required")
+
+
+class SumAccumulator(Accumulator):
+    """Neumaier compensated sum."""
+
+    def __init__(self):
+        super().__init__()
+        self.total = 0.0
+        self.compensation = 0.0
+
+    def update(self, value: float) -> None:
+        self.count += 1
+        self._add(value)
+
+    def update_many(self, values: Iterable[float]) -> None:
+        # fsum is exact per chunk; chunks are then combined with compensation
+        chunk = np.asarray(values, dtype=np.float64)
+        if chunk.size:
+            try:
+                partial = math.fsum(chunk.tolist())
+            except OverflowError:
+                raise ValueError("Result is out of range")
+            self.count += chunk.size
+            self._add(partial)
+
+    def _add(self, value: float) -> None:
+        total = self.total + value
+        if abs(self.total) >= abs(value):
+            self.compensation += (self.total - total) + value
+        else:
+            self.compensation += (value - total) + self.total
+        self.total = total
+
+    def result(self) -> float:
+        self._require(1)
+        return self.total + self.compensation
+
+
+class MeanAccumulator(Accumulator):
+    """Welford running mean and sum of squared deviations."""
+
+    def __init__(self):
+        super().__init__()
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        if math.isfinite(delta):
+            self.mean += delta / self.count
+        else:
+            # value and the mean lie near opposite ends of the float range
+            self.mean += value / self.count - self.mean / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def update_many(self, values: Iterable[float]) -> None:
+        # Merge chunk statistics (Chan et al.) instead of looping in Python
+        chunk = np.asarray(values, dtype=np.float64)
+        if chunk.size == 0:
+            return
+        n = chunk.size
+        with np.errstate(over="ignore"):
+            chunk_mean = float(chunk.mean())
+            if not math.isfinite(chunk_mean):
+                # The chunk's sum overflowed; average pre-scaled values instead
+                chunk_mean = math.fsum(chunk / n)
+            chunk_m2 = float(((chunk - chunk_mean) ** 2).sum())
+        total = self.count + n
+        delta = chunk_mean - self.mean
+        if math.isfinite(delta):
+            self.mean += delta * (n / total)
+        else:
+            self.mean = self.mean * (self.count / total) + chunk_mean * (n / total)
+        # Overflows to inf only when the variance itself is out of range
+        self.m2 += chunk_m2 + delta * delta * (self.count * n / total)
+        self.count = total
+
+    def result(self) -> float:
+        self._require(1)
+        return self.mean
+
+
+class VarianceAccumulator(MeanAccumulator):
+    """Sample variance from Welford's algorithm."""
+
+    def result(self) -> float:
+        self._require(2)
+        return self.m2 / (self.count - 1)
+
+
+class MinAccumulator(Accumulator):
+    """Running minimum."""
+
+    def __init__(self):
+        super().__init__()
+        self.value = math.inf
+
+    def update(self, value: float) -> None:
+        self.count += 1
+        self.value = min(self.value, value)
+
+    def update_many(self, values: Iterable[float]) -> None:
+        chunk = np.asarray(values, dtype=np.float64)
+        if chunk.size:
+            self.count += chunk.size
+            self.value = min(self.value, float(chunk.min()))
+
+    def result(self) -> float:
+        self._require(1)
+        return self.value
+
+
+class MaxAccumulator(Accumulator):
+    """Running maximum."""
+
+    def __init__(self):
+        super().__init__()
+        self.value = -math.inf
+
+    def update(self, value: float) -> None:
+        self.count += 1
+        self.value = max(self.value, value)
+
+    def update_many(self, values: Iterable[float]) -> None:
+        chunk = np.asarray(values, dtype=np.float64)
+        if chunk.size:
+            self.count += chunk.size
+            self.value = max(self.value, float(chunk.max()))
+
+    def result(self) -> float:
+        self._require(1)
+        return self.value
+
+
+class PercentileAccumulator(Accumulator):
+    """
+    P-squared streaming quantile estimate using five markers.
+
+    Exact (linear interpolation) while fewer than five values have been
+    seen, and for p=0 and p=100, whose outer markers are the minimum and
+    maximum. Other percentiles of longer inputs are approximate.
+    """
+
+    def __init__(self, percentile: float):
+        super().__init__()
+        if not 0 <= percentile <= 100:
+            raise ValueError("percentile must be between 0 and 100")
+        self.p = percentile / 100.0
+        self.heights: List[float] = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * self.p, 1 + 4 * self.p, 3 + 2 * self.p, 5]
+        self.increments = [0, self.p / 2, self.p, (1 + self.p) / 2, 1]
+
+    def update(self, value: float) -> None:
+        self.count += 1
+        if self.count <= 5:
+            self.heights.append(value)
+            self.heights.sort()
+            return
+
+        q = self.heights
+        if value < q[0]:
+            q[0] = value
+            k = 0
+        elif value >= q[4]:
+            q[4] = value
+            k = 3
+        else:
+            k = next(i for i in range(4) if q[i] <= value < q[i + 1])
+        for i in range(k + 1, 5):
+            self.positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in range(1, 4):
+            d = self.desired[i] - self.positions[i]
+            if (d >= 1 and self.positions[i + 1] - self.positions[i] > 1) or \
+               (d <= -1 and self.positions[i - 1] - self.positions[i] < -1):
+                step = 1 if d > 0 else -1
+                candidate = self._parabolic(i, step)
+                if not q[i - 1] < candidate < q[i + 1]:
+                    candidate = self._linear(i, step)
+                q[i] = candidate
+                self.positions[i] += step
+
+    def _parabolic(self, i: int, d: int) -> float:
+        q, n = self.heights, self.positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def _linear(self, i: int, d: int) -> float:
+        q, n = self.heights, self.positions
+        return q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+
+    def result(self) -> float:
+        self._require(1)
+        if self.count <= 5:
+            return float(np.percentile(self.heights, self.p * 100))
+        if self.p == 0:
+            return self.heights[0]
+        if self.p == 1:
+            return self.heights[4]
+        return self.heights[2]
+
+
+class ExactPercentileAccumulator(Accumulator):
+    """
+    Exact percentile (linear interpolation) over buffered values.
+
+    Keeps every value, so it is only for operand lists that are already in
+    memory.
+    """
+
+    def __init__(self, percentile: float):
+        super().__init__()
+        if not 0 <= percentile <= 100:
+            raise ValueError("percentile must be between 0 and 100")
+        self.percentile = percentile
+        self.chunks: List[np.ndarray] = []
+
+    def update(self, value: float) -> None:
+        self.update_many([value])
+
+    def update_many(self, values: Iterable[float]) -> None:
+        chunk = np.asarray(values, dtype=np.float64)
+        self.count += chunk.size
+        self.chunks.append(chunk)
+
+    def result(self) -> float:
+        self._require(1)
+        return float(np.percentile(np.concatenate(self.chunks), self.percentile))
+
+
+_ACCUMULATORS: Dict[str, Type[Accumulator]] = {
+    "Sum": SumAccumulator,
+    "Mean": MeanAccumulator,
+    "Variance": VarianceAccumulator,
+    "Min": MinAccumulator,
+    "Max": MaxAccumulator,
+}
+
+
+def make_accumulator(
+    operation_type: str, percentile: Optional[float] = None, exact: bool = False
+) -> Accumulator:
+    """
+    Create the accumulator for an aggregate type.
+
+    With exact, Percentile buffers its values and interpolates exactly
+    instead of estimating (for operand lists already in memory).
+
+    Raises:
+        ValueError: If the type is unknown or Percentile lacks a percentile
+    """
+    operation_type = getattr(operation_type, "value", operation_type)
+    if operation_type == "Percentile":
+        if percentile is None:
+            raise ValueError("Percentile calculations require a percentile")
+        return ExactPercentileAccumulator(percentile) if exact else PercentileAccumulator(percentile)
+    accumulator_class = _ACCUMULATORS.get(operation_type)
+    if accumulator_class is None:
+        raise ValueError(f"Unsupported aggregate type: {operation_type}")
+    return accumulator_class()
+
+
+class OperandCompressor:
+    """Incrementally zlib-compress operands as little-endian float64."""
+
+    def __init__(self):
+        self._compressor = zlib.compressobj(level=6)
+        self._parts: List[bytes] = []
+
+    def write(self, values: np.ndarray) -> None:
+        self._parts.append(self._compressor.compress(np.ascontiguousarray(values, dtype=FLOAT64).tobytes()))
+
+    def finish(self) -> bytes:
+        self._parts.append(self._compressor.flush())
+        return b"".join(self._parts)
+
+
+def decompress_operands(data: bytes) -> np.ndarray:
+    """Inverse of OperandCompressor."""
+    return np.frombuffer(zlib.decompress(data), dtype=FLOAT64)
+
+
+def _checked(values: np.ndarray) -> np.ndarray:
+    if not np.isfinite(values).all():
+        raise ValueError("Operands must be finite numbers")
+    return values
+
+
+async def parse_text_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[np.ndarray]:
+    """
+    Parse numbers separated by commas, semicolons or whitespace from a byte stream.
+
+    Tokens split across chunk boundaries are carried over to the next chunk.
+
+    Raises:
+        ValueError: On a token that is not a number or is longer than
+            MAX_TEXT_TOKEN bytes
+    """
+    pending = b""
+    async for chunk in chunks:
+        data = pending + chunk
+        tokens = _SEPARATORS.split(data)
+        # The last token may continue in the next chunk
+        pending = tokens.pop() if tokens else b""
+        values = [token for token in tokens if token]
+        if len(pending) > MAX_TEXT_TOKEN or any(len(token) > MAX_TEXT_TOKEN for token in values):
+            raise ValueError(f"Operands must be numbers of at most {MAX_TEXT_TOKEN} characters")
+        if values:
+            yield _checked(_to_floats(values))
+    if pending.strip():
+        yield _checked(_to_floats([pending.strip()]))
+
+
+async def parse_binary_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[np.ndarray]:
+    """
+    Parse little-endian float64 values from a byte stream.
+
+    Raises:
+        ValueError: If the stream length is not a multiple of 8 bytes
+    """
+    pending = b""
+    async for chunk in chunks:
+        data = pending + chunk
+        usable = len(data) - len(data) % FLOAT64.itemsize
+        pending = data[usable:]
+        if usable:
+            yield _checked(np.frombuffer(data[:usable], dtype=FLOAT64))
+    if pending:
+        raise ValueError("Binary operand stream length must be a multiple of 8 bytes")
+
+
+def _to_floats(tokens: List[bytes]) -> np.ndarray:
+    try:
+        return np.array([float(token) for token in tokens], dtype=np.float64)
+    except ValueError:
+        raise ValueError("Operands must be numbers")
+
+
+def aggregate(operation_type: str, values: Iterable[float], percentile: Optional[float] = None) -> float:
+    """Aggregate an in-memory operand list in one call (percentiles are exact)."""
+    accumulator = make_accumulator(operation_type, percentile, exact=True)
+    accumulator.update_many(_checked(np.asarray(values, dtype=np.float64)))
+    result = finalize(accumulator)
+    CALCULATIONS.inc((getattr(operation_type, "value", operation_type),))
+    return result
+
+
+def finalize(accumulator: Accumulator) -> float:
+    """
+    Return an accumulator's result.
+
+    Raises:
+        ValueError: If too few operands were seen or the result overflowed
+    """
+    value = float(accumulator.result())
+    if not math.isfinite(value):
+        raise ValueError("Result is out of range")
+    return value
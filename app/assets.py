@@ -0,0 +1,189 @@
+"""
+Static asset build and serving.
+
+``python -m app.assets`` copies ``static/`` into ``static/dist/``:
+
+- every stylesheet and script also gets a content-hashed copy
+  (``css/style.3f2a1b9c0d.css``), listed in ``manifest.json``;
+- HTML pages are rewritten to reference the hashed copies;
+- every text file gets precompressed ``.gz`` (and, with the optional
+  ``brotli`` package, ``.br``) siblings when that saves space.
+
+When ``static/dist/manifest.json`` exists the app serves that directory
+with ``PrecompressedStaticFiles``: it picks the precompressed sibling the
+client accepts, marks hashed assets ``immutable`` for a year, and makes
+HTML and other unhashed files revalidate on every use.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import stat
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from app.compression import brotli, is_compressible, negotiate_encoding
+
+SOURCE_DIR = "static"
+BUILD_DIR = os.path.join(SOURCE_DIR, "dist")
+MANIFEST = "manifest.json"
+HASHED_EXTENSIONS = frozenset({".css", ".js"})
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+PRECOMPRESS_MINIMUM_SIZE = 256
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+def _media_type(path: str) -> str:
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+def _write(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as handle:
+        handle.write(data)
+
+
+def _precompress(path: str, data: bytes, sizes: Dict[str, int]) -> None:
+    if len(data) < PRECOMPRESS_MINIMUM_SIZE or not is_compressible(_media_type(path)):
+        return
+    # mtime=0 keeps builds reproducible
+    variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(data, quality=11)
+    for suffix, compressed in variants.items():
+        if len(compressed) < len(data):
+            _write(path + suffix, compressed)
+            sizes[suffix] = len(compressed)
+
+
+def build(source: str = SOURCE_DIR, output: str = BUILD_DIR) -> Dict[str, Dict]:
+    """
+    Build hashed, precompressed assets.
+
+    Args:
+        source: Directory of hand-written assets
+        output: Build directory (replaced on every build)
+
+    Returns:
+        Per-file report: hashed name (if any) and sizes of each variant
+    """
+    source, output = os.path.abspath(source), os.path.abspath(output)
+    if os.path.isdir(output):
+        shutil.rmtree(output)
+    files = {}
+    for root, dirs, names in os.walk(source):
+        dirs[:] = [name for name in dirs if os.path.join(root, name) != output]
+        for name in names:
+            full_path = os.path.join(root, name)
+            with open(full_path, "rb") as handle:
+                files[os.path.relpath(full_path, source).replace(os.sep, "/")] = handle.read()
+
+    manifest: Dict[str, str] = {}
+    for path, data in files.items():
+        stem, extension = os.path.splitext(path)
+        if extension in HASHED_EXTENSIONS:
+            manifest[path] = f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{extension}"
+
+    report: Dict[str, Dict] = {}
+    # Longest paths first, so "js/a.js" never rewrites part of "js/a.json"
+    references = sorted(manifest, key=len, reverse=True)
+    for path, data in sorted(files.items()):
+        if path.endswith(".html"):
+            text = data.decode("utf-8")
+            for original in references:
+                text = text.replace(f"/static/{original}", f"/static/{manifest[original]}")
+            data = text.encode("utf-8")
+        targets = [path] + ([manifest[path]] if path in manifest else [])
+        for target in targets:
+            sizes = {"": len(data)}
+            _write(os.path.join(output, target), data)
+            _precompress(os.path.join(output, target), data, sizes)
+            report[target] = sizes
+
+    _write(os.path.join(output, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+    return report
+
+
+def load_manifest(directory: str) -> Optional[Dict[str, str]]:
+    """Return the build manifest in a directory, or None if it was not built."""
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
+
+
+def static_directory() -> str:
+    """Serve the build output when it exists, the sources otherwise."""
+    return BUILD_DIR if load_manifest(BUILD_DIR) is not None else SOURCE_DIR
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles that serves precompressed siblings and sets Cache-Control.
+
+    Files named in the directory's build manifest are content-hashed, so
+    they are cached as immutable; everything else is revalidated with the
+    ETag/Last-Modified validators StaticFiles already emits.
+    """
+
+    def __init__(self, *, directory: str, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        manifest = load_manifest(directory) or {}
+        self.immutable = frozenset(manifest.values())
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        relative = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+        media_type = _media_type(str(full_path))
+        served_path, served_stat, encoding = full_path, stat_result, None
+
+        available = [coding for coding, suffix in PRECOMPRESSED_SUFFIXES.items()
+                     if os.path.isfile(f"{full_path}{suffix}")]
+        if available:
+            encoding = negotiate_encoding(request_headers.get("accept-encoding", ""), available)
+            if encoding is not None:
+                served_path = f"{full_path}{PRECOMPRESSED_SUFFIXES[encoding]}"
+                served_stat = os.stat(served_path)
+                if not stat.S_ISREG(served_stat.st_mode):
+                    served_path, served_stat, encoding = full_path, stat_result, None
+
+        response = FileResponse(
+            served_path, status_code=status_code, stat_result=served_stat,
+            method=scope["method"], media_type=media_type,
+        )
+        if encoding is not None:
+            response.headers["content-encoding"] = encoding
+        if available:
+            response.headers["vary"] = "Accept-Encoding"
+        response.headers["cache-control"] = (
+            IMMUTABLE_CACHE_CONTROL if relative in self.immutable else REVALIDATE_CACHE_CONTROL
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build hashed, precompressed static assets.")
+    parser.add_argument("--source", default=SOURCE_DIR)
+    parser.add_argument("--output", default=BUILD_DIR)
+    args = parser.parse_args()
+
+    report = build(args.source, args.output)
+    print(f"{'file':<40} {'bytes':>8} {'gzip':>8} {'brotli':>8}")
+    for path, sizes in sorted(report.items()):
+        print(f"{path:<40} {sizes['']:>8} {sizes.get('.gz', '-'):>8} {sizes.get('.br', '-'):>8}")
+
+
+if __name__ == "__main__":
+    main()
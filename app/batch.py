@@ -0,0 +1,132 @@
+"""
+In-process execution of POST /batch sub-requests.
+
+Each sub-request is dispatched through the application itself, so it gets
+the same routing, validation and error handling as a real request. The
+batch validates the bearer token once and shares one database session
+(see ``app.database.shared_session``) with every sub-request.
+
+Sub-requests run one after another, in order, because they share that
+session. A batch of only GET requests runs in a single read transaction
+(REPEATABLE READ on PostgreSQL), so all of its responses reflect the same
+snapshot; batches containing writes commit as each sub-request does.
+"""
+import asyncio
+import base64
+import json
+from typing import Any, Dict, List
+
+from sqlalchemy.orm import Session
+from starlette.types import ASGIApp, Message, Scope
+
+from app.database import shared_session
+from app.schemas import BatchSubRequest
+from app.security import authenticated_username
+from app.serialization import dumps
+
+# Response headers worth returning per sub-request
+FORWARDED_HEADERS = ("content-type", "etag", "cache-control", "location")
+
+
+def is_read_only(requests: List[BatchSubRequest]) -> bool:
+    return all(sub.method == "GET" for sub in requests)
+
+
+def _decode_body(content_type: str, body: bytes) -> Dict[str, Any]:
+    if not body:
+        return {"body": None}
+    if content_type.startswith("application/json"):
+        return {"body": json.loads(body)}
+    if content_type.startswith("text/"):
+        return {"body": body.decode("utf-8", errors="replace")}
+    return {"body": base64.b64encode(body).decode("ascii"), "headers": {"content-transfer-encoding": "base64"}}
+
+
+async def dispatch(app: ASGIApp, parent: Scope, sub: BatchSubRequest, authorization: bytes) -> Dict[str, Any]:
+    """Run one sub-request through the ASGI app and collect its response."""
+    path, _, query = sub.path.partition("?")
+    body = dumps(sub.body) if sub.body is not None else b""
+    headers = [(b"authorization", authorization), (b"content-length", str(len(body)).encode("ascii"))]
+    if sub.body is not None:
+        headers.append((b"content-type", b"application/json"))
+    headers.extend((name.encode("latin-1"), value.encode("latin-1")) for name, value in sub.headers.items())
+    scope = {
+        "type": "http",
+        "asgi": parent.get("asgi", {"version": "3.0"}),
+        "http_version": parent.get("http_version", "1.1"),
+        "method": sub.method,
+        "scheme": parent.get("scheme", "http"),
+        "server": parent.get("server"),
+        "client": parent.get("client"),
+        "root_path": parent.get("root_path", ""),
+        "path": path,
+        "raw_path": path.encode("utf-8"),
+        "query_string": query.encode("latin-1"),
+        "headers": headers,
+    }
+    request_body = [{"type": "http.request", "body": body, "more_body": False}]
+    response: Dict[str, Any] = {"status": 500, "headers": [], "body": []}
+
+    async def receive() -> Message:
+        if request_body:
+            return request_body.pop()
+        # The client stays connected: a streaming response listens for a
+        # disconnect while it streams and cancels the wait once it is done
+        await asyncio.Event().wait()
+
+    async def send(message: Message) -> None:
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = message.get("headers", [])
+        elif message["type"] == "http.response.body":
+            response["body"].append(message.get("body", b""))
+
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        # The error middleware already produced a 500 response; keep the batch going
+        pass
+
+    raw_headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in response["headers"]}
+    item = _decode_body(raw_headers.get("content-type", ""), b"".join(response["body"]))
+    forwarded = {name: raw_headers[name] for name in FORWARDED_HEADERS if name in raw_headers}
+    return {
+        "id": sub.id,
+        "status": response["status"],
+        "headers": {**forwarded, **item.get("headers", {})},
+        "body": item["body"],
+    }
+
+
+async def run_batch(
+    app: ASGIApp, parent: Scope, requests: List[BatchSubRequest], db: Session, username: str, authorization: bytes
+) -> List[Dict[str, Any]]:
+    """
+    Run sub-requests in order on one shared session.
+
+    Args:
+        app: The application to dispatch into
+        parent: Scope of the batch request (server, client, scheme)
+        requests: Validated sub-requests
+        db: Session shared by every sub-request
+        username: Username from the already validated token
+        authorization: The batch's Authorization header, passed on unchanged
+    """
+    read_only = is_read_only(requests)
+    if read_only and db.get_bind().dialect.name == "postgresql":
+        db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    session_token = shared_session.set(db)
+    user_token = authenticated_username.set(username)
+    try:
+        responses = []
+        for sub in requests:
+            responses.append(await dispatch(app, parent, sub, authorization))
+            if db.in_transaction() and not read_only:
+                # A failed write must not leave the shared session unusable for later sub-requests
+                db.rollback()
+        return responses
+    finally:
+        authenticated_username.reset(user_token)
+        shared_session.reset(session_token)
+        if read_only:
+            db.rollback()
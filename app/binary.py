@@ -0,0 +1,222 @@
+"""
+Binary response and request formats: MessagePack and CBOR.
+
+Bulk endpoints negotiate these through ``Accept`` (responses) and
+``Content-Type`` (uploads); JSON stays the default. Compared to JSON, a
+UUID is 16 raw bytes instead of 36 hex characters plus quotes, a float is
+an IEEE 754 double instead of its shortest decimal representation, and a
+timestamp is a native timestamp value instead of an ISO 8601 string.
+
+The wire formats are handled by ``msgpack`` and ``cbor2``; this module
+only maps the types the API uses:
+
+========  ==================================  ================================
+Python    MessagePack                         CBOR
+========  ==================================  ================================
+UUID      bin 8, 16 bytes                     tag 37 + 16-byte string
+float     float 64                            float 64 (decodes 16/32 too)
+datetime  timestamp extension (-1), UTC       tag 1, epoch seconds, UTC
+records   map of field name to value          map of field name to value
+========  ==================================  ================================
+
+Naive datetimes are treated as UTC. Decoders return UUIDs as ``UUID``
+(CBOR) or 16-byte ``bytes`` (MessagePack, which has no UUID type; the
+request schemas accept both) and timestamps as aware UTC datetimes. Any
+malformed upload raises ``ValueError``.
+"""
+from abc import ABC, abstractmethod
+from dataclasses import is_dataclass
+from datetime import datetime, timezone
+from enum import Enum
+from io import BytesIO
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence
+from uuid import UUID
+
+import cbor2
+import msgpack
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+
+# Nesting deeper than this in an upload is rejected
+MAX_DEPTH = 32
+
+
+def _utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _record_dict(value: Any) -> Optional[Dict[str, Any]]:
+    """A dataclass record (the query layer's slotted records) as a dict of its fields."""
+    if is_dataclass(value) and not isinstance(value, type):
+        return {name: getattr(value, name) for name in value.__dataclass_fields__}
+    return None
+
+
+def _check_depth(value: Any, depth: int = 0) -> None:
+    if depth > MAX_DEPTH:
+        raise ValueError("Nesting too deep")
+    if isinstance(value, dict):
+        for item in value.values():
+            _check_depth(item, depth + 1)
+    elif isinstance(value, list):
+        for item in value:
+            _check_depth(item, depth + 1)
+
+
+class BinaryFormat(ABC):
+    """A negotiable binary format: encoding, decoding and export framing."""
+
+    media_type = ""
+
+    @abstractmethod
+    def dumps(self, value: Any) -> bytes:
+        """Encode a value (dicts, lists, records, UUIDs, datetimes, scalars)."""
+
+    @abstractmethod
+    def _decode(self, data: bytes) -> Any:
+        """Decode exactly one value with the library, raising whatever it raises."""
+
+    @abstractmethod
+    def stream(self, batches: Iterable[Sequence[Any]]) -> Iterator[bytes]:
+        """Encode an export whose length is not known up front."""
+
+    def loads(self, data: bytes) -> Any:
+        """
+        Decode exactly one value.
+
+        Raises:
+            ValueError: If the input is malformed, truncated, too deeply
+                nested, out of range or followed by trailing bytes
+        """
+        try:
+            value = self._decode(data)
+        except ValueError:
+            raise
+        except Exception as e:
+            # Library errors, RecursionError and out-of-range timestamps (OverflowError, OSError)
+            raise ValueError(f"Malformed {self.media_type} body: {e}") from e
+        _check_depth(value)
+        return value
+
+
+class MessagePackFormat(BinaryFormat):
+    """MessagePack (https://github.com/msgpack/msgpack/blob/master/spec.md)."""
+
+    media_type = MSGPACK
+
+    @staticmethod
+    def _default(value: Any) -> Any:
+        if isinstance(value, UUID):
+            return value.bytes
+        if isinstance(value, datetime):
+            return msgpack.Timestamp.from_datetime(_utc(value))
+        if isinstance(value, Enum):
+            return value.value
+        record = _record_dict(value)
+        if record is not None:
+            return record
+        raise TypeError(f"Cannot encode {type(value).__name__}")
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=self._default, use_bin_type=True)
+
+    def _decode(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False, timestamp=3)
+
+    def iter_loads(self, data: bytes) -> Iterator[Any]:
+        """Decode a sequence of concatenated values (see ``stream``)."""
+        unpacker = msgpack.Unpacker(raw=False, timestamp=3)
+        unpacker.feed(data)
+        try:
+            for value in unpacker:
+                _check_depth(value)
+                yield value
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Malformed {self.media_type} body: {e}") from e
+
+    def stream(self, batches: Iterable[Sequence[Any]]) -> Iterator[bytes]:
+        """MessagePack has no indefinite-length array: emit one map per item, back to back."""
+        packer = msgpack.Packer(default=self._default, use_bin_type=True)
+        for batch in batches:
+            if batch:
+                yield b"".join(packer.pack(item) for item in batch)
+
+
+class CBORFormat(BinaryFormat):
+    """CBOR (RFC 8949), with UUIDs as tag 37 and timestamps as tag 1."""
+
+    media_type = CBOR
+
+    @staticmethod
+    def _default(encoder: cbor2.CBOREncoder, value: Any) -> None:
+        if isinstance(value, Enum):
+            encoder.encode(value.value)
+            return
+        record = _record_dict(value)
+        if record is None:
+            raise TypeError(f"Cannot encode {type(value).__name__}")
+        encoder.encode(record)
+
+    def dumps(self, value: Any) -> bytes:
+        return cbor2.dumps(value, datetime_as_timestamp=True, timezone=timezone.utc, default=self._default)
+
+    def _decode(self, data: bytes) -> Any:
+        stream = BytesIO(data)
+        value = cbor2.CBORDecoder(stream).decode()
+        if stream.tell() != len(data):
+            raise ValueError("Trailing bytes after the value")
+        return value
+
+    def stream(self, batches: Iterable[Sequence[Any]]) -> Iterator[bytes]:
+        """Emit one indefinite-length array."""
+        yield b"\x9f"
+        for batch in batches:
+            if batch:
+                yield b"".join(self.dumps(item) for item in batch)
+        yield b"\xff"
+
+
+FORMATS: Dict[str, BinaryFormat] = {MSGPACK: MessagePackFormat(), CBOR: CBORFormat()}
+# Media types older clients send for the same formats
+ALIASES = {"application/x-msgpack": MSGPACK, "application/vnd.msgpack": MSGPACK}
+
+
+def media_type(content_type: Optional[str]) -> str:
+    """The bare, canonical media type of a Content-Type header (JSON when absent)."""
+    if not content_type:
+        return JSON
+    bare = content_type.split(";", 1)[0].strip().lower()
+    return ALIASES.get(bare, bare)
+
+
+def negotiate(accept: Optional[str]) -> Optional[BinaryFormat]:
+    """
+    Pick a binary format from an Accept header, or None for JSON.
+
+    A binary format is chosen only when the client ranks it strictly
+    above JSON; wildcards and ties keep the JSON default.
+    """
+    if not accept:
+        return None
+    quality: Dict[str, float] = {}
+    for part in accept.split(","):
+        name, *params = part.split(";")
+        q = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        name = media_type(name)
+        quality[name] = max(q, quality.get(name, 0.0))
+    json_quality = max(quality.get(JSON, 0.0), quality.get("application/*", 0.0), quality.get("*/*", 0.0))
+    best = max(FORMATS, key=lambda name: quality.get(name, 0.0))
+    if quality.get(best, 0.0) > json_quality:
+        return FORMATS[best]
+    return None
@@ -0,0 +1,457 @@
+"""
+Pluggable key/value stores for application caches.
+
+Caches (currently the user profile cache) keep serialized bytes under
+string keys with a TTL, in one of three backends selected by
+``CACHE_BACKEND``:
+
+- ``memory`` (default): a per-process LRU map.
+- ``mmap`` or ``mmap:///path/to/file``: a fixed-size, direct-mapped table
+  in a memory-mapped file, shared by every worker on the host. The
+  default file is named after the app instance (``CACHE_INSTANCE``, or a
+  digest of the database URL), so two deployments or test runs of one
+  user on a host do not share entries.
+- ``redis://host:port/db``: any server speaking the Redis protocol (RESP),
+  shared by every worker on every node. Only GET, SET PX, DEL and SCAN are
+  used, so small stand-ins work too.
+
+Shared backends are written through by the worker handling a mutation;
+per-process backends in other workers are evicted by the invalidation
+broadcast in ``app.invalidation``.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import socket
+import stat
+import struct
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_SLOT_SIZE = int(os.getenv("CACHE_SLOT_SIZE", "1024"))
+# Names the default mmap file; defaults to a digest of the database URL
+CACHE_INSTANCE = os.getenv("CACHE_INSTANCE", "")
+
+
+class CacheBackend(ABC):
+    """
+    Abstract base class of a bytes-valued cache store.
+
+    Attributes:
+        shared: Whether other worker processes see the same entries
+    """
+    shared = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the value stored under key, or None if missing or expired."""
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        """Store a value under key for ttl seconds."""
+        pass
+
+    @abstractmethod
+    def delete(self, *keys: str) -> None:
+        """Remove keys; missing keys are ignored."""
+        pass
+
+    @abstractmethod
+    def clear(self) -> int:
+        """Drop every entry; returns how many were dropped (when known)."""
+        pass
+
+    def stats(self) -> Dict[str, float]:
+        return {"backend": type(self).__name__}
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    """
+    Thread-safe per-process LRU map with per-entry expiry.
+
+    Attributes:
+        maxsize: Maximum number of entries
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self) -> int:
+        with self._lock:
+            dropped = len(self._entries)
+            self._entries.clear()
+            return dropped
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def _check_private(status: os.stat_result, path: str, is_type) -> None:
+    """Refuse a file other users own or can access, or one of the wrong type."""
+    if not is_type(status.st_mode) or status.st_uid != os.getuid() or status.st_mode & 0o077:
+        raise PermissionError(f"{path} must be owned by this user and inaccessible to others")
+
+
+def _private_directory(parent: str) -> str:
+    """Return this user's directory under parent (mode 0700), creating it if missing."""
+    path = os.path.join(parent, f"calchub-{os.getuid()}")
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    # lstat, so a symlink planted in its place is refused too
+    _check_private(os.lstat(path), path, stat.S_ISDIR)
+    return path
+
+
+class SharedMemoryBackend(CacheBackend):
+    """
+    Direct-mapped table of fixed-size slots in a memory-mapped file.
+
+    A key lives in slot ``hash(key) % slots``; a colliding write replaces
+    the previous occupant. Each slot holds a 16-byte key digest, a
+    wall-clock expiry and the value, so values larger than
+    ``slot_size - 28`` bytes are not cached. Readers take a shared
+    ``flock`` and writers an exclusive one, so processes never observe a
+    half-written slot.
+
+    Entries feed identity resolution, so the file must be a regular file
+    (not a symlink) owned by this user and inaccessible to anyone else.
+
+    Attributes:
+        path: Backing file; every process opening it shares the entries
+        slots: Number of slots
+        slot_size: Bytes per slot, header included
+
+    Raises:
+        PermissionError: If the file is shared with other users or not a regular file
+        OSError: If path is a symlink
+    """
+    shared = True
+    HEADER = struct.Struct("<16sdI")
+
+    def __init__(self, path: str, slots: int = 10000, slot_size: int = CACHE_SLOT_SIZE):
+        if slot_size <= self.HEADER.size:
+            raise ValueError(f"slot_size must exceed {self.HEADER.size} bytes")
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.capacity = slot_size - self.HEADER.size
+        size = slots * slot_size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW | os.O_CLOEXEC, 0o600)
+        try:
+            _check_private(os.fstat(self._fd), path, stat.S_ISREG)
+        except PermissionError:
+            os.close(self._fd)
+            raise
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        # flock excludes other processes; threads of this process share the lock
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.oversize = 0
+
+    def _locate(self, key: str) -> Tuple[bytes, int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        return digest, int.from_bytes(digest[:8], "little") % self.slots * self.slot_size
+
+    @contextmanager
+    def _locked(self, operation: int):
+        with self._lock:
+            fcntl.flock(self._fd, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def get(self, key: str) -> Optional[bytes]:
+        digest, offset = self._locate(key)
+        with self._locked(fcntl.LOCK_SH):
+            stored, expires_at, length = self.HEADER.unpack_from(self._map, offset)
+            if stored != digest or expires_at <= time.time():
+                return None
+            start = offset + self.HEADER.size
+            return self._map[start:start + length]
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        if len(value) > self.capacity:
+            self.oversize += 1
+            self.delete(key)
+            return
+        digest, offset = self._locate(key)
+        with self._locked(fcntl.LOCK_EX):
+            stored, expires_at, _ = self.HEADER.unpack_from(self._map, offset)
+            if stored not in (digest, bytes(16)) and expires_at > time.time():
+                self.evictions += 1
+            start = offset + self.HEADER.size
+            self._map[start:start + len(value)] = value
+            self.HEADER.pack_into(self._map, offset, digest, time.time() + ttl, len(value))
+
+    def delete(self, *keys: str) -> None:
+        with self._locked(fcntl.LOCK_EX):
+            for key in keys:
+                digest, offset = self._locate(key)
+                if self._map[offset:offset + 16] == digest:
+                    self.HEADER.pack_into(self._map, offset, bytes(16), 0.0, 0)
+
+    def _live_slots(self) -> int:
+        now = time.time()
+        return sum(
+            1 for offset in range(0, self.slots * self.slot_size, self.slot_size)
+            if self._map[offset:offset + 16] != bytes(16)
+            and self.HEADER.unpack_from(self._map, offset)[1] > now
+        )
+
+    def clear(self) -> int:
+        with self._locked(fcntl.LOCK_EX):
+            dropped = self._live_slots()
+            empty = bytes(self.slot_size)
+            for offset in range(0, self.slots * self.slot_size, self.slot_size):
+                self._map[offset:offset + self.slot_size] = empty
+            return dropped
+
+    def stats(self) -> Dict[str, float]:
+        with self._locked(fcntl.LOCK_SH):
+            size = self._live_slots()
+        return {
+            "backend": "mmap",
+            "path": self.path,
+            "size": size,
+            "maxsize": self.slots,
+            "slot_size": self.slot_size,
+            "evictions": self.evictions,
+            "oversize": self.oversize,
+        }
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+
+class RESPError(Exception):
+    """Error reply from a Redis-protocol server."""
+
+
+class RedisBackend(CacheBackend):
+    """
+    Minimal Redis-protocol (RESP2) client used as a cache store.
+
+    Keys are namespaced with ``prefix``. Connection or protocol failures
+    (including malformed replies, after which the connection is dropped)
+    are treated as cache misses (and counted), so the cache never takes an
+    endpoint down; entries then live at most their TTL.
+
+    Attributes:
+        host, port, db: Server address and logical database
+        prefix: Namespace prepended to every key
+    """
+    shared = True
+
+    def __init__(self, url: str, prefix: str = "", timeout: float = 1.0):
+        parsed = urlparse(url)
+        if parsed.scheme != "redis":
+            raise ValueError(f"Unsupported cache URL: {url}")
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.prefix = prefix
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._reader = None
+        self._lock = threading.Lock()
+        self.errors = 0
+
+    @staticmethod
+    def encode(*args) -> bytes:
+        """Encode a command as a RESP array of bulk strings."""
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by cache server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            raise RESPError(rest.decode("utf-8"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise ValueError(f"Unexpected reply type {kind!r}")
+
+    def _connect(self) -> None:
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._reader = self._sock.makefile("rb")
+        if self.password:
+            self._call("AUTH", self.password)
+        if self.db:
+            self._call("SELECT", self.db)
+
+    def _disconnect(self) -> None:
+        if self._sock is not None:
+            self._reader.close()
+            self._sock.close()
+        self._sock = self._reader = None
+
+    def _call(self, *args):
+        self._sock.sendall(self.encode(*args))
+        return self._read_reply()
+
+    def execute(self, *args):
+        """
+        Run one command, reconnecting once if the connection went away.
+
+        Raises:
+            OSError: If the server cannot be reached
+            RESPError: If the server replies with an error
+            ValueError: If the reply is malformed (the connection is dropped)
+        """
+        with self._lock:
+            for attempt in (0, 1):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._call(*args)
+                except (OSError, ConnectionError):
+                    self._disconnect()
+                    if attempt:
+                        raise
+                except ValueError:
+                    # The rest of the reply is still unread; start over on a new connection
+                    self._disconnect()
+                    raise
+
+    def _safe(self, *args):
+        try:
+            return self.execute(*args)
+        except (OSError, RESPError, ValueError):
+            self.errors += 1
+            return None
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._safe("GET", self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._safe("SET", self.prefix + key, value, "PX", max(1, int(ttl * 1000)))
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self._safe("DEL", *(self.prefix + key for key in keys))
+
+    def _scan(self) -> List[bytes]:
+        keys, cursor = [], "0"
+        while True:
+            reply = self._safe("SCAN", cursor, "MATCH", self.prefix + "*", "COUNT", 500)
+            if reply is None:
+                return keys
+            cursor, batch = reply[0].decode("ascii"), reply[1]
+            keys.extend(batch)
+            if cursor == "0":
+                return keys
+
+    def clear(self) -> int:
+        keys = self._scan()
+        for start in range(0, len(keys), 500):
+            self._safe("DEL", *keys[start:start + 500])
+        return len(keys)
+
+    def stats(self) -> Dict[str, float]:
+        return {"backend": "redis", "server": f"{self.host}:{self.port}/{self.db}", "errors": self.errors}
+
+    def close(self) -> None:
+        with self._lock:
+            self._disconnect()
+
+
+def instance_name(database_url: str) -> str:
+    """CACHE_INSTANCE, or a short digest of the database URL the app uses."""
+    return CACHE_INSTANCE or hashlib.sha256(database_url.encode("utf-8")).hexdigest()[:16]
+
+
+def make_backend(spec: str, namespace: str, maxsize: int, instance: str = "") -> CacheBackend:
+    """
+    Build the backend described by a ``CACHE_BACKEND`` value.
+
+    Args:
+        spec: ``memory``, ``mmap``, ``mmap:///path`` or ``redis://host:port/db``
+        namespace: Cache name, used for the mmap file and Redis key prefix
+        maxsize: Entry (or slot) count for bounded backends
+        instance: App instance name, part of the default mmap file name
+
+    Raises:
+        ValueError: If the spec is not recognised
+        PermissionError: If an mmap file or its default directory is not private to this user
+    """
+    if spec in ("", "memory"):
+        return MemoryBackend(maxsize)
+    if spec == "mmap" or spec.startswith("mmap://"):
+        path = spec[len("mmap://"):] if spec.startswith("mmap://") else ""
+        name = f"{namespace}-{instance}-cache.mmap" if instance else f"{namespace}-cache.mmap"
+        path = path or os.path.join(_private_directory(tempfile.gettempdir()), name)
+        return SharedMemoryBackend(path, slots=maxsize)
+    if spec.startswith("redis://"):
+        return RedisBackend(spec, prefix=f"calchub:{namespace}:")
+    raise ValueError(f"Unknown CACHE_BACKEND: {spec}")
@@ -0,0 +1,203 @@
+"""
+Content-negotiated response compression.
+
+``CompressionMiddleware`` compresses compressible responses with brotli
+(when the optional ``brotli`` package is installed) or gzip, whichever the
+client prefers in ``Accept-Encoding``. Bodies smaller than
+``COMPRESSION_MINIMUM_SIZE`` are sent as-is. Streaming responses are
+compressed chunk by chunk and flushed after each chunk, so nothing is
+held back until the stream ends.
+
+Responses that already carry ``Content-Encoding`` (such as precompressed
+static files) and event streams pass through untouched.
+"""
+import os
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "500"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+COMPRESSIBLE_TYPES = frozenset({
+    "application/javascript",
+    "application/json",
+    "application/manifest+json",
+    "application/xml",
+    "image/svg+xml",
+})
+UNCOMPRESSIBLE_TYPES = frozenset({"text/event-stream"})
+
+
+def available_encodings() -> List[str]:
+    """Encodings this process can produce, in server preference order."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def negotiate_encoding(accept_encoding: str, available: Iterable[str]) -> Optional[str]:
+    """
+    Pick a content coding from an Accept-Encoding header.
+
+    Args:
+        accept_encoding: Header value, e.g. ``"gzip;q=0.8, br"``
+        available: Codings the server can produce, in preference order
+
+    Returns:
+        The coding with the highest client q-value (server order breaks
+        ties), or None for identity
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+    best, best_q = None, 0.0
+    for coding in available:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if media_type in UNCOMPRESSIBLE_TYPES:
+        return False
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES or media_type.endswith("+json")
+
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _BrotliCompressor:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        output = self._compressor.process(data)
+        return output + (self._compressor.finish() if final else self._compressor.flush())
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware applying gzip or brotli to HTTP responses.
+
+    Attributes:
+        minimum_size: Bodies below this many bytes are not compressed
+        gzip_level: zlib compression level (1-9)
+        brotli_quality: brotli quality (0-11)
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MINIMUM_SIZE,
+        gzip_level: int = GZIP_LEVEL,
+        brotli_quality: int = BROTLI_QUALITY,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), available_encodings())
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressingResponder(self, coding, send)
+        await self.app(scope, receive, responder.send)
+
+    def compressor(self, coding: str):
+        if coding == "br":
+            return _BrotliCompressor(self.brotli_quality)
+        return _GzipCompressor(self.gzip_level)
+
+
+class _CompressingResponder:
+    """Per-response state: buffers until the size threshold, then compresses."""
+
+    def __init__(self, middleware: CompressionMiddleware, coding: str, send: Send):
+        self.middleware = middleware
+        self.coding = coding
+        self._send = send
+        self.start: Optional[Message] = None
+        self.passthrough = False
+        self.compressor = None
+        self.buffer: List[bytes] = []
+        self.buffered = 0
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                message["status"] < 200
+                or message["status"] in (204, 304)
+                or "content-encoding" in headers
+                or not is_compressible(headers.get("content-type", ""))
+            )
+            if self.passthrough:
+                await self._send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body, more_body = message.get("body", b""), message.get("more_body", False)
+        if self.compressor is not None:
+            await self._send({"type": "http.response.body", "body": self.compressor.compress(body, not more_body),
+                              "more_body": more_body})
+            return
+
+        self.buffer.append(body)
+        self.buffered += len(body)
+        if more_body and self.buffered < self.middleware.minimum_size:
+            return
+        data = b"".join(self.buffer)
+        self.buffer = []
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers.add_vary_header("Accept-Encoding")
+        if not more_body and self.buffered < self.middleware.minimum_size:
+            await self._send(self.start)
+            await self._send({"type": "http.response.body", "body": data})
+            return
+
+        self.compressor = self.middleware.compressor(self.coding)
+        payload = self.compressor.compress(data, not more_body)
+        headers["content-encoding"] = self.coding
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            # The compressed representation is not byte-identical to the original
+            headers["etag"] = "W/" + etag
+        if more_body:
+            del headers["content-length"]
+        else:
+            headers["content-length"] = str(len(payload))
+        await self._send(self.start)
+        await self._send({"type": "http.response.body", "body": payload, "more_body": more_body})
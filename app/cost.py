@@ -0,0 +1,115 @@
+"""
+Cost and magnitude guards for expensive arithmetic.
+
+Power results are predicted from logarithms before anything is computed,
+so requests that would overflow a float, or produce a complex number the
+``Float`` column cannot store, fail fast with a ValueError.
+"""
+import math
+
+import numpy as np
+
+# log10 of the largest finite float (~1.8e308)
+MAX_RESULT_LOG10 = math.log10(1.7976931348623157e308)
+
+
+def estimate_power_log10(a: float, b: float) -> float:
+    """
+    Estimate log10(|a ** b|) without computing the power.
+
+    Args:
+        a: Base
+        b: Exponent
+
+    Returns:
+        Predicted base-10 magnitude of the result (-inf for a zero result)
+    """
+    if a == 0:
+        return -math.inf if b > 0 else 0.0
+    return b * math.log10(abs(a))
+
+
+def check_power(a: float, b: float) -> None:
+    """
+    Ensure a ** b is a finite real number.
+
+    Raises:
+        ValueError: If the result would be complex, infinite or undefined
+    """
+    if not (math.isfinite(a) and math.isfinite(b)):
+        raise ValueError("Operands must be finite numbers")
+    if a == 0 and b < 0:
+        raise ValueError("Division by zero is not allowed")
+    if a < 0 and not b.is_integer():
+        raise ValueError("Negative base with a fractional exponent is not a real number")
+    if estimate_power_log10(a, b) > MAX_RESULT_LOG10:
+        raise ValueError("Result is too large")
+
+
+def bounded_power(a: float, b: float) -> float:
+    """
+    Raise a to the power of b after checking the predicted magnitude.
+
+    Raises:
+        ValueError: If the result would not fit in a float
+    """
+    a, b = float(a), float(b)
+    check_power(a, b)
+    try:
+        return a ** b
+    except OverflowError:
+        # The estimate can be off by rounding right at the boundary
+        raise ValueError("Result is too large")
+
+
+def bounded_modulo(a: float, b: float) -> float:
+    """
+    Compute a modulo b for finite operands.
+
+    Raises:
+        ValueError: If b is zero or an operand is not finite
+    """
+    a, b = float(a), float(b)
+    if b == 0:
+        raise ValueError("Division by zero is not allowed")
+    if not (math.isfinite(a) and math.isfinite(b)):
+        raise ValueError("Operands must be finite numbers")
+    return a % b
+
+
+def check_power_many(a: np.ndarray, b: np.ndarray) -> None:
+    """
+    Vectorized check_power over operand arrays.
+
+    Raises:
+        ValueError: If any element's result would be complex, infinite or undefined
+    """
+    if not (np.isfinite(a).all() and np.isfinite(b).all()):
+        raise ValueError("Operands must be finite numbers")
+    if np.any((a == 0) & (b < 0)):
+        raise ValueError("Division by zero is not allowed")
+    if np.any((a < 0) & (b != np.floor(b))):
+        raise ValueError("Negative base with a fractional exponent is not a real number")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        magnitude = b * np.log10(np.abs(a))
+    if np.any(np.nan_to_num(magnitude, nan=0.0, neginf=0.0) > MAX_RESULT_LOG10):
+        raise ValueError("Result is too large")
+
+
+def bounded_power_many(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Vectorized bounded_power."""
+    check_power_many(a, b)
+    with np.errstate(over="raise"):
+        try:
+            return np.power(a, b)
+        except FloatingPointError:
+            raise ValueError("Result is too large")
+
+
+def bounded_modulo_many(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Vectorized bounded_modulo."""
+    if np.any(b == 0):
+        raise ValueError("Division by zero is not allowed")
+    if not (np.isfinite(a).all() and np.isfinite(b).all()):
+        raise ValueError("Operands must be finite numbers")
+    return np.mod(a, b)
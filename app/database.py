@@ -1,11 +1,19 @@
 """
 Database configuration and connection setup.
 """
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 from pydantic_settings import BaseSettings
 from pydantic import ConfigDict
 
+from app.slow_queries import slow_query_log
+from app.timing import current_timing
+
 Base = declarative_base()
 
 
@@ -23,31 +31,78 @@ def get_database_url() -> str:
     return settings.database_url
 
 
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    timing = current_timing.get()
+    if timing is not None:
+        timing.record_query(statement, elapsed)
+    slow_query_log.observe(conn.engine, statement, parameters, executemany, elapsed)
+
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+
+def instrument(engine: Engine) -> Engine:
+    """
+    Count and time every statement the engine runs.
+
+    Each statement is added to the current request's ``RequestTiming``
+    (see ``app.timing``), and slow ones go to the slow-query log (see
+    ``app.slow_queries``).
+
+    Args:
+        engine: Engine to attach the cursor hooks to
+
+    Returns:
+        The same engine
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    return engine
+
+
 def get_engine():
-    """Create and return the SQLAlchemy engine."""
+    """Create and return the SQLAlchemy engine (instrumented, see ``instrument``)."""
     url = get_database_url()
     # SQLite requires connect_args for check_same_thread
     if url.startswith("sqlite"):
-        return create_engine(url, connect_args={"check_same_thread": False})
-    return create_engine(url)
+        return instrument(create_engine(url, connect_args={"check_same_thread": False}))
+    return instrument(create_engine(url))
 
 
-def get_session_local():
-    """Get the session factory."""
-    engine = get_engine()
-    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def get_session_local(bind=None):
+    """Get the session factory, bound to ``bind`` or to a new engine."""
+    return sessionmaker(autocommit=False, autoflush=False, bind=bind if bind is not None else get_engine())
 
 
-# Convenience exports
+# Convenience exports; sessions share the module engine, so its pool is the one requests use
 engine = get_engine()
-SessionLocal = get_session_local()
+SessionLocal = get_session_local(engine)
+
+
+# Set by POST /batch so every sub-request runs on the batch's session
+shared_session: ContextVar[Optional[Session]] = ContextVar("shared_session", default=None)
 
 
 def get_db():
     """
     Dependency for FastAPI to get a database session.
     Usage: async def endpoint(db: Session = Depends(get_db))
+
+    Inside a batch, yields the batch's session instead of opening one.
     """
+    shared = shared_session.get()
+    if shared is not None:
+        yield shared
+        return
     db = SessionLocal()
     try:
         yield db
@@ -0,0 +1,96 @@
+"""
+Per-user data versions and conditional GET support.
+
+Every calculation mutation bumps the owner's row in ``user_data_versions``
+in the same transaction. Read endpoints derive a strong ETag from that
+version (plus the request's parameters), so ``If-None-Match`` can be
+answered with 304 Not Modified after a single primary-key lookup,
+without running the list or summary queries.
+
+Endpoints read the version before the data. A concurrent write can only
+make the data newer than its ETag, which costs a later refetch; it can
+never pin stale data to a current ETag.
+"""
+import hashlib
+from typing import Dict, Iterable, Optional
+from uuid import UUID
+
+from fastapi import Request, Response, status
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.models import UserDataVersion
+
+CACHE_CONTROL = "private, no-cache"
+UPSERT_DIALECTS = {"postgresql": postgresql_insert, "sqlite": sqlite_insert}
+
+
+def bump_data_versions(db: Session, user_ids: Iterable[Optional[UUID]]) -> Dict[UUID, int]:
+    """
+    Increment the data version of each user, creating missing rows.
+
+    Runs in the caller's transaction, so the bump commits (or rolls back)
+    together with the mutation. Nothing caches versions in memory, so
+    there is nothing to invalidate in other workers; open event streams
+    learn of the change from ``app.events.record_change``.
+
+    Returns:
+        The new version of each user, which becomes visible on commit
+    """
+    ids = sorted({user_id for user_id in user_ids if user_id is not None})
+    if not ids:
+        return {}
+    table = UserDataVersion.__table__
+    upsert = UPSERT_DIALECTS.get(db.get_bind().dialect.name)
+    if upsert is not None:
+        statement = upsert(table).values([{"user_id": user_id, "version": 1} for user_id in ids])
+        rows = db.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={"version": table.c.version + 1},
+        ).returning(table.c.user_id, table.c.version))
+        return dict(rows.all())
+    db.execute(update(table).where(table.c.user_id.in_(ids)).values(version=table.c.version + 1))
+    existing = set(db.execute(select(table.c.user_id).where(table.c.user_id.in_(ids))).scalars())
+    missing = [user_id for user_id in ids if user_id not in existing]
+    if missing:
+        db.execute(insert(table), [{"user_id": user_id, "version": 1} for user_id in missing])
+    return dict(db.execute(select(table.c.user_id, table.c.version).where(table.c.user_id.in_(ids))).all())
+
+
+def bump_data_version(db: Session, user_id: UUID) -> int:
+    """Increment one user's data version and return the new version."""
+    return bump_data_versions(db, [user_id])[user_id]
+
+
+def make_etag(resource: str, user_id: UUID, version: int, *params) -> str:
+    """Build a strong ETag for one user's view of a resource at a data version."""
+    material = "\x1f".join([resource, user_id.hex, str(version), *map(str, params)])
+    return '"' + hashlib.sha256(material.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Evaluate If-None-Match against an ETag.
+
+    Uses the weak comparison RFC 9110 prescribes for If-None-Match, and
+    honours ``*``.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {candidate.strip() for candidate in header.split(",")}
+    if "*" in candidates:
+        return True
+    return etag in {candidate[2:] if candidate.startswith("W/") else candidate for candidate in candidates}
+
+
+def cache_headers(etag: str, vary: str = "Authorization") -> dict:
+    """Headers attached to every versioned read (``vary`` adds Accept for negotiated ones)."""
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": vary}
+
+
+def not_modified(etag: str, vary: str = "Authorization") -> Response:
+    """Empty 304 response for a matching ETag."""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag, vary))
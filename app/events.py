@@ -0,0 +1,326 @@
+"""
+Live calculation change events for GET /calculations/stream.
+
+Mutation endpoints call ``record_change`` inside their transaction. The
+event is delivered only if that transaction commits: to this worker's
+subscribers by a session ``after_commit`` hook, and to other workers over
+the ``events`` namespace of the LISTEN/NOTIFY invalidation channel, which
+PostgreSQL also delivers on commit only.
+
+Each event's id is the user's data version after the mutation (see
+``app.etags``), so ids are monotonic per user and identical on every
+worker. ``EventBus`` keeps the most recent events in a ring buffer to
+replay them to a client reconnecting with ``Last-Event-ID``; when the
+buffer cannot prove there is no gap it sends a ``reset`` event instead,
+and the client refetches.
+
+Subscribers are plain bounded asyncio queues, so an idle connection costs
+one suspended coroutine and no database connection. A subscriber that
+falls behind has its queue replaced by a single ``reset`` event.
+"""
+import asyncio
+import json
+import os
+import threading
+from collections import defaultdict, deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, List, NamedTuple, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import invalidation
+from app.queries import CALCULATION_FIELDS
+from app.serialization import dumps
+
+HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "64"))
+REPLAY_BUFFER_SIZE = int(os.getenv("SSE_REPLAY_SIZE", "1024"))
+# Milliseconds browsers wait before reconnecting
+RETRY_MS = 3000
+
+NAMESPACE = "events"
+PENDING_KEY = "pending_change_events"
+# Pending-event count when each open savepoint began
+SAVEPOINT_MARKS_KEY = "pending_change_marks"
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+# Rows changed in bulk, or an event too large to deliver; clients refetch
+CHANGED = "changed"
+RESET = "reset"
+
+
+class ChangeEvent(NamedTuple):
+    """One change to a user's calculations; ``data`` is the JSON event body."""
+    user_id: str
+    version: int
+    type: str
+    data: str
+
+    def to_key(self) -> str:
+        return json.dumps(list(self))
+
+    @classmethod
+    def from_key(cls, key: str) -> "ChangeEvent":
+        user_id, version, kind, data = json.loads(key)
+        return cls(user_id, int(version), kind, data)
+
+    def frame(self) -> bytes:
+        """Encode as a Server-Sent Events message."""
+        return f"id: {self.version}\nevent: {self.type}\ndata: {self.data}\n\n".encode("utf-8")
+
+
+def calculation_row(calc) -> Dict[str, Any]:
+    """A calculation as a CalculationRead-shaped dict."""
+    return {field: getattr(calc, field) for field in CALCULATION_FIELDS}
+
+
+def make_event(
+    user_id: UUID, version: int, kind: str, calculations: Iterable = (), deleted: Iterable[UUID] = ()
+) -> ChangeEvent:
+    """
+    Build an event carrying the changed rows (as CalculationRead) and deleted ids.
+
+    Events too large for a NOTIFY payload are downgraded to ``changed``
+    without rows.
+    """
+    body = {"type": kind, "version": version,
+            "calculations": [calculation_row(calc) for calc in calculations],
+            "deleted": [str(calc_id) for calc_id in deleted]}
+    change = ChangeEvent(user_id.hex, version, kind, dumps(body).decode("utf-8"))
+    # The key travels JSON-encoded inside the notification envelope
+    if len(json.dumps(change.to_key())) > invalidation.MAX_PAYLOAD - 200:
+        return make_event(user_id, version, CHANGED)
+    return change
+
+
+def reset_event(user_id: str, version: int) -> ChangeEvent:
+    return ChangeEvent(user_id, version, RESET, json.dumps({"type": RESET, "version": version}))
+
+
+def record_change(db: Session, change: ChangeEvent) -> None:
+    """
+    Queue an event that is published when ``db`` commits.
+
+    It is dropped if the transaction, or a savepoint it was queued in,
+    rolls back. (The NOTIFY goes out with the transaction, so PostgreSQL
+    drops it along with the savepoint itself.)
+    """
+    # Make sure a transaction is open, so its end (commit or not) settles the event
+    db.connection()
+    invalidation.publish(db, NAMESPACE, [change.to_key()])
+    db.info.setdefault(PENDING_KEY, []).append(change)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session: Session) -> None:
+    for change in session.info.pop(PENDING_KEY, ()):
+        event_bus.publish(change)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending(session: Session, transaction) -> None:
+    # Runs after after_commit; whatever is left was rolled back or closed
+    if transaction.parent is None:
+        session.info.pop(PENDING_KEY, None)
+        session.info.pop(SAVEPOINT_MARKS_KEY, None)
+
+
+@event.listens_for(Session, "after_transaction_create")
+def _mark_savepoint(session: Session, transaction) -> None:
+    if transaction.nested:
+        marks = session.info.setdefault(SAVEPOINT_MARKS_KEY, {})
+        marks[transaction] = len(session.info.get(PENDING_KEY, ()))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_savepoint_events(session: Session, previous_transaction) -> None:
+    # Events queued since a rolled-back savepoint began describe changes that never happened
+    if previous_transaction.nested:
+        mark = session.info.get(SAVEPOINT_MARKS_KEY, {}).pop(previous_transaction, None)
+        if mark is not None:
+            del session.info.get(PENDING_KEY, [])[mark:]
+
+
+class Subscriber:
+    """One open stream: a bounded queue owned by the event loop that serves it."""
+
+    def __init__(self, user_id: str, maxsize: int):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: "asyncio.Queue[ChangeEvent]" = asyncio.Queue(maxsize)
+        self.overflows = 0
+
+    def offer(self, change: ChangeEvent) -> None:
+        """Enqueue an event (on the subscriber's loop); a full queue collapses to one reset."""
+        if self.queue.full():
+            self.overflows += 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            change = reset_event(self.user_id, change.version)
+        self.queue.put_nowait(change)
+
+    async def next(self, timeout: float) -> Optional[ChangeEvent]:
+        """Wait for the next event; None after ``timeout`` seconds of silence."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBus:
+    """
+    In-process fan-out of change events to stream subscribers.
+
+    ``publish`` may be called from any thread (request handlers, the
+    invalidation listener); delivery is handed to each subscriber's loop.
+    """
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE, replay_size: int = REPLAY_BUFFER_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[Subscriber]] = defaultdict(set)
+        self._recent: Deque[ChangeEvent] = deque(maxlen=replay_size)
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, user_id: str) -> Subscriber:
+        subscriber = Subscriber(user_id, self.queue_size)
+        with self._lock:
+            self._subscribers[user_id].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.user_id]
+
+    def publish(self, change: ChangeEvent) -> None:
+        with self._lock:
+            self._recent.append(change)
+            self.published += 1
+            subscribers = list(self._subscribers.get(change.user_id, ()))
+        for subscriber in subscribers:
+            self._deliver(subscriber, change)
+
+    def _deliver(self, subscriber: Subscriber, change: ChangeEvent) -> None:
+        try:
+            subscriber.loop.call_soon_threadsafe(subscriber.offer, change)
+        except RuntimeError:
+            # The subscriber's loop is closed
+            self.unsubscribe(subscriber)
+
+    def replay(self, user_id: str, after: int, current: int) -> Optional[List[ChangeEvent]]:
+        """
+        Return the user's events with versions in ``(after, current]``.
+
+        Returns None unless the buffer holds every one of them, in which
+        case the client must start over.
+        """
+        with self._lock:
+            events = {change.version: change for change in self._recent
+                      if change.user_id == user_id and after < change.version <= current}
+        if sorted(events) != list(range(after + 1, current + 1)):
+            return None
+        return [events[version] for version in sorted(events)]
+
+    def reset_subscribers(self) -> None:
+        """Tell every subscriber to refetch (notifications may have been missed)."""
+        with self._lock:
+            subscribers = [subscriber for group in self._subscribers.values() for subscriber in group]
+        for subscriber in subscribers:
+            self._deliver(subscriber, reset_event(subscriber.user_id, 0))
+
+    def on_invalidation(self, keys: Optional[List[str]]) -> None:
+        """Handle events published by other workers."""
+        if keys is None:
+            self.reset_subscribers()
+            return
+        for key in keys:
+            try:
+                self.publish(ChangeEvent.from_key(key))
+            except (ValueError, TypeError):
+                continue
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            subscribers = [subscriber for group in self._subscribers.values() for subscriber in group]
+            return {
+                "users": len(self._subscribers),
+                "subscribers": len(subscribers),
+                "published": self.published,
+                "buffered": len(self._recent),
+                "overflows": sum(subscriber.overflows for subscriber in subscribers),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._recent.clear()
+
+
+event_bus = EventBus()
+invalidation.register(NAMESPACE, event_bus.on_invalidation)
+
+
+async def stream_events(
+    bus: EventBus, subscriber: Subscriber, current: int, last_event_id: Optional[int],
+    heartbeat: float = HEARTBEAT_INTERVAL
+) -> AsyncIterator[bytes]:
+    """
+    Produce the SSE byte stream for one subscriber.
+
+    A new client gets a ``ready`` event at the current version. A client
+    resuming from ``last_event_id`` gets the events it missed, or a
+    ``reset`` when they are no longer buffered. Comments are sent as
+    heartbeats so proxies keep the connection open.
+
+    Events can arrive out of order (a NOTIFY from another worker may trail
+    this worker's own later event). An event that skips versions is sent
+    after the missing ones from the replay buffer, or as a ``reset`` when
+    they are not buffered yet; an older event that arrives afterwards is
+    then already covered and dropped.
+
+    Args:
+        bus: Bus the subscriber is registered with (unsubscribed on exit)
+        subscriber: Subscription taken before ``current`` was read
+        current: The user's data version when the stream opened
+        last_event_id: Last version the client saw, if resuming
+        heartbeat: Seconds of silence before a heartbeat comment
+    """
+    try:
+        yield f"retry: {RETRY_MS}\n\n".encode("ascii")
+        last = current
+        if last_event_id is None:
+            yield ChangeEvent(subscriber.user_id, current, "ready",
+                              json.dumps({"type": "ready", "version": current})).frame()
+        elif last_event_id < current:
+            missed = bus.replay(subscriber.user_id, last_event_id, current)
+            if missed is None:
+                yield reset_event(subscriber.user_id, current).frame()
+            else:
+                for change in missed:
+                    yield change.frame()
+        while True:
+            change = await subscriber.next(heartbeat)
+            if change is None:
+                yield b": keepalive\n\n"
+            elif change.type == RESET:
+                last = max(last, change.version)
+                yield reset_event(subscriber.user_id, last).frame()
+            elif change.version == last + 1:
+                last = change.version
+                yield change.frame()
+            elif change.version > last:
+                missed = bus.replay(subscriber.user_id, last, change.version)
+                last = change.version
+                if missed is None:
+                    yield reset_event(subscriber.user_id, last).frame()
+                else:
+                    for missed_change in missed:
+                        yield missed_change.frame()
+    finally:
+        bus.unsubscribe(subscriber)
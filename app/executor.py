@@ -0,0 +1,193 @@
+"""
+Process pool for evaluating expensive calculations off the event loop.
+
+Evaluations run in worker processes with a per-call time budget. Each
+worker runs one call at a time, and the budget starts when a worker picks
+the call up, so time spent queued behind other calls does not count. A
+call that overruns its budget has only its own worker terminated (and
+replaced on demand), so a single pathological request cannot hold a CPU
+or the event loop hostage, nor fail the calculations of other requests.
+
+Workers are started with ``forkserver`` (``spawn`` where that is not
+available), never ``fork``: the server is multi-threaded (bcrypt workers,
+the request threadpool, the slow-query log), and a forked child can
+inherit a lock another thread was holding and deadlock on it. The fork
+server preloads the expression evaluator, so a new worker does not spend
+its first call's budget importing it.
+"""
+import asyncio
+import multiprocessing
+import os
+from collections import deque
+from typing import Callable, Deque, List, Optional, Set
+
+# Configuration
+CALCULATION_TIME_BUDGET = float(os.getenv("CALCULATION_TIME_BUDGET", "2.0"))
+CALCULATION_POOL_WORKERS = int(os.getenv("CALCULATION_POOL_WORKERS", "2"))
+# Calculations costing more than this (see Operation.cost) are evaluated in the process pool
+INLINE_COST_LIMIT = int(os.getenv("CALCULATION_INLINE_COST_LIMIT", "48"))
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+FORKSERVER_PRELOAD = ["app.factory"]
+
+
+class CalculationTimeout(ValueError):
+    """Raised when an evaluation exceeds its time budget."""
+
+
+def _serve(conn) -> None:
+    """Worker process loop: run (func, args) requests until the pipe closes."""
+    while True:
+        try:
+            func, args = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            reply = (True, func(*args))
+        except Exception as e:
+            reply = (False, e)
+        try:
+            conn.send(reply)
+        except Exception:
+            # The exception did not pickle; keep its message
+            conn.send((False, ValueError(str(reply[1]))))
+
+
+class _Worker:
+    """One worker process and its end of the pipe."""
+
+    def __init__(self, context):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def wait(self, budget: float):
+        """Block until the reply arrives or the budget runs out (None); runs in a thread."""
+        if not self.conn.poll(budget):
+            return None
+        return self.conn.recv()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+
+class WorkerPool:
+    """Up to ``max_workers`` single-call worker processes, started on demand."""
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._context = multiprocessing.get_context(START_METHOD)
+        if START_METHOD == "forkserver":
+            self._context.set_forkserver_preload(FORKSERVER_PRELOAD)
+        self._idle: List[_Worker] = []
+        self._workers: Set[_Worker] = set()
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def _acquire(self) -> _Worker:
+        if self._idle:
+            return self._idle.pop()
+        if len(self._workers) < self.max_workers:
+            worker = _Worker(self._context)
+            self._workers.add(worker)
+            return worker
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release(waiter.result())
+            raise
+
+    def _release(self, worker: _Worker) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(worker)
+                return
+        self._idle.append(worker)
+
+    def _discard(self, worker: _Worker) -> None:
+        """Kill a worker and let the next caller start a fresh one."""
+        self._workers.discard(worker)
+        worker.kill()
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                worker = _Worker(self._context)
+                self._workers.add(worker)
+                waiter.set_result(worker)
+                return
+
+    async def run(self, func: Callable[..., float], args: tuple, budget: float) -> float:
+        worker = await self._acquire()
+        try:
+            worker.conn.send((func, args))
+            reply = await asyncio.get_running_loop().run_in_executor(None, worker.wait, budget)
+        except (EOFError, OSError) as e:
+            # The worker died mid-call
+            self._discard(worker)
+            raise CalculationTimeout("Calculation worker failed") from e
+        except BaseException:
+            # Cancelled while the call may still be running
+            self._discard(worker)
+            raise
+        if reply is None:
+            self._discard(worker)
+            raise CalculationTimeout("Calculation exceeded its time budget")
+        self._release(worker)
+        ok, value = reply
+        if not ok:
+            raise value
+        return value
+
+    def shutdown(self) -> None:
+        for worker in list(self._workers):
+            worker.kill()
+        self._workers.clear()
+        self._idle.clear()
+        for waiter in self._waiters:
+            waiter.cancel()
+        self._waiters.clear()
+
+
+_pool: Optional[WorkerPool] = None
+
+
+def _get_pool() -> WorkerPool:
+    """Create the worker pool on first use."""
+    global _pool
+    if _pool is None:
+        _pool = WorkerPool(CALCULATION_POOL_WORKERS)
+    return _pool
+
+
+async def run_bounded(func: Callable[..., float], *args, timeout: Optional[float] = None) -> float:
+    """
+    Run func(*args) in a worker process within a time budget.
+
+    Args:
+        func: Picklable, module-level function to run
+        *args: Arguments for func
+        timeout: Budget in seconds, from when a worker starts the call
+            (defaults to CALCULATION_TIME_BUDGET)
+
+    Returns:
+        The function's result
+
+    Raises:
+        CalculationTimeout: If the budget is exceeded or the worker died
+        ValueError: Propagated from func
+    """
+    budget = CALCULATION_TIME_BUDGET if timeout is None else timeout
+    return await _get_pool().run(func, args, budget)
+
+
+def shutdown_pool() -> None:
+    """Stop every worker on application exit."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
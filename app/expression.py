@@ -0,0 +1,287 @@
+"""
+Safe arithmetic expression compiler for Expression calculations.
+
+Expressions are parsed with the ``ast`` module, checked against a small
+whitelist grammar (numbers, the variables ``a`` and ``b``, arithmetic
+operators and a handful of math functions) and compiled once to a Python
+code object. Compiled expressions are cached by their normalized text, so
+``"a+b"`` and ``"(a) + b"`` share a single compilation.
+"""
+import ast
+import math
+from functools import lru_cache
+from typing import Callable, Dict, Sequence
+
+import numpy as np
+
+from app.cost import bounded_modulo, bounded_power
+
+# Limits that keep parsing and evaluation cost bounded
+MAX_EXPRESSION_LENGTH = 255
+MAX_EXPRESSION_NODES = 64
+MAX_EXPRESSION_DEPTH = 16
+
+# Relative evaluation cost of nodes; anything not listed costs 1
+POWER_COST = 8
+CALL_COST = 4
+
+VARIABLES = ("a", "b")
+
+CONSTANTS: Dict[str, float] = {
+    "pi": math.pi,
+    "e": math.e,
+}
+
+_BINARY_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Mod, ast.Pow)
+_UNARY_OPERATORS = (ast.UAdd, ast.USub)
+
+
+def _checked(value: float) -> float:
+    """Reject complex, infinite and NaN results."""
+    if isinstance(value, complex):
+        raise ValueError("Expression result is not a real number")
+    if math.isinf(value) or math.isnan(value):
+        raise ValueError("Expression result is out of range")
+    return value
+
+
+def _pow(x: float, y: float) -> float:
+    """Exponentiation guarded by a magnitude estimate."""
+    return bounded_power(x, y)
+
+
+def _div(x: float, y: float) -> float:
+    if y == 0:
+        raise ValueError("Division by zero is not allowed")
+    return x / y
+
+
+def _mod(x: float, y: float) -> float:
+    return bounded_modulo(x, y)
+
+
+def _math(func: Callable[..., float]) -> Callable[..., float]:
+    """Wrap a math function so domain errors surface as ValueError."""
+    def wrapper(*args: float) -> float:
+        try:
+            return _checked(float(func(*args)))
+        except OverflowError:
+            raise ValueError("Expression result is out of range")
+        except ValueError:
+            raise ValueError(f"Math domain error in {func.__name__}()")
+    wrapper.__name__ = func.__name__
+    return wrapper
+
+
+# Functions callable from an expression, with their scalar and array kernels
+SCALAR_FUNCTIONS: Dict[str, Callable[..., float]] = {
+    "abs": _math(abs),
+    "sqrt": _math(math.sqrt),
+    "exp": _math(math.exp),
+    "log": _math(math.log),
+    "sin": _math(math.sin),
+    "cos": _math(math.cos),
+    "tan": _math(math.tan),
+    "floor": _math(math.floor),
+    "ceil": _math(math.ceil),
+    "min": _math(min),
+    "max": _math(max),
+}
+
+ARRAY_FUNCTIONS: Dict[str, Callable[..., np.ndarray]] = {
+    "abs": np.abs,
+    "sqrt": np.sqrt,
+    "exp": np.exp,
+    "log": np.log,
+    "sin": np.sin,
+    "cos": np.cos,
+    "tan": np.tan,
+    "floor": np.floor,
+    "ceil": np.ceil,
+    "min": np.minimum,
+    "max": np.maximum,
+}
+
+FUNCTION_ARITY: Dict[str, int] = {name: 1 for name in SCALAR_FUNCTIONS}
+FUNCTION_ARITY.update({"min": 2, "max": 2})
+
+# Helpers injected for operators that need guarding in scalar mode
+_SCALAR_HELPERS = {"_pow": _pow, "_div": _div, "_mod": _mod}
+_ARRAY_HELPERS = {"_pow": np.power, "_div": np.divide, "_mod": np.mod}
+_OPERATOR_HELPERS = {ast.Pow: "_pow", ast.Div: "_div", ast.Mod: "_mod"}
+
+
+class _Validator(ast.NodeVisitor):
+    """Walk an expression tree and reject anything outside the grammar."""
+
+    def __init__(self):
+        self.nodes = 0
+        self.depth = 0
+        self.cost = 0
+        self.variables = set()
+
+    def visit(self, node):
+        self.nodes += 1
+        if self.nodes > MAX_EXPRESSION_NODES:
+            raise ValueError("Expression is too complex")
+        self.cost += 1
+        self.depth += 1
+        if self.depth > MAX_EXPRESSION_DEPTH:
+            raise ValueError("Expression is nested too deeply")
+        try:
+            return super().visit(node)
+        finally:
+            self.depth -= 1
+
+    def generic_visit(self, node):
+        raise ValueError(f"Unsupported syntax in expression: {type(node).__name__}")
+
+    def visit_Expression(self, node):
+        self.visit(node.body)
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ValueError("Only numeric literals are allowed in expressions")
+
+    def visit_Name(self, node):
+        if node.id in VARIABLES:
+            self.variables.add(node.id)
+        elif node.id not in CONSTANTS:
+            raise ValueError(f"Unknown name in expression: {node.id}")
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, _BINARY_OPERATORS):
+            raise ValueError(f"Unsupported operator in expression: {type(node.op).__name__}")
+        if isinstance(node.op, ast.Pow):
+            self.cost += POWER_COST
+        self.visit(node.left)
+        self.visit(node.right)
+
+    def visit_UnaryOp(self, node):
+        if not isinstance(node.op, _UNARY_OPERATORS):
+            raise ValueError(f"Unsupported operator in expression: {type(node.op).__name__}")
+        self.visit(node.operand)
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in SCALAR_FUNCTIONS:
+            raise ValueError("Unsupported function call in expression")
+        if node.keywords or len(node.args) != FUNCTION_ARITY[node.func.id]:
+            raise ValueError(f"Invalid arguments to {node.func.id}()")
+        self.cost += CALL_COST
+        for arg in node.args:
+            self.visit(arg)
+
+
+class _GuardOperators(ast.NodeTransformer):
+    """Rewrite ``/``, ``%`` and ``**`` into calls to guarded helpers."""
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        helper = _OPERATOR_HELPERS.get(type(node.op))
+        if helper is None:
+            return node
+        return ast.copy_location(
+            ast.Call(func=ast.Name(id=helper, ctx=ast.Load()), args=[node.left, node.right], keywords=[]),
+            node,
+        )
+
+
+class CompiledExpression:
+    """
+    A validated expression compiled to a code object.
+
+    Attributes:
+        text: Normalized expression text
+        variables: Variable names the expression references
+        cost: Static estimate of evaluation cost
+    """
+
+    def __init__(self, text: str, code, variables: frozenset, cost: int):
+        self.text = text
+        self.variables = variables
+        self.cost = cost
+        self._code = code
+        self._scalar_namespace = {"__builtins__": {}, **CONSTANTS, **SCALAR_FUNCTIONS, **_SCALAR_HELPERS}
+        self._array_namespace = {"__builtins__": {}, **CONSTANTS, **ARRAY_FUNCTIONS, **_ARRAY_HELPERS}
+
+    def evaluate(self, a: float, b: float) -> float:
+        """
+        Evaluate the expression for a single pair of operands.
+
+        Raises:
+            ValueError: If evaluation fails (division by zero, overflow, domain error)
+        """
+        try:
+            result = eval(self._code, self._scalar_namespace, {"a": a, "b": b})
+        except (OverflowError, ZeroDivisionError):
+            raise ValueError("Expression result is out of range")
+        return _checked(float(result))
+
+    def evaluate_batch(self, a_values: Sequence[float], b_values: Sequence[float]) -> np.ndarray:
+        """
+        Evaluate the expression for many operand pairs at once using NumPy.
+
+        Raises:
+            ValueError: If any element fails to evaluate
+        """
+        a_array = np.asarray(a_values, dtype=np.float64)
+        b_array = np.asarray(b_values, dtype=np.float64)
+        if a_array.shape != b_array.shape:
+            raise ValueError("Operand batches must have the same length")
+        try:
+            with np.errstate(all="raise"):
+                result = eval(self._code, self._array_namespace, {"a": a_array, "b": b_array})
+        except FloatingPointError:
+            raise ValueError("Expression result is out of range")
+        return np.broadcast_to(np.asarray(result, dtype=np.float64), a_array.shape)
+
+
+def normalize_expression(text: str) -> str:
+    """
+    Validate an expression and return its canonical text.
+
+    Raises:
+        ValueError: If the expression is empty, too long or not in the grammar
+    """
+    if not text or not text.strip():
+        raise ValueError("Expression must be a non-empty string")
+    if len(text) > MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"Expression must be at most {MAX_EXPRESSION_LENGTH} characters")
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except SyntaxError:
+        raise ValueError("Expression is not valid syntax")
+    _Validator().visit(tree)
+    return ast.unparse(tree)
+
+
+@lru_cache(maxsize=512)
+def _compile_normalized(text: str) -> CompiledExpression:
+    tree = ast.parse(text, mode="eval")
+    validator = _Validator()
+    validator.visit(tree)
+    guarded = ast.fix_missing_locations(_GuardOperators().visit(tree))
+    code = compile(guarded, "<expression>", "eval")
+    return CompiledExpression(text, code, frozenset(validator.variables), validator.cost)
+
+
+@lru_cache(maxsize=512)
+def compile_expression(text: str) -> CompiledExpression:
+    """
+    Compile an expression, reusing cached compilations.
+
+    Args:
+        text: Expression source, e.g. ``"sqrt(a**2 + b**2)"``
+
+    Returns:
+        The compiled expression
+
+    Raises:
+        ValueError: If the expression is invalid
+    """
+    return _compile_normalized(normalize_expression(text))
+
+
+def evaluate_expression(text: str, a: float, b: float) -> float:
+    """Compile (or fetch from cache) and evaluate an expression."""
+    return compile_expression(text).evaluate(a, b)
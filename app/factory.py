@@ -3,64 +3,137 @@ Factory pattern for calculation operations.
 
 This module implements the Factory design pattern to create different
 calculation operations (Add, Subtract, Multiply, Divide) dynamically.
+
+Operations live in a single OperationRegistry. Built-in operations are
+registered directly; additional operations are discovered from the
+``secure_fastapi_app.operations`` entry point group and imported only
+when first used. Stateless operations are instantiated once and shared.
+
+Only binary operations over two scalar operands live here. Aggregates
+(n operands, streamed through accumulators) and vector operations
+(array operands) have different signatures and are dispatched by
+``app.aggregates`` and ``app.vectors``.
 """
 from abc import ABC, abstractmethod
-from typing import Dict, Type
+from importlib.metadata import EntryPoint, entry_points
+from typing import Callable, Dict, Optional, Sequence, Type, Union
+
+import numpy as np
+
+from app import executor
+from app.cost import bounded_modulo, bounded_modulo_many, bounded_power, bounded_power_many
+from app.expression import compile_expression
+from app.metrics import CALCULATIONS
+
+ENTRY_POINT_GROUP = "secure_fastapi_app.operations"
+
+ScalarKernel = Callable[..., float]
+VectorKernel = Callable[..., np.ndarray]
 
 
 class Operation(ABC):
     """
     Abstract base class for all calculation operations.
-    
-    Each concrete operation must implement the calculate method.
+
+    Each concrete operation must implement the calculate method. Operations
+    may override calculate_many with a vectorized kernel; the default loops
+    over calculate.
+
+    Attributes:
+        version: Kernel version, part of every cached result's key; bump it
+            whenever a change alters results, so stale cached results are
+            no longer found
+        cacheable: Whether results are worth keeping in the result cache
+            (false for operations cheaper to compute than to look up)
     """
-    
+
+    version: int = 1
+    cacheable: bool = True
+
     @abstractmethod
     def calculate(self, a: float, b: float) -> float:
         """
         Perform the calculation.
-        
+
         Args:
             a: First operand
             b: Second operand
-            
+
         Returns:
             Result of the calculation
         """
         pass
 
+    def calculate_many(self, a: Sequence[float], b: Sequence[float]) -> np.ndarray:
+        """
+        Perform the calculation for many operand pairs.
+
+        Args:
+            a: First operands
+            b: Second operands
+
+        Returns:
+            Array of results, one per operand pair
+        """
+        return np.fromiter(
+            (self.calculate(x, y) for x, y in zip(a, b)),
+            dtype=np.float64,
+            count=len(a),
+        )
+
+    def cost(self, expression: Optional[str] = None) -> int:
+        """Estimated cost of one evaluation, compared against INLINE_COST_LIMIT."""
+        return 0
+
 
 class AddOperation(Operation):
     """Addition operation."""
-    
+
+    cacheable = False
+
     def calculate(self, a: float, b: float) -> float:
         """Add two numbers."""
         return a + b
 
+    def calculate_many(self, a: Sequence[float], b: Sequence[float]) -> np.ndarray:
+        return np.add(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64))
+
 
 class SubtractOperation(Operation):
     """Subtraction operation."""
-    
+
+    cacheable = False
+
     def calculate(self, a: float, b: float) -> float:
         """Subtract b from a."""
         return a - b
 
+    def calculate_many(self, a: Sequence[float], b: Sequence[float]) -> np.ndarray:
+        return np.subtract(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64))
+
 
 class MultiplyOperation(Operation):
     """Multiplication operation."""
-    
+
+    cacheable = False
+
     def calculate(self, a: float, b: float) -> float:
         """Multiply two numbers."""
         return a * b
 
+    def calculate_many(self, a: Sequence[float], b: Sequence[float]) -> np.ndarray:
+        return np.multiply(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64))
+
 
 class DivideOperation(Operation):
     """Division operation."""
-    
+
+    cacheable = False
+
     def calculate(self, a: float, b: float) -> float:
         """
         Divide a by b.
-        
+
         Raises:
             ValueError: If b is zero
         """
@@ -68,86 +141,302 @@ class DivideOperation(Operation):
             raise ValueError("Division by zero is not allowed")
         return a / b
 
+    def calculate_many(self, a: Sequence[float], b: Sequence[float]) -> np.ndarray:
+        b_array = np.asarray(b, dtype=np.float64)
+        if np.any(b_array == 0):
+            raise ValueError("Division by zero is not allowed")
+        return np.divide(np.asarray(a, dtype=np.float64), b_array)
+
 
 class PowerOperation(Operation):
     """Exponentiation operation."""
 
     def calculate(self, a: float, b: float) -> float:
-        """Raise a to the power of b."""
-        return a ** b
+        """
+        Raise a to the power of b.
+
+        Raises:
+            ValueError: If the result would overflow or be complex
+        """
+        return bounded_power(a, b)
+
+    def calculate_many(self, a: Sequence[float], b: Sequence[float]) -> np.ndarray:
+        return bounded_power_many(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64))
 
 
 class ModuloOperation(Operation):
     """Modulo operation."""
 
+    cacheable = False
+
     def calculate(self, a: float, b: float) -> float:
         """Compute a modulo b."""
-        if b == 0:
-            raise ValueError("Division by zero is not allowed")
-        return a % b
+        return bounded_modulo(a, b)
+
+    def calculate_many(self, a: Sequence[float], b: Sequence[float]) -> np.ndarray:
+        return bounded_modulo_many(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64))
+
+
+class ExpressionOperation(Operation):
+    """
+    Arithmetic expression over the variables a and b.
+
+    The shared instance is stateless and takes the expression per call;
+    an instance created with an expression uses it as the default.
+    """
+
+    def __init__(self, expression: Optional[str] = None):
+        self.expression = expression
+
+    def _compiled(self, expression: Optional[str]):
+        expression = expression or self.expression
+        if not expression:
+            raise ValueError("Expression calculations require an expression")
+        return compile_expression(expression)
+
+    def calculate(self, a: float, b: float, expression: Optional[str] = None) -> float:
+        """
+        Evaluate the expression with the given operands.
+
+        Raises:
+            ValueError: If no expression was given or evaluation fails
+        """
+        return self._compiled(expression).evaluate(a, b)
+
+    def calculate_many(
+        self, a: Sequence[float], b: Sequence[float], expression: Optional[str] = None
+    ) -> np.ndarray:
+        return self._compiled(expression).evaluate_batch(a, b)
+
+    def cost(self, expression: Optional[str] = None) -> int:
+        return self._compiled(expression).cost
+
+
+# Operations that ship with the application
+BUILTIN_OPERATIONS: Dict[str, Type[Operation]] = {
+    "Add": AddOperation,
+    "Subtract": SubtractOperation,
+    "Multiply": MultiplyOperation,
+    "Divide": DivideOperation,
+    "Power": PowerOperation,
+    "Modulo": ModuloOperation,
+    "Expression": ExpressionOperation,
+}
+
+
+class _DispatchTable(dict):
+    """Kernel table that resolves (and caches) entries missing on lookup."""
+
+    def __init__(self, resolve: Callable[[str], Callable], names):
+        super().__init__((name, resolve(name)) for name in names)
+        self._resolve = resolve
+
+    def __missing__(self, name: str) -> Callable:
+        kernel = self[name] = self._resolve(name)
+        return kernel
+
+
+def _key(operation_type) -> str:
+    """Normalize an OperationType member or string to its registry key."""
+    return getattr(operation_type, "value", operation_type)
+
+
+class OperationRegistry:
+    """
+    Registry of operation singletons with precomputed dispatch tables.
+
+    Entry points are enumerated on first use and each plugin module is
+    imported only when its operation is first requested. Every binary
+    calculation, including ones evaluated in the process pool, goes through
+    the registry, so it alone decides caching and counts results.
+    Aggregates and vector operations are not registered here; see the
+    module docstring.
+    """
+
+    def __init__(self, builtins: Dict[str, Type[Operation]], group: str = ENTRY_POINT_GROUP):
+        self._builtins = builtins
+        self._group = group
+        self._sources: Optional[Dict[str, Union[Type[Operation], EntryPoint]]] = None
+        self._instances: Dict[str, Operation] = {}
+        self._scalar: Optional[Dict[str, ScalarKernel]] = None
+        self._vector: Optional[Dict[str, VectorKernel]] = None
+
+    def _discover(self) -> Dict[str, Union[Type[Operation], EntryPoint]]:
+        if self._sources is None:
+            sources: Dict[str, Union[Type[Operation], EntryPoint]] = dict(self._builtins)
+            for entry_point in entry_points(group=self._group):
+                # Built-ins cannot be shadowed by plugins
+                sources.setdefault(entry_point.name, entry_point)
+            self._sources = sources
+        return self._sources
+
+    def names(self) -> list[str]:
+        """Return the names of all registered operations."""
+        return list(self._discover().keys())
+
+    def __contains__(self, operation_type) -> bool:
+        return _key(operation_type) in self._discover()
+
+    def get_class(self, operation_type) -> Type[Operation]:
+        """
+        Return the class implementing an operation, importing it if needed.
+
+        Raises:
+            ValueError: If the operation is not registered
+        """
+        name = _key(operation_type)
+        sources = self._discover()
+        source = sources.get(name)
+        if source is None:
+            raise ValueError(
+                f"Unsupported operation type: {name}. "
+                f"Supported types: {', '.join(sources.keys())}"
+            )
+        if isinstance(source, EntryPoint):
+            source = source.load()
+            if not (isinstance(source, type) and issubclass(source, Operation)):
+                raise ValueError(f"Entry point for {name} is not an Operation subclass")
+            sources[name] = source
+        return source
+
+    def version(self, operation_type) -> int:
+        """Return the kernel version of an operation (see ``Operation.version``)."""
+        return self.get_class(operation_type).version
+
+    def is_cacheable(self, operation_type) -> bool:
+        """Return whether results of an operation are worth caching."""
+        return self.get_class(operation_type).cacheable
+
+    def exceeds_inline_cost(self, operation_type, expression: Optional[str] = None) -> bool:
+        """Whether a calculation is too expensive to evaluate on the event loop."""
+        return self.get(operation_type).cost(expression) > executor.INLINE_COST_LIMIT
+
+    def get(self, operation_type) -> Operation:
+        """Return the shared instance of an operation."""
+        name = _key(operation_type)
+        instance = self._instances.get(name)
+        if instance is None:
+            instance = self._instances[name] = self.get_class(name)()
+        return instance
+
+    @property
+    def scalar(self) -> Dict[str, ScalarKernel]:
+        """
+        Dispatch table of bound scalar kernels, keyed by operation name.
+
+        Built-ins are bound up front; plugin kernels are bound on first lookup.
+        """
+        if self._scalar is None:
+            self._scalar = _DispatchTable(lambda name: self.get(name).calculate, self._builtins)
+        return self._scalar
+
+    @property
+    def vector(self) -> Dict[str, VectorKernel]:
+        """Dispatch table of bound vectorized kernels, keyed by operation name."""
+        if self._vector is None:
+            self._vector = _DispatchTable(lambda name: self.get(name).calculate_many, self._builtins)
+        return self._vector
+
+    def calculate(self, operation_type, a: float, b: float, expression: Optional[str] = None) -> float:
+        """
+        Compute a single result through the scalar dispatch table.
+
+        Raises:
+            ValueError: If the operation is unknown or the calculation fails
+        """
+        name = _key(operation_type)
+        kernel = self.scalar[name]
+        result = kernel(a, b, expression) if expression is not None else kernel(a, b)
+        CALCULATIONS.inc((name,))
+        return result
+
+    def calculate_many(
+        self, operation_type, a: Sequence[float], b: Sequence[float], expression: Optional[str] = None
+    ) -> np.ndarray:
+        """
+        Compute results for many operand pairs through the vectorized dispatch table.
+
+        Raises:
+            ValueError: If the operation is unknown or any calculation fails
+        """
+        name = _key(operation_type)
+        kernel = self.vector[name]
+        results = kernel(a, b, expression) if expression is not None else kernel(a, b)
+        CALCULATIONS.inc((name,), len(results))
+        return results
+
+    async def calculate_bounded(
+        self, operation_type, a: float, b: float, expression: Optional[str] = None
+    ) -> float:
+        """
+        Compute a single result, in the process pool under the calculation
+        time budget if it exceeds INLINE_COST_LIMIT.
+
+        Raises:
+            ValueError: If the operation is unknown or the calculation fails
+            CalculationTimeout: If the calculation exceeds its time budget
+        """
+        name = _key(operation_type)
+        if not self.exceeds_inline_cost(name, expression):
+            return self.calculate(name, a, b, expression)
+        kernel = self.get(name).calculate
+        args = (a, b, expression) if expression is not None else (a, b)
+        result = await executor.run_bounded(kernel, *args)
+        CALCULATIONS.inc((name,))
+        return result
+
+
+registry = OperationRegistry(BUILTIN_OPERATIONS)
 
 
 class CalculationFactory:
     """
     Factory class for creating calculation operations.
-    
-    Uses a registry pattern to map operation types to their implementations.
+
+    A thin facade over the shared OperationRegistry.
     """
-    
-    # Registry mapping operation names to their classes
-    _operations: Dict[str, Type[Operation]] = {
-        "Add": AddOperation,
-        "Subtract": SubtractOperation,
-        "Multiply": MultiplyOperation,
-        "Divide": DivideOperation,
-        "Power": PowerOperation,
-        "Modulo": ModuloOperation,
-    }
-    
+
     @classmethod
-    def create_operation(cls, operation_type: str) -> Operation:
+    def create_operation(cls, operation_type: str, **options) -> Operation:
         """
         Create an operation instance based on the operation type.
-        
+
         Args:
             operation_type: Type of operation (Add, Subtract, Multiply, Divide)
-            
+            **options: Operation-specific arguments (e.g. expression)
+
         Returns:
-            An instance of the appropriate Operation subclass
-            
+            The shared instance, or a new instance when options are given
+
         Raises:
             ValueError: If operation_type is not supported
         """
-        operation_class = cls._operations.get(operation_type)
-        if operation_class is None:
-            raise ValueError(
-                f"Unsupported operation type: {operation_type}. "
-                f"Supported types: {', '.join(cls._operations.keys())}"
-            )
-        return operation_class()
-    
+        if options:
+            return registry.get_class(operation_type)(**options)
+        return registry.get(operation_type)
+
     @classmethod
     def get_supported_operations(cls) -> list[str]:
         """
         Get a list of supported operation types.
-        
+
         Returns:
             List of supported operation names
         """
-        return list(cls._operations.keys())
-    
+        return registry.names()
+
     @classmethod
-    def calculate(cls, operation_type: str, a: float, b: float) -> float:
+    def calculate(cls, operation_type: str, a: float, b: float, **options) -> float:
         """
         Convenience method to create an operation and calculate in one step.
-        
+
         Args:
             operation_type: Type of operation
             a: First operand
             b: Second operand
-            
+            **options: Operation-specific arguments (e.g. expression)
+
         Returns:
             Result of the calculation
         """
-        operation = cls.create_operation(operation_type)
-        return operation.calculate(a, b)
+        return registry.calculate(operation_type, a, b, **options)
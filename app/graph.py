@@ -0,0 +1,224 @@
+"""
+Dependency graph between calculations.
+
+A calculation may take either operand from another calculation's result
+(``a_ref`` / ``b_ref``). The references form a DAG stored on the
+calculations table itself; when an upstream row changes, only its
+descendants are recomputed, layer by layer in topological order, with
+each layer evaluated through the registry's vectorized kernels (or, for
+request handlers, expensive expressions in the bounded process pool).
+"""
+import asyncio
+from collections import defaultdict
+from typing import Dict, Generator, Iterable, List, Optional, Sequence, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.factory import registry
+from app.models import Calculation
+
+
+def get_source(db: Session, source_id: UUID, user_id: UUID) -> Calculation:
+    """
+    Fetch a referenced calculation owned by the same user.
+
+    Raises:
+        ValueError: If the reference does not exist or belongs to someone else
+    """
+    source = db.query(Calculation).filter(
+        Calculation.id == source_id,
+        Calculation.user_id == user_id
+    ).first()
+    if source is None:
+        raise ValueError(f"Referenced calculation {source_id} not found")
+    return source
+
+
+def _children(db: Session, parent_ids: Iterable[UUID], user_id: UUID) -> List[Calculation]:
+    parent_ids = list(parent_ids)
+    if not parent_ids:
+        return []
+    return db.query(Calculation).filter(
+        Calculation.user_id == user_id,
+        or_(Calculation.a_ref.in_(parent_ids), Calculation.b_ref.in_(parent_ids))
+    ).all()
+
+
+def descendants(db: Session, root: Calculation) -> Dict[UUID, Calculation]:
+    """
+    Collect every calculation that transitively depends on root.
+
+    Runs one query per graph level rather than one per node.
+    """
+    found: Dict[UUID, Calculation] = {}
+    frontier = [root.id]
+    while frontier:
+        next_frontier = []
+        for child in _children(db, frontier, root.user_id):
+            if child.id not in found and child.id != root.id:
+                found[child.id] = child
+                next_frontier.append(child.id)
+        frontier = next_frontier
+    return found
+
+
+def check_reference(db: Session, calc: Calculation, source_id: Optional[UUID]) -> None:
+    """
+    Ensure pointing calc at source_id keeps the graph acyclic.
+
+    Raises:
+        ValueError: If source_id is calc itself or one of its descendants
+    """
+    if source_id is None:
+        return
+    if source_id == calc.id or source_id in descendants(db, calc):
+        raise ValueError("Dependency cycle detected")
+
+
+def topological_layers(root: Calculation, nodes: Dict[UUID, Calculation]) -> List[List[Calculation]]:
+    """
+    Order the descendants of root into layers (Kahn's algorithm).
+
+    Every node in a layer depends only on root or on nodes in earlier
+    layers, so each layer can be evaluated as one batch.
+
+    Raises:
+        ValueError: If the nodes contain a cycle
+    """
+    known: Set[UUID] = set(nodes) | {root.id}
+    in_degree: Dict[UUID, int] = {}
+    dependents: Dict[UUID, List[UUID]] = defaultdict(list)
+    for node in nodes.values():
+        parents = {ref for ref in (node.a_ref, node.b_ref) if ref in known}
+        in_degree[node.id] = len(parents - {root.id})
+        for parent in parents:
+            dependents[parent].append(node.id)
+
+    layers: List[List[Calculation]] = []
+    current = [nodes[node_id] for node_id in dependents[root.id] if in_degree[node_id] == 0]
+    current = list({node.id: node for node in current}.values())
+    visited = 0
+    while current:
+        layers.append(current)
+        visited += len(current)
+        upcoming: Dict[UUID, Calculation] = {}
+        for node in current:
+            for child_id in dependents[node.id]:
+                in_degree[child_id] -= 1
+                if in_degree[child_id] == 0:
+                    upcoming[child_id] = nodes[child_id]
+        current = list(upcoming.values())
+    if visited != len(nodes):
+        raise ValueError("Dependency cycle detected")
+    return layers
+
+
+GroupEvaluation = Generator[Tuple[str, Optional[str], List[Calculation]], Sequence[float], List[Calculation]]
+
+
+def _propagate(db: Session, root: Calculation) -> GroupEvaluation:
+    """
+    Walk root's descendants layer by layer, yielding each (type, expression)
+    group of a layer for evaluation and receiving its results back.
+
+    Returns (as the generator's value) the recomputed calculations in
+    topological order.
+    """
+    nodes = descendants(db, root)
+    if not nodes:
+        return []
+    # Flush so a database-generated result reflects root's current inputs
+    db.flush()
+    results: Dict[UUID, float] = {root.id: root.result}
+    updated: List[Calculation] = []
+    for layer in topological_layers(root, nodes):
+        for node in layer:
+            if node.a_ref in results:
+                node.a = results[node.a_ref]
+            if node.b_ref in results:
+                node.b = results[node.b_ref]
+
+        # Evaluate each (type, expression) group of the layer as one batch
+        groups: Dict[tuple, List[Calculation]] = defaultdict(list)
+        for node in layer:
+            groups[(node.type, node.expression)].append(node)
+        for (operation_type, expression), group in groups.items():
+            values = yield operation_type, expression, group
+            for node, value in zip(group, values):
+                node.result = results[node.id] = float(value)
+        updated.extend(layer)
+    db.flush()
+    return updated
+
+
+def recompute_descendants(db: Session, root: Calculation) -> List[Calculation]:
+    """
+    Propagate root's result to every dependent calculation, inline.
+
+    Every dependent is evaluated in the calling thread without a time
+    budget, so this is for offline jobs; request handlers use
+    ``recompute_descendants_bounded``. Changes are made on the session
+    only; the caller commits them in one transaction (or rolls back if a
+    ValueError escapes).
+
+    Returns:
+        The recomputed calculations in topological order
+
+    Raises:
+        ValueError: On a cycle or if any dependent calculation fails
+    """
+    walk = _propagate(db, root)
+    try:
+        operation_type, expression, group = next(walk)
+        while True:
+            values = registry.calculate_many(
+                operation_type, [node.a for node in group], [node.b for node in group], expression
+            )
+            operation_type, expression, group = walk.send(values)
+    except StopIteration as done:
+        return done.value
+
+
+async def recompute_descendants_bounded(db: Session, root: Calculation) -> List[Calculation]:
+    """
+    Like ``recompute_descendants``, but without stalling the event loop on
+    expensive dependents.
+
+    Groups costing more than INLINE_COST_LIMIT are evaluated in the
+    process pool, one call (and one time budget) per dependent, like
+    ``evaluate_calculation`` does for a single calculation.
+
+    Raises:
+        ValueError: On a cycle or if any dependent calculation fails
+        CalculationTimeout: If a dependent exceeds its time budget
+    """
+    walk = _propagate(db, root)
+    try:
+        operation_type, expression, group = next(walk)
+        while True:
+            if registry.exceeds_inline_cost(operation_type, expression):
+                values = await _evaluate_in_pool(operation_type, expression, group)
+            else:
+                values = registry.calculate_many(
+                    operation_type, [node.a for node in group], [node.b for node in group], expression
+                )
+            operation_type, expression, group = walk.send(values)
+    except StopIteration as done:
+        return done.value
+
+
+async def _evaluate_in_pool(operation_type: str, expression: Optional[str], group: List[Calculation]) -> List[float]:
+    calls = [
+        asyncio.ensure_future(registry.calculate_bounded(operation_type, node.a, node.b, expression))
+        for node in group
+    ]
+    try:
+        values = await asyncio.gather(*calls)
+    except BaseException:
+        # One failure fails the group; stop the calls still holding workers
+        for call in calls:
+            call.cancel()
+        raise
+    return values
@@ -0,0 +1,161 @@
+"""
+Cross-worker cache invalidation over PostgreSQL LISTEN/NOTIFY.
+
+Mutation endpoints call ``publish`` inside their transaction; PostgreSQL
+delivers the notification to every listening connection only when that
+transaction commits, and drops it on rollback. Each worker runs one
+``InvalidationListener`` thread that receives notifications and hands the
+keys to the handler registered for their namespace.
+
+Notifications a worker sent itself are ignored, since it already updated
+its own caches. On databases without NOTIFY (SQLite) publishing and
+listening are no-ops; caches then rely on their TTL across workers.
+"""
+import json
+import logging
+import select
+import threading
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy import select as sql_select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "cache_invalidation"
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD = 7900
+ORIGIN = uuid.uuid4().hex
+
+# A handler receives the invalidated keys, or None to drop everything
+Handler = Callable[[Optional[List[str]]], None]
+_handlers: Dict[str, Handler] = {}
+
+
+def register(namespace: str, handler: Handler) -> None:
+    """Route notifications for a namespace to a handler."""
+    _handlers[namespace] = handler
+
+
+def supports_notify(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _payloads(namespace: str, keys: List[str]) -> Iterable[str]:
+    batch: List[str] = []
+    for key in keys:
+        candidate = json.dumps({"origin": ORIGIN, "namespace": namespace, "keys": batch + [key]})
+        if batch and len(candidate.encode("utf-8")) > MAX_PAYLOAD:
+            yield json.dumps({"origin": ORIGIN, "namespace": namespace, "keys": batch})
+            batch = []
+        batch.append(key)
+    if batch:
+        yield json.dumps({"origin": ORIGIN, "namespace": namespace, "keys": batch})
+
+
+def publish(db: Session, namespace: str, keys: Iterable[str]) -> None:
+    """
+    Queue an invalidation that other workers receive when ``db`` commits.
+
+    Args:
+        db: Session of the mutating transaction
+        namespace: Cache namespace (e.g. ``"user"``)
+        keys: Keys to invalidate within the namespace
+    """
+    keys = [str(key) for key in keys if key is not None]
+    if not keys or not supports_notify(db):
+        return
+    for payload in _payloads(namespace, keys):
+        db.execute(sql_select(func.pg_notify(CHANNEL, payload)))
+
+
+def dispatch(payload: str) -> None:
+    """Apply one notification payload to the registered handler."""
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        return
+    if message.get("origin") == ORIGIN:
+        return
+    handler = _handlers.get(message.get("namespace"))
+    if handler is not None:
+        handler(list(message.get("keys") or []))
+
+
+def reset_all() -> None:
+    """Drop every registered cache; used when notifications may have been missed."""
+    for handler in _handlers.values():
+        handler(None)
+
+
+class InvalidationListener:
+    """
+    Background thread holding a LISTEN connection.
+
+    After a connection loss it reconnects and resets every registered
+    cache, because notifications sent meanwhile are lost.
+
+    Attributes:
+        engine: Engine to take the listening connection from
+        poll_interval: Seconds between checks of the stop flag
+    """
+
+    def __init__(self, channel: str = CHANNEL, poll_interval: float = 1.0, retry_delay: float = 5.0):
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.engine: Optional[Engine] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, engine: Engine) -> bool:
+        """Start listening; returns False on databases without NOTIFY."""
+        if engine.dialect.name != "postgresql" or self._thread is not None:
+            return False
+        self.engine = engine
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-invalidation", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=self.poll_interval + 1)
+        self._thread = None
+
+    def _run(self) -> None:
+        connected_before = False
+        while not self._stop.is_set():
+            try:
+                raw = self.engine.raw_connection()
+                raw.detach()
+                try:
+                    connection = raw.driver_connection
+                    connection.autocommit = True
+                    with connection.cursor() as cursor:
+                        cursor.execute(f"LISTEN {self.channel}")
+                    if connected_before:
+                        reset_all()
+                    connected_before = True
+                    self._listen(connection)
+                finally:
+                    raw.close()
+            except Exception:
+                logger.exception("Cache invalidation listener lost its connection")
+                self._stop.wait(self.retry_delay)
+
+    def _listen(self, connection) -> None:
+        while not self._stop.is_set():
+            if select.select([connection], [], [], self.poll_interval) == ([], [], []):
+                continue
+            connection.poll()
+            while connection.notifies:
+                dispatch(connection.notifies.pop(0).payload)
+
+
+invalidation_listener = InvalidationListener()
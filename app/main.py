@@ -1,26 +1,69 @@
 """
 Main FastAPI application with user management endpoints.
 """
-from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, WebSocket, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from sqlalchemy.exc import IntegrityError
-from typing import List
+from sqlalchemy import exists, or_, select, update
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from typing import List, Optional, Tuple
 from datetime import datetime
 from uuid import UUID
 
-from app.database import get_db, engine, Base
-from app.models import User, Calculation
+import hmac
+import json
+import numpy as np
+
+from app.database import get_db, engine, Base, shared_session
+from app.models import User, Calculation, CalculationTombstone, VectorCalculation
 from app.schemas import (
     UserCreate, UserRead, UserUpdate, UserLogin,
     PasswordChange,
-    CalculationCreate, CalculationRead, CalculationUpdate, OperationType, CalculationSummary
+    CalculationCreate, CalculationRead, CalculationUpdate, OperationType, CalculationSummary, is_aggregate,
+    CalculationBulkCreate, CalculationChanges,
+    CalculationTransform, CalculationTransformResult,
+    VectorCalculationCreate, VectorCalculationInfo, VectorCalculationRead,
+    BatchRequest, BatchResponse
+)
+from app.aggregates import (
+    OperandCompressor, aggregate, decompress_operands, finalize, make_accumulator, parse_binary_stream, parse_text_stream
+)
+from app.factory import registry
+from app.graph import check_reference, get_source, recompute_descendants_bounded
+from app.result_cache import result_cache, result_key
+from app.executor import shutdown_pool
+from app.vectors import compute_vector, encode_array
+from app import queries
+from app.etags import bump_data_version, cache_headers, etag_matches, make_etag, not_modified
+from app.serialization import (
+    JSONBytesResponse, calculation_records_json, dumps, encode, encode_records, negotiated_response
 )
-from app.security import hash_password, verify_password, create_access_token, get_current_user_id
+from app.binary import (
+    FORMATS as BINARY_FORMATS, CBOR, JSON, MSGPACK, BinaryFormat, media_type as binary_media_type, negotiate
+)
+from app.sql_kernels import DB_COMPUTED_RESULTS, SQL_KERNELS, ZERO_DIVISOR_TYPES, is_kernel_error
+from app.security import hash_password_async, verify_password_async, create_access_token, get_current_user_id, check_admin
+from app.user_cache import UserIdentity, user_cache
+from app.invalidation import invalidation_listener
+from app.singleflight import coalesced_read, read_flights
+from app.assets import PrecompressedStaticFiles, static_directory
+from app.compression import CompressionMiddleware
+from app.timing import ServerTimingMiddleware, auth_phase
+from app.slow_queries import slow_query_log
+from app import metrics
+from app.batch import run_batch
+from app.events import (
+    CHANGED, CREATED, DELETED, UPDATED, calculation_row, event_bus, make_event, record_change, stream_events
+)
+from app import ws
+from app.migrations import upgrade_schema
 
-# Create all tables on startup
+# Create all tables on startup, then add columns newer than existing tables
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
 
 app = FastAPI(
     title="Secure FastAPI Application",
@@ -28,13 +71,28 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Innermost, so Server-Timing covers the endpoint and not compression
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(CompressionMiddleware)
+# Outermost, so latency includes compression
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Mount static files (the hashed, precompressed build when present)
+app.mount("/static", PrecompressedStaticFiles(directory=static_directory()), name="static")
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database tables on startup."""
+    """Initialize database tables and start listening for cache invalidations."""
     Base.metadata.create_all(bind=engine)
+    invalidation_listener.start(engine)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the calculation process pool, the invalidation listener and the slow-query writer."""
+    shutdown_pool()
+    invalidation_listener.stop()
+    slow_query_log.stop()
 
 
 @app.get("/health", tags=["Health"])
@@ -42,6 +100,60 @@ async def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "message": "Application is running"}
 
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    """
+    Runtime metrics in the Prometheus text format.
+
+    Open unless METRICS_TOKEN is set, in which case scrapers must send it
+    as a bearer token.
+    """
+    if metrics.METRICS_TOKEN and not hmac.compare_digest(
+        request.headers.get("authorization", ""), f"Bearer {metrics.METRICS_TOKEN}"
+    ):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@metrics.registry.register
+def collect_runtime_metrics():
+    """Scrape-time values owned by the pool, the caches and the event bus."""
+    pool = engine.pool
+    if hasattr(pool, "checkedout"):
+        yield metrics.family(
+            "calchub_db_pool_connections", "gauge", "Database pool connections by state.", {
+                ("checked_out",): pool.checkedout(), ("checked_in",): pool.checkedin(),
+                ("overflow",): max(pool.overflow(), 0),
+            }, ("state",),
+        )
+        yield metrics.family("calchub_db_pool_size", "gauge", "Configured database pool size.", {(): pool.size()})
+
+    caches = {"user": user_cache.stats(), "result": result_cache.stats()}
+    yield metrics.family("calchub_cache_hits_total", "counter", "Cache hits.", {
+        ("user",): caches["user"]["hits"], ("result",): caches["result"]["hits"] + caches["result"]["shared_hits"],
+    }, ("cache",))
+    yield metrics.family("calchub_cache_misses_total", "counter", "Cache misses.", {
+        (name,): stats["misses"] for name, stats in caches.items()
+    }, ("cache",))
+    yield metrics.family("calchub_cache_hit_ratio", "gauge", "Cache hits over lookups since start.", {
+        (name,): stats["hit_ratio"] for name, stats in caches.items()
+    }, ("cache",))
+
+    coalescing = read_flights.stats()["routes"]
+    yield metrics.family("calchub_read_executions_total", "counter", "Coalesced reads that ran a query.", {
+        (route,): stats["executions"] for route, stats in coalescing.items()
+    }, ("route",))
+    yield metrics.family("calchub_read_shared_total", "counter", "Coalesced reads served by another's query.", {
+        (route,): stats["shared"] for route, stats in coalescing.items()
+    }, ("route",))
+
+    events = event_bus.stats()
+    yield metrics.family("calchub_event_subscribers", "gauge", "Open calculation event streams.",
+                         {(): events["subscribers"]})
+    yield metrics.family("calchub_events_published_total", "counter", "Calculation change events published.",
+                         {(): events["published"]})
+
+
 # --- User Endpoints ---
 
 @app.post("/users/register", response_model=UserRead, status_code=status.HTTP_201_CREATED, tags=["Users"])
@@ -57,7 +169,7 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)) ->
     """
     try:
         # Hash the password before storing
-        password_hash = hash_password(user_data.password)
+        password_hash = await hash_password_async(user_data.password)
         
         # Create new user instance
         db_user = User(
@@ -70,6 +182,7 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)) ->
         db.add(db_user)
         db.commit()
         db.refresh(db_user)
+        user_cache.put(db_user)
         
         return db_user
     
@@ -104,14 +217,16 @@ async def login_user(user_data: UserLogin, db: Session = Depends(get_db)):
             detail="Invalid username or password"
         )
     
-    if not verify_password(user_data.password, user.password_hash):
+    if not await verify_password_async(user_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password"
         )
     user.last_login = datetime.utcnow()
+    user_cache.publish(db, user)
     db.commit()
     db.refresh(user)
+    user_cache.put(user)
     
     access_token = create_access_token(data={"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer", "user_id": str(user.id)}
@@ -121,8 +236,8 @@ async def get_my_profile(
     db: Session = Depends(get_db),
     current_username: str = Depends(get_current_user_id)
 ) -> UserRead:
-    """Return the currently authenticated user's profile."""
-    return get_authenticated_user(db, current_username)
+    """Return the currently authenticated user's profile (served from the user cache)."""
+    return JSONBytesResponse(get_cached_user(db, current_username).payload)
 
 
 @app.put("/users/me", response_model=UserRead, tags=["Users"])
@@ -133,6 +248,7 @@ async def update_my_profile(
 ) -> UserRead:
     """Update profile details for the authenticated user."""
     user = get_authenticated_user(db, current_username)
+    user_cache.publish(db, user)
 
     try:
         if user_data.username is not None:
@@ -146,6 +262,7 @@ async def update_my_profile(
 
         db.commit()
         db.refresh(user)
+        user_cache.put(user)
         return user
 
     except IntegrityError as e:
@@ -168,14 +285,17 @@ async def update_my_profile(
 
 @app.get("/users/{user_id}", response_model=UserRead, tags=["Users"])
 async def get_user(user_id: str, db: Session = Depends(get_db)) -> UserRead:
-    """Get a user by ID."""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    return user
+    """Get a user by ID (served from the user cache)."""
+    cached = user_cache.get(user_id)
+    if cached is None:
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        cached = user_cache.put(user)
+    return JSONBytesResponse(cached.payload)
 
 
 @app.post("/users/change-password", status_code=status.HTTP_204_NO_CONTENT, tags=["Users"])
@@ -187,14 +307,16 @@ async def change_password(
     """Change password for the authenticated user after verifying current password."""
     user = get_authenticated_user(db, current_username)
 
-    if not verify_password(payload.current_password, user.password_hash):
+    if not await verify_password_async(payload.current_password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
         )
 
-    user.password_hash = hash_password(payload.new_password)
+    user.password_hash = await hash_password_async(payload.new_password)
+    user_cache.publish(db, user)
     db.commit()
+    user_cache.invalidate(user.id, user.username)
     return None
 
 
@@ -220,6 +342,7 @@ async def update_user(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    user_cache.publish(db, user)
     
     try:
         if user_data.username is not None:
@@ -233,6 +356,7 @@ async def update_user(
         
         db.commit()
         db.refresh(user)
+        user_cache.put(user)
         return user
     
     except IntegrityError as e:
@@ -263,35 +387,108 @@ async def delete_user(user_id: str, db: Session = Depends(get_db)):
             detail="User not found"
         )
     
+    user_cache.publish(db, user)
     db.delete(user)
     db.commit()
+    user_cache.invalidate(user.id, user.username)
+
+# --- Admin Endpoints ---
+
+def require_admin(
+    db: Session = Depends(get_db),
+    current_username: str = Depends(get_current_user_id)
+) -> UserIdentity:
+    """Dependency that resolves the caller and only lets users listed in ADMIN_USER_IDS through."""
+    admin = get_authenticated_identity(db, current_username)
+    check_admin(admin.id)
+    return admin
+
+
+@app.get("/admin/user-cache/stats", tags=["Admin"])
+async def user_cache_stats(admin: UserIdentity = Depends(require_admin)):
+    """Return size, hit/miss counters and hit ratio of the user profile cache."""
+    return user_cache.stats()
+
+
+@app.post("/admin/user-cache/flush", tags=["Admin"])
+async def flush_user_cache(admin: UserIdentity = Depends(require_admin)):
+    """Drop every cached user profile in this worker."""
+    return {"flushed": user_cache.clear()}
+
+
+@app.get("/admin/read-coalescing/stats", tags=["Admin"])
+async def read_coalescing_stats(admin: UserIdentity = Depends(require_admin)):
+    """Return how many calculation reads were served by sharing a concurrent identical query."""
+    return read_flights.stats()
+
+
+@app.get("/admin/events/stats", tags=["Admin"])
+async def event_stream_stats(admin: UserIdentity = Depends(require_admin)):
+    """Return open calculation streams, published events and queue overflows in this worker."""
+    return event_bus.stats()
+
+
+# --- Batch Endpoint ---
+
+@app.post("/batch", response_model=BatchResponse, tags=["Batch"])
+async def batch(
+    batch_data: BatchRequest,
+    request: Request,
+    current_username: str = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """
+    Run several API requests in one round trip.
+
+    The token is validated once for the whole batch. Sub-requests run in
+    order on one database session; a batch of only GETs reads a single
+    consistent snapshot. Each sub-request keeps its own status code, so one
+    failing sub-request does not fail the batch. ``Accept:
+    application/msgpack`` or ``application/cbor`` encodes the envelope and
+    the decoded sub-response bodies in that binary format.
+    """
+    fmt = response_format(request)
+    responses = await run_batch(
+        request.app, request.scope, batch_data.requests, db,
+        current_username, request.headers["authorization"].encode("latin-1"),
+    )
+    return negotiated_response(encode({"responses": responses}, fmt), fmt)
 
 # --- Calculation Endpoints ---
 
-def perform_calculation(a: float, b: float, op: OperationType) -> float:
-    """Helper function to perform arithmetic operations."""
-    if op == OperationType.ADD:
-        return a + b
-    elif op == OperationType.SUBTRACT:
-        return a - b
-    elif op == OperationType.MULTIPLY:
-        return a * b
-    elif op == OperationType.DIVIDE:
-        if b == 0:
-            raise ValueError("Division by zero")
-        return a / b
-    elif op == OperationType.POWER:
-        return a ** b
-    elif op == OperationType.MODULO:
-        if b == 0:
-            raise ValueError("Division by zero")
-        return a % b
-    raise ValueError("Invalid operation")
+OCTET_STREAM = "application/octet-stream"
+MAX_CHANGES_PAGE = 5000
+
+
+async def evaluate_calculation(
+    a: float, b: float, op: str, expression: str | None = None, db: Session | None = None
+) -> float:
+    """
+    Evaluate a calculation without blocking the event loop on expensive input.
+
+    Results of expensive operations are served from the content-addressed
+    result cache when possible. Cheap operations run inline; calculations
+    whose estimated cost exceeds INLINE_COST_LIMIT run in the process pool
+    under a time budget.
+    """
+    cacheable = registry.is_cacheable(op)
+    if cacheable:
+        key = result_key(op, a, b, expression)
+        cached = result_cache.get(key, db)
+        if cached is not None:
+            return cached
+
+    result = await registry.calculate_bounded(op, a, b, expression)
+
+    if cacheable:
+        result_cache.put(key, result, op, db)
+    return result
 
 
 def get_authenticated_user(db: Session, current_username: str) -> User:
     """Retrieve the authenticated user or raise 404."""
-    user = db.query(User).filter(User.username == current_username).first()
+    with auth_phase():
+        user = db.query(User).filter(User.username == current_username).first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -300,6 +497,89 @@ def get_authenticated_user(db: Session, current_username: str) -> User:
     return user
 
 
+def get_cached_user(db: Session, current_username: str):
+    """Retrieve the authenticated user's cache entry, loading it on a miss, or raise 404."""
+    with auth_phase():
+        cached = user_cache.get_by_username(current_username)
+        if cached is None:
+            cached = user_cache.put(get_authenticated_user(db, current_username))
+    return cached
+
+
+def get_authenticated_identity(db: Session, current_username: str) -> UserIdentity:
+    """Retrieve the authenticated user's id and username without loading the User row on a cache hit."""
+    return get_cached_user(db, current_username).identity
+
+
+def parse_field_set(fields: Optional[str]) -> queries.FieldSet:
+    """Parse a ``fields`` query parameter or raise 400."""
+    try:
+        return queries.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+def get_authenticated_user_version(db: Session, current_username: str) -> Tuple[UUID, int]:
+    """Retrieve the authenticated user's id and data version (for read endpoints) or raise 404."""
+    with auth_phase():
+        cached = user_cache.get_by_username(current_username)
+        if cached is not None:
+            return cached.identity.id, queries.get_data_version(db, cached.identity.id)
+        found = queries.get_user_version(db, current_username)
+    if found is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    return found
+
+
+# Reads that negotiate a binary format vary by Accept as well as by user
+NEGOTIATED_VARY = "Authorization, Accept"
+EXPORT_EXTENSIONS = {MSGPACK: "msgpack", CBOR: "cbor"}
+
+
+def negotiated_etag_params(fmt: Optional[BinaryFormat]) -> Tuple[str, ...]:
+    """ETag material for the response format (none for JSON, so JSON ETags are unchanged)."""
+    return (fmt.media_type,) if fmt else ()
+
+
+def response_format(request: Request) -> Optional[BinaryFormat]:
+    """The binary format the client's Accept header prefers, or None for JSON."""
+    return negotiate(request.headers.get("accept"))
+
+
+async def read_negotiated_body(request: Request, model: type):
+    """
+    Decode a JSON, MessagePack or CBOR request body and validate it with ``model``.
+
+    Raises:
+        HTTPException: 415 for any other content type, 400 if the body cannot be decoded
+        RequestValidationError: If the body does not match ``model``
+    """
+    content_type = binary_media_type(request.headers.get("content-type"))
+    if content_type != JSON and content_type not in BINARY_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Send the body as one of: {', '.join([JSON, *BINARY_FORMATS])}"
+        )
+    body = await request.body()
+    try:
+        payload = json.loads(body) if content_type == JSON else BINARY_FORMATS[content_type].loads(body)
+    except (ValueError, RecursionError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Malformed body: {e}")
+    try:
+        return model.model_validate(payload)
+    except ValidationError as e:
+        # Inputs may be raw bytes, which the error response cannot render
+        raise RequestValidationError([
+            {**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False, include_input=False)
+        ])
+
+
 @app.post("/calculations", response_model=CalculationRead, status_code=status.HTTP_201_CREATED, tags=["Calculations"])
 async def create_calculation(
     calc_data: CalculationCreate, 
@@ -311,110 +591,530 @@ async def create_calculation(
     
     - **a**: First operand
     - **b**: Second operand  
-    - **type**: Operation type (Add, Subtract, Multiply, Divide)
+    - **type**: Operation type (Add, Subtract, Multiply, Divide, Power, Modulo, Expression)
+    - **expression**: Expression over a and b (Expression calculations only)
+    - **a_ref** / **b_ref**: Take an operand from another calculation's result
+    
+    For aggregates (Sum, Mean, Variance, Min, Max, Percentile) send
+    **operands** (and **percentile** for Percentile) instead of a and b;
+    the stored a is the operand count and b the percentile (0 otherwise).
+    Set **store_operands** to keep a compressed copy of the operands.
+    Very large operand lists should be streamed to /calculations/aggregate.
     
     Returns the created calculation with computed result.
     """
-    user = get_authenticated_user(db, current_username)
-    
+    user = get_authenticated_identity(db, current_username)
+    db_calc = await stage_new_calculation(db, user, calc_data)
+    db.commit()
+    db.refresh(db_calc)
+    return db_calc
+
+
+async def stage_new_calculation(db: Session, user: UserIdentity, calc_data: CalculationCreate) -> Calculation:
+    """
+    Compute and add a new calculation to the session; the caller commits.
+
+    Raises:
+        HTTPException: 400 if the operands are invalid
+    """
+    db_calc = await build_calculation(db, user, calc_data)
+    stage_created(db, user, [db_calc])
+    return db_calc
+
+
+async def build_calculation(db: Session, user: UserIdentity, calc_data: CalculationCreate) -> Calculation:
+    """
+    Compute a new calculation without adding it to the session.
+
+    Raises:
+        HTTPException: 400 if the operands are invalid
+    """
+    if is_aggregate(calc_data.type):
+        try:
+            operands = np.asarray(calc_data.operands, dtype=np.float64)
+            result = aggregate(calc_data.type, operands, calc_data.percentile)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        compressed = None
+        if calc_data.store_operands:
+            compressor = OperandCompressor()
+            compressor.write(operands)
+            compressed = compressor.finish()
+        return build_aggregate(user, calc_data.type, operands.size, calc_data.percentile, result, compressed)
+
     try:
-        result = perform_calculation(calc_data.a, calc_data.b, calc_data.type)
+        a = get_source(db, calc_data.a_ref, user.id).result if calc_data.a_ref else calc_data.a
+        b = get_source(db, calc_data.b_ref, user.id).result if calc_data.b_ref else calc_data.b
+        result = await evaluate_calculation(a, b, calc_data.type, calc_data.expression, db)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-    db_calc = Calculation(
-        a=calc_data.a,
-        b=calc_data.b,
+    return Calculation(
+        a=a,
+        b=b,
         type=calc_data.type,
+        expression=calc_data.expression,
+        a_ref=calc_data.a_ref,
+        b_ref=calc_data.b_ref,
         result=result,
         user_id=user.id
     )
-    db.add(db_calc)
+
+
+def stage_created(db: Session, user: UserIdentity, db_calcs: List[Calculation]) -> None:
+    """Add new calculations, bump the owner's version once and queue their change event."""
+    db.add_all(db_calcs)
+    version = bump_data_version(db, user.id)
+    for db_calc in db_calcs:
+        db_calc.change_seq = version
+    db.flush()
+    record_change(db, make_event(user.id, version, CREATED, db_calcs))
+
+
+def build_aggregate(
+    user: UserIdentity, calc_type: str, count: int, percentile: Optional[float],
+    result: float, operands: Optional[bytes]
+) -> Calculation:
+    """Build an aggregate calculation (a = operand count, b = percentile or 0)."""
+    return Calculation(
+        a=float(count),
+        b=percentile or 0.0,
+        type=getattr(calc_type, "value", calc_type),
+        result=result,
+        operands=operands,
+        user_id=user.id
+    )
+
+
+@app.post("/calculations/bulk", response_model=List[CalculationRead], status_code=status.HTTP_201_CREATED, tags=["Calculations"])
+async def create_calculations_bulk(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_username: str = Depends(get_current_user_id)
+):
+    """
+    Create up to 1000 calculations in one transaction.
+
+    The body is a list of calculation objects (as for POST /calculations)
+    sent as `application/json`, `application/msgpack` or
+    `application/cbor`; UUIDs may be 16 raw bytes. The response uses the
+    format negotiated with `Accept` (JSON by default). Either every
+    calculation is created or none is; errors name the failing item.
+    """
+    user = get_authenticated_identity(db, current_username)
+    items = await read_negotiated_body(request, CalculationBulkCreate)
+    fmt = response_format(request)
+
+    db_calcs = []
+    for index, calc_data in enumerate(items.root):
+        try:
+            db_calcs.append(await build_calculation(db, user, calc_data))
+        except HTTPException as e:
+            db.rollback()
+            raise HTTPException(status_code=e.status_code, detail=f"Item {index}: {e.detail}")
+    stage_created(db, user, db_calcs)
+    rows = [calculation_row(db_calc) for db_calc in db_calcs]
+    db.commit()
+    return negotiated_response(encode(rows, fmt), fmt, status_code=status.HTTP_201_CREATED)
+
+
+@app.post("/calculations/aggregate", response_model=CalculationRead, status_code=status.HTTP_201_CREATED, tags=["Calculations"])
+async def create_streamed_aggregate(
+    request: Request,
+    type: OperationType,
+    percentile: Optional[float] = None,
+    store_operands: bool = False,
+    db: Session = Depends(get_db),
+    current_username: str = Depends(get_current_user_id)
+) -> CalculationRead:
+    """
+    Create an aggregate calculation from operands streamed in the request body.
+    
+    The body is consumed chunk by chunk in constant memory (apart from the
+    compressed copy when **store_operands** is set):
+    
+    - `application/octet-stream`: little-endian float64 values
+    - anything else: numbers separated by commas, semicolons or whitespace
+    
+    Query parameters: **type** (Sum, Mean, Variance, Min, Max, Percentile),
+    **percentile** (0-100, Percentile only) and **store_operands**.
+    """
+    user = get_authenticated_identity(db, current_username)
+    if not is_aggregate(type):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{type.value} is not an aggregate operation"
+        )
+
+    binary = request.headers.get("content-type", "").startswith(OCTET_STREAM)
+    parse = parse_binary_stream if binary else parse_text_stream
+    compressor = OperandCompressor() if store_operands else None
+    try:
+        if (type == OperationType.PERCENTILE) != (percentile is not None):
+            raise ValueError("percentile is required for, and only allowed with, Percentile calculations")
+        accumulator = make_accumulator(type, percentile)
+        async for chunk in parse(request.stream()):
+            # Keep long chunks (e.g. P-squared updates) off the event loop
+            await run_in_threadpool(accumulator.update_many, chunk)
+            if compressor is not None:
+                compressor.write(chunk)
+        result = finalize(accumulator)
+        metrics.CALCULATIONS.inc((type.value,))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    operands = compressor.finish() if compressor is not None else None
+    db_calc = build_aggregate(user, type, accumulator.count, percentile, result, operands)
+    stage_created(db, user, [db_calc])
     db.commit()
     db.refresh(db_calc)
     return db_calc
 
 
+@app.post("/calculations/transform", response_model=CalculationTransformResult, tags=["Calculations"])
+async def transform_calculations(
+    transform: CalculationTransform,
+    db: Session = Depends(get_db),
+    current_username: str = Depends(get_current_user_id)
+) -> CalculationTransformResult:
+    """
+    Rewrite an operand of every calculation of one type in a single UPDATE.
+    
+    - **type**: Built-in arithmetic type (Add, Subtract, Multiply, Divide, Power, Modulo)
+    - **operand**: `a` or `b`; it becomes `operand * scale + offset` and is
+      detached from any reference
+    
+    Results are recomputed by the database in the same statement. Only
+    calculations that other calculations depend on are loaded afterwards,
+    to propagate their new results.
+    """
+    user = get_authenticated_identity(db, current_username)
+    table = Calculation.__table__
+    operand = table.c[transform.operand]
+    new_value = operand * transform.scale + transform.offset
+    matches = (table.c.user_id == user.id, table.c.type == transform.type.value)
+
+    if transform.type.value in ZERO_DIVISOR_TYPES and transform.operand == "b":
+        if db.scalar(select(exists().where(*matches, new_value == 0))):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Division by zero is not allowed"
+            )
+
+    values = {transform.operand: new_value, f"{transform.operand}_ref": None}
+    if not DB_COMPUTED_RESULTS:
+        new_a = new_value if transform.operand == "a" else table.c.a
+        new_b = new_value if transform.operand == "b" else table.c.b
+        values["result"] = SQL_KERNELS[transform.type.value](new_a, new_b)
+
+    try:
+        version = values["change_seq"] = bump_data_version(db, user.id)
+        updated = db.execute(update(table).where(*matches).values(values)).rowcount
+
+        # Propagate to dependents of the rewritten rows, if there are any
+        references = table.c.user_id == user.id
+        roots = db.query(Calculation).filter(
+            Calculation.user_id == user.id,
+            Calculation.type == transform.type.value,
+            or_(
+                Calculation.id.in_(select(table.c.a_ref).where(references)),
+                Calculation.id.in_(select(table.c.b_ref).where(references)),
+            )
+        ).all()
+        for root in roots:
+            for dependent in await recompute_descendants_bounded(db, root):
+                dependent.change_seq = version
+        record_change(db, make_event(user.id, version, CHANGED))
+        db.commit()
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except DBAPIError as e:
+        db.rollback()
+        if not is_kernel_error(e):
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Transform produced a result that is out of range or undefined"
+        )
+    return CalculationTransformResult(updated=updated, propagated=len(roots))
+
+
 @app.get("/calculations", response_model=List[CalculationRead], tags=["Calculations"])
 async def list_calculations(
+    request: Request,
     skip: int = 0, 
     limit: int = 100, 
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
     current_username: str = Depends(get_current_user_id)
 ) -> List[CalculationRead]:
     """
     Browse (List) all calculations for the authenticated user.
     
-    Supports pagination with skip and limit parameters.
+    Supports pagination with skip and limit parameters, and sparse
+    fieldsets with ``fields`` (e.g. ``fields=id,type,result``), which
+    selects only those columns. Responses carry a strong ETag; a matching
+    If-None-Match gets 304 without querying the calculations. Identical
+    concurrent requests share one query. ``Accept: application/msgpack``
+    or ``application/cbor`` returns the list in that binary format.
     """
-    # Get user from database
-    user = get_authenticated_user(db, current_username)
-    
-    # Filter calculations by user_id
-    calcs = db.query(Calculation).filter(
-        Calculation.user_id == user.id
-    ).offset(skip).limit(limit).all()
-    return calcs
+    field_set = parse_field_set(fields)
+    fmt = response_format(request)
+    media = fmt.media_type if fmt else JSON
+    user_id, version = get_authenticated_user_version(db, current_username)
+    etag = make_etag("calculations", user_id, version, skip, limit, *field_set, *negotiated_etag_params(fmt))
+    if etag_matches(request, etag):
+        return not_modified(etag, NEGOTIATED_VARY)
+
+    # Records already match CalculationRead, so response_model revalidation is skipped
+    body = await coalesced_read(
+        db, ("calculations", user_id, skip, limit, field_set, version, media),
+        lambda session: encode_records(queries.list_calculations(session, user_id, skip, limit, field_set), fmt),
+    )
+    return negotiated_response(body, fmt, headers=cache_headers(etag, NEGOTIATED_VARY))
 
 
 @app.get("/calculations/summary", response_model=CalculationSummary, tags=["Calculations"])
 async def calculations_summary(
+    request: Request,
     db: Session = Depends(get_db),
     current_username: str = Depends(get_current_user_id)
 ) -> CalculationSummary:
-    """Return aggregated metrics for the authenticated user's calculations."""
-    user = get_authenticated_user(db, current_username)
+    """
+    Return aggregated metrics for the authenticated user's calculations.
+    
+    Supports If-None-Match and request coalescing like the calculation list.
+    """
+    user_id, version = get_authenticated_user_version(db, current_username)
+    etag = make_etag("summary", user_id, version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
 
-    base_query = db.query(Calculation).filter(Calculation.user_id == user.id)
-    total = base_query.count()
+    body = await coalesced_read(db, ("summary", user_id, version), lambda session: summary_json(session, user_id))
+    return JSONBytesResponse(body, headers=cache_headers(etag))
 
-    breakdown_pairs = db.query(Calculation.type, func.count(Calculation.id)).filter(
-        Calculation.user_id == user.id
-    ).group_by(Calculation.type).all()
-    operations_breakdown = {op: count for op, count in breakdown_pairs}
 
-    average_result = base_query.with_entities(func.avg(Calculation.result)).scalar()
-    last_calc = base_query.order_by(Calculation.created_at.desc()).first()
+def summary_json(db: Session, user_id: UUID) -> bytes:
+    """Serialize a user's CalculationSummary."""
+    stats = queries.calculation_summary(db, user_id)
 
     most_used_operation = None
-    if operations_breakdown:
-        most_used_operation = max(operations_breakdown, key=operations_breakdown.get)
-
-    return CalculationSummary(
-        total=total,
-        average_result=float(average_result) if average_result is not None else None,
-        last_result=last_calc.result if last_calc else None,
-        operations_breakdown=operations_breakdown,
-        most_used_operation=most_used_operation,
+    if stats.operations_breakdown:
+        most_used_operation = max(stats.operations_breakdown, key=stats.operations_breakdown.get)
+
+    return dumps({
+        "total": stats.total,
+        "average_result": stats.average_result,
+        "last_result": stats.last_result,
+        "operations_breakdown": stats.operations_breakdown,
+        "most_used_operation": most_used_operation,
+    })
+
+
+@app.get("/calculations/export", response_model=List[CalculationRead], tags=["Calculations"])
+async def export_calculations(
+    request: Request,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_username: str = Depends(get_current_user_id)
+):
+    """
+    Export all of the authenticated user's calculations, oldest first.
+
+    The JSON array is streamed in batches, so memory stays flat however
+    many calculations the user has. Supports ``fields`` and If-None-Match
+    like the list endpoint. With ``Accept: application/cbor`` the export
+    is one indefinite-length CBOR array; with ``application/msgpack`` it
+    is a sequence of MessagePack maps, one per calculation, since
+    MessagePack arrays need their length up front.
+    """
+    field_set = parse_field_set(fields)
+    fmt = response_format(request)
+    user_id, version = get_authenticated_user_version(db, current_username)
+    etag = make_etag("export", user_id, version, *field_set, *negotiated_etag_params(fmt))
+    if etag_matches(request, etag):
+        return not_modified(etag, NEGOTIATED_VARY)
+
+    bind = db.get_bind()
+    # A batch drains the stream before its shared session closes, so inside
+    # one the export reads the batch's snapshot like every other sub-request
+    shared = db if shared_session.get() is db else None
+
+    def batches():
+        if shared is not None:
+            yield from queries.iter_calculations(shared, user_id, field_set)
+            return
+        # The stream outlives the endpoint, so it reads through its own session
+        with Session(bind=bind) as session:
+            yield from queries.iter_calculations(session, user_id, field_set)
+
+    def json_stream():
+        yield b"["
+        first = True
+        for batch in batches():
+            body = calculation_records_json(batch)[1:-1]
+            if body:
+                yield body if first else b"," + body
+                first = False
+        yield b"]"
+
+    extension = EXPORT_EXTENSIONS[fmt.media_type] if fmt else "json"
+    headers = {
+        **cache_headers(etag, NEGOTIATED_VARY),
+        "Content-Disposition": f'attachment; filename="calculations.{extension}"',
+    }
+    if fmt is None:
+        return StreamingResponse(json_stream(), media_type=JSON, headers=headers)
+    return StreamingResponse(fmt.stream(batches()), media_type=fmt.media_type, headers=headers)
+
+
+@app.get("/calculations/changes", response_model=CalculationChanges, tags=["Calculations"])
+async def calculation_changes(
+    request: Request,
+    since: Optional[str] = None,
+    limit: int = 1000,
+    db: Session = Depends(get_db),
+    current_username: str = Depends(get_current_user_id)
+) -> CalculationChanges:
+    """
+    Return calculations created, updated or deleted since a sync token.
+
+    Without ``since`` this is a full sync of every calculation. Each
+    response's ``next`` is the token for the following request; keep
+    requesting while ``has_more`` is true. Deleted calculations are listed
+    by id in ``deleted``. A token from another server state (e.g. after a
+    restore) gets 410 Gone, and the client should sync from scratch.
+    Supports If-None-Match, so polling an unchanged account costs one
+    primary-key lookup.
+    """
+    try:
+        since_version = None if since is None else int(since)
+        if since_version is not None and since_version < 0:
+            raise ValueError
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sync token")
+    if not 1 <= limit <= MAX_CHANGES_PAGE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"limit must be between 1 and {MAX_CHANGES_PAGE}"
+        )
+
+    user_id, version = get_authenticated_user_version(db, current_username)
+    if since_version is not None and since_version > version:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Sync token is no longer valid; sync from scratch")
+    etag = make_etag("changes", user_id, version, since, limit)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    changes = queries.list_changes(db, user_id, since_version, version, limit)
+    body = dumps({
+        "calculations": changes.calculations,
+        "deleted": changes.deleted,
+        "next": str(changes.until),
+        "has_more": changes.has_more,
+    })
+    return JSONBytesResponse(body, headers=cache_headers(etag))
+
+
+@app.get("/calculations/stream", tags=["Calculations"])
+async def stream_calculation_events(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_username: str = Depends(get_current_user_id)
+):
+    """
+    Push the authenticated user's calculation changes as Server-Sent Events.
+
+    Events are ``created`` and ``updated`` (carrying the changed
+    calculations, including recomputed dependents), ``deleted`` (carrying
+    ids; references to them become null) and ``changed`` or ``reset``
+    (refetch). Each event id is the user's data version; reconnecting with
+    ``Last-Event-ID`` replays missed events while they are still buffered.
+    """
+    user = get_authenticated_identity(db, current_username)
+    last_event_id = request.headers.get("last-event-id")
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    # Subscribe before reading the version, so no event can fall in between
+    subscriber = event_bus.subscribe(user.id.hex)
+    try:
+        current = queries.get_data_version(db, user.id)
+    except Exception:
+        event_bus.unsubscribe(subscriber)
+        raise
+    # Release the pooled connection; the stream only waits on the bus
+    db.rollback()
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(
+        stream_events(event_bus, subscriber, current, last_event_id),
+        media_type="text/event-stream", headers=headers,
     )
 
 
+@app.get("/calculations/cache-stats", tags=["Calculations"])
+async def calculation_cache_stats(admin: UserIdentity = Depends(require_admin)):
+    """Return hit/miss statistics for the shared calculation result cache (administrators only)."""
+    return result_cache.stats()
+
+
 @app.get("/calculations/{calc_id}", response_model=CalculationRead, tags=["Calculations"])
 async def get_calculation(
     calc_id: str, 
+    request: Request,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
     current_username: str = Depends(get_current_user_id)
 ) -> CalculationRead:
     """
     Read (Get) a specific calculation by ID for the authenticated user.
     
-    Returns 404 if calculation not found or doesn't belong to the user.
+    Supports ``fields`` like the list endpoint. Returns 404 if calculation
+    not found or doesn't belong to the user.
     """
-    # Get user from database
-    user = get_authenticated_user(db, current_username)
+    field_set = parse_field_set(fields)
+    user_id, version = get_authenticated_user_version(db, current_username)
+    etag = make_etag("calculation", user_id, version, calc_id, *field_set)
+    if etag_matches(request, etag):
+        return not_modified(etag)
     
     # Find calculation by ID and ensure it belongs to the user
-    calc = db.query(Calculation).filter(
-        Calculation.id == calc_id,
-        Calculation.user_id == user.id
-    ).first()
+    record = queries.get_calculation(db, calc_id, user_id, field_set)
     
-    if not calc:
+    if record is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
             detail="Calculation not found"
         )
-    return calc
+    return JSONBytesResponse(dumps(record), headers=cache_headers(etag))
+
+
+@app.get("/calculations/{calc_id}/operands", tags=["Calculations"])
+async def get_calculation_operands(
+    calc_id: UUID,
+    db: Session = Depends(get_db),
+    current_username: str = Depends(get_current_user_id)
+) -> Response:
+    """
+    Download the stored operands of an aggregate calculation.
+    
+    Returns little-endian float64 bytes, or 404 if the operands were not stored.
+    """
+    user = get_authenticated_identity(db, current_username)
+    operands = db.query(Calculation.operands).filter(
+        Calculation.id == calc_id,
+        Calculation.user_id == user.id
+    ).scalar()
+    if operands is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Stored operands not found"
+        )
+    return Response(content=decompress_operands(operands).tobytes(), media_type=OCTET_STREAM)
 
 
 @app.put("/calculations/{calc_id}", response_model=CalculationRead, tags=["Calculations"])
@@ -430,34 +1130,15 @@ async def update_calculation(
     
     Supports both PUT and PATCH methods.
     Updates operands and/or operation type, then recalculates the result.
+    Setting an operand to a value detaches it from its reference. Every
+    calculation that depends on this one is recomputed in topological
+    order in the same transaction.
     """
     try:
         # Get user from database
-        user = get_authenticated_user(db, current_username)
-        
-        # Find calculation by ID and ensure it belongs to the user
-        calc = db.query(Calculation).filter(
-            Calculation.id == calc_id,
-            Calculation.user_id == user.id
-        ).first()
+        user = get_authenticated_identity(db, current_username)
         
-        if not calc:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, 
-                detail="Calculation not found"
-            )
-
-        # Update fields if provided
-        if calc_data.a is not None:
-            calc.a = calc_data.a
-        if calc_data.b is not None:
-            calc.b = calc_data.b
-        if calc_data.type is not None:
-            calc.type = calc_data.type
-
-        # Recompute result
-        calc.result = perform_calculation(calc.a, calc.b, OperationType(calc.type))
-
+        calc = await stage_update(db, user, calc_id, calc_data)
         db.commit()
         db.refresh(calc)
         return calc
@@ -484,21 +1165,9 @@ async def delete_calculation(
     """
     try:
         # Get user from database
-        user = get_authenticated_user(db, current_username)
-        
-        # Find calculation by ID and ensure it belongs to the user
-        calc = db.query(Calculation).filter(
-            Calculation.id == calc_id,
-            Calculation.user_id == user.id
-        ).first()
-        
-        if not calc:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, 
-                detail="Calculation not found"
-            )
+        user = get_authenticated_identity(db, current_username)
         
-        db.delete(calc)
+        stage_delete(db, user, calc_id)
         db.commit()
     except HTTPException:
         raise
@@ -508,3 +1177,296 @@ async def delete_calculation(
         print(f"Error deleting calculation: {str(e)}")
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
+
+
+async def stage_update(db: Session, user: UserIdentity, calc_id: UUID, calc_data: CalculationUpdate) -> Calculation:
+    """
+    Apply an update and recompute dependents in the session; the caller commits.
+
+    Raises:
+        HTTPException: 404 if the user has no such calculation, 400 if the update is invalid
+    """
+    # Find calculation by ID and ensure it belongs to the user
+    calc = db.query(Calculation).filter(
+        Calculation.id == calc_id,
+        Calculation.user_id == user.id
+    ).first()
+    
+    if not calc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, 
+            detail="Calculation not found"
+        )
+
+    if is_aggregate(calc.type) or is_aggregate(calc_data.type):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Aggregate calculations cannot be edited; create a new one instead"
+        )
+
+    previous_inputs = (calc.a, calc.b, calc.type, calc.expression)
+
+    # Update fields if provided
+    try:
+        if calc_data.a is not None:
+            calc.a, calc.a_ref = calc_data.a, None
+        if calc_data.b is not None:
+            calc.b, calc.b_ref = calc_data.b, None
+        if calc_data.a_ref is not None:
+            check_reference(db, calc, calc_data.a_ref)
+            calc.a, calc.a_ref = get_source(db, calc_data.a_ref, user.id).result, calc_data.a_ref
+        if calc_data.b_ref is not None:
+            check_reference(db, calc, calc_data.b_ref)
+            calc.b, calc.b_ref = get_source(db, calc_data.b_ref, user.id).result, calc_data.b_ref
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if calc_data.type is not None:
+        calc.type = calc_data.type
+    if calc_data.expression is not None:
+        if calc.type != OperationType.EXPRESSION:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="expression is only allowed for Expression calculations"
+            )
+        calc.expression = calc_data.expression
+    elif calc.type != OperationType.EXPRESSION:
+        calc.expression = None
+
+    # Recompute result only when an input actually changed
+    dependents = []
+    try:
+        if (calc.a, calc.b, calc.type, calc.expression) != previous_inputs:
+            calc.result = await evaluate_calculation(calc.a, calc.b, calc.type, calc.expression, db)
+            dependents = await recompute_descendants_bounded(db, calc)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    version = bump_data_version(db, user.id)
+    for changed in (calc, *dependents):
+        changed.change_seq = version
+    db.flush()
+    record_change(db, make_event(user.id, version, UPDATED, [calc, *dependents]))
+    return calc
+
+
+def stage_delete(db: Session, user: UserIdentity, calc_id: UUID) -> None:
+    """
+    Delete a calculation, detach its dependents and leave a tombstone; the caller commits.
+
+    Raises:
+        HTTPException: 404 if the user has no such calculation
+    """
+    # Find calculation by ID and ensure it belongs to the user
+    calc = db.query(Calculation).filter(
+        Calculation.id == calc_id,
+        Calculation.user_id == user.id
+    ).first()
+    
+    if not calc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, 
+            detail="Calculation not found"
+        )
+    
+    # Dependents keep their last operand values
+    version = bump_data_version(db, user.id)
+    db.query(Calculation).filter(Calculation.a_ref == calc.id).update(
+        {Calculation.a_ref: None, Calculation.change_seq: version}, synchronize_session=False
+    )
+    db.query(Calculation).filter(Calculation.b_ref == calc.id).update(
+        {Calculation.b_ref: None, Calculation.change_seq: version}, synchronize_session=False
+    )
+    db.delete(calc)
+    # Leave a tombstone so delta sync can report the deletion
+    db.add(CalculationTombstone(id=calc.id, user_id=user.id, change_seq=version))
+    record_change(db, make_event(user.id, version, DELETED, deleted=[calc_id]))
+
+
+# --- Vector Calculation Endpoints ---
+
+
+def get_owned_vector_calculation(db: Session, calc_id: UUID, user: UserIdentity) -> VectorCalculation:
+    """Retrieve a vector calculation owned by the user or raise 404."""
+    calc = db.query(VectorCalculation).filter(
+        VectorCalculation.id == calc_id,
+        VectorCalculation.user_id == user.id
+    ).first()
+    if not calc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Vector calculation not found"
+        )
+    return calc
+
+
+@app.post("/vector-calculations", response_model=VectorCalculationRead, status_code=status.HTTP_201_CREATED, tags=["Vector Calculations"])
+async def create_vector_calculation(
+    calc_data: VectorCalculationCreate,
+    db: Session = Depends(get_db),
+    current_username: str = Depends(get_current_user_id)
+) -> VectorCalculationRead:
+    """
+    Create a vector calculation for the authenticated user.
+    
+    - **type**: Dot, ElementwiseAdd, ElementwiseMultiply, Norm, VectorSum or VectorMean
+    - **a** / **b**: Lists of numbers or base64-encoded float64 data
+    - **store_operands**: Set to false to persist only the result
+    
+    Arrays in the response are base64-encoded little-endian float64.
+    """
+    user = get_authenticated_identity(db, current_username)
+
+    a, b = calc_data.a_array, calc_data.b_array
+    try:
+        result = compute_vector(calc_data.type.value, a, b)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    reduced = isinstance(result, float)
+    db_calc = VectorCalculation(
+        type=calc_data.type.value,
+        length=int(a.size),
+        a_data=encode_array(a) if calc_data.store_operands else None,
+        b_data=encode_array(b) if calc_data.store_operands and b is not None else None,
+        result=result if reduced else None,
+        result_data=None if reduced else encode_array(result),
+        user_id=user.id
+    )
+    db.add(db_calc)
+    db.commit()
+    db.refresh(db_calc)
+    return db_calc
+
+
+@app.get("/vector-calculations", response_model=List[VectorCalculationInfo], tags=["Vector Calculations"])
+async def list_vector_calculations(
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_username: str = Depends(get_current_user_id)
+) -> List[VectorCalculationInfo]:
+    """List vector calculation metadata for the authenticated user, without array payloads."""
+    user = get_authenticated_identity(db, current_username)
+    rows = db.query(
+        VectorCalculation.id,
+        VectorCalculation.type,
+        VectorCalculation.length,
+        VectorCalculation.result,
+        VectorCalculation.user_id,
+        VectorCalculation.created_at,
+    ).filter(
+        VectorCalculation.user_id == user.id
+    ).order_by(VectorCalculation.created_at.desc()).offset(skip).limit(limit).all()
+    return [VectorCalculationInfo.model_validate(row) for row in rows]
+
+
+@app.get("/vector-calculations/{calc_id}", response_model=VectorCalculationRead, tags=["Vector Calculations"])
+async def get_vector_calculation(
+    calc_id: UUID,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_username: str = Depends(get_current_user_id)
+):
+    """
+    Read a vector calculation.
+    
+    Returns JSON with base64-encoded arrays by default. With
+    `Accept: application/octet-stream` the result is returned as raw
+    little-endian float64 bytes (a single value for reductions).
+    """
+    user = get_authenticated_identity(db, current_username)
+    calc = get_owned_vector_calculation(db, calc_id, user)
+
+    if OCTET_STREAM in request.headers.get("accept", ""):
+        body = calc.result_data if calc.result_data is not None else encode_array(np.array([calc.result]))
+        return Response(
+            content=body,
+            media_type=OCTET_STREAM,
+            headers={"X-Vector-Type": calc.type, "X-Vector-Length": str(len(body) // 8)}
+        )
+    return calc
+
+
+@app.delete("/vector-calculations/{calc_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Vector Calculations"])
+async def delete_vector_calculation(
+    calc_id: UUID,
+    db: Session = Depends(get_db),
+    current_username: str = Depends(get_current_user_id)
+):
+    """Delete a vector calculation for the authenticated user."""
+    user = get_authenticated_identity(db, current_username)
+    calc = get_owned_vector_calculation(db, calc_id, user)
+    db.delete(calc)
+    db.commit()
+
+
+# --- WebSocket Endpoint ---
+
+def parse_compute(message: dict) -> CalculationCreate:
+    calc_data = CalculationCreate.model_validate(message)
+    if calc_data.a_ref or calc_data.b_ref:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="compute does not resolve references; use create"
+        )
+    return calc_data
+
+
+async def run_compute(calc_data: CalculationCreate, principal: ws.Principal) -> dict:
+    """Evaluate without touching the database."""
+    if is_aggregate(calc_data.type):
+        result = aggregate(calc_data.type, np.asarray(calc_data.operands, dtype=np.float64), calc_data.percentile)
+    else:
+        result = await evaluate_calculation(calc_data.a, calc_data.b, calc_data.type, calc_data.expression)
+    return {"result": result}
+
+
+def parse_calc_id(message: dict) -> UUID:
+    try:
+        return UUID(str(message.get("calc_id")))
+    except ValueError:
+        raise ValueError("calc_id must be a UUID")
+
+
+async def run_create(db: Session, calc_data: CalculationCreate, principal: ws.Principal) -> dict:
+    calc = await stage_new_calculation(db, principal.identity, calc_data)
+    return {"calculation": calculation_row(calc)}
+
+
+async def run_update(db: Session, args: Tuple[UUID, CalculationUpdate], principal: ws.Principal) -> dict:
+    calc = await stage_update(db, principal.identity, *args)
+    return {"calculation": calculation_row(calc)}
+
+
+async def run_delete(db: Session, calc_id: UUID, principal: ws.Principal) -> dict:
+    stage_delete(db, principal.identity, calc_id)
+    return {}
+
+
+WS_HANDLERS = {
+    "compute": ws.Handler(parse_compute, run_compute, writes=False),
+    "create": ws.Handler(CalculationCreate.model_validate, run_create, writes=True),
+    "update": ws.Handler(
+        lambda message: (parse_calc_id(message), CalculationUpdate.model_validate(message)), run_update, writes=True
+    ),
+    "delete": ws.Handler(parse_calc_id, run_delete, writes=True),
+}
+
+
+@app.websocket("/ws/calculations")
+async def calculation_socket(websocket: WebSocket, db: Session = Depends(get_db)):
+    """
+    Persistent calculator session (see ``app.ws`` for the protocol).
+
+    Ops: ``compute`` (evaluate only, nothing stored), ``create``,
+    ``update`` (with ``calc_id``) and ``delete`` (``calc_id``). Fields are
+    those of the matching HTTP request body. Writes are committed in
+    groups; a write's reply is sent once it is committed.
+    """
+    await websocket.accept()
+    principal = await ws.authenticate(websocket, lambda username: get_authenticated_identity(db, username))
+    # Writes open their own sessions; don't hold a connection for the life of the socket
+    bind = db.get_bind()
+    db.rollback()
+    if principal is not None:
+        await ws.serve(websocket, principal, WS_HANDLERS, bind)
@@ -0,0 +1,363 @@
+"""
+In-process metrics, exposed in the Prometheus text format at /metrics.
+
+Counters, gauges and histograms are sharded per thread: each thread that
+records a value gets its own dict of label values to numbers, so the hot
+path is a thread-local lookup and a dict update, with no lock. A scrape
+sums the shards under the metric's lock. Shards of threads that have
+exited are folded into a base shard so thread churn does not grow them.
+
+Values that already live elsewhere (cache counters, the connection pool)
+are read at scrape time by collectors registered with ``register``.
+
+Series are named ``calchub_*``. The instrumented values are:
+
+- HTTP requests: latency histogram and count per route template, and
+  requests in flight (``MetricsMiddleware``)
+- bcrypt: latency per operation and calls in progress (``app.security``)
+- calculations computed per operation type (``app.factory``,
+  ``app.aggregates``, and the process pool path in ``app.main``)
+- database pool, caches, read coalescing and live streams (collectors
+  registered in ``app.main``)
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# When set, GET /metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Starlette appends "; charset=utf-8" to text types
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Seconds; the Prometheus client defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+BCRYPT_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0)
+
+Labels = Tuple[str, ...]
+
+
+class Sample(NamedTuple):
+    """One exposition line: a series name suffix, its labels and value."""
+    suffix: str
+    labels: Dict[str, str]
+    value: float
+
+
+class Family(NamedTuple):
+    """A metric family as rendered: name, type, help text and samples."""
+    name: str
+    kind: str
+    documentation: str
+    samples: List[Sample]
+
+
+class _Metric:
+    """Base of the sharded metric types."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, dict]] = []
+        self._base: dict = {}
+        self._lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), values))
+            return values
+
+    def _merged(self) -> Dict[Labels, object]:
+        """Sum every shard (folding those of exited threads into the base)."""
+        with self._lock:
+            live = []
+            for thread, values in self._shards:
+                if thread.is_alive():
+                    live.append((thread, values))
+                else:
+                    self._merge_into(self._base, values)
+            self._shards = live
+            merged = self._copy(self._base)
+            for _, values in live:
+                self._merge_into(merged, dict(values))
+        return merged
+
+    def _merge_into(self, target: dict, values: dict) -> None:
+        for labels, value in values.items():
+            target[labels] = target.get(labels, 0.0) + value
+
+    def _copy(self, values: dict) -> dict:
+        return dict(values)
+
+    def _label_dict(self, labels: Labels) -> Dict[str, str]:
+        return dict(zip(self.labelnames, labels))
+
+    def collect(self) -> Family:
+        samples = [Sample("", self._label_dict(labels), value) for labels, value in sorted(self._merged().items())]
+        return Family(self.name, self.kind, self.documentation, samples)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._base = {}
+            for _, values in self._shards:
+                values.clear()
+
+
+class Counter(_Metric):
+    """A monotonically increasing count; names end in ``_total``."""
+
+    kind = "counter"
+
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down, as the sum of per-thread increments.
+
+    Suits "in progress" gauges, where every ``inc`` has a matching ``dec``.
+    """
+
+    kind = "gauge"
+
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0.0) + amount
+
+    def dec(self, labels: Labels = (), amount: float = 1.0) -> None:
+        self.inc(labels, -amount)
+
+    @contextmanager
+    def track(self, labels: Labels = ()) -> Iterator[None]:
+        """Count the block as in progress while it runs."""
+        self.inc(labels)
+        try:
+            yield
+        finally:
+            self.dec(labels)
+
+
+class Histogram(_Metric):
+    """Observations counted into fixed buckets, plus their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        shard = self._shard()
+        counts = shard.get(labels)
+        if counts is None:
+            # One slot per bucket, one for +Inf, then the sum
+            counts = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    @contextmanager
+    def time(self, labels: Labels = ()) -> Iterator[None]:
+        """Observe the block's duration in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, labels)
+
+    def _merge_into(self, target: dict, values: dict) -> None:
+        for labels, counts in values.items():
+            existing = target.get(labels)
+            if existing is None:
+                target[labels] = list(counts)
+            else:
+                for index, count in enumerate(counts):
+                    existing[index] += count
+
+    def _copy(self, values: dict) -> dict:
+        return {labels: list(counts) for labels, counts in values.items()}
+
+    def collect(self) -> Family:
+        samples = []
+        for labels, counts in sorted(self._merged().items()):
+            label_dict = self._label_dict(labels)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                samples.append(Sample("_bucket", {**label_dict, "le": _format_value(bound)}, cumulative))
+            samples.append(Sample("_sum", label_dict, counts[-1]))
+            samples.append(Sample("_count", label_dict, cumulative))
+        return Family(self.name, self.kind, self.documentation, samples)
+
+
+Collector = Callable[[], Iterable[Family]]
+
+
+class Registry:
+    """The metrics and scrape-time collectors rendered by /metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Collector] = []
+        self._lock = threading.Lock()
+
+    def _add(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def register(self, collector: Collector) -> Collector:
+        """Add a function returning families computed at scrape time."""
+        with self._lock:
+            self._collectors.append(collector)
+        return collector
+
+    def collect(self) -> List[Family]:
+        with self._lock:
+            metrics, collectors = list(self._metrics.values()), list(self._collectors)
+        families = [metric.collect() for metric in metrics]
+        for collector in collectors:
+            families.extend(collector())
+        return families
+
+    def render(self) -> bytes:
+        """Render every family in the Prometheus text exposition format (0.0.4)."""
+        lines = []
+        for family in self.collect():
+            lines.append(f"# HELP {family.name} {_escape_help(family.documentation)}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for sample in family.samples:
+                lines.append(f"{family.name}{sample.suffix}{_format_labels(sample.labels)} {_format_value(sample.value)}")
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    def clear(self) -> None:
+        """Reset every metric (tests)."""
+        for metric in list(self._metrics.values()):
+            metric.clear()
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if value == float("-inf"):
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def family(name: str, kind: str, documentation: str, values: Dict[Labels, float],
+           labelnames: Sequence[str] = ()) -> Family:
+    """Build a collector family from label tuples to values."""
+    samples = [Sample("", dict(zip(labelnames, labels)), value) for labels, value in sorted(values.items())]
+    return Family(name, kind, documentation, samples)
+
+
+registry = Registry()
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "calchub_http_request_duration_seconds", "HTTP request latency, until the last body chunk is sent.",
+    ("method", "route"),
+)
+HTTP_REQUESTS = registry.counter(
+    "calchub_http_requests_total", "HTTP requests by route template and status code.", ("method", "route", "status"),
+)
+HTTP_IN_FLIGHT = registry.gauge("calchub_http_requests_in_flight", "HTTP requests being processed.", ("method",))
+BCRYPT_SECONDS = registry.histogram(
+    "calchub_bcrypt_duration_seconds", "bcrypt hash and verify latency.", ("operation",), BCRYPT_BUCKETS,
+)
+BCRYPT_IN_PROGRESS = registry.gauge(
+    "calchub_bcrypt_in_progress", "bcrypt calls running on a bcrypt worker thread.", ("operation",),
+)
+BCRYPT_WAITING = registry.gauge(
+    "calchub_bcrypt_waiting", "bcrypt calls queued for a free bcrypt worker thread.", ("operation",),
+)
+CALCULATIONS = registry.counter(
+    "calchub_calculations_total", "Results computed, by operation type.", ("operation",),
+)
+
+
+def route_label(scope: Scope) -> str:
+    """
+    The matched route's path template, so label values stay bounded.
+
+    Mounted apps (static files) get one label per mount point, and
+    anything else shares the ``unmatched`` label.
+    """
+    path = getattr(scope.get("route"), "path", None)
+    if path:
+        return path
+    if "app_root_path" in scope:
+        return scope["root_path"][len(scope["app_root_path"]):] + "/*"
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency, status counts and requests in flight."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc((method,))
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec((method,))
+            route = route_label(scope)
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, (method, route))
+            HTTP_REQUESTS.inc((method, route, str(status_code)))
@@ -0,0 +1,94 @@
+"""
+Startup upgrades for tables that existed before a release added columns.
+
+``Base.metadata.create_all`` creates missing tables but never alters an
+existing one, so a column added to an existing table is listed in
+``ADDED_COLUMNS``. On startup, ``upgrade_schema`` adds each listed column
+the table still lacks, with the type, foreign key and indexes of its
+model definition. Added columns must be nullable (or have a server
+default), since existing rows get no value. Columns the model does not
+define in the current configuration (``stored_result`` outside
+``CALCULATION_RESULT_MODE=database``) are skipped.
+
+A generated column cannot be added to an existing table, so database
+result mode needs ``calculations`` created in that mode (or rebuilt by an
+explicit migration); ``upgrade_schema`` refuses to start it on a table
+whose ``result`` is a plain column.
+"""
+import logging
+from typing import List, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+
+from app import models  # noqa: F401  (registers the tables on Base.metadata)
+from app.database import Base
+from app.sql_kernels import DB_COMPUTED_RESULTS
+
+logger = logging.getLogger(__name__)
+
+# (table, column) pairs added to existing tables, oldest first
+ADDED_COLUMNS: List[Tuple[str, str]] = [
+    ("calculations", "expression"),
+    ("calculations", "a_ref"),
+    ("calculations", "b_ref"),
+    ("calculations", "operands"),
+    ("calculations", "change_seq"),
+    ("calculations", "stored_result"),
+]
+
+
+def add_column_ddl(engine: Engine, table_name: str, column_name: str) -> str:
+    """Build ``ALTER TABLE ... ADD COLUMN`` for a column of the model metadata."""
+    dialect = engine.dialect
+    quote = dialect.identifier_preparer.quote
+    column = Base.metadata.tables[table_name].c[column_name]
+    ddl = f"ALTER TABLE {quote(table_name)} ADD COLUMN {quote(column.name)} {column.type.compile(dialect=dialect)}"
+    for foreign_key in column.foreign_keys:
+        target = foreign_key.column
+        ddl += f" REFERENCES {quote(target.table.name)} ({quote(target.name)})"
+        if foreign_key.ondelete:
+            ddl += f" ON DELETE {foreign_key.ondelete}"
+    return ddl
+
+
+def upgrade_schema(engine: Engine) -> List[str]:
+    """
+    Add the columns in ADDED_COLUMNS that existing tables lack.
+
+    Args:
+        engine: Engine of the application database, after create_all
+
+    Returns:
+        The "table.column" names that were added
+
+    Raises:
+        RuntimeError: Database result mode on a calculations table whose
+            result column is not generated
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    if DB_COMPUTED_RESULTS and "calculations" in existing_tables:
+        result = next(column for column in inspector.get_columns("calculations") if column["name"] == "result")
+        if "computed" not in result:
+            raise RuntimeError(
+                "CALCULATION_RESULT_MODE=database needs calculations.result to be a generated column; "
+                "the existing table predates it, so recreate the table or migrate it explicitly"
+            )
+    added: List[str] = []
+    with engine.begin() as conn:
+        for table_name, column_name in ADDED_COLUMNS:
+            if table_name not in existing_tables:
+                continue
+            if column_name not in Base.metadata.tables[table_name].c:
+                continue
+            if column_name in {column["name"] for column in inspector.get_columns(table_name)}:
+                continue
+            conn.exec_driver_sql(add_column_ddl(engine, table_name, column_name))
+            table = Base.metadata.tables[table_name]
+            for index in table.indexes:
+                if column_name in index.columns:
+                    index.create(conn, checkfirst=True)
+            logger.info("Added column %s.%s", table_name, column_name)
+            added.append(f"{table_name}.{column_name}")
+    return added
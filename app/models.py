@@ -2,11 +2,16 @@
 SQLAlchemy models for the application.
 """
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Float, ForeignKey, func, Uuid
-from sqlalchemy.orm import relationship
+from sqlalchemy import Boolean, Column, Computed, String, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, func, Uuid
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import deferred, relationship
 import uuid
 
 from app.database import Base
+from app.sql_kernels import DB_COMPUTED_RESULTS, result_expression
+
+# Column the application writes results to (see app.sql_kernels)
+WRITABLE_RESULT_COLUMN = "stored_result" if DB_COMPUTED_RESULTS else "result"
 
 
 class User(Base):
@@ -45,9 +50,19 @@ class Calculation(Base):
         a: First operand (float)
         b: Second operand (float)
         type: Operation type (Add, Subtract, Multiply, Divide)
+        expression: Expression text for Expression calculations
+        a_ref: Calculation whose result feeds operand a, if any
+        b_ref: Calculation whose result feeds operand b, if any
         result: Computed result of the operation
+        operands: zlib-compressed float64 operand list of an aggregate, if stored
         user_id: Optional foreign key to User model
         created_at: Timestamp when calculation was created
+        change_seq: Owner's data version at the row's last change (delta sync)
+
+    Aggregate calculations (Sum, Mean, ...) store the operand count in a
+    and the requested percentile (or 0) in b. With
+    CALCULATION_RESULT_MODE=database, result is a generated column and
+    writes to it go to stored_result.
     """
     __tablename__ = "calculations"
 
@@ -55,12 +70,172 @@ class Calculation(Base):
     a = Column(Float, nullable=False)
     b = Column(Float, nullable=False)
     type = Column(String(20), nullable=False)
-    result = Column(Float, nullable=False)
+    expression = Column(String(255), nullable=True)
+    a_ref = Column(Uuid, ForeignKey("calculations.id", ondelete="SET NULL"), nullable=True, index=True)
+    b_ref = Column(Uuid, ForeignKey("calculations.id", ondelete="SET NULL"), nullable=True, index=True)
+    if DB_COMPUTED_RESULTS:
+        # The database derives result for built-in arithmetic; other types use stored_result
+        stored_result = Column(Float, nullable=True)
+        computed_result = Column(
+            "result", Float, Computed(result_expression(type, a, b, stored_result), persisted=True)
+        )
+    else:
+        result = Column(Float, nullable=False)
+    # Deferred so listing calculations never loads operand blobs
+    operands = deferred(Column(LargeBinary, nullable=True))
     user_id = Column(Uuid, ForeignKey("users.id"), nullable=True, index=True)
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    # NULL for rows unchanged since before change tracking
+    change_seq = Column(Integer, nullable=True)
 
     # Relationship to User (optional)
     user = relationship("User", backref="calculations")
 
+    __table_args__ = (Index("ix_calculations_user_id_change_seq", "user_id", "change_seq"),)
+
+    if DB_COMPUTED_RESULTS:
+        @hybrid_property
+        def result(self):
+            """Generated result, or the application's value until the row is flushed."""
+            return self.computed_result if self.computed_result is not None else self.stored_result
+
+        @result.setter
+        def result(self, value):
+            self.stored_result = value
+
+        @result.expression
+        def result(cls):
+            return cls.computed_result
+
     def __repr__(self) -> str:
         return f"<Calculation(id={self.id}, type={self.type}, a={self.a}, b={self.b}, result={self.result})>"
+
+
+class UserDataVersion(Base):
+    """
+    Per-user counter bumped by every calculation mutation.
+    
+    Read endpoints derive ETags from it, so unchanged data can be answered
+    with 304 Not Modified without querying the calculations themselves.
+    
+    Attributes:
+        user_id: Owning user (primary key)
+        version: Number of mutations so far
+    """
+    __tablename__ = "user_data_versions"
+
+    user_id = Column(Uuid, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"<UserDataVersion(user_id={self.user_id}, version={self.version})>"
+
+
+class CalculationTombstone(Base):
+    """
+    Marker left by a deleted calculation.
+    
+    Delta sync (GET /calculations/changes) reports deletions from these
+    rows, since the calculation itself is gone.
+    
+    Attributes:
+        id: Id of the deleted calculation
+        user_id: Owner of the deleted calculation
+        change_seq: Owner's data version of the deletion
+        deleted_at: Deletion timestamp
+    """
+    __tablename__ = "calculation_tombstones"
+
+    id = Column(Uuid, primary_key=True)
+    user_id = Column(Uuid, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    change_seq = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    __table_args__ = (Index("ix_calculation_tombstones_user_id_change_seq", "user_id", "change_seq"),)
+
+    def __repr__(self) -> str:
+        return f"<CalculationTombstone(id={self.id}, change_seq={self.change_seq})>"
+
+
+class CachedResult(Base):
+    """
+    Shared, content-addressed calculation result.
+    
+    Rows are keyed by a hash of the operation and its inputs and carry no
+    user information; they only let workers reuse each other's results.
+    
+    Attributes:
+        key: SHA-256 content address of (type, a, b, expression)
+        type: Operation type, for inspection and pruning
+        result: Computed result
+        created_at: Timestamp when the result was cached
+    """
+    __tablename__ = "calculation_results"
+
+    key = Column(String(64), primary_key=True)
+    type = Column(String(20), nullable=False)
+    result = Column(Float, nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<CachedResult(key={self.key}, type={self.type}, result={self.result})>"
+
+
+class RecomputeCheckpoint(Base):
+    """
+    Progress of one worker of a result recompute job.
+    
+    Attributes:
+        job_name: Unique job/worker name
+        last_id: Last calculation id processed (keyset cursor)
+        processed: Rows processed so far
+        updated: Rows whose result changed
+        failed: Rows that could not be recomputed
+        finished: Whether the worker reached the end of its range
+        updated_at: Timestamp of the last checkpoint
+    """
+    __tablename__ = "recompute_checkpoints"
+
+    job_name = Column(String(100), primary_key=True)
+    last_id = Column(Uuid, nullable=True)
+    processed = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    finished = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<RecomputeCheckpoint(job_name={self.job_name}, processed={self.processed}, finished={self.finished})>"
+
+
+class VectorCalculation(Base):
+    """
+    Calculation over float64 vectors, stored as binary blobs.
+    
+    Attributes:
+        id: UUID primary key
+        type: Vector operation type (Dot, ElementwiseAdd, Norm, ...)
+        length: Number of elements in each operand
+        a_data: First operand as float64 bytes (None when only the result is kept)
+        b_data: Second operand as float64 bytes (binary operations only)
+        result: Scalar result of reductions
+        result_data: Array result of element-wise operations as float64 bytes
+        user_id: Foreign key to User model
+        created_at: Timestamp when calculation was created
+    """
+    __tablename__ = "vector_calculations"
+
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4, index=True)
+    type = Column(String(30), nullable=False)
+    length = Column(Integer, nullable=False)
+    a_data = Column(LargeBinary, nullable=True)
+    b_data = Column(LargeBinary, nullable=True)
+    result = Column(Float, nullable=True)
+    result_data = Column(LargeBinary, nullable=True)
+    user_id = Column(Uuid, ForeignKey("users.id"), nullable=False, index=True)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    user = relationship("User", backref="vector_calculations")
+
+    def __repr__(self) -> str:
+        return f"<VectorCalculation(id={self.id}, type={self.type}, length={self.length})>"
@@ -0,0 +1,237 @@
+"""
+Read-side query layer for calculations.
+
+Read endpoints only serialize what they fetch, so they select plain
+column tuples with Core ``select()`` and wrap them in ``CalculationRecord``,
+a ``__slots__`` dataclass. Nothing enters the session's identity map, no
+relationship or backref state is built, and orjson serializes the records
+natively. Writes keep using the ORM models.
+
+Sparse fieldsets (``?fields=id,type,result``) select only the requested
+columns into a record class generated once per field set.
+"""
+from collections import namedtuple
+from dataclasses import dataclass, make_dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import func, select, union_all
+from sqlalchemy.orm import Session
+
+from app.models import Calculation, CalculationTombstone, User, UserDataVersion
+
+# Columns in CalculationRead field order
+CALCULATION_FIELDS = ("id", "a", "b", "type", "expression", "a_ref", "b_ref", "result", "user_id", "created_at")
+
+
+@dataclass
+class CalculationRecord:
+    """Read-only view of one calculation row; fields match CalculationRead."""
+    __slots__ = CALCULATION_FIELDS
+
+    id: UUID
+    a: float
+    b: float
+    type: str
+    expression: Optional[str]
+    a_ref: Optional[UUID]
+    b_ref: Optional[UUID]
+    result: float
+    user_id: Optional[UUID]
+    created_at: datetime
+
+
+FieldSet = Tuple[str, ...]
+
+
+def parse_fields(fields: Optional[str]) -> FieldSet:
+    """
+    Parse a ``fields`` query parameter into a canonical field set.
+
+    Fields are returned in CalculationRead order, without duplicates, so
+    equivalent requests share one cache key and one record class.
+
+    Raises:
+        ValueError: If a field is unknown or the list is empty
+    """
+    if fields is None:
+        return CALCULATION_FIELDS
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    if not requested:
+        raise ValueError("fields must name at least one field")
+    unknown = sorted(requested.difference(CALCULATION_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed fields: {', '.join(CALCULATION_FIELDS)}")
+    return tuple(name for name in CALCULATION_FIELDS if name in requested)
+
+
+@lru_cache(maxsize=256)
+def record_type(fields: FieldSet) -> type:
+    """Return the slotted record class for a field set (CalculationRecord for all fields)."""
+    if fields == CALCULATION_FIELDS:
+        return CalculationRecord
+    annotations = CalculationRecord.__annotations__
+    return make_dataclass(
+        "CalculationRecord_" + "_".join(fields),
+        [(name, annotations[name]) for name in fields],
+        namespace={"__slots__": fields},
+    )
+
+
+def _columns(fields: FieldSet):
+    return tuple(getattr(Calculation, name) for name in fields)
+
+
+SummaryStats = namedtuple("SummaryStats", "total average_result last_result operations_breakdown")
+# A page of delta sync: changed rows, deleted ids, and the version the page reaches
+Changes = namedtuple("Changes", "calculations deleted until has_more")
+
+
+def get_user_id(db: Session, username: str) -> Optional[UUID]:
+    """Look up a user's id without loading the User row."""
+    return db.execute(select(User.id).where(User.username == username)).scalar()
+
+
+def get_user_version(db: Session, username: str) -> Optional[Tuple[UUID, int]]:
+    """Look up a user's id and calculation data version (0 before any mutation) in one query."""
+    row = db.execute(
+        select(User.id, func.coalesce(UserDataVersion.version, 0))
+        .outerjoin(UserDataVersion, UserDataVersion.user_id == User.id)
+        .where(User.username == username)
+    ).first()
+    return tuple(row) if row is not None else None
+
+
+def get_data_version(db: Session, user_id: UUID) -> int:
+    """Look up a user's calculation data version (0 before any mutation)."""
+    version = db.execute(select(UserDataVersion.version).where(UserDataVersion.user_id == user_id)).scalar()
+    return version or 0
+
+
+def list_calculations(
+    db: Session, user_id: UUID, skip: int = 0, limit: int = 100, fields: FieldSet = CALCULATION_FIELDS
+) -> List[CalculationRecord]:
+    """Fetch a page of a user's calculations as records with the given fields."""
+    record = record_type(fields)
+    rows = db.execute(
+        select(*_columns(fields)).where(Calculation.user_id == user_id).offset(skip).limit(limit)
+    )
+    return [record(*row) for row in rows]
+
+
+def get_calculation(
+    db: Session, calc_id: UUID, user_id: UUID, fields: FieldSet = CALCULATION_FIELDS
+) -> Optional[CalculationRecord]:
+    """Fetch one calculation owned by the user, or None."""
+    row = db.execute(
+        select(*_columns(fields)).where(Calculation.id == calc_id, Calculation.user_id == user_id)
+    ).first()
+    return record_type(fields)(*row) if row is not None else None
+
+
+def iter_calculations(
+    db: Session, user_id: UUID, fields: FieldSet = CALCULATION_FIELDS, batch_size: int = 1000
+) -> Iterator[List[CalculationRecord]]:
+    """Stream all of a user's calculations, oldest first, in batches of records."""
+    record = record_type(fields)
+    result = db.execute(
+        select(*_columns(fields))
+        .where(Calculation.user_id == user_id)
+        .order_by(Calculation.created_at, Calculation.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for rows in result.partitions():
+        yield [record(*row) for row in rows]
+
+
+def list_changes(
+    db: Session, user_id: UUID, since: Optional[int], current: int, limit: int = 1000
+) -> Changes:
+    """
+    Fetch calculations changed and deleted after data version ``since``.
+
+    Rows are stamped with the owner's data version by every mutation, so
+    changes are an index range scan on ``(user_id, change_seq)``. Pages
+    end on a version boundary, so a client never sees half of one
+    mutation; a single mutation that touched more than ``limit`` rows is
+    returned whole. ``since=None`` is a full sync: every live row, no
+    tombstones.
+
+    Args:
+        db: Session to read with
+        user_id: Owner
+        since: Version the client has synced up to, or None
+        current: Owner's data version, read before this call
+        limit: Target page size
+
+    Returns:
+        Changes whose ``until`` is the client's next ``since``
+    """
+    tombstone_seq = CalculationTombstone.change_seq
+    if since is None:
+        seq = func.coalesce(Calculation.change_seq, 0)
+        row_filter = [Calculation.user_id == user_id, seq <= current]
+        candidates = select(seq.label("seq")).where(*row_filter).subquery()
+    else:
+        seq = Calculation.change_seq
+        row_filter = [Calculation.user_id == user_id, seq > since, seq <= current]
+        tombstone_filter = [CalculationTombstone.user_id == user_id, tombstone_seq > since, tombstone_seq <= current]
+        candidates = union_all(
+            select(seq.label("seq")).where(*row_filter),
+            select(tombstone_seq.label("seq")).where(*tombstone_filter),
+        ).subquery()
+    seqs = db.execute(select(candidates.c.seq).order_by(candidates.c.seq).limit(limit + 1)).scalars().all()
+
+    until, has_more = current, False
+    if len(seqs) > limit:
+        until, has_more = seqs[limit - 1], True
+        if seqs[limit] == until:
+            # Do not split the last mutation; drop it unless it is all there is
+            earlier = [value for value in seqs[:limit] if value < until]
+            if earlier:
+                until = earlier[-1]
+
+    record = record_type(CALCULATION_FIELDS)
+    rows = db.execute(
+        select(*_columns(CALCULATION_FIELDS)).where(*row_filter, seq <= until).order_by(seq, Calculation.id)
+    )
+    deleted: List[UUID] = []
+    if since is not None:
+        deleted = list(db.execute(
+            select(CalculationTombstone.id)
+            .where(*tombstone_filter, tombstone_seq <= until)
+            .order_by(tombstone_seq)
+        ).scalars())
+    return Changes([record(*row) for row in rows], deleted, until, has_more)
+
+
+def calculation_summary(db: Session, user_id: UUID) -> SummaryStats:
+    """
+    Compute summary metrics in two queries.
+
+    One grouped query yields per-type counts and result sums (total and
+    average are derived from them); a second fetches the latest result.
+    """
+    groups = db.execute(
+        select(Calculation.type, func.count(), func.sum(Calculation.result))
+        .where(Calculation.user_id == user_id)
+        .group_by(Calculation.type)
+    ).all()
+    breakdown: Dict[str, int] = {calc_type: count for calc_type, count, _ in groups}
+    total = sum(breakdown.values())
+    result_sum = sum(float(subtotal or 0.0) for _, _, subtotal in groups)
+
+    last_result = db.execute(
+        select(Calculation.result)
+        .where(Calculation.user_id == user_id)
+        .order_by(Calculation.created_at.desc())
+        .limit(1)
+    ).scalar()
+    return SummaryStats(
+        total=total,
+        average_result=result_sum / total if total else None,
+        last_result=last_result,
+        operations_breakdown=breakdown,
+    )
@@ -0,0 +1,404 @@
+"""
+Resumable background job that recomputes stored calculation results.
+
+When an operation's semantics change, stored ``Calculation.result`` values
+go stale. This job walks the calculations table in primary-key (keyset)
+order, recomputes each chunk through the registry's vectorized kernels
+and writes changed results back in batched UPDATEs per chunk. Progress
+is checkpointed in the same transaction as each chunk, so an interrupted
+run resumes where it stopped. Several workers can split the id space.
+
+The write-back only matches rows whose operands, type, expression and
+result are still the ones the chunk read. A row edited between the read
+and the write keeps its edit and is counted as skipped; the edit already
+computed its result from the new operands.
+
+Each row is recomputed from its own stored operands, and a changed result
+is propagated to the calculations that reference it (``a_ref`` /
+``b_ref``) in the same transaction. Aggregate rows are skipped, since
+their operand lists are not always stored, and so are rows whose result
+the database generates itself.
+
+A run first deletes the shared cached results of the types it recomputes,
+so workers stop serving the old values. In-memory caches of running
+workers only let go of them once the operation's ``version`` is bumped
+(see ``app.result_cache.result_key``).
+
+Usage:
+    python -m app.recompute --types Power,Modulo --workers 4 --chunk-size 1000
+"""
+import argparse
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import Float, String, Uuid, bindparam, cast, column, delete, or_, select, update, values
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.aggregates import AGGREGATE_TYPES
+from app.etags import bump_data_versions
+from app.events import CHANGED, make_event, record_change
+from app.factory import registry
+from app.graph import recompute_descendants
+from app.sql_kernels import DB_COMPUTED_RESULTS, SQL_KERNELS
+from app.models import WRITABLE_RESULT_COLUMN, CachedResult, Calculation, RecomputeCheckpoint
+
+DEFAULT_CHUNK_SIZE = 1000
+UUID_SPACE = 2 ** 128
+SKIPPED_TYPES = (*AGGREGATE_TYPES, *(SQL_KERNELS if DB_COMPUTED_RESULTS else ()))
+
+
+@dataclass
+class RecomputeStats:
+    """Counters for one job (or the sum of several workers)."""
+    processed: int = 0
+    updated: int = 0
+    failed: int = 0
+    skipped: int = 0
+
+    def __add__(self, other: "RecomputeStats") -> "RecomputeStats":
+        return RecomputeStats(
+            self.processed + other.processed,
+            self.updated + other.updated,
+            self.failed + other.failed,
+            self.skipped + other.skipped,
+        )
+
+
+def split_id_space(workers: int) -> List[Tuple[Optional[uuid.UUID], Optional[uuid.UUID]]]:
+    """
+    Split the UUID key space into contiguous [low, high) ranges.
+
+    The first range has no lower bound and the last no upper bound.
+    """
+    bounds = [uuid.UUID(int=i * UUID_SPACE // workers) for i in range(1, workers)]
+    lows: List[Optional[uuid.UUID]] = [None, *bounds]
+    highs: List[Optional[uuid.UUID]] = [*bounds, None]
+    return list(zip(lows, highs))
+
+
+def recompute_rows(rows: Sequence) -> Tuple[List[Tuple[uuid.UUID, float]], int]:
+    """
+    Recompute results for a chunk of (id, a, b, type, expression, result) rows.
+
+    Rows are grouped by (type, expression) and evaluated with the vectorized
+    kernels; if a group fails, its rows are retried one by one so a single
+    bad row does not block the rest.
+
+    Returns:
+        (changed (id, result) pairs, number of rows that failed)
+    """
+    groups: Dict[tuple, list] = defaultdict(list)
+    for row in rows:
+        groups[(row.type, row.expression)].append(row)
+
+    changed: List[Tuple[uuid.UUID, float]] = []
+    failed = 0
+    for (operation_type, expression), group in groups.items():
+        try:
+            results = registry.calculate_many(
+                operation_type, [row.a for row in group], [row.b for row in group], expression
+            )
+        except ValueError:
+            results = []
+            for row in group:
+                try:
+                    results.append(registry.calculate(operation_type, row.a, row.b, expression))
+                except ValueError:
+                    results.append(None)
+                    failed += 1
+        for row, value in zip(group, results):
+            if value is not None and float(value) != row.result:
+                changed.append((row.id, float(value)))
+    return changed, failed
+
+
+def write_results(
+    db: Session, rows: Sequence, changed: Sequence[Tuple[uuid.UUID, float]]
+) -> Set[uuid.UUID]:
+    """
+    Write recomputed results back, if the rows are unchanged since the read.
+
+    Each UPDATE also matches the a, b, type, expression and result read in
+    ``rows``, so a concurrent edit is never overwritten with a result of
+    the old operands. PostgreSQL gets one ``UPDATE ... FROM (VALUES ...)
+    RETURNING`` per chunk; other dialects run one UPDATE per row.
+
+    Returns:
+        Ids of the rows that were written
+    """
+    if not changed:
+        return set()
+    table = Calculation.__table__
+    target = WRITABLE_RESULT_COLUMN
+    read = {row.id: row for row in rows}
+    if db.get_bind().dialect.name == "postgresql":
+        new_values = values(
+            column("id", Uuid), column("a", Float), column("b", Float), column("type", String),
+            column("expression", String), column("old_result", Float), column("result", Float),
+            name="new_values",
+        ).data([
+            (row_id, read[row_id].a, read[row_id].b, read[row_id].type, read[row_id].expression,
+             read[row_id].result, result)
+            for row_id, result in changed
+        ])
+        written = db.execute(
+            update(table)
+            # VALUES literals are untyped; cast so the comparison is uuid = uuid
+            .where(
+                table.c.id == cast(new_values.c.id, Uuid),
+                table.c.a == new_values.c.a,
+                table.c.b == new_values.c.b,
+                table.c.type == new_values.c.type,
+                table.c.expression.is_not_distinct_from(new_values.c.expression),
+                table.c.result == new_values.c.old_result,
+            )
+            .values({target: new_values.c.result})
+            .returning(table.c.id)
+        ).scalars()
+        return set(written)
+
+    statement = update(table).where(
+        table.c.id == bindparam("row_id"),
+        table.c.a == bindparam("read_a"),
+        table.c.b == bindparam("read_b"),
+        table.c.type == bindparam("read_type"),
+        table.c.expression.is_not_distinct_from(bindparam("read_expression", type_=String)),
+        table.c.result == bindparam("read_result"),
+    ).values({target: bindparam("new_result")})
+    written = set()
+    for row_id, result in changed:
+        row = read[row_id]
+        matched = db.execute(
+            statement,
+            {"row_id": row_id, "read_a": row.a, "read_b": row.b, "read_type": row.type,
+             "read_expression": row.expression, "read_result": row.result, "new_result": result},
+            execution_options={"synchronize_session": False},
+        ).rowcount
+        if matched:
+            written.add(row_id)
+    return written
+
+
+def propagate(db: Session, row_ids: Sequence[uuid.UUID]) -> Tuple[List[Calculation], int]:
+    """
+    Recompute the dependents of rows whose results were just rewritten.
+
+    Each root's dependents are recomputed in a savepoint, so a dependent
+    that fails (or a cycle) leaves that root's subgraph as it was without
+    holding up the others.
+
+    Returns:
+        (recomputed dependents, number of roots whose propagation failed)
+    """
+    if not row_ids:
+        return [], 0
+    table = Calculation.__table__
+    roots = db.query(Calculation).filter(
+        Calculation.id.in_(row_ids),
+        or_(Calculation.id.in_(select(table.c.a_ref)), Calculation.id.in_(select(table.c.b_ref))),
+    ).all()
+    dependents: Dict[uuid.UUID, Calculation] = {}
+    failed = 0
+    for root in roots:
+        try:
+            with db.begin_nested():
+                for dependent in recompute_descendants(db, root):
+                    dependents[dependent.id] = dependent
+        except ValueError:
+            failed += 1
+    return list(dependents.values()), failed
+
+
+def purge_cached_results(db: Session, types: Optional[Iterable[str]] = None) -> int:
+    """
+    Delete shared cached results of the given operation types (all when None).
+
+    Returns:
+        Number of rows deleted
+    """
+    statement = delete(CachedResult)
+    if types:
+        statement = statement.where(CachedResult.type.in_(list(types)))
+    return db.execute(statement).rowcount
+
+
+def stamp_changes(db: Session, row_ids: Sequence[uuid.UUID], version: int) -> None:
+    """Mark rows as changed at their owner's data version, for delta sync."""
+    table = Calculation.__table__
+    db.execute(update(table).where(table.c.id.in_(row_ids)).values(change_seq=version))
+
+
+class RecomputeJob:
+    """
+    One worker of a recompute run over a contiguous id range.
+
+    Attributes:
+        name: Checkpoint key; reruns with the same name resume
+        chunk_size: Rows per chunk (and per UPDATE)
+        types: Only recompute these operation types (all when None)
+        throttle: Seconds to sleep between chunks
+        low / high: Id range [low, high) this worker owns
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        name: str = "recompute",
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        types: Optional[Iterable[str]] = None,
+        throttle: float = 0.0,
+        low: Optional[uuid.UUID] = None,
+        high: Optional[uuid.UUID] = None,
+    ):
+        self.session_factory = session_factory
+        self.name = name
+        self.chunk_size = chunk_size
+        self.types = list(types) if types else None
+        self.throttle = throttle
+        self.low = low
+        self.high = high
+
+    def _checkpoint(self, db: Session) -> RecomputeCheckpoint:
+        checkpoint = db.get(RecomputeCheckpoint, self.name)
+        if checkpoint is None:
+            checkpoint = RecomputeCheckpoint(
+                job_name=self.name, last_id=None, processed=0, updated=0, failed=0, finished=False
+            )
+            db.add(checkpoint)
+            db.flush()
+        return checkpoint
+
+    def _next_chunk(self, db: Session, after: Optional[uuid.UUID]):
+        columns = Calculation.__table__.c
+        query = select(
+            columns.id, columns.a, columns.b, columns.type, columns.expression, columns.result, columns.user_id
+        ).where(columns.type.notin_(SKIPPED_TYPES)).order_by(columns.id).limit(self.chunk_size)
+        lower = after if after is not None else self.low
+        if lower is not None:
+            query = query.where(columns.id > lower if after is not None else columns.id >= lower)
+        if self.high is not None:
+            query = query.where(columns.id < self.high)
+        if self.types:
+            query = query.where(columns.type.in_(self.types))
+        return db.execute(query).all()
+
+    def run(self) -> RecomputeStats:
+        """
+        Process chunks until the range is exhausted.
+
+        Returns:
+            Counters for the rows this call processed
+        """
+        stats = RecomputeStats()
+        while True:
+            with self.session_factory() as db:
+                checkpoint = self._checkpoint(db)
+                if checkpoint.finished:
+                    db.commit()
+                    return stats
+                rows = self._next_chunk(db, checkpoint.last_id)
+                if not rows:
+                    checkpoint.finished = True
+                    db.commit()
+                    return stats
+
+                changed, failed = recompute_rows(rows)
+                changed_ids = write_results(db, rows, changed)
+                skipped = len(changed) - len(changed_ids)
+                dependents, propagation_failed = propagate(db, changed_ids)
+                failed += propagation_failed
+                # Invalidate ETags of users whose results changed, and tell their open streams
+                changed_by_user = defaultdict(list)
+                for row in rows:
+                    if row.id in changed_ids:
+                        changed_by_user[row.user_id].append(row.id)
+                for dependent in dependents:
+                    if dependent.id not in changed_ids:
+                        changed_by_user[dependent.user_id].append(dependent.id)
+                versions = bump_data_versions(db, changed_by_user)
+                for user_id, version in versions.items():
+                    stamp_changes(db, changed_by_user[user_id], version)
+                    record_change(db, make_event(user_id, version, CHANGED))
+                checkpoint.last_id = rows[-1].id
+                checkpoint.processed += len(rows)
+                updated = len(changed_ids | {dependent.id for dependent in dependents})
+                checkpoint.updated += updated
+                checkpoint.failed += failed
+                db.commit()
+
+            stats += RecomputeStats(len(rows), updated, failed, skipped)
+            if len(rows) < self.chunk_size:
+                continue  # next pass marks the checkpoint finished
+            if self.throttle:
+                time.sleep(self.throttle)
+
+
+def run_parallel(
+    session_factory: sessionmaker,
+    name: str = "recompute",
+    workers: int = 1,
+    restart: bool = False,
+    **options,
+) -> RecomputeStats:
+    """
+    Run a recompute job split across worker threads by id range.
+
+    Shared cached results of the recomputed types are deleted first.
+
+    Args:
+        session_factory: Session factory; each chunk uses its own session
+        name: Job name; worker checkpoints are stored as "<name>:<index>/<workers>"
+        workers: Number of parallel workers
+        restart: Discard existing checkpoints for this job first
+        **options: Passed to RecomputeJob (chunk_size, types, throttle)
+
+    Returns:
+        Combined counters from all workers
+    """
+    jobs = [
+        RecomputeJob(session_factory, name=f"{name}:{index}/{workers}", low=low, high=high, **options)
+        for index, (low, high) in enumerate(split_id_space(workers))
+    ]
+    with session_factory() as db:
+        purge_cached_results(db, options.get("types"))
+        if restart:
+            db.query(RecomputeCheckpoint).filter(
+                RecomputeCheckpoint.job_name.in_([job.name for job in jobs])
+            ).delete(synchronize_session=False)
+        db.commit()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda job: job.run(), jobs))
+    return sum(results, RecomputeStats())
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Recompute stored calculation results.")
+    parser.add_argument("--name", default="recompute", help="Job name used for checkpoints")
+    parser.add_argument("--types", help="Comma-separated operation types to recompute")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--throttle", type=float, default=0.0, help="Seconds to sleep between chunks")
+    parser.add_argument("--restart", action="store_true", help="Ignore existing checkpoints")
+    args = parser.parse_args(argv)
+
+    from app.database import SessionLocal
+
+    stats = run_parallel(
+        SessionLocal,
+        name=args.name,
+        workers=args.workers,
+        restart=args.restart,
+        chunk_size=args.chunk_size,
+        types=args.types.split(",") if args.types else None,
+        throttle=args.throttle,
+    )
+    print(f"processed={stats.processed} updated={stats.updated} failed={stats.failed} skipped={stats.skipped}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Content-addressed cache of calculation results.
+
+Results are keyed by a hash of the operation and its exact inputs, never by
+user or row, so identical submissions from different users share a cached
+result while every user still gets their own Calculation row. An optional
+shared table lets several workers reuse each other's results.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.factory import registry
+from app.models import CachedResult
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "4096"))
+RESULT_CACHE_PERSIST = os.getenv("RESULT_CACHE_PERSIST", "false").lower() in {"1", "true", "yes"}
+
+
+def result_key(operation_type: str, a: float, b: float, expression: Optional[str] = None) -> str:
+    """
+    Return the content address of a calculation.
+
+    Operands are hashed by their exact float representation, so 0.1 and
+    0.1000000001 never collide. The operation's kernel version is hashed
+    too, so results persisted before a change to its semantics are no
+    longer found.
+    """
+    operation_type = getattr(operation_type, "value", operation_type)
+    version = str(registry.version(operation_type))
+    material = "\x1f".join((operation_type, version, float(a).hex(), float(b).hex(), expression or ""))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Bounded, thread-safe LRU map from content address to result.
+
+    Attributes:
+        maxsize: Maximum number of cached results
+    """
+
+    def __init__(self, maxsize: int = RESULT_CACHE_SIZE, persist: bool = RESULT_CACHE_PERSIST):
+        self.maxsize = maxsize
+        self.persist = persist
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.evictions = 0
+
+    def get(self, key: str, db: Optional[Session] = None) -> Optional[float]:
+        """
+        Look a result up in memory, then in the shared table if enabled.
+
+        Returns:
+            The cached result, or None on a miss
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+        if self.persist and db is not None:
+            row = db.get(CachedResult, key)
+            if row is not None:
+                self._store(key, row.result)
+                with self._lock:
+                    self.shared_hits += 1
+                return row.result
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: float, operation_type: str = "", db: Optional[Session] = None) -> None:
+        """Cache a result in memory, and in the shared table if enabled."""
+        self._store(key, value)
+        if self.persist and db is not None:
+            try:
+                # A savepoint keeps a duplicate-key race from aborting the caller's transaction
+                with db.begin_nested():
+                    db.add(CachedResult(key=key, type=getattr(operation_type, "value", operation_type), result=value))
+            except IntegrityError:
+                pass
+
+    def _store(self, key: str, value: float) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop all in-memory entries and reset statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.shared_hits = self.evictions = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters and the current hit ratio."""
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            }
+
+
+result_cache = ResultCache()
@@ -1,12 +1,20 @@
 """
 Pydantic schemas for request/response validation and serialization.
 """
-from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator
+from pydantic import BaseModel, EmailStr, Field, PrivateAttr, RootModel, field_validator, model_validator
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional, Union
 from uuid import UUID
 from enum import Enum
 
+import numpy as np
+
+from app.aggregates import AGGREGATE_TYPES, MAX_AGGREGATE_OPERANDS
+from app.expression import MAX_EXPRESSION_LENGTH, normalize_expression
+from app.factory import registry
+from app.sql_kernels import SQL_KERNELS
+from app.vectors import VECTOR_KERNELS, coerce_vector, to_base64
+
 
 class UserCreate(BaseModel):
     """
@@ -99,6 +107,57 @@ class OperationType(str, Enum):
     DIVIDE = "Divide"
     POWER = "Power"
     MODULO = "Modulo"
+    EXPRESSION = "Expression"
+    SUM = "Sum"
+    MEAN = "Mean"
+    VARIANCE = "Variance"
+    MIN = "Min"
+    MAX = "Max"
+    PERCENTILE = "Percentile"
+
+
+def is_aggregate(calc_type) -> bool:
+    """Return whether a type is an n-ary aggregate over an operand list."""
+    return getattr(calc_type, "value", calc_type) in AGGREGATE_TYPES
+
+
+def _validate_operation_type(value: str):
+    """Map built-in names to OperationType and accept registered plugin operations."""
+    if value in OperationType._value2member_map_:
+        return OperationType(value)
+    if value in registry:
+        return value
+    raise ValueError(
+        f"Unsupported operation type: {value}. "
+        f"Supported types: {', '.join([*registry.names(), *AGGREGATE_TYPES])}"
+    )
+
+
+def _validate_references(calc) -> None:
+    """Reject operands given both as a value and as a reference."""
+    if calc.a is not None and calc.a_ref is not None:
+        raise ValueError("Provide either a or a_ref, not both")
+    if calc.b is not None and calc.b_ref is not None:
+        raise ValueError("Provide either b or b_ref, not both")
+
+
+def _validate_aggregate(calc_type, percentile: Optional[float]) -> None:
+    """Require a percentile for Percentile aggregates and reject it otherwise."""
+    if calc_type == OperationType.PERCENTILE and percentile is None:
+        raise ValueError("Percentile calculations require a percentile")
+    if calc_type != OperationType.PERCENTILE and percentile is not None:
+        raise ValueError("percentile is only allowed for Percentile calculations")
+
+
+def _validate_expression(calc_type: Optional[OperationType], expression: Optional[str]) -> Optional[str]:
+    """Require an expression for Expression calculations and normalize it."""
+    if expression is None:
+        if calc_type == OperationType.EXPRESSION:
+            raise ValueError("Expression calculations require an expression")
+        return None
+    if calc_type is not None and calc_type != OperationType.EXPRESSION:
+        raise ValueError("expression is only allowed for Expression calculations")
+    return normalize_expression(expression)
 
 
 class CalculationCreate(BaseModel):
@@ -108,9 +167,53 @@ class CalculationCreate(BaseModel):
     Validates incoming calculation data.
     User ID is extracted from the authentication token.
     """
-    a: float = Field(..., description="First operand")
-    b: float = Field(..., description="Second operand")
-    type: OperationType = Field(..., description="Operation type (Add, Subtract, Multiply, Divide, Power, Modulo)")
+    a: Optional[float] = Field(None, description="First operand (required unless a_ref is given)")
+    b: Optional[float] = Field(None, description="Second operand (required unless b_ref is given)")
+    type: str = Field(
+        ...,
+        description="Operation type (Add, Subtract, Multiply, Divide, Power, Modulo, Expression, "
+                    "or an aggregate: Sum, Mean, Variance, Min, Max, Percentile)"
+    )
+    a_ref: Optional[UUID] = Field(None, description="Use this calculation's result as a")
+    b_ref: Optional[UUID] = Field(None, description="Use this calculation's result as b")
+    expression: Optional[str] = Field(
+        None,
+        max_length=MAX_EXPRESSION_LENGTH,
+        description="Arithmetic expression over a and b, e.g. 'sqrt(a**2 + b**2)'"
+    )
+    operands: Optional[List[float]] = Field(
+        None,
+        min_length=1,
+        max_length=MAX_AGGREGATE_OPERANDS,
+        description="Operand list for aggregates (Sum, Mean, Variance, Min, Max, Percentile)"
+    )
+    percentile: Optional[float] = Field(None, ge=0, le=100, description="Percentile rank (Percentile only)")
+    store_operands: bool = Field(False, description="Persist the aggregate's operands (compressed)")
+
+    @field_validator('type')
+    @classmethod
+    def validate_type(cls, value: str):
+        """Accept built-in and registered plugin operation types."""
+        return _validate_operation_type(value)
+
+    @model_validator(mode='after')
+    def validate_operands(self):
+        """Each operand needs either a value or a reference; aggregates need an operand list."""
+        if is_aggregate(self.type):
+            _validate_aggregate(self.type, self.percentile)
+            if self.operands is None:
+                raise ValueError(f"{self.type.value} calculations require operands")
+            if any(value is not None for value in (self.a, self.b, self.a_ref, self.b_ref)):
+                raise ValueError("Aggregate calculations take operands instead of a and b")
+            return self
+        if self.operands is not None or self.percentile is not None:
+            raise ValueError("operands and percentile are only allowed for aggregate calculations")
+        if self.a is None and self.a_ref is None:
+            raise ValueError("Either a or a_ref is required")
+        if self.b is None and self.b_ref is None:
+            raise ValueError("Either b or b_ref is required")
+        _validate_references(self)
+        return self
 
     @model_validator(mode='after')
     def validate_divisor(self):
@@ -119,6 +222,12 @@ class CalculationCreate(BaseModel):
             raise ValueError("Division by zero is not allowed")
         return self
 
+    @model_validator(mode='after')
+    def validate_expression(self):
+        """Ensure Expression calculations carry a valid expression."""
+        self.expression = _validate_expression(self.type, self.expression)
+        return self
+
     class Config:
         json_schema_extra = {
             "example": {
@@ -129,6 +238,18 @@ class CalculationCreate(BaseModel):
         }
 
 
+MAX_BULK_CALCULATIONS = 1000
+
+
+class CalculationBulkCreate(RootModel):
+    """
+    Schema for POST /calculations/bulk: a list of calculations created together.
+
+    Sent as JSON, MessagePack or CBOR; UUIDs may be 16 raw bytes.
+    """
+    root: List[CalculationCreate] = Field(..., min_length=1, max_length=MAX_BULK_CALCULATIONS)
+
+
 class CalculationRead(BaseModel):
     """
     Schema for returning calculation details.
@@ -139,6 +260,9 @@ class CalculationRead(BaseModel):
     a: float
     b: float
     type: str
+    expression: Optional[str] = None
+    a_ref: Optional[UUID] = None
+    b_ref: Optional[UUID] = None
     result: float
     user_id: Optional[UUID]
     created_at: datetime
@@ -168,7 +292,16 @@ class CalculationUpdate(BaseModel):
     """Schema for updating a calculation."""
     a: Optional[float] = None
     b: Optional[float] = None
-    type: Optional[OperationType] = None
+    type: Optional[str] = None
+    expression: Optional[str] = Field(None, max_length=MAX_EXPRESSION_LENGTH)
+    a_ref: Optional[UUID] = Field(None, description="Take a from this calculation's result")
+    b_ref: Optional[UUID] = Field(None, description="Take b from this calculation's result")
+
+    @field_validator('type')
+    @classmethod
+    def validate_type(cls, value: Optional[str]):
+        """Accept built-in and registered plugin operation types."""
+        return None if value is None else _validate_operation_type(value)
 
     @model_validator(mode='after')
     def validate_divisor(self):
@@ -177,6 +310,19 @@ class CalculationUpdate(BaseModel):
             raise ValueError("Division by zero is not allowed")
         return self
 
+    @model_validator(mode='after')
+    def validate_operands(self):
+        """An operand can be set to a value or a reference, not both."""
+        _validate_references(self)
+        return self
+
+    @model_validator(mode='after')
+    def validate_expression(self):
+        """Normalize a new expression; the stored type is checked on update."""
+        if self.expression is not None:
+            self.expression = _validate_expression(self.type, self.expression)
+        return self
+
 
 class PasswordChange(BaseModel):
     """Schema for password change requests."""
@@ -197,3 +343,193 @@ class CalculationSummary(BaseModel):
     last_result: float | None
     operations_breakdown: dict[str, int]
     most_used_operation: str | None
+
+
+class CalculationChanges(BaseModel):
+    """One page of delta sync from GET /calculations/changes."""
+    calculations: List[CalculationRead] = Field(..., description="Rows created or updated since the token")
+    deleted: List[UUID] = Field(..., description="Ids of calculations deleted since the token")
+    next: str = Field(..., description="Token for the next request")
+    has_more: bool = Field(..., description="Whether another page is available right away")
+
+
+class CalculationTransform(BaseModel):
+    """
+    Set-based rewrite of one operand across all of a user's calculations of a type.
+    
+    The operand becomes ``operand * scale + offset`` and results are
+    recomputed in the same UPDATE statement.
+    """
+    type: OperationType = Field(..., description="Built-in arithmetic type to transform (Add ... Modulo)")
+    operand: str = Field(..., pattern="^(a|b)$", description="Operand to rewrite: a or b")
+    scale: float = Field(1.0, allow_inf_nan=False, description="Multiplier applied to the operand")
+    offset: float = Field(0.0, allow_inf_nan=False, description="Added after scaling")
+
+    @field_validator('type')
+    @classmethod
+    def validate_type(cls, value: OperationType):
+        """Only operations with a SQL kernel can be transformed in the database."""
+        if value.value not in SQL_KERNELS:
+            raise ValueError(f"Supported types: {', '.join(SQL_KERNELS)}")
+        return value
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "type": "Multiply",
+                "operand": "b",
+                "scale": 2.0
+            }
+        }
+
+
+class CalculationTransformResult(BaseModel):
+    """Outcome of a bulk transform."""
+    updated: int = Field(..., description="Calculations rewritten")
+    propagated: int = Field(..., description="Rewritten calculations whose dependents were recomputed")
+
+
+class VectorOperationType(str, Enum):
+    """Enumeration for supported vector calculation types."""
+    DOT = "Dot"
+    ELEMENTWISE_ADD = "ElementwiseAdd"
+    ELEMENTWISE_MULTIPLY = "ElementwiseMultiply"
+    NORM = "Norm"
+    VECTOR_SUM = "VectorSum"
+    VECTOR_MEAN = "VectorMean"
+
+
+class VectorCalculationCreate(BaseModel):
+    """
+    Schema for creating a vector calculation.
+    
+    Operands are JSON lists of numbers or base64-encoded little-endian
+    float64 data, up to 100,000 elements each.
+    """
+    type: VectorOperationType = Field(..., description="Vector operation type")
+    a: Union[List[float], str] = Field(..., description="First vector (list or base64 float64)")
+    b: Optional[Union[List[float], str]] = Field(None, description="Second vector for binary operations")
+    store_operands: bool = Field(True, description="Persist operands, or only the result when false")
+
+    _a: np.ndarray = PrivateAttr()
+    _b: Optional[np.ndarray] = PrivateAttr(default=None)
+
+    @model_validator(mode='after')
+    def validate_vectors(self):
+        """Decode operands and check them against the operation's arity."""
+        self._a = coerce_vector(self.a)
+        self._b = coerce_vector(self.b) if self.b is not None else None
+        kernel = VECTOR_KERNELS[self.type.value]
+        if kernel.arity == 2 and self._b is None:
+            raise ValueError(f"{self.type.value} requires two vectors")
+        if kernel.arity == 1 and self._b is not None:
+            raise ValueError(f"{self.type.value} takes a single vector")
+        if self._b is not None and self._a.shape != self._b.shape:
+            raise ValueError("Vectors must have the same length")
+        return self
+
+    @property
+    def a_array(self) -> np.ndarray:
+        return self._a
+
+    @property
+    def b_array(self) -> Optional[np.ndarray]:
+        return self._b
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "type": "Dot",
+                "a": [1.0, 2.0, 3.0],
+                "b": [4.0, 5.0, 6.0],
+                "store_operands": True
+            }
+        }
+
+
+class VectorCalculationInfo(BaseModel):
+    """Vector calculation metadata, without array payloads."""
+    id: UUID
+    type: str
+    length: int
+    result: Optional[float]
+    user_id: UUID
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class VectorCalculationRead(VectorCalculationInfo):
+    """
+    Vector calculation with its arrays as base64-encoded float64 data.
+    
+    Operands are null when only the result was persisted.
+    """
+    a_data: Optional[str] = None
+    b_data: Optional[str] = None
+    result_data: Optional[str] = None
+
+    @field_validator('a_data', 'b_data', 'result_data', mode='before')
+    @classmethod
+    def encode_blob(cls, value):
+        """Encode raw float64 blobs as base64 text."""
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return to_base64(bytes(value))
+        return value
+
+
+MAX_BATCH_REQUESTS = 20
+# Sub-request headers a client may set; Authorization is inherited from the batch
+BATCH_HEADERS = frozenset({"accept", "if-none-match"})
+# Long-lived responses that would never let a batch finish
+UNBATCHABLE_PATHS = frozenset({"/calculations/stream"})
+
+
+class BatchSubRequest(BaseModel):
+    """One request inside POST /batch."""
+    id: Optional[str] = Field(None, max_length=64, description="Echoed back on the matching response")
+    method: str = Field("GET", pattern="^(GET|POST|PUT|PATCH|DELETE)$")
+    path: str = Field(..., max_length=2048, description="Path and query string, e.g. /calculations?limit=10")
+    body: Optional[Any] = None
+    headers: Dict[str, str] = Field(default_factory=dict)
+
+    @field_validator('path')
+    @classmethod
+    def validate_path(cls, value: str) -> str:
+        """Only same-application paths, and never /batch itself."""
+        if not value.startswith("/") or value.startswith("//"):
+            raise ValueError("path must be an absolute path on this API")
+        path = value.split("?", 1)[0].rstrip("/")
+        if path == "/batch":
+            raise ValueError("batches cannot be nested")
+        if path in UNBATCHABLE_PATHS:
+            raise ValueError(f"{path} streams and cannot be batched")
+        return value
+
+    @field_validator('headers')
+    @classmethod
+    def validate_headers(cls, value: Dict[str, str]) -> Dict[str, str]:
+        headers = {name.lower(): header for name, header in value.items()}
+        rejected = sorted(set(headers) - BATCH_HEADERS)
+        if rejected:
+            raise ValueError(f"Headers not allowed in sub-requests: {', '.join(rejected)}")
+        return headers
+
+
+class BatchRequest(BaseModel):
+    """Schema for POST /batch."""
+    requests: List[BatchSubRequest] = Field(..., min_length=1, max_length=MAX_BATCH_REQUESTS)
+
+
+class BatchResponseItem(BaseModel):
+    """The response to one sub-request."""
+    id: Optional[str] = None
+    status: int
+    headers: Dict[str, str]
+    body: Optional[Any] = None
+
+
+class BatchResponse(BaseModel):
+    """Responses in sub-request order."""
+    responses: List[BatchResponseItem]
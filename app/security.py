@@ -3,21 +3,39 @@ Password hashing utilities using bcrypt and JWT token generation.
 
 Provides secure password hashing, verification functions, and JWT handling.
 """
+import asyncio
 import bcrypt
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
+from contextvars import ContextVar, copy_context
+from typing import Optional
+from uuid import UUID
 import os
 
+from app.metrics import BCRYPT_IN_PROGRESS, BCRYPT_SECONDS, BCRYPT_WAITING
+from app.timing import auth_phase
+
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-keep-it-secret")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Comma-separated user ids allowed to call /admin endpoints (ids, unlike usernames, cannot be claimed)
+ADMIN_USER_IDS = frozenset(UUID(value.strip()) for value in os.getenv("ADMIN_USER_IDS", "").split(",") if value.strip())
+# Threads hashing and verifying passwords for requests; further calls queue for a free one
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", "4"))
 
 security = HTTPBearer()
 
+# Kept apart from the request threadpool, so a burst of logins cannot starve other requests
+_bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+
+# Set by POST /batch after it validated the token, so sub-requests skip decoding it again
+authenticated_username: ContextVar[Optional[str]] = ContextVar("authenticated_username", default=None)
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     """
     Create a JWT access token.
@@ -58,7 +76,8 @@ def hash_password(password: str) -> str:
     # bcrypt generates a random salt and includes it in the hash
     # Default cost factor is 12, which is secure and reasonably fast
     salt = bcrypt.gensalt(rounds=12)
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
+    with auth_phase(), BCRYPT_IN_PROGRESS.track(("hash",)), BCRYPT_SECONDS.time(("hash",)):
+        hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
 
@@ -82,12 +101,64 @@ def verify_password(password: str, password_hash: str) -> bool:
         raise ValueError("Password hash must be a non-empty string")
     
     try:
-        return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+        with auth_phase(), BCRYPT_IN_PROGRESS.track(("verify",)), BCRYPT_SECONDS.time(("verify",)):
+            return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
     except ValueError:
         # Invalid hash format
         return False
 
 
+async def _run_bcrypt(operation: str, func, *args):
+    """Run a bcrypt call on the bcrypt workers, counting it as waiting until a worker picks it up."""
+    BCRYPT_WAITING.inc((operation,))
+
+    def run():
+        BCRYPT_WAITING.dec((operation,))
+        return func(*args)
+
+    future = _bcrypt_executor.submit(copy_context().run, run)
+    try:
+        # The wait for a worker counts as authentication time too
+        with auth_phase():
+            return await asyncio.wrap_future(future)
+    finally:
+        if future.cancelled():
+            BCRYPT_WAITING.dec((operation,))
+
+
+async def hash_password_async(password: str) -> str:
+    """
+    Hash a password on the bcrypt workers, keeping the event loop free.
+    
+    Args:
+        password: Plain-text password to hash
+        
+    Returns:
+        Hashed password string
+        
+    Raises:
+        ValueError: If password is empty or invalid
+    """
+    return await _run_bcrypt("hash", hash_password, password)
+
+
+async def verify_password_async(password: str, password_hash: str) -> bool:
+    """
+    Verify a password on the bcrypt workers, keeping the event loop free.
+    
+    Args:
+        password: Plain-text password to verify
+        password_hash: Bcrypt hash to verify against
+        
+    Returns:
+        True if password matches hash, False otherwise
+        
+    Raises:
+        ValueError: If either parameter is invalid
+    """
+    return await _run_bcrypt("verify", verify_password, password, password_hash)
+
+
 def decode_access_token(token: str) -> dict:
     """
     Decode and validate a JWT access token.
@@ -121,9 +192,13 @@ def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(secu
     Raises:
         HTTPException: If token is invalid or user not found
     """
+    username = authenticated_username.get()
+    if username is not None:
+        return username
     try:
         token = credentials.credentials
-        payload = decode_access_token(token)
+        with auth_phase():
+            payload = decode_access_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise HTTPException(
@@ -140,3 +215,20 @@ def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(secu
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+
+def check_admin(user_id: UUID) -> None:
+    """
+    Only let users whose id is listed in ADMIN_USER_IDS through.
+    
+    Args:
+        user_id: Id of the authenticated user
+        
+    Raises:
+        HTTPException: 403 if the user is not an administrator
+    """
+    if user_id not in ADMIN_USER_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Administrator privileges required",
+        )
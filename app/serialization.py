@@ -0,0 +1,75 @@
+"""
+Fast JSON responses built straight from query records.
+
+Read endpoints fetch ``CalculationRecord`` objects from ``app.queries`` and
+serialize them to bytes in one pass, instead of loading ORM objects,
+revalidating them through ``response_model`` and encoding them with the
+stdlib ``json`` module. orjson is used when installed; otherwise Pydantic's
+``TypeAdapter.dump_json`` serializes the same records without validation.
+
+Endpoints that negotiate MessagePack or CBOR (see ``app.binary``) encode
+the same records with the chosen format instead.
+"""
+from functools import lru_cache
+from typing import Any, List, Optional, Sequence
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from app.binary import BinaryFormat
+from app.queries import CalculationRecord
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+_ANY_ADAPTER = TypeAdapter(Any)
+
+
+@lru_cache(maxsize=256)
+def _records_adapter(record_type: type) -> TypeAdapter:
+    return TypeAdapter(List[record_type])
+
+
+def dumps(payload: Any) -> bytes:
+    """Serialize dicts, lists, dataclasses, UUIDs and datetimes to JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return _ANY_ADAPTER.dump_json(payload)
+
+
+def calculation_records_json(records: Sequence[CalculationRecord]) -> bytes:
+    """Serialize records (full or sparse) as a CalculationRead list."""
+    if orjson is not None:
+        return orjson.dumps(records)
+    return _records_adapter(type(records[0]) if records else CalculationRecord).dump_json(records)
+
+
+def encode_records(records: Sequence[CalculationRecord], fmt: Optional[BinaryFormat]) -> bytes:
+    """Serialize records as JSON, or with a negotiated binary format."""
+    if fmt is None:
+        return calculation_records_json(records)
+    return fmt.dumps(records)
+
+
+def encode(payload: Any, fmt: Optional[BinaryFormat]) -> bytes:
+    """Serialize a payload as JSON, or with a negotiated binary format."""
+    return dumps(payload) if fmt is None else fmt.dumps(payload)
+
+
+def negotiated_response(body: bytes, fmt: Optional[BinaryFormat], **kwargs: Any) -> Response:
+    """Response for a body produced by ``encode``/``encode_records`` with the same format."""
+    if fmt is None:
+        return JSONBytesResponse(body, **kwargs)
+    return Response(body, media_type=fmt.media_type, **kwargs)
+
+
+class JSONBytesResponse(Response):
+    """JSON response for pre-serialized bytes, or a payload serialized with dumps()."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
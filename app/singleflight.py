@@ -0,0 +1,115 @@
+"""
+Request coalescing for identical concurrent reads.
+
+Bursts of identical reads (a dashboard open in several tabs, client
+retries) are collapsed: the first request for a key starts the work, and
+every request for the same key that arrives while it runs awaits the same
+result. Keys include the user's data version, so a read that starts after
+a write never joins a flight that began before it.
+
+The shared work runs in a task of its own, so a waiter that disconnects
+(and is cancelled) does not cancel the flight for the others.
+"""
+import asyncio
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.database import shared_session
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent async calls by key.
+
+    Keys are tuples whose first element names the route, which is how
+    statistics are broken down.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, "asyncio.Task"] = {}
+        self._executions: Dict[str, int] = defaultdict(int)
+        self._shared: Dict[str, int] = defaultdict(int)
+
+    async def do(self, key: Tuple, work: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return ``await work()``, sharing one execution among concurrent callers.
+
+        Args:
+            key: Identity of the call; ``key[0]`` is the route name
+            work: Zero-argument coroutine function doing the actual work
+
+        Raises:
+            Whatever ``work`` raises, to every caller sharing the flight
+        """
+        route = key[0]
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(work())
+            self._flights[key] = flight
+            self._executions[route] += 1
+            flight.add_done_callback(lambda done: self._land(key, done))
+        else:
+            self._shared[route] += 1
+        return await asyncio.shield(flight)
+
+    def _land(self, key: Hashable, flight: "asyncio.Task") -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.cancelled():
+            # Mark the exception retrieved when every waiter has gone away
+            flight.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return executions, shared results and collapse ratio, overall and per route."""
+        def summarize(executions: int, shared: int) -> Dict[str, float]:
+            requests = executions + shared
+            return {
+                "requests": requests,
+                "executions": executions,
+                "shared": shared,
+                "collapse_ratio": shared / requests if requests else 0.0,
+            }
+
+        routes = sorted(set(self._executions) | set(self._shared))
+        return {
+            **summarize(sum(self._executions.values()), sum(self._shared.values())),
+            "in_flight": len(self._flights),
+            "routes": {route: summarize(self._executions[route], self._shared[route]) for route in routes},
+        }
+
+    def reset(self) -> None:
+        """Reset statistics (in-flight calls are unaffected)."""
+        self._executions.clear()
+        self._shared.clear()
+
+
+read_flights = SingleFlight()
+
+
+async def coalesced_read(db: Session, key: Tuple, read: Callable[[Session], Any]) -> Any:
+    """
+    Run a blocking read once per key among concurrent requests.
+
+    The read gets its own session on the request session's engine and runs
+    in the threadpool, so it neither blocks the event loop nor depends on
+    the session of whichever request happened to start it. Inside a batch
+    the read runs directly on the batch's shared session instead, so every
+    sub-request sees the same transaction.
+
+    Args:
+        db: The calling request's session (only its engine is used)
+        key: ``(route, user_id, *params, data_version)``
+        read: Function of a session returning the response body
+    """
+    if shared_session.get() is db:
+        return read(db)
+    bind = db.get_bind()
+
+    def run() -> Any:
+        with Session(bind=bind) as session:
+            return read(session)
+
+    return await read_flights.do(key, lambda: run_in_threadpool(run))
@@ -0,0 +1,268 @@
+"""
+Slow-query log with plan capture.
+
+The statement hooks in ``app.database`` hand every statement's duration to
+``slow_query_log.observe``. One that took ``SLOW_QUERY_THRESHOLD_MS`` or
+longer is sampled (``SLOW_QUERY_SAMPLE_RATE``), rate limited
+(``SLOW_QUERY_MAX_PER_MINUTE``) and queued; the request goes on at once.
+A background thread then captures the plan and appends one JSON line to a
+rotating log file (``SLOW_QUERY_LOG``)::
+
+    {"time": "...", "duration_ms": 812.4, "method": "GET", "route": "/users",
+     "statement": "SELECT ...", "parameters": [100, 0], "plan": "Limit ..."}
+
+Plans come from ``EXPLAIN (ANALYZE, BUFFERS)`` on PostgreSQL, run inside a
+rolled-back transaction with a statement timeout. ANALYZE executes the
+statement again, so only SELECTs get it; other statements get a plain
+``EXPLAIN``. SQLite gives ``EXPLAIN QUERY PLAN``; other databases no plan.
+
+Parameters are redacted before they are written: numbers, booleans and
+NULLs are kept (limits and offsets matter for a plan), anything else is
+replaced by its type name, and removed from the plan text as well.
+
+Skipped, dropped and logged statements are counted in
+``calchub_slow_queries_total`` at /metrics.
+"""
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import Any, List, NamedTuple, Optional
+
+from sqlalchemy.engine import Engine
+
+from app.metrics import registry
+from app.timing import current_timing
+
+logger = logging.getLogger(__name__)
+
+# Statements at least this slow are logged; 0 disables the log
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "500"))
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_SAMPLE_RATE", "1.0"))
+SLOW_QUERY_MAX_PER_MINUTE = int(os.getenv("SLOW_QUERY_MAX_PER_MINUTE", "30"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() in {"1", "true", "yes"}
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "5000"))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "logs/slow_queries.log")
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "5"))
+
+# Captures waiting for the writer thread; more are dropped
+QUEUE_SIZE = 256
+# Rows of an executemany written to the log
+LOGGED_ROWS = 10
+
+SLOW_QUERIES = registry.counter(
+    "calchub_slow_queries_total", "Statements over the slow-query threshold, by what happened to them.", ("outcome",),
+)
+
+KEPT_TYPES = (bool, int, float, type(None))
+# Statements with a plan, by their first keyword (DDL and PRAGMAs have none)
+EXPLAINABLE = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"})
+
+
+class SlowQuery(NamedTuple):
+    """A slow statement waiting to be written."""
+    engine: Engine
+    statement: str
+    parameters: Any
+    executemany: bool
+    seconds: float
+    method: Optional[str]
+    route: Optional[str]
+    logged_at: datetime
+
+
+class RateLimiter:
+    """Token bucket allowing ``per_minute`` events a minute, in bursts of up to as many."""
+
+    def __init__(self, per_minute: int, clock=time.monotonic):
+        self.per_minute = per_minute
+        self._clock = clock
+        self._tokens = float(per_minute)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.per_minute, self._tokens + (now - self._updated) * self.per_minute / 60)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+def redact(parameters: Any) -> Any:
+    """Keep numbers, booleans and NULLs of bound parameters; replace anything else by its type name."""
+    if isinstance(parameters, dict):
+        return {name: redact(value) for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact(value) for value in parameters]
+    if isinstance(parameters, KEPT_TYPES):
+        return parameters
+    return f"<{type(parameters).__name__}>"
+
+
+def redacted_values(parameters: Any) -> List[str]:
+    """The text of every parameter ``redact`` hides, to scrub from plans."""
+    if isinstance(parameters, dict):
+        parameters = list(parameters.values())
+    if isinstance(parameters, (list, tuple)):
+        return [text for value in parameters for text in redacted_values(value)]
+    if isinstance(parameters, KEPT_TYPES):
+        return []
+    return [str(parameters)]
+
+
+def explain(engine: Engine, statement: str, parameters: Any) -> Optional[str]:
+    """
+    Capture the plan of a statement on a separate connection.
+
+    Args:
+        engine: Engine the statement ran on
+        statement: SQL as sent to the driver
+        parameters: Parameters as sent to the driver
+
+    Returns:
+        The plan as text, or None for statements other than queries and
+        DML, and for databases without a supported EXPLAIN
+    """
+    dialect = engine.dialect.name
+    verb = (statement.split(None, 1) or [""])[0].upper()
+    if verb not in EXPLAINABLE:
+        return None
+    if dialect == "postgresql":
+        prefix = "EXPLAIN (ANALYZE, BUFFERS) " if verb == "SELECT" else "EXPLAIN "
+    elif dialect == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    else:
+        return None
+    with engine.connect() as conn:
+        try:
+            if dialect == "postgresql":
+                conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(SLOW_QUERY_EXPLAIN_TIMEOUT_MS)}")
+            rows = conn.exec_driver_sql(prefix + statement, parameters).all()
+        finally:
+            # EXPLAIN ANALYZE ran the statement; keep none of its effects
+            conn.rollback()
+    return "\n".join(str(row[-1]) for row in rows)
+
+
+class SlowQueryLog:
+    """Samples, rate limits and queues slow statements for a writer thread."""
+
+    def __init__(
+        self,
+        threshold_ms: float = SLOW_QUERY_THRESHOLD_MS,
+        sample_rate: float = SLOW_QUERY_SAMPLE_RATE,
+        max_per_minute: int = SLOW_QUERY_MAX_PER_MINUTE,
+        capture_plans: bool = SLOW_QUERY_EXPLAIN,
+        path: str = SLOW_QUERY_LOG,
+        max_bytes: int = SLOW_QUERY_LOG_MAX_BYTES,
+        backups: int = SLOW_QUERY_LOG_BACKUPS,
+    ):
+        self.threshold = threshold_ms / 1000
+        self.sample_rate = sample_rate
+        self.capture_plans = capture_plans
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._limiter = RateLimiter(max_per_minute)
+        self._queue: "queue.Queue[Optional[SlowQuery]]" = queue.Queue(maxsize=QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self._handler: Optional[RotatingFileHandler] = None
+        self._lock = threading.Lock()
+
+    def observe(self, engine: Engine, statement: str, parameters: Any, executemany: bool, seconds: float) -> None:
+        """Queue a finished statement if it was slow (called for every statement)."""
+        if self.threshold <= 0 or seconds < self.threshold:
+            return
+        if threading.current_thread() is self._thread:
+            # The writer's own EXPLAIN
+            return
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            SLOW_QUERIES.inc(("sampled_out",))
+            return
+        if not self._limiter.allow():
+            SLOW_QUERIES.inc(("rate_limited",))
+            return
+        timing = current_timing.get()
+        method, route = timing.route() if timing is not None else (None, None)
+        item = SlowQuery(engine, statement, parameters, executemany, seconds, method, route,
+                         datetime.now(timezone.utc))
+        self._start()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            SLOW_QUERIES.inc(("dropped",))
+
+    def capture(self, item: SlowQuery) -> dict:
+        """Build the log entry for a slow statement, with its redacted plan."""
+        parameters = item.parameters
+        entry = {
+            "time": item.logged_at.isoformat(),
+            "duration_ms": round(item.seconds * 1000, 3),
+            "method": item.method,
+            "route": item.route,
+            "statement": item.statement,
+        }
+        if item.executemany:
+            entry["rows"] = len(parameters)
+            parameters = parameters[:LOGGED_ROWS]
+        entry["parameters"] = redact(parameters)
+        if self.capture_plans and not item.executemany:
+            try:
+                plan = explain(item.engine, item.statement, item.parameters)
+            except Exception as e:
+                entry["plan_error"] = f"{type(e).__name__}: {e}"
+            else:
+                if plan is not None:
+                    for value in sorted(set(redacted_values(item.parameters)), key=len, reverse=True):
+                        plan = plan.replace(value, "<redacted>")
+                    entry["plan"] = plan
+        return entry
+
+    def _start(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._handler = RotatingFileHandler(self.path, maxBytes=self.max_bytes, backupCount=self.backups)
+            self._thread = threading.Thread(target=self._run, name="slow-query-log", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                line = json.dumps(self.capture(item), default=str)
+                self._handler.emit(logging.makeLogRecord({"msg": line, "levelno": logging.INFO}))
+                SLOW_QUERIES.inc(("logged",))
+            except Exception:
+                logger.exception("Could not write a slow-query log entry")
+
+    def stop(self) -> None:
+        """Write what is queued, then stop the writer thread."""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(None)
+            self._thread.join(timeout=SLOW_QUERY_EXPLAIN_TIMEOUT_MS / 1000 + 5)
+            self._thread = None
+            self._handler.close()
+            self._handler = None
+
+
+slow_query_log = SlowQueryLog()
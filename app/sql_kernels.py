@@ -0,0 +1,147 @@
+"""
+SQL versions of the built-in arithmetic operations.
+
+The same kernels back two features:
+
+- ``CALCULATION_RESULT_MODE=database`` makes ``calculations.result`` a
+  stored generated column, so the database derives it from ``a``, ``b``
+  and ``type`` on every insert and update. Types without a SQL kernel
+  (Expression, aggregates, plugins) fall back to ``stored_result``, which
+  the application still writes.
+- Set-based bulk transforms rewrite operands and results in a single
+  ``UPDATE`` without loading rows into Python.
+
+Modulo follows Python's sign convention: the remainder has the sign of
+the divisor. On SQLite it is Python's own ``%``. PostgreSQL computes it
+with ``mod()`` on ``numeric`` and moves a remainder of the wrong sign
+into range; ``a - b * floor(a / b)`` in ``double precision`` is not used,
+since it is off in the last bits for about half of ordinary inputs and
+loses the remainder entirely at large magnitudes. The catch is that
+``double precision`` converts to ``numeric`` rounded to 15 significant
+digits, so PostgreSQL takes the remainder of the decimal operands rather
+than of their binary values, and does not match Python bit for bit even
+for ordinary decimals: ``0.1 % 0.03`` is ``0.01`` there and
+``0.010000000000000009`` in Python, and ``0.3 % 0.1`` is ``0`` there and
+``0.09999999999999998`` in Python (a remainder just below the divisor
+becomes zero). Results agree to about 15 significant digits of the
+operands, modulo the divisor.
+
+SQLite gets ``power``, ``floor`` and ``mod`` registered on every
+connection; ``power`` raises on overflow instead of storing infinity.
+"""
+import math
+import os
+import sqlite3
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import Float, Numeric, case, cast, event, func
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DataError, DBAPIError, OperationalError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.sql.functions import FunctionElement
+
+# How sqlite3 reports a ValueError raised in a registered function (OverflowError becomes DataError)
+SQLITE_FUNCTION_ERROR = "user-defined function raised exception"
+
+CALCULATION_RESULT_MODE = os.getenv("CALCULATION_RESULT_MODE", "python").lower()
+DB_COMPUTED_RESULTS = CALCULATION_RESULT_MODE == "database"
+
+
+class PythonModulo(FunctionElement):
+    """``a % b`` with Python's sign convention, compiled per dialect."""
+
+    type = Float()
+    name = "mod"
+    inherit_cache = True
+
+
+@compiles(PythonModulo)
+def _compile_mod(element, compiler, **kw) -> str:
+    # SQLite: the function registered below
+    return f"mod({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(PythonModulo, "postgresql")
+def _compile_mod_postgresql(element, compiler, **kw) -> str:
+    a, b = (cast(operand, Numeric) for operand in element.clauses)
+    remainder = func.mod(a, b)
+    # mod() has the sign of the dividend; Python's % that of the divisor
+    expression = case((func.sign(remainder) == -func.sign(b), remainder + b), else_=remainder)
+    return compiler.process(cast(expression, Float), **kw)
+
+
+SQL_KERNELS: Dict[str, Callable[[ColumnElement, ColumnElement], ColumnElement]] = {
+    "Add": lambda a, b: a + b,
+    "Subtract": lambda a, b: a - b,
+    "Multiply": lambda a, b: a * b,
+    "Divide": lambda a, b: a / b,
+    "Power": lambda a, b: func.power(a, b),
+    "Modulo": lambda a, b: PythonModulo(a, b),
+}
+
+# Operations that fail when the second operand is zero
+ZERO_DIVISOR_TYPES = frozenset({"Divide", "Modulo"})
+
+
+def result_expression(
+    type_column: ColumnElement,
+    a: ColumnElement,
+    b: ColumnElement,
+    fallback: Optional[ColumnElement] = None,
+) -> ColumnElement:
+    """
+    Build ``CASE type WHEN 'Add' THEN a + b ... ELSE fallback END``.
+
+    Args:
+        type_column: Column holding the operation type
+        a / b: Operand expressions (columns or arbitrary SQL)
+        fallback: Value for types without a SQL kernel (NULL when omitted)
+    """
+    return case(
+        {name: kernel(a, b) for name, kernel in SQL_KERNELS.items()},
+        value=type_column,
+        else_=fallback,
+    )
+
+
+def is_kernel_error(error: DBAPIError) -> bool:
+    """
+    Whether a statement failed on its data (overflow, an undefined power,
+    division by zero) rather than on the database (deadlocks, lock
+    timeouts, lost connections), which must not be blamed on the client.
+    """
+    if isinstance(error, DataError):
+        return True
+    return (
+        isinstance(error, OperationalError)
+        and isinstance(error.orig, sqlite3.OperationalError)
+        and str(error.orig) == SQLITE_FUNCTION_ERROR
+    )
+
+
+def _sqlite_power(a: Optional[float], b: Optional[float]) -> Optional[float]:
+    if a is None or b is None:
+        return None
+    # math.pow raises OverflowError/ValueError where SQLite's pow returns inf/NaN
+    return math.pow(a, b)
+
+
+def _sqlite_floor(value: Optional[float]) -> Optional[float]:
+    return None if value is None else float(math.floor(value))
+
+
+def _sqlite_mod(a: Optional[float], b: Optional[float]) -> Optional[float]:
+    if a is None or b is None or b == 0:
+        # NULL like SQLite's own division by zero
+        return None
+    return float(a) % float(b)
+
+
+@event.listens_for(Engine, "connect")
+def register_sqlite_functions(dbapi_connection, connection_record) -> None:
+    """Give SQLite connections the functions used by the SQL kernels."""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function("power", 2, _sqlite_power, deterministic=True)
+        dbapi_connection.create_function("floor", 1, _sqlite_floor, deterministic=True)
+        dbapi_connection.create_function("mod", 2, _sqlite_mod, deterministic=True)
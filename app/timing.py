@@ -0,0 +1,165 @@
+"""
+Per-request timing: database statements, authentication and the rest.
+
+``ServerTimingMiddleware`` gives every HTTP request a ``RequestTiming``
+through a context variable. The engine hooks in ``app.database`` add each
+statement's count and duration to it, and ``auth_phase`` blocks (token
+decoding, user lookup, bcrypt) add their time. When the response starts,
+the totals go out in a ``Server-Timing`` header::
+
+    Server-Timing: db;dur=3.41;desc="4 queries", auth;dur=0.12, app;dur=1.87
+
+``auth`` excludes the statements it runs, which count under ``db``, and
+``app`` is what remains, so the three add up to the time until the
+response started (later chunks of a streamed body are not included).
+
+After the response, a request that ran more than ``SQL_QUERY_BUDGET``
+statements is logged, as is every statement that ran at least
+``SQL_REPEAT_THRESHOLD`` times with the same SQL: the usual sign of a
+lookup made once per row (N+1).
+"""
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.metrics import route_label
+
+logger = logging.getLogger(__name__)
+
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() in {"1", "true", "yes"}
+# Statements per request before it is logged; 0 disables
+SQL_QUERY_BUDGET = int(os.getenv("SQL_QUERY_BUDGET", "10"))
+# Executions of one statement per request before it is logged as an N+1 suspect; 0 disables.
+# A few repeats are normal: POST /batch sub-requests each read the caller's data version.
+SQL_REPEAT_THRESHOLD = int(os.getenv("SQL_REPEAT_THRESHOLD", "5"))
+
+# Longest statement text written to the log
+LOGGED_STATEMENT_LENGTH = 200
+
+
+class RequestTiming:
+    """Statements and time spent by one request, filled in as it runs."""
+
+    __slots__ = ("scope", "started", "queries", "db_seconds", "auth_seconds", "statements", "_in_auth")
+
+    def __init__(self, scope: Optional[Scope] = None):
+        self.scope = scope
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.auth_seconds = 0.0
+        self.statements: Counter = Counter()
+        self._in_auth = False
+
+    def record_query(self, statement: str, seconds: float) -> None:
+        self.queries += 1
+        self.db_seconds += seconds
+        self.statements[statement] += 1
+
+    def route(self) -> Tuple[str, str]:
+        """Method and route template of the request (once routed), for logs."""
+        if self.scope is None:
+            return "", ""
+        return self.scope["method"], route_label(self.scope)
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statements run at least ``threshold`` times, most repeated first."""
+        if threshold <= 0:
+            return []
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+    def server_timing(self, elapsed: float) -> str:
+        """
+        Format a Server-Timing header value.
+
+        Args:
+            elapsed: Seconds since the request started
+
+        Returns:
+            ``db``, ``auth`` and ``app`` durations in milliseconds
+        """
+        app_seconds = max(elapsed - self.db_seconds - self.auth_seconds, 0.0)
+        return (
+            f'db;dur={self.db_seconds * 1000:.2f};desc="{self.queries} queries", '
+            f"auth;dur={self.auth_seconds * 1000:.2f}, app;dur={app_seconds * 1000:.2f}"
+        )
+
+
+current_timing: ContextVar[Optional[RequestTiming]] = ContextVar("current_timing", default=None)
+
+
+@contextmanager
+def auth_phase() -> Iterator[None]:
+    """
+    Count the block as authentication time for the current request.
+
+    Nested blocks count once, and statements run inside stay under ``db``.
+    """
+    timing = current_timing.get()
+    if timing is None or timing._in_auth:
+        yield
+        return
+    timing._in_auth = True
+    started, db_before = time.perf_counter(), timing.db_seconds
+    try:
+        yield
+    finally:
+        timing._in_auth = False
+        timing.auth_seconds += time.perf_counter() - started - (timing.db_seconds - db_before)
+
+
+def _shorten(statement: str) -> str:
+    statement = " ".join(statement.split())
+    if len(statement) > LOGGED_STATEMENT_LENGTH:
+        return statement[:LOGGED_STATEMENT_LENGTH] + "..."
+    return statement
+
+
+def report(timing: RequestTiming) -> None:
+    """Log a finished request that exceeded the query budget or repeated statements."""
+    method, route = timing.route()
+    if 0 < SQL_QUERY_BUDGET < timing.queries:
+        logger.warning(
+            "%s %s ran %d SQL statements (budget %d) taking %.1f ms",
+            method, route, timing.queries, SQL_QUERY_BUDGET, timing.db_seconds * 1000,
+        )
+    for statement, count in timing.repeated(SQL_REPEAT_THRESHOLD):
+        logger.warning("Possible N+1 in %s %s: statement ran %d times: %s", method, route, count, _shorten(statement))
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware timing each HTTP request and adding ``Server-Timing``.
+
+    Requests dispatched inside another (``POST /batch`` sub-requests) are
+    counted towards the outer request.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or current_timing.get() is not None:
+            await self.app(scope, receive, send)
+            return
+        timing = RequestTiming(scope)
+        token = current_timing.set(timing)
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start" and SERVER_TIMING_ENABLED:
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", timing.server_timing(time.perf_counter() - timing.started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_timing.reset(token)
+            report(timing)
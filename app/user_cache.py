@@ -0,0 +1,186 @@
+"""
+Cache of user profiles.
+
+Profile reads (``GET /users/me``, ``GET /users/{id}``) and the per-request
+username -> user lookup behind every authenticated endpoint are served
+from serialized ``UserRead`` payloads with a TTL, kept in the backend
+chosen by ``CACHE_BACKEND`` (see ``app.cache_backends``). Endpoints that
+change a user write the fresh row through (or drop it) after committing,
+and publish an invalidation so other workers drop their per-process
+copies. Password hashes are never cached.
+"""
+import json
+import os
+import threading
+from typing import Dict, List, NamedTuple, Optional, Union
+from uuid import UUID
+
+from app import invalidation
+from app.cache_backends import CACHE_BACKEND, CacheBackend, instance_name, make_backend
+from app.database import get_database_url
+from app.models import User
+from app.schemas import UserRead
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+NAMESPACE = "user"
+
+
+class UserIdentity(NamedTuple):
+    """The parts of a user most endpoints need: who is calling."""
+    id: UUID
+    username: str
+
+
+class CachedUser(NamedTuple):
+    """A cached profile: identity plus the serialized UserRead JSON."""
+    identity: UserIdentity
+    payload: bytes
+
+
+def serialize_user(user: User) -> bytes:
+    """Serialize a user exactly as the UserRead response model would."""
+    return UserRead.model_validate(user).model_dump_json().encode("utf-8")
+
+
+def _as_uuid(user_id: Union[UUID, str]) -> Optional[UUID]:
+    if isinstance(user_id, UUID):
+        return user_id
+    try:
+        return UUID(str(user_id))
+    except ValueError:
+        return None
+
+
+def _id_key(user_id: UUID) -> str:
+    return "id:" + user_id.hex
+
+
+def _name_key(username: str) -> str:
+    return "name:" + username
+
+
+def _decode(payload: Optional[bytes]) -> Optional[CachedUser]:
+    if payload is None:
+        return None
+    profile = json.loads(payload)
+    return CachedUser(UserIdentity(UUID(profile["id"]), profile["username"]), payload)
+
+
+class UserCache:
+    """
+    User profiles addressable by id or username.
+
+    Profiles are stored under ``id:<hex>`` and a ``name:<username>`` key
+    points at the id. A username lookup only hits when the profile it
+    points at still carries that username, so a stale pointer left by a
+    rename on another worker is harmless.
+
+    Attributes:
+        backend: Store holding the entries
+        ttl: Seconds an entry stays valid
+    """
+
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL,
+                 backend: Optional[CacheBackend] = None):
+        self.backend = backend if backend is not None else make_backend(
+            CACHE_BACKEND, NAMESPACE, maxsize, instance_name(get_database_url())
+        )
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _count(self, entry: Optional[CachedUser]) -> Optional[CachedUser]:
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def get(self, user_id: Union[UUID, str]) -> Optional[CachedUser]:
+        """Look a user up by id."""
+        key = _as_uuid(user_id)
+        return self._count(_decode(self.backend.get(_id_key(key))) if key is not None else None)
+
+    def get_by_username(self, username: str) -> Optional[CachedUser]:
+        """Look a user up by username."""
+        pointer = self.backend.get(_name_key(username))
+        entry = _decode(self.backend.get("id:" + pointer.decode("ascii"))) if pointer else None
+        if entry is not None and entry.identity.username != username:
+            entry = None
+        return self._count(entry)
+
+    def put(self, user: User) -> CachedUser:
+        """Cache (or refresh) a user's profile; call after the change is committed."""
+        entry = CachedUser(UserIdentity(user.id, user.username), serialize_user(user))
+        previous = _decode(self.backend.get(_id_key(user.id)))
+        if previous is not None and previous.identity.username != user.username:
+            # A renamed user must not stay reachable under the old username
+            self.backend.delete(_name_key(previous.identity.username))
+        self.backend.set(_id_key(user.id), entry.payload, self.ttl)
+        self.backend.set(_name_key(user.username), user.id.hex.encode("ascii"), self.ttl)
+        return entry
+
+    def invalidate(self, user_id: Union[UUID, str, None] = None, username: Optional[str] = None) -> None:
+        """Drop a user by id and/or username."""
+        keys = []
+        key = _as_uuid(user_id) if user_id is not None else None
+        if key is not None:
+            keys.append(_id_key(key))
+            cached = _decode(self.backend.get(_id_key(key)))
+            if cached is not None:
+                keys.append(_name_key(cached.identity.username))
+        if username is not None:
+            keys.append(_name_key(username))
+            pointer = self.backend.get(_name_key(username))
+            if pointer:
+                keys.append("id:" + pointer.decode("ascii"))
+        if keys:
+            self.backend.delete(*keys)
+            with self._lock:
+                self.invalidations += 1
+
+    def publish(self, db, user: User) -> None:
+        """Tell other workers to drop this user when ``db`` commits."""
+        invalidation.publish(db, NAMESPACE, [user.id.hex, user.username])
+
+    def on_invalidation(self, keys: Optional[List[str]]) -> None:
+        """
+        Apply an invalidation broadcast by another worker.
+
+        Shared backends were already updated by the writer, so only
+        per-process entries are dropped.
+        """
+        if self.backend.shared:
+            return
+        if keys is None:
+            self.backend.clear()
+            return
+        user_id, *usernames = keys
+        self.invalidate(user_id)
+        for username in usernames:
+            self.invalidate(username=username)
+
+    def clear(self) -> int:
+        """Drop every entry; returns how many were dropped."""
+        return self.backend.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters, the current hit ratio and backend statistics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            counters = {
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+        return {**self.backend.stats(), **counters}
+
+
+user_cache = UserCache()
+invalidation.register(NAMESPACE, user_cache.on_invalidation)
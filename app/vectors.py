@@ -0,0 +1,139 @@
+"""
+Array-valued calculations computed with NumPy.
+
+Operands and results are stored as little-endian float64 blobs rather
+than JSON lists, and travel over the API either as JSON lists, base64
+strings or raw ``application/octet-stream`` bodies.
+"""
+import base64
+import binascii
+from typing import Callable, Dict, NamedTuple, Optional, Union
+
+import numpy as np
+
+MAX_VECTOR_LENGTH = 100_000
+FLOAT64 = np.dtype("<f8")
+
+
+class VectorKernel(NamedTuple):
+    """A vector operation: its arity, function and whether it reduces to a scalar."""
+    arity: int
+    func: Callable[..., Union[float, np.ndarray]]
+    reduces: bool
+
+
+def _dot(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.dot(a, b))
+
+
+def _norm(a: np.ndarray) -> float:
+    return float(np.linalg.norm(a))
+
+
+def _sum(a: np.ndarray) -> float:
+    return float(np.sum(a))
+
+
+def _mean(a: np.ndarray) -> float:
+    return float(np.mean(a))
+
+
+VECTOR_KERNELS: Dict[str, VectorKernel] = {
+    "Dot": VectorKernel(2, _dot, True),
+    "ElementwiseAdd": VectorKernel(2, np.add, False),
+    "ElementwiseMultiply": VectorKernel(2, np.multiply, False),
+    "Norm": VectorKernel(1, _norm, True),
+    "VectorSum": VectorKernel(1, _sum, True),
+    "VectorMean": VectorKernel(1, _mean, True),
+}
+
+
+def encode_array(values: np.ndarray) -> bytes:
+    """Serialize an array as little-endian float64 bytes."""
+    return np.ascontiguousarray(values, dtype=FLOAT64).tobytes()
+
+
+def decode_array(data: bytes) -> np.ndarray:
+    """
+    Deserialize little-endian float64 bytes into a read-only array.
+
+    Raises:
+        ValueError: If the byte length is not a multiple of 8
+    """
+    if len(data) % FLOAT64.itemsize:
+        raise ValueError("Binary vector length must be a multiple of 8 bytes")
+    return np.frombuffer(data, dtype=FLOAT64)
+
+
+def to_base64(data: Optional[bytes]) -> Optional[str]:
+    """Encode a blob as base64 text."""
+    return None if data is None else base64.b64encode(data).decode("ascii")
+
+
+def coerce_vector(value: Union[list, str, bytes, np.ndarray]) -> np.ndarray:
+    """
+    Turn a JSON list, base64 string or raw bytes into a validated float64 array.
+
+    Raises:
+        ValueError: If the vector is empty, too long or contains non-finite values
+    """
+    if isinstance(value, str):
+        try:
+            value = base64.b64decode(value, validate=True)
+        except binascii.Error:
+            raise ValueError("Vector strings must be base64-encoded float64 data")
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        array = decode_array(bytes(value))
+    else:
+        array = np.asarray(value, dtype=FLOAT64)
+    if array.ndim != 1:
+        raise ValueError("Vectors must be one-dimensional")
+    if array.size == 0:
+        raise ValueError("Vectors must not be empty")
+    if array.size > MAX_VECTOR_LENGTH:
+        raise ValueError(f"Vectors must have at most {MAX_VECTOR_LENGTH} elements")
+    if not np.isfinite(array).all():
+        raise ValueError("Vectors must contain only finite numbers")
+    return array
+
+
+def compute_vector(operation_type: str, a: np.ndarray, b: Optional[np.ndarray] = None) -> Union[float, np.ndarray]:
+    """
+    Run a vector operation.
+
+    Args:
+        operation_type: Name from VECTOR_KERNELS
+        a: First operand
+        b: Second operand (binary operations only)
+
+    Returns:
+        A float for reductions, otherwise an array
+
+    Raises:
+        ValueError: If the operation is unknown or the operands do not fit it
+    """
+    kernel = VECTOR_KERNELS.get(operation_type)
+    if kernel is None:
+        raise ValueError(
+            f"Unsupported vector operation: {operation_type}. "
+            f"Supported types: {', '.join(VECTOR_KERNELS)}"
+        )
+    if kernel.arity == 1:
+        if b is not None:
+            raise ValueError(f"{operation_type} takes a single vector")
+        operands = (a,)
+    else:
+        if b is None:
+            raise ValueError(f"{operation_type} requires two vectors")
+        if a.shape != b.shape:
+            raise ValueError("Vectors must have the same length")
+        operands = (a, b)
+    with np.errstate(over="ignore", invalid="ignore"):
+        result = kernel.func(*operands)
+    if kernel.reduces:
+        if not np.isfinite(result):
+            raise ValueError("Result is out of range")
+        return float(result)
+    if not np.isfinite(result).all():
+        raise ValueError("Result is out of range")
+    return result
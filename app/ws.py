@@ -0,0 +1,292 @@
+"""
+Persistent WebSocket calculator sessions.
+
+A client opens ``/ws/calculations`` and authenticates once, either with
+an ``Authorization: Bearer`` header or with a first message
+``{"op": "auth", "token": "..."}``. The resolved user is kept for the
+life of the socket, so later messages skip token decoding, the user
+lookup and opening a session.
+
+Every other message is ``{"id": ..., "op": ..., ...fields}``. Messages
+may be pipelined; each reply carries the request's ``id`` and replies
+can arrive out of order:
+
+- ``{"id": ..., "ok": true, ...result}`` on success
+- ``{"id": ..., "ok": false, "status": 404, "detail": ...}`` on failure,
+  with the status code the HTTP API would have used
+
+Read-only operations run concurrently as soon as they arrive. Writes are
+applied in arrival order by a ``GroupCommitter``, which commits whatever
+writes queued up while the previous group was committing in a single
+transaction, with a savepoint per write.
+"""
+import asyncio
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect, status
+from jose import JWTError
+from pydantic import ValidationError
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.security import decode_access_token
+from app.serialization import dumps
+from app.user_cache import UserIdentity
+
+WS_AUTH_TIMEOUT = float(os.getenv("WS_AUTH_TIMEOUT", "10"))
+WS_MAX_IN_FLIGHT = int(os.getenv("WS_MAX_IN_FLIGHT", "256"))
+WS_MAX_GROUP_SIZE = int(os.getenv("WS_MAX_GROUP_SIZE", "64"))
+# Extra wait for more writes before committing a group; 0 only groups writes that are already queued
+WS_COMMIT_WINDOW = float(os.getenv("WS_COMMIT_WINDOW_MS", "0")) / 1000
+
+POLICY_VIOLATION = 1008
+
+
+class Principal(NamedTuple):
+    """The authenticated user of a socket and when their token expires."""
+    identity: UserIdentity
+    expires_at: Optional[float]
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.time() >= self.expires_at
+
+
+class Handler(NamedTuple):
+    """
+    One operation of the protocol.
+
+    ``parse`` validates a message (raising ValueError or HTTPException)
+    before anything runs. Reads call ``run(args, principal)``; writes call
+    ``run(db, args, principal)`` inside a savepoint of a group transaction
+    and must neither commit nor roll back.
+    """
+    parse: Callable[[Dict[str, Any]], Any]
+    run: Callable[..., Awaitable[Dict[str, Any]]]
+    writes: bool
+
+
+def error_reply(request_id: Any, exc: Exception) -> Dict[str, Any]:
+    """Map an exception to an error reply, the way the HTTP API maps it to a status."""
+    if isinstance(exc, HTTPException):
+        return {"id": request_id, "ok": False, "status": exc.status_code, "detail": exc.detail}
+    if isinstance(exc, ValidationError):
+        detail = exc.errors(include_url=False, include_context=False)
+        return {"id": request_id, "ok": False, "status": status.HTTP_422_UNPROCESSABLE_ENTITY, "detail": detail}
+    if isinstance(exc, ValueError):
+        return {"id": request_id, "ok": False, "status": status.HTTP_400_BAD_REQUEST, "detail": str(exc)}
+    return {"id": request_id, "ok": False, "status": status.HTTP_500_INTERNAL_SERVER_ERROR, "detail": "Internal error"}
+
+
+def read_token(websocket: WebSocket) -> Optional[str]:
+    header = websocket.headers.get("authorization", "")
+    scheme, _, token = header.partition(" ")
+    return token.strip() if scheme.lower() == "bearer" and token.strip() else None
+
+
+async def authenticate(
+    websocket: WebSocket, resolve: Callable[[str], UserIdentity], timeout: float = WS_AUTH_TIMEOUT
+) -> Optional[Principal]:
+    """
+    Authenticate an accepted socket once.
+
+    Args:
+        websocket: The accepted socket
+        resolve: Maps a username to its identity (raises HTTPException if unknown)
+        timeout: Seconds to wait for the auth message
+
+    Returns:
+        The principal, or None after closing the socket with 1008
+    """
+    request_id = None
+    token = read_token(websocket)
+    try:
+        if token is None:
+            message = json.loads(await asyncio.wait_for(websocket.receive_text(), timeout))
+            request_id = message.get("id")
+            if message.get("op") != "auth" or not isinstance(message.get("token"), str):
+                raise ValueError("The first message must be {\"op\": \"auth\", \"token\": ...}")
+            token = message["token"]
+        payload = decode_access_token(token)
+        username = payload.get("sub")
+        if username is None:
+            raise JWTError("token has no subject")
+        identity = resolve(username)
+    except (asyncio.TimeoutError, ValueError, AttributeError, JWTError, HTTPException):
+        await websocket.close(code=POLICY_VIOLATION, reason="Authentication failed")
+        return None
+    except WebSocketDisconnect:
+        return None
+    principal = Principal(identity, payload.get("exp"))
+    await websocket.send_text(dumps({
+        "id": request_id, "ok": True, "user_id": identity.id, "username": identity.username,
+    }).decode("utf-8"))
+    return principal
+
+
+class WriteOp(NamedTuple):
+    request_id: Any
+    handler: Handler
+    args: Any
+
+
+class GroupCommitter:
+    """
+    Applies queued writes in groups, one transaction and one commit per group.
+
+    Writes are applied in submission order, each in its own savepoint: a
+    write that fails rolls back to its savepoint and gets an error reply,
+    while the rest of the group still commits. Nothing is run twice. If
+    the commit itself fails, every write of the group is reported failed.
+
+    Attributes:
+        groups: Transactions committed or attempted
+        writes: Writes applied successfully
+        failed: Writes that failed
+    """
+
+    def __init__(
+        self, bind: Engine, principal: Principal, reply: Callable[[Dict[str, Any]], Awaitable[None]],
+        done: Callable[[], None], max_group: int = WS_MAX_GROUP_SIZE, window: float = WS_COMMIT_WINDOW
+    ):
+        self.bind = bind
+        self.principal = principal
+        self.reply = reply
+        self.done = done
+        self.max_group = max_group
+        self.window = window
+        self.queue: "asyncio.Queue[Optional[WriteOp]]" = asyncio.Queue()
+        self.groups = self.writes = self.failed = 0
+
+    def submit(self, op: WriteOp) -> None:
+        self.queue.put_nowait(op)
+
+    async def close(self) -> None:
+        """Stop after committing everything already submitted."""
+        self.queue.put_nowait(None)
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            op = await self.queue.get()
+            if op is None:
+                return
+            group = [op]
+            deadline = loop.time() + self.window
+            while len(group) < self.max_group:
+                try:
+                    if self.queue.empty() and loop.time() < deadline:
+                        nxt = await asyncio.wait_for(self.queue.get(), deadline - loop.time())
+                    else:
+                        nxt = self.queue.get_nowait()
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                if nxt is None:
+                    stopping = True
+                    break
+                group.append(nxt)
+            await self.commit(group)
+
+    async def commit(self, group: List[WriteOp]) -> None:
+        self.groups += 1
+        outcomes: List[Tuple[WriteOp, Optional[Dict[str, Any]], Optional[Exception]]] = []
+        with Session(bind=self.bind) as db:
+            for op in group:
+                try:
+                    with db.begin_nested():
+                        result = await op.handler.run(db, op.args, self.principal)
+                except Exception as exc:
+                    outcomes.append((op, None, exc))
+                else:
+                    outcomes.append((op, result, None))
+            try:
+                db.commit()
+            except Exception as exc:
+                db.rollback()
+                outcomes = [(op, None, error or exc) for op, _, error in outcomes]
+
+        for op, result, error in outcomes:
+            self.done()
+            if error is None:
+                self.writes += 1
+                await self.reply({"id": op.request_id, "ok": True, **result})
+            else:
+                self.failed += 1
+                await self.reply(error_reply(op.request_id, error))
+
+
+async def serve(
+    websocket: WebSocket, principal: Principal, handlers: Dict[str, Handler], bind: Engine,
+    max_in_flight: int = WS_MAX_IN_FLIGHT
+) -> GroupCommitter:
+    """
+    Serve an authenticated socket until it closes.
+
+    At most ``max_in_flight`` requests are processed at once; beyond that
+    the socket is not read, which pushes back on the client.
+
+    Returns:
+        The socket's committer (for its counters)
+    """
+    send_lock = asyncio.Lock()
+    slots = asyncio.Semaphore(max_in_flight)
+
+    async def reply(message: Dict[str, Any]) -> None:
+        async with send_lock:
+            try:
+                await websocket.send_text(dumps(message).decode("utf-8"))
+            except (WebSocketDisconnect, RuntimeError):
+                pass  # The client went away; writes are committed regardless
+
+    committer = GroupCommitter(bind, principal, reply, slots.release)
+    committer_task = asyncio.ensure_future(committer.run())
+    reads = set()
+
+    async def run_read(request_id: Any, handler: Handler, args: Any) -> None:
+        try:
+            result = await handler.run(args, principal)
+        except Exception as exc:
+            await reply(error_reply(request_id, exc))
+        else:
+            await reply({"id": request_id, "ok": True, **result})
+        finally:
+            slots.release()
+
+    try:
+        while True:
+            text = await websocket.receive_text()
+            if principal.expired():
+                await websocket.close(code=POLICY_VIOLATION, reason="Token expired")
+                break
+            request_id = None
+            try:
+                message = json.loads(text)
+                if not isinstance(message, dict):
+                    raise ValueError("Messages must be JSON objects")
+                request_id = message.get("id")
+                handler = handlers.get(message.get("op"))
+                if handler is None:
+                    raise ValueError(f"Unknown op; expected one of: {', '.join(sorted(handlers))}")
+                args = handler.parse(message)
+            except (ValueError, HTTPException) as exc:
+                await reply(error_reply(request_id, exc))
+                continue
+
+            await slots.acquire()
+            if handler.writes:
+                committer.submit(WriteOp(request_id, handler, args))
+            else:
+                task = asyncio.ensure_future(run_read(request_id, handler, args))
+                reads.add(task)
+                task.add_done_callback(reads.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await committer.close()
+        await committer_task
+        if reads:
+            await asyncio.gather(*reads, return_exceptions=True)
+    return committer
@@ -0,0 +1 @@
+"""Micro-benchmarks for hot paths; run the modules with ``python -m benchmarks.<name>``."""
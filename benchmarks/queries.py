@@ -0,0 +1,122 @@
+"""
+Benchmark the columnar read path against the ORM path.
+
+For each request shape (list, get, summary) this measures median latency
+and peak Python heap allocation (tracemalloc) of the previous ORM
+implementation against the ``app.queries`` read layer, including JSON
+serialization, against an SQLite database holding ``--rows`` calculations
+for one user.
+
+Usage:
+    python -m benchmarks.queries --rows 10000
+"""
+import argparse
+import gc
+import statistics
+import time
+import tracemalloc
+import uuid
+from typing import Callable, List, Tuple
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import Session
+
+from app import queries
+from app.database import Base
+from app.models import Calculation, User
+from app.schemas import CalculationRead, CalculationSummary
+from app.serialization import calculation_records_json, dumps
+from benchmarks.serialization import make_rows, response_model_json
+
+
+def orm_list(db: Session, user_id: uuid.UUID, limit: int) -> bytes:
+    return response_model_json(db.query(Calculation).filter(Calculation.user_id == user_id).limit(limit).all())
+
+
+def records_list(db: Session, user_id: uuid.UUID, limit: int) -> bytes:
+    return calculation_records_json(queries.list_calculations(db, user_id, limit=limit))
+
+
+def orm_get(db: Session, user_id: uuid.UUID, calc_id: uuid.UUID) -> bytes:
+    calc = db.query(Calculation).filter(Calculation.id == calc_id, Calculation.user_id == user_id).first()
+    return CalculationRead.model_validate(calc).model_dump_json().encode()
+
+
+def records_get(db: Session, user_id: uuid.UUID, calc_id: uuid.UUID) -> bytes:
+    return dumps(queries.get_calculation(db, calc_id, user_id))
+
+
+def orm_summary(db: Session, user_id: uuid.UUID) -> bytes:
+    """The previous four-query summary."""
+    base_query = db.query(Calculation).filter(Calculation.user_id == user_id)
+    total = base_query.count()
+    breakdown = dict(db.query(Calculation.type, func.count(Calculation.id)).filter(
+        Calculation.user_id == user_id
+    ).group_by(Calculation.type).all())
+    average = base_query.with_entities(func.avg(Calculation.result)).scalar()
+    last = base_query.order_by(Calculation.created_at.desc()).first()
+    return CalculationSummary(
+        total=total,
+        average_result=average,
+        last_result=last.result if last else None,
+        operations_breakdown=breakdown,
+        most_used_operation=max(breakdown, key=breakdown.get) if breakdown else None,
+    ).model_dump_json().encode()
+
+
+def records_summary(db: Session, user_id: uuid.UUID) -> bytes:
+    stats = queries.calculation_summary(db, user_id)
+    return dumps(stats._asdict())
+
+
+def measure(engine, request: Callable[[Session], bytes], repeat: int) -> Tuple[float, float]:
+    """Return (median ms, peak MiB) with a fresh session per request, as in get_db."""
+    samples = []
+    for _ in range(repeat):
+        with Session(engine) as db:
+            started = time.perf_counter()
+            request(db)
+            samples.append((time.perf_counter() - started) * 1000)
+    gc.collect()
+    tracemalloc.start()
+    with Session(engine) as db:
+        request(db)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(samples), peak / 2 ** 20
+
+
+def run(rows: int, repeat: int) -> None:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    user_id = uuid.uuid4()
+    data = make_rows(rows, user_id)
+    with Session(engine) as db:
+        db.add(User(id=user_id, username="bench", email="bench@example.com", password_hash="x"))
+        db.add_all(Calculation(**dict(zip(queries.CALCULATION_FIELDS, row))) for row in data)
+        db.commit()
+    calc_id = data[rows // 2][0]
+
+    shapes: List[Tuple[str, Callable, Callable]] = [
+        (f"list ({rows} rows)", lambda db: orm_list(db, user_id, rows), lambda db: records_list(db, user_id, rows)),
+        ("get", lambda db: orm_get(db, user_id, calc_id), lambda db: records_get(db, user_id, calc_id)),
+        ("summary", lambda db: orm_summary(db, user_id), lambda db: records_summary(db, user_id)),
+    ]
+    print(f"{'request':<18} {'path':<8} {'median ms':>10} {'peak MiB':>9}")
+    for name, orm_func, records_func in shapes:
+        for path, request in (("orm", orm_func), ("records", records_func)):
+            elapsed, peak = measure(engine, request, repeat)
+            print(f"{name:<18} {path:<8} {elapsed:>10.2f} {peak:>9.2f}")
+    engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    run(args.rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
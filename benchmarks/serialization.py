@@ -0,0 +1,119 @@
+"""
+Benchmark list-response serialization.
+
+Compares the previous path (ORM objects validated through
+``response_model=List[CalculationRead]`` and encoded with the stdlib json
+module, as FastAPI does) against serializing ``CalculationRecord`` rows
+directly, both for serialization alone and including the SQLite query,
+plus the MessagePack and CBOR encodings negotiated with ``Accept``.
+
+Usage:
+    python -m benchmarks.serialization --sizes 100 1000 10000
+"""
+import argparse
+import json
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app import binary, queries, serialization
+from app.database import Base
+from app.models import Calculation, User
+from app.queries import CALCULATION_FIELDS, CalculationRecord
+from app.schemas import CalculationRead
+from app.serialization import calculation_records_json
+
+READ_LIST = TypeAdapter(List[CalculationRead])
+
+
+def response_model_json(objects) -> bytes:
+    """What FastAPI does for response_model=List[CalculationRead] plus JSONResponse."""
+    validated = READ_LIST.validate_python(objects, from_attributes=True)
+    content = READ_LIST.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def type_adapter_json(records) -> bytes:
+    """Fast path with orjson disabled."""
+    module_orjson, serialization.orjson = serialization.orjson, None
+    try:
+        return calculation_records_json(records)
+    finally:
+        serialization.orjson = module_orjson
+
+
+def make_rows(count: int, user_id: uuid.UUID) -> List[tuple]:
+    start = datetime(2024, 1, 1)
+    return [
+        (uuid.uuid4(), float(i), 2.0, "Multiply", None, None, None, i * 2.0, user_id, start + timedelta(seconds=i))
+        for i in range(count)
+    ]
+
+
+def timed(func: Callable[[], object], repeat: int) -> float:
+    """Median wall time in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def run(sizes: List[int], repeat: int) -> None:
+    print(f"{'rows':>7} {'variant':<38} {'ms':>9} {'speedup':>8}")
+    for size in sizes:
+        user_id = uuid.uuid4()
+        rows = make_rows(size, user_id)
+        records = [CalculationRecord(*row) for row in rows]
+        objects = [Calculation(**dict(zip(CALCULATION_FIELDS, row))) for row in rows]
+
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            db.add(User(id=user_id, username="bench", email="bench@example.com", password_hash="x"))
+            db.add_all(Calculation(**dict(zip(CALCULATION_FIELDS, row))) for row in rows)
+            db.commit()
+
+        def orm_query_then_response_model():
+            with Session(engine) as db:
+                response_model_json(db.query(Calculation).filter(Calculation.user_id == user_id).all())
+
+        def records_query_then_fast_path():
+            with Session(engine) as db:
+                calculation_records_json(queries.list_calculations(db, user_id, limit=size))
+
+        variants = [
+            ("serialize: response_model + json", lambda: response_model_json(objects)),
+            ("serialize: records + TypeAdapter", lambda: type_adapter_json(records)),
+            ("serialize: records + orjson", lambda: calculation_records_json(records)),
+            ("serialize: records + msgpack", lambda: binary.FORMATS[binary.MSGPACK].dumps(records)),
+            ("serialize: records + cbor", lambda: binary.FORMATS[binary.CBOR].dumps(records)),
+            ("query+serialize: ORM + response_model", orm_query_then_response_model),
+            ("query+serialize: records + orjson", records_query_then_fast_path),
+        ]
+        baselines = {}
+        for name, func in variants:
+            elapsed = timed(func, repeat)
+            group = name.split(":")[0]
+            baselines.setdefault(group, elapsed)
+            print(f"{size:>7} {name:<38} {elapsed:>9.2f} {baselines[group] / elapsed:>7.1f}x")
+        engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
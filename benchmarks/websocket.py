@@ -0,0 +1,79 @@
+"""
+Benchmark per-operation latency of the WebSocket session against HTTP.
+
+Runs the application in-process (against DATABASE_URL) and compares a
+stateless POST /calculations, which decodes the token, looks up the user
+and commits every time, with ``compute`` and ``create`` messages on one
+authenticated socket, sent one at a time and pipelined.
+
+Usage:
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.websocket --count 1000
+"""
+import argparse
+import time
+import uuid
+from typing import Callable
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def per_op(func: Callable[[int], None], count: int) -> float:
+    """Mean wall time per operation in milliseconds."""
+    started = time.perf_counter()
+    func(count)
+    return (time.perf_counter() - started) * 1000 / count
+
+
+def run(count: int) -> None:
+    with TestClient(app) as client:
+        unique = uuid.uuid4().hex
+        user = {"username": f"bench_{unique}", "email": f"bench_{unique}@example.com", "password": "benchpassword"}
+        client.post("/users/register", json=user)
+        token = client.post("/users/login", json=user).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        with client.websocket_connect("/ws/calculations", headers=headers) as socket:
+            socket.receive_json()
+
+            def http_create(n):
+                for i in range(n):
+                    client.post("/calculations", json={"a": float(i), "b": 2.0, "type": "Add"}, headers=headers)
+
+            def sequential(op):
+                def send(n):
+                    for i in range(n):
+                        socket.send_json({"id": i, "op": op, "a": float(i), "b": 2.0, "type": "Add"})
+                        socket.receive_json()
+                return send
+
+            def pipelined(op):
+                def send(n):
+                    for i in range(n):
+                        socket.send_json({"id": i, "op": op, "a": float(i), "b": 2.0, "type": "Add"})
+                    for _ in range(n):
+                        socket.receive_json()
+                return send
+
+            variants = [
+                ("http: POST /calculations", http_create),
+                ("ws: create, sequential", sequential("create")),
+                ("ws: create, pipelined", pipelined("create")),
+                ("ws: compute, sequential", sequential("compute")),
+                ("ws: compute, pipelined", pipelined("compute")),
+            ]
+            print(f"{'variant':<28} {'ms/op':>9}")
+            for name, func in variants:
+                print(f"{name:<28} {per_op(func, count):>9.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--count", type=int, default=1000)
+    args = parser.parse_args()
+    run(args.count)
+
+
+if __name__ == "__main__":
+    main()
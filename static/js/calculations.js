@@ -1,15 +1,54 @@
 // Calculations Management JavaScript
 const API_BASE_URL = window.location.origin;
 
+// Calculations currently displayed, kept in sync by live events
+let currentCalculations = [];
+// True while GET /calculations/stream is connected
+let liveUpdates = false;
+
 // Initialize page
 document.addEventListener('DOMContentLoaded', function() {
     checkAuth();
     setupEventListeners();
-    loadProfile();
-    loadSummary();
-    loadCalculations();
+    connectEventStream();
+    loadDashboard();
 });
 
+// Load profile, summary and calculations in one round trip, falling back to
+// separate requests if the batch endpoint is unavailable
+async function loadDashboard() {
+    try {
+        const response = await fetch(`${API_BASE_URL}/batch`, {
+            method: 'POST',
+            headers: getAuthHeaders(),
+            body: JSON.stringify({
+                requests: [
+                    { id: 'profile', path: '/users/me' },
+                    { id: 'summary', path: '/calculations/summary' },
+                    { id: 'calculations', path: '/calculations?limit=100' }
+                ]
+            })
+        });
+
+        if (response.status === 401) {
+            logout();
+            return;
+        }
+        if (!response.ok) throw new Error(`Batch failed: ${response.status}`);
+
+        const { responses } = await response.json();
+        const byId = Object.fromEntries(responses.map(item => [item.id, item]));
+        if (byId.profile.status === 200) renderProfile(byId.profile.body); else loadProfile();
+        if (byId.summary.status === 200) renderSummary(byId.summary.body); else loadSummary();
+        if (byId.calculations.status === 200) displayCalculations(byId.calculations.body); else loadCalculations();
+    } catch (error) {
+        console.error('Batch load failed, loading separately', error);
+        loadProfile();
+        loadSummary();
+        loadCalculations();
+    }
+}
+
 // Check if user is authenticated
 function checkAuth() {
     const token = localStorage.getItem('access_token');
@@ -25,7 +64,6 @@ function checkAuth() {
 
 // Fetch and display user profile
 async function loadProfile() {
-    const usernameDisplay = document.getElementById('username-display');
     try {
         const response = await fetch(`${API_BASE_URL}/users/me`, {
             headers: getAuthHeaders()
@@ -36,24 +74,28 @@ async function loadProfile() {
             return;
         }
 
-        const profile = await response.json();
-        localStorage.setItem('username', profile.username);
-        usernameDisplay.textContent = `Welcome, ${profile.username}!`;
-        document.getElementById('last-login').textContent = profile.last_login ? `Last login: ${new Date(profile.last_login).toLocaleString()}` : '';
-
-        // Populate form fields
-        const profileForm = document.getElementById('profile-form');
-        if (profileForm) {
-            profileForm.username.value = profile.username;
-            profileForm.email.value = profile.email;
-            profileForm.full_name.value = profile.full_name || '';
-            profileForm.bio.value = profile.bio || '';
-        }
+        renderProfile(await response.json());
     } catch (error) {
         console.error('Error loading profile', error);
     }
 }
 
+// Display the user profile and populate the profile form
+function renderProfile(profile) {
+    localStorage.setItem('username', profile.username);
+    document.getElementById('username-display').textContent = `Welcome, ${profile.username}!`;
+    document.getElementById('last-login').textContent = profile.last_login ? `Last login: ${new Date(profile.last_login).toLocaleString()}` : '';
+
+    // Populate form fields
+    const profileForm = document.getElementById('profile-form');
+    if (profileForm) {
+        profileForm.username.value = profile.username;
+        profileForm.email.value = profile.email;
+        profileForm.full_name.value = profile.full_name || '';
+        profileForm.bio.value = profile.bio || '';
+    }
+}
+
 // Submit profile update
 async function handleProfileUpdate(event) {
     event.preventDefault();
@@ -121,30 +163,36 @@ async function handlePasswordChange(event) {
 // Fetch calculation summary
 async function loadSummary() {
     try {
+        // Revalidate with If-None-Match; unchanged data comes back as 304
         const response = await fetch(`${API_BASE_URL}/calculations/summary`, {
+            cache: 'no-cache',
             headers: getAuthHeaders()
         });
 
         if (!response.ok) return;
 
-        const summary = await response.json();
-        document.getElementById('stat-total').textContent = summary.total;
-        document.getElementById('stat-average').textContent = summary.average_result !== null ? summary.average_result.toFixed(2) : '-';
-        document.getElementById('stat-most-used').textContent = summary.most_used_operation || '-';
-        document.getElementById('stat-last').textContent = summary.last_result !== null ? summary.last_result.toFixed(2) : '-';
-
-        const breakdown = document.getElementById('stat-breakdown');
-        breakdown.innerHTML = '';
-        Object.entries(summary.operations_breakdown || {}).forEach(([op, count]) => {
-            const span = document.createElement('span');
-            span.textContent = `${op}: ${count}`;
-            breakdown.appendChild(span);
-        });
+        renderSummary(await response.json());
     } catch (error) {
         console.error('Failed to load summary', error);
     }
 }
 
+// Display the calculation summary
+function renderSummary(summary) {
+    document.getElementById('stat-total').textContent = summary.total;
+    document.getElementById('stat-average').textContent = summary.average_result !== null ? summary.average_result.toFixed(2) : '-';
+    document.getElementById('stat-most-used').textContent = summary.most_used_operation || '-';
+    document.getElementById('stat-last').textContent = summary.last_result !== null ? summary.last_result.toFixed(2) : '-';
+
+    const breakdown = document.getElementById('stat-breakdown');
+    breakdown.innerHTML = '';
+    Object.entries(summary.operations_breakdown || {}).forEach(([op, count]) => {
+        const span = document.createElement('span');
+        span.textContent = `${op}: ${count}`;
+        breakdown.appendChild(span);
+    });
+}
+
 // Get auth headers
 function getAuthHeaders() {
     const token = localStorage.getItem('access_token');
@@ -276,6 +324,7 @@ async function loadCalculations() {
     try {
         const response = await fetch(`${API_BASE_URL}/calculations?limit=100`, {
             method: 'GET',
+            cache: 'no-cache',
             headers: getAuthHeaders()
         });
         
@@ -299,8 +348,93 @@ async function loadCalculations() {
     }
 }
 
+// Receive calculation changes as Server-Sent Events. fetch() is used instead
+// of EventSource because EventSource cannot send the Authorization header.
+async function connectEventStream(lastEventId = null) {
+    try {
+        const headers = getAuthHeaders();
+        if (lastEventId !== null) headers['Last-Event-ID'] = lastEventId;
+        const response = await fetch(`${API_BASE_URL}/calculations/stream`, { headers, cache: 'no-store' });
+
+        if (response.status === 401) {
+            logout();
+            return;
+        }
+        if (!response.ok || !response.body) throw new Error(`Stream failed: ${response.status}`);
+
+        liveUpdates = true;
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += value;
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const message = parseEventMessage(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+                if (message.id !== undefined) lastEventId = message.id;
+                if (message.event && message.data) applyCalculationEvent(message.event, JSON.parse(message.data));
+            }
+        }
+    } catch (error) {
+        console.error('Live updates disconnected', error);
+    }
+    liveUpdates = false;
+    setTimeout(() => connectEventStream(lastEventId), 3000);
+}
+
+// Parse one SSE message ("field: value" lines; ":" lines are heartbeats)
+function parseEventMessage(text) {
+    const message = {};
+    text.split('\n').forEach(line => {
+        if (!line || line.startsWith(':')) return;
+        const separator = line.indexOf(':');
+        const field = separator === -1 ? line : line.slice(0, separator);
+        const value = separator === -1 ? '' : line.slice(separator + 1).replace(/^ /, '');
+        message[field] = field === 'data' && message.data ? `${message.data}\n${value}` : value;
+    });
+    return message;
+}
+
+// Apply a pushed change to the displayed calculations
+function applyCalculationEvent(type, event) {
+    if (type === 'ready') return;
+    if (type === 'created' || type === 'updated') {
+        event.calculations.forEach(calc => {
+            const index = currentCalculations.findIndex(item => item.id === calc.id);
+            if (index === -1) currentCalculations.push(calc);
+            else currentCalculations[index] = calc;
+        });
+    } else if (type === 'deleted') {
+        const deleted = new Set(event.deleted);
+        currentCalculations = currentCalculations
+            .filter(calc => !deleted.has(calc.id))
+            .map(calc => ({
+                ...calc,
+                a_ref: deleted.has(calc.a_ref) ? null : calc.a_ref,
+                b_ref: deleted.has(calc.b_ref) ? null : calc.b_ref
+            }));
+    } else {
+        // 'changed' (bulk update) or 'reset' (missed events): refetch
+        loadCalculations();
+        loadSummary();
+        return;
+    }
+    displayCalculations(currentCalculations);
+    loadSummary();
+}
+
+// Refetch after our own mutation, unless the live stream will deliver it
+function refreshAfterMutation() {
+    if (liveUpdates) return;
+    loadCalculations();
+    loadSummary();
+}
+
 // Display calculations in a table
 function displayCalculations(calculations) {
+    currentCalculations = calculations;
     const container = document.getElementById('calculations-container');
     
     if (calculations.length === 0) {
@@ -395,8 +529,7 @@ async function handleAddCalculation(event) {
         
         // Reset form and reload calculations
         document.getElementById('add-calculation-form').reset();
-        loadCalculations();
-        loadSummary();
+        refreshAfterMutation();
         
     } catch (error) {
         console.error('Error creating calculation:', error);
@@ -540,8 +673,7 @@ async function handleEditCalculation(event) {
         
         // Close modal and reload calculations
         document.getElementById('edit-modal').style.display = 'none';
-        loadCalculations();
-        loadSummary();
+        refreshAfterMutation();
         
     } catch (error) {
         console.error('Error updating calculation:', error);
@@ -572,8 +704,7 @@ async function deleteCalculation(calcId) {
         }
         
         showMessage('Calculation deleted successfully!', 'success');
-        loadCalculations();
-        loadSummary();
+        refreshAfterMutation();
         
     } catch (error) {
         console.error('Error deleting calculation:', error);
@@ -0,0 +1,193 @@
+"""
+Unit tests for streaming aggregate accumulators.
+"""
+import asyncio
+import math
+import statistics
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from app.aggregates import (
+    OperandCompressor,
+    aggregate,
+    decompress_operands,
+    finalize,
+    make_accumulator,
+    parse_binary_stream,
+    parse_text_stream,
+)
+from app.schemas import CalculationCreate, OperationType
+
+
+async def _chunks(parts):
+    for part in parts:
+        yield part
+
+
+def _collect(stream):
+    async def run():
+        return [chunk async for chunk in stream]
+    return np.concatenate(asyncio.run(run()))
+
+
+class TestAccumulators:
+    """Test suite for online aggregate algorithms."""
+
+    def test_sum_is_compensated(self):
+        """Test that the compensated sum does not lose small terms."""
+        values = [1e16, 1.0, -1e16] * 1000
+        assert aggregate("Sum", values) == 1000.0
+        accumulator = make_accumulator("Sum")
+        for value in values:
+            accumulator.update(value)
+        assert finalize(accumulator) == 1000.0
+
+    def test_mean_and_variance_match_statistics(self):
+        """Test Welford results against the statistics module, chunked and one by one."""
+        values = [1e9 + x for x in (4.0, 7.0, 13.0, 16.0)]
+        assert aggregate("Mean", values) == pytest.approx(statistics.mean(values))
+        assert aggregate("Variance", values) == pytest.approx(statistics.variance(values))
+
+        accumulator = make_accumulator("Variance")
+        accumulator.update_many(values[:1])
+        accumulator.update_many(values[1:])
+        assert finalize(accumulator) == pytest.approx(statistics.variance(values))
+
+    def test_min_max(self):
+        """Test running extremes."""
+        assert aggregate("Min", [3.0, -2.0, 5.0]) == -2.0
+        assert aggregate("Max", [3.0, -2.0, 5.0]) == 5.0
+
+    def test_percentile_small_inputs_are_exact(self):
+        """Test that fewer than five values use exact interpolation."""
+        assert aggregate("Percentile", [1.0, 2.0, 3.0, 4.0], 50) == 2.5
+
+    def test_percentile_estimate(self):
+        """Test that the streamed P-squared estimate is close on a large sample."""
+        values = np.random.default_rng(7).normal(size=20_000)
+        accumulator = make_accumulator("Percentile", 90)
+        accumulator.update_many(values)
+        assert finalize(accumulator) == pytest.approx(np.percentile(values, 90), abs=0.05)
+
+    @pytest.mark.parametrize("percentile,extreme", [(0, np.min), (100, np.max)])
+    def test_streamed_percentile_extremes_are_exact(self, percentile, extreme):
+        """Test that p=0 and p=100 stream to the minimum and maximum."""
+        values = np.random.default_rng(3).normal(size=1_000)
+        accumulator = make_accumulator("Percentile", percentile)
+        accumulator.update_many(values)
+        assert finalize(accumulator) == extreme(values)
+
+    def test_in_memory_percentile_is_exact(self):
+        """Test that aggregate() interpolates exactly over an operand list."""
+        values = np.random.default_rng(11).exponential(size=1_000)
+        assert aggregate("Percentile", values, 37.5) == np.percentile(values, 37.5)
+
+    def test_variance_needs_two_operands(self):
+        """Test that sample variance of one value is rejected."""
+        with pytest.raises(ValueError, match="At least 2"):
+            aggregate("Variance", [1.0])
+
+    def test_rejects_non_finite(self):
+        """Test that NaN and infinity are rejected."""
+        with pytest.raises(ValueError, match="finite"):
+            aggregate("Sum", [1.0, math.inf])
+
+    def test_sum_overflow(self):
+        """Test that overflowing results are rejected."""
+        with pytest.raises(ValueError, match="out of range"):
+            aggregate("Sum", [1.7e308, 1.7e308])
+
+    def test_mean_of_near_max_floats(self):
+        """Test that the mean does not overflow when the sum of its operands would."""
+        big = 1.7e308
+        assert aggregate("Mean", [big, big, big]) == big
+        assert aggregate("Mean", [big, -big, big]) == pytest.approx(big / 3)
+
+        chunked, scalar = make_accumulator("Mean"), make_accumulator("Mean")
+        chunked.update_many([-big])
+        chunked.update_many([big, big])
+        for value in (-big, big, big):
+            scalar.update(value)
+        assert finalize(chunked) == pytest.approx(big / 3)
+        assert finalize(scalar) == pytest.approx(big / 3)
+        with pytest.raises(ValueError, match="out of range"):
+            aggregate("Variance", [big, -big])
+
+    def test_unknown_type(self):
+        """Test that non-aggregate types are rejected."""
+        with pytest.raises(ValueError):
+            make_accumulator("Add")
+
+
+class TestStreamParsing:
+    """Test suite for incremental request body parsing."""
+
+    def test_text_tokens_split_across_chunks(self):
+        """Test that numbers split over chunk boundaries are reassembled."""
+        values = _collect(parse_text_stream(_chunks([b"1.5, 2", b"5 3\n", b"-4e", b"1;7"])))
+        assert values.tolist() == [1.5, 25.0, 3.0, -40.0, 7.0]
+
+    def test_text_rejects_garbage(self):
+        """Test that non-numeric tokens are rejected."""
+        with pytest.raises(ValueError, match="numbers"):
+            _collect(parse_text_stream(_chunks([b"1, two"])))
+
+    def test_text_rejects_overlong_tokens(self):
+        """Test that a body without separators fails instead of buffering forever."""
+        with pytest.raises(ValueError, match="at most 64"):
+            _collect(parse_text_stream(_chunks([b"1" * 40, b"2" * 40, b"3" * 40])))
+        with pytest.raises(ValueError, match="at most 64"):
+            _collect(parse_text_stream(_chunks([b"1" * 65 + b",2"])))
+
+    def test_binary_values_split_across_chunks(self):
+        """Test that float64 values split over chunk boundaries are reassembled."""
+        data = np.array([1.0, 2.0, 3.0], dtype="<f8").tobytes()
+        values = _collect(parse_binary_stream(_chunks([data[:5], data[5:19], data[19:]])))
+        assert values.tolist() == [1.0, 2.0, 3.0]
+
+    def test_binary_rejects_partial_value(self):
+        """Test that a trailing partial float64 is rejected."""
+        with pytest.raises(ValueError, match="multiple of 8"):
+            _collect(parse_binary_stream(_chunks([b"\x00" * 9])))
+
+    def test_compression_round_trip(self):
+        """Test that incrementally compressed operands decompress intact."""
+        compressor = OperandCompressor()
+        compressor.write(np.arange(1000, dtype=float))
+        compressor.write(np.array([0.5]))
+        restored = decompress_operands(compressor.finish())
+        assert restored.tolist() == [*range(1000), 0.5]
+
+
+class TestAggregateSchema:
+    """Test suite for aggregate calculation validation."""
+
+    def test_valid_aggregate(self):
+        """Test that an operand list is accepted without a and b."""
+        calc = CalculationCreate(type="Mean", operands=[1, 2, 3])
+        assert calc.type == OperationType.MEAN
+        assert calc.a is None
+
+    def test_requires_operands(self):
+        """Test that aggregates need an operand list."""
+        with pytest.raises(ValidationError):
+            CalculationCreate(type="Sum")
+
+    def test_rejects_binary_operands(self):
+        """Test that aggregates cannot also take a and b."""
+        with pytest.raises(ValidationError):
+            CalculationCreate(type="Sum", operands=[1.0], a=1.0)
+
+    def test_percentile_required(self):
+        """Test that Percentile requires a percentile in range."""
+        with pytest.raises(ValidationError):
+            CalculationCreate(type="Percentile", operands=[1.0])
+        with pytest.raises(ValidationError):
+            CalculationCreate(type="Percentile", operands=[1.0], percentile=101)
+
+    def test_operands_only_for_aggregates(self):
+        """Test that binary operations reject operand lists."""
+        with pytest.raises(ValidationError):
+            CalculationCreate(type="Add", a=1.0, b=2.0, operands=[1.0])
@@ -0,0 +1,102 @@
+"""
+Unit tests for the static asset build and precompressed serving.
+"""
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import assets
+from app.assets import IMMUTABLE_CACHE_CONTROL, PrecompressedStaticFiles, build, load_manifest
+
+SCRIPT = "function greet() { return 'hello'; }\n" * 40
+STYLE = "body { color: #333; margin: 0 auto; }\n" * 40
+
+
+@pytest.fixture
+def built(tmp_path, monkeypatch):
+    monkeypatch.setattr(assets, "brotli", None)
+    source = tmp_path / "static"
+    (source / "js").mkdir(parents=True)
+    (source / "css").mkdir()
+    (source / "js" / "app.js").write_text(SCRIPT)
+    (source / "css" / "style.css").write_text(STYLE)
+    (source / "index.html").write_text(
+        '<link href="/static/css/style.css"><script src="/static/js/app.js"></script>' + " " * 300
+    )
+    output = tmp_path / "static" / "dist"
+    report = build(str(source), str(output))
+    return output, report
+
+
+@pytest.fixture
+def client(built):
+    output, _ = built
+    app = FastAPI()
+    app.mount("/static", PrecompressedStaticFiles(directory=str(output)), name="static")
+    return TestClient(app)
+
+
+class TestBuild:
+    """Test the asset build step."""
+
+    def test_manifest_and_hashed_copies(self, built):
+        output, report = built
+        manifest = load_manifest(str(output))
+        assert set(manifest) == {"js/app.js", "css/style.css"}
+        hashed = manifest["js/app.js"]
+        assert hashed.startswith("js/app.") and hashed.endswith(".js") and hashed != "js/app.js"
+        assert (output / hashed).read_text() == SCRIPT
+        assert "dist/manifest.json" not in report
+
+    def test_html_references_rewritten(self, built):
+        output, _ = built
+        manifest = load_manifest(str(output))
+        html = (output / "index.html").read_text()
+        assert f'/static/{manifest["css/style.css"]}' in html
+        assert "/static/js/app.js" not in html
+
+    def test_precompressed_siblings(self, built):
+        output, report = built
+        assert gzip.decompress((output / "js" / "app.js.gz").read_bytes()).decode() == SCRIPT
+        assert report["js/app.js"][".gz"] < report["js/app.js"][""]
+
+    def test_rebuild_is_reproducible(self, built, tmp_path):
+        output, _ = built
+        first = (output / "js" / "app.js.gz").read_bytes()
+        build(str(tmp_path / "static"), str(output))
+        assert (output / "js" / "app.js.gz").read_bytes() == first
+
+    def test_missing_manifest(self, tmp_path):
+        assert load_manifest(str(tmp_path)) is None
+
+
+class TestPrecompressedStaticFiles:
+    """Test serving of built assets."""
+
+    def test_hashed_asset_immutable_and_gzipped(self, client, built):
+        output, _ = built
+        hashed = json.loads((output / "manifest.json").read_text())["js/app.js"]
+        response = client.get(f"/static/{hashed}", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert "javascript" in response.headers["content-type"]
+        assert response.text == SCRIPT
+
+    def test_html_revalidated(self, client):
+        response = client.get("/static/index.html", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["cache-control"] == "no-cache"
+        assert response.headers["content-type"].startswith("text/html")
+        cached = client.get("/static/index.html", headers={
+            "Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"],
+        })
+        assert cached.status_code == 304
+
+    def test_identity_when_not_accepted(self, client):
+        response = client.get("/static/js/app.js", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
+        assert response.text == SCRIPT
@@ -0,0 +1,119 @@
+"""
+Unit tests for batch sub-request validation and dispatch.
+"""
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+
+from app.batch import dispatch, is_read_only, run_batch
+from app.database import shared_session
+from app.schemas import BatchRequest, BatchSubRequest, MAX_BATCH_REQUESTS
+from app.security import authenticated_username
+
+
+async def echo(request):
+    return JSONResponse({
+        "method": request.method,
+        "path": request.url.path,
+        "query": dict(request.query_params),
+        "authorization": request.headers.get("authorization"),
+        "if_none_match": request.headers.get("if-none-match"),
+        "body": (await request.json()) if request.method != "GET" else None,
+        "username": authenticated_username.get(),
+        "shared": shared_session.get() is not None,
+    })
+
+
+async def text(request):
+    return PlainTextResponse("hello")
+
+
+async def binary(request):
+    return Response(b"\x00\x01", media_type="application/octet-stream")
+
+
+async def crash(request):
+    raise RuntimeError("boom")
+
+
+test_app = Starlette(routes=[
+    Route("/echo", echo, methods=["GET", "POST"]),
+    Route("/text", text),
+    Route("/binary", binary),
+    Route("/crash", crash),
+])
+
+
+def run(sub, authorization=b"Bearer token"):
+    return asyncio.run(dispatch(test_app, {"type": "http"}, BatchSubRequest(**sub), authorization))
+
+
+class TestBatchSchemas:
+    """Test suite for sub-request validation."""
+
+    def test_defaults(self):
+        sub = BatchSubRequest(path="/users/me")
+        assert sub.method == "GET" and sub.headers == {} and sub.body is None
+
+    @pytest.mark.parametrize("path", ["users/me", "//evil.example/users", "http://evil.example/", "/batch", "/batch/?x=1"])
+    def test_rejected_paths(self, path):
+        with pytest.raises(ValidationError):
+            BatchSubRequest(path=path)
+
+    def test_headers_lowercased_and_whitelisted(self):
+        assert BatchSubRequest(path="/x", headers={"If-None-Match": '"a"'}).headers == {"if-none-match": '"a"'}
+        with pytest.raises(ValidationError, match="authorization"):
+            BatchSubRequest(path="/x", headers={"Authorization": "Bearer other"})
+
+    def test_method_and_size_limits(self):
+        with pytest.raises(ValidationError):
+            BatchSubRequest(path="/x", method="OPTIONS")
+        with pytest.raises(ValidationError):
+            BatchRequest(requests=[])
+        with pytest.raises(ValidationError):
+            BatchRequest(requests=[{"path": "/x"}] * (MAX_BATCH_REQUESTS + 1))
+
+    def test_is_read_only(self):
+        assert is_read_only([BatchSubRequest(path="/a"), BatchSubRequest(path="/b")])
+        assert not is_read_only([BatchSubRequest(path="/a"), BatchSubRequest(path="/b", method="DELETE")])
+
+
+class TestDispatch:
+    """Test suite for in-process dispatch."""
+
+    def test_get_with_query_and_headers(self):
+        item = run({"id": "1", "path": "/echo?limit=5", "headers": {"if-none-match": '"v1"'}})
+        assert item["id"] == "1" and item["status"] == 200
+        assert item["headers"]["content-type"] == "application/json"
+        assert item["body"]["query"] == {"limit": "5"}
+        assert item["body"]["authorization"] == "Bearer token"
+        assert item["body"]["if_none_match"] == '"v1"'
+
+    def test_post_body(self):
+        item = run({"method": "POST", "path": "/echo", "body": {"a": 1}})
+        assert item["body"]["method"] == "POST" and item["body"]["body"] == {"a": 1}
+
+    def test_non_json_bodies(self):
+        assert run({"path": "/text"})["body"] == "hello"
+        binary = run({"path": "/binary"})
+        assert binary["body"] == "AAE="
+        assert binary["headers"]["content-transfer-encoding"] == "base64"
+
+    def test_unknown_route_and_crash(self):
+        assert run({"path": "/missing"})["status"] == 404
+        assert run({"path": "/crash"})["status"] == 500
+
+    def test_run_batch_shares_session_and_identity(self):
+        db = Session(bind=create_engine("sqlite://"))
+        requests = [BatchSubRequest(path="/echo"), BatchSubRequest(path="/echo")]
+        responses = asyncio.run(run_batch(test_app, {"type": "http"}, requests, db, "alice", b"Bearer token"))
+        assert [item["body"]["username"] for item in responses] == ["alice", "alice"]
+        assert all(item["body"]["shared"] for item in responses)
+        assert shared_session.get() is None and authenticated_username.get() is None
+        db.close()
@@ -0,0 +1,161 @@
+"""
+Unit tests for the MessagePack and CBOR codecs and Accept negotiation.
+"""
+import struct
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from app.binary import CBOR, FORMATS, MSGPACK, media_type, negotiate
+from app.queries import CalculationRecord, record_type
+
+msgpack = FORMATS[MSGPACK]
+cbor = FORMATS[CBOR]
+
+
+def make_record(**fields):
+    row = dict(id=uuid.uuid4(), a=1.5, b=2.0, type="Add", expression=None, a_ref=None, b_ref=uuid.uuid4(),
+               result=3.5, user_id=uuid.uuid4(), created_at=datetime(2024, 1, 2, 3, 4, 5, 678901))
+    row.update(fields)
+    return CalculationRecord(**row)
+
+
+class TestMessagePack:
+    """Test suite for the MessagePack codec."""
+
+    @pytest.mark.parametrize("value, encoded", [
+        (None, b"\xc0"), (True, b"\xc3"), (False, b"\xc2"),
+        (5, b"\x05"), (-1, b"\xff"), (200, b"\xcc\xc8"), (-200, b"\xd1\xff\x38"),
+        (1.5, b"\xcb\x3f\xf8\x00\x00\x00\x00\x00\x00"),
+        ("abc", b"\xa3abc"), (b"\x01", b"\xc4\x01\x01"),
+        ([1, 2], b"\x92\x01\x02"), ({"a": 1}, b"\x81\xa1a\x01"),
+    ])
+    def test_spec_encodings(self, value, encoded):
+        assert msgpack.dumps(value) == encoded
+        assert msgpack.loads(encoded) == value
+
+    def test_uuid_is_sixteen_raw_bytes(self):
+        value = uuid.uuid4()
+        assert msgpack.dumps(value) == b"\xc4\x10" + value.bytes
+
+    def test_timestamps(self):
+        moment = datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc)
+        encoded = msgpack.dumps(moment)
+        assert encoded[:2] == b"\xd7\xff"
+        assert msgpack.loads(encoded) == moment
+        # Naive datetimes are UTC; dates before 1970 need the 96-bit form
+        assert msgpack.loads(msgpack.dumps(datetime(1960, 5, 1))) == datetime(1960, 5, 1, tzinfo=timezone.utc)
+
+    def test_records_round_trip(self):
+        record = make_record()
+        decoded = msgpack.loads(msgpack.dumps([record, record]))
+        assert len(decoded) == 2
+        assert decoded[0]["id"] == record.id.bytes and decoded[0]["b_ref"] == record.b_ref.bytes
+        assert decoded[0]["a_ref"] is None and decoded[0]["result"] == 3.5
+        assert decoded[0]["created_at"] == record.created_at.replace(tzinfo=timezone.utc)
+
+    def test_sparse_records_and_stream(self):
+        sparse = record_type(("id", "result"))(uuid.uuid4(), 4.0)
+        assert msgpack.loads(msgpack.dumps([sparse])) == [{"id": sparse.id.bytes, "result": 4.0}]
+        streamed = b"".join(msgpack.stream([[sparse], [], [sparse]]))
+        assert len(list(msgpack.iter_loads(streamed))) == 2
+
+    def test_large_containers(self):
+        values = list(range(70000))
+        assert msgpack.loads(msgpack.dumps(values)) == values
+        mapping = {f"k{i}": "x" * 300 for i in range(20)}
+        assert msgpack.loads(msgpack.dumps(mapping)) == mapping
+
+
+class TestCBOR:
+    """Test suite for the CBOR codec (RFC 8949 Appendix A vectors)."""
+
+    @pytest.mark.parametrize("value, encoded", [
+        (0, b"\x00"), (23, b"\x17"), (24, b"\x18\x18"), (1000, b"\x19\x03\xe8"), (-1000, b"\x39\x03\xe7"),
+        (1.1, b"\xfb\x3f\xf1\x99\x99\x99\x99\x99\x9a"), (None, b"\xf6"), (True, b"\xf5"),
+        ("IETF", b"\x64IETF"), ([1, [2, 3]], b"\x82\x01\x82\x02\x03"), ({"a": 1}, b"\xa1\x61a\x01"),
+    ])
+    def test_spec_encodings(self, value, encoded):
+        assert cbor.dumps(value) == encoded
+        assert cbor.loads(encoded) == value
+
+    def test_decodes_other_float_widths_and_indefinite_lengths(self):
+        assert cbor.loads(b"\xf9\x3c\x00") == 1.0
+        assert cbor.loads(b"\xfa\x47\xc3\x50\x00") == 100000.0
+        assert cbor.loads(b"\x9f\x01\x82\x02\x03\xff") == [1, [2, 3]]
+        assert cbor.loads(b"\xbf\x61a\x01\xff") == {"a": 1}
+        assert cbor.loads(b"\x7f\x62ab\x61c\xff") == "abc"
+
+    def test_uuid_and_timestamp_tags(self):
+        value = uuid.uuid4()
+        assert cbor.dumps(value) == b"\xd8\x25\x50" + value.bytes
+        assert cbor.loads(cbor.dumps(value)) == value
+        assert cbor.loads(b"\xc1\x1a\x51\x4b\x67\xb0") == datetime(2013, 3, 21, 20, 4, tzinfo=timezone.utc)
+        moment = datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc)
+        assert cbor.loads(cbor.dumps(moment)) == moment
+
+    def test_export_stream_is_one_indefinite_array(self):
+        record = make_record()
+        streamed = b"".join(cbor.stream([[record], [record]]))
+        assert streamed[:1] == b"\x9f" and streamed[-1:] == b"\xff"
+        decoded = cbor.loads(streamed)
+        assert [item["id"] for item in decoded] == [record.id, record.id]
+
+
+class TestMalformedInput:
+    """Both decoders reject bad uploads with ValueError."""
+
+    @pytest.mark.parametrize("fmt", [msgpack, cbor], ids=["msgpack", "cbor"])
+    def test_truncated_trailing_and_oversized(self, fmt):
+        encoded = fmt.dumps([1.5, "abc"])
+        with pytest.raises(ValueError):
+            fmt.loads(encoded[:-1])
+        with pytest.raises(ValueError):
+            fmt.loads(encoded + b"\x00")
+        with pytest.raises(ValueError):
+            fmt.loads(fmt.dumps([0] * 20)[:3])
+
+    def test_depth_limit(self):
+        with pytest.raises(ValueError, match="deep"):
+            msgpack.loads(b"\x91" * 100 + b"\x00")
+        with pytest.raises(ValueError, match="deep"):
+            cbor.loads(b"\x81" * 100 + b"\x00")
+
+    def test_invalid_markers(self):
+        with pytest.raises(ValueError):
+            msgpack.loads(b"\xc1")
+        with pytest.raises(ValueError):
+            cbor.loads(b"\xff")
+        with pytest.raises(ValueError):
+            cbor.loads(b"\xd8\x25\x41\x00")
+
+    def test_out_of_range_timestamps(self):
+        # 2**62 seconds is far past datetime.max
+        with pytest.raises(ValueError):
+            msgpack.loads(b"\xc7\x0c\xff" + struct.pack(">Iq", 0, 2 ** 62))
+        with pytest.raises(ValueError):
+            cbor.loads(b"\xc1\x1b" + struct.pack(">Q", 2 ** 63))
+
+    def test_unencodable(self):
+        with pytest.raises(TypeError):
+            msgpack.dumps(object())
+
+
+class TestNegotiation:
+    """Test suite for Accept negotiation."""
+
+    @pytest.mark.parametrize("accept, expected", [
+        (None, None), ("", None), ("*/*", None), ("application/json", None),
+        ("application/msgpack", MSGPACK), ("application/x-msgpack", MSGPACK), ("application/cbor", CBOR),
+        ("application/json, application/cbor;q=0.9", None),
+        ("application/cbor, application/json;q=0.5", CBOR),
+        ("application/msgpack;q=0.5, */*;q=0.5", None),
+    ])
+    def test_negotiate(self, accept, expected):
+        fmt = negotiate(accept)
+        assert (fmt.media_type if fmt else None) == expected
+
+    def test_media_type(self):
+        assert media_type(None) == "application/json"
+        assert media_type("Application/MsgPack; charset=binary") == MSGPACK
@@ -0,0 +1,231 @@
+"""
+Unit tests for the pluggable cache backends.
+"""
+import fnmatch
+import os
+import socketserver
+import threading
+import time
+
+import pytest
+
+from app import cache_backends
+from app.cache_backends import MemoryBackend, RedisBackend, SharedMemoryBackend, instance_name, make_backend
+
+
+class RESPStandIn(socketserver.ThreadingTCPServer):
+    """A tiny in-memory server speaking the Redis protocol subset the backend uses."""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), RESPHandler)
+        self.data = {}
+        self.malformed = False
+
+
+class RESPHandler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        header = self.rfile.readline()
+        if not header:
+            return None
+        args = []
+        for _ in range(int(header[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def bulk(self, value):
+        return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def handle(self):
+        data = self.server.data
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            command = args[0].upper()
+            if self.server.malformed:
+                reply = b"$oops\r\n"
+            elif command == b"GET":
+                entry = data.get(args[1])
+                if entry is not None and entry[1] <= time.monotonic():
+                    del data[args[1]]
+                    entry = None
+                reply = self.bulk(entry[0] if entry else None)
+            elif command == b"SET":
+                data[args[1]] = (args[2], time.monotonic() + int(args[4]) / 1000)
+                reply = b"+OK\r\n"
+            elif command == b"DEL":
+                reply = b":%d\r\n" % sum(data.pop(key, None) is not None for key in args[1:])
+            elif command == b"SCAN":
+                pattern = args[3].decode()
+                keys = [key for key in data if fnmatch.fnmatchcase(key.decode(), pattern)]
+                reply = b"*2\r\n" + self.bulk(b"0") + b"*%d\r\n" % len(keys) + b"".join(map(self.bulk, keys))
+            else:
+                reply = b"-ERR unknown command\r\n"
+            self.wfile.write(reply)
+
+
+@pytest.fixture
+def resp_server():
+    server = RESPStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=["memory", "mmap", "redis"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        store = MemoryBackend(maxsize=100)
+    elif request.param == "mmap":
+        store = SharedMemoryBackend(str(tmp_path / "cache.mmap"), slots=128, slot_size=256)
+    else:
+        server = request.getfixturevalue("resp_server")
+        store = RedisBackend(f"redis://127.0.0.1:{server.server_address[1]}/0", prefix="test:")
+    yield store
+    store.close()
+
+
+class TestBackendContract:
+    """Behaviour every backend must share."""
+
+    def test_set_get_delete(self, backend):
+        assert backend.get("k") is None
+        backend.set("k", b"value", 60)
+        assert backend.get("k") == b"value"
+        backend.set("k", b"newer", 60)
+        assert backend.get("k") == b"newer"
+        backend.delete("k", "missing")
+        assert backend.get("k") is None
+
+    def test_expiry(self, backend):
+        backend.set("short", b"x", 0.05)
+        backend.set("long", b"y", 60)
+        time.sleep(0.1)
+        assert backend.get("short") is None
+        assert backend.get("long") == b"y"
+
+    def test_clear(self, backend):
+        for i in range(3):
+            backend.set(f"k{i}", b"v", 60)
+        assert backend.clear() == 3
+        assert backend.get("k0") is None
+
+
+class TestSharedMemoryBackend:
+    """Tests specific to the mmap backend."""
+
+    def test_visible_across_mappings(self, tmp_path):
+        path = str(tmp_path / "cache.mmap")
+        first = SharedMemoryBackend(path, slots=16)
+        second = SharedMemoryBackend(path, slots=16)
+        first.set("k", b"shared", 60)
+        assert second.get("k") == b"shared"
+        second.delete("k")
+        assert first.get("k") is None
+
+    def test_refuses_files_others_can_reach(self, tmp_path):
+        exposed = tmp_path / "exposed.mmap"
+        exposed.touch()
+        exposed.chmod(0o666)
+        with pytest.raises(PermissionError):
+            SharedMemoryBackend(str(exposed), slots=16)
+        link = tmp_path / "link.mmap"
+        link.symlink_to(tmp_path / "target.mmap")
+        with pytest.raises(OSError):
+            SharedMemoryBackend(str(link), slots=16)
+        assert not (tmp_path / "target.mmap").exists()
+
+    def test_oversize_values_not_cached(self, tmp_path):
+        store = SharedMemoryBackend(str(tmp_path / "cache.mmap"), slots=16, slot_size=64)
+        store.set("k", b"small", 60)
+        store.set("k", b"x" * 100, 60)
+        assert store.get("k") is None
+        assert store.stats()["oversize"] == 1
+
+    def test_collision_replaces_occupant(self, tmp_path):
+        store = SharedMemoryBackend(str(tmp_path / "cache.mmap"), slots=1)
+        store.set("a", b"1", 60)
+        store.set("b", b"2", 60)
+        assert store.get("a") is None
+        assert store.get("b") == b"2"
+        assert store.stats()["evictions"] == 1
+
+
+class TestRedisBackend:
+    """Tests specific to the RESP backend."""
+
+    def test_encode(self):
+        assert RedisBackend.encode("GET", "k") == b"*2\r\n$3\r\nGET\r\n$1\r\nk\r\n"
+
+    def test_keys_are_prefixed(self, resp_server):
+        store = RedisBackend(f"redis://127.0.0.1:{resp_server.server_address[1]}", prefix="calchub:user:")
+        store.set("id:1", b"v", 60)
+        assert list(resp_server.data) == [b"calchub:user:id:1"]
+        store.close()
+
+    def test_unreachable_server_is_a_miss(self, resp_server):
+        port = resp_server.server_address[1]
+        resp_server.shutdown()
+        resp_server.server_close()
+        store = RedisBackend(f"redis://127.0.0.1:{port}", timeout=0.2)
+        assert store.get("k") is None
+        store.set("k", b"v", 60)
+        assert store.stats()["errors"] == 2
+
+    def test_malformed_reply_is_a_miss(self, resp_server):
+        store = RedisBackend(f"redis://127.0.0.1:{resp_server.server_address[1]}")
+        store.set("k", b"v", 60)
+        resp_server.malformed = True
+        assert store.get("k") is None
+        assert store.stats()["errors"] == 1
+        resp_server.malformed = False
+        assert store.get("k") == b"v"
+        store.close()
+
+
+class TestMakeBackend:
+    """Test backend selection from CACHE_BACKEND values."""
+
+    def test_specs(self, tmp_path):
+        assert isinstance(make_backend("memory", "user", 10), MemoryBackend)
+        mapped = make_backend(f"mmap://{tmp_path}/users.mmap", "user", 10)
+        assert isinstance(mapped, SharedMemoryBackend) and mapped.path.endswith("users.mmap")
+        mapped.close()
+        remote = make_backend("redis://cache:6380/2", "user", 10)
+        assert (remote.host, remote.port, remote.db, remote.prefix) == ("cache", 6380, 2, "calchub:user:")
+
+    def test_default_mmap_path(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(cache_backends.tempfile, "gettempdir", lambda: str(tmp_path))
+        mapped = make_backend("mmap", "user", 10)
+        assert mapped.path == str(tmp_path / f"calchub-{os.getuid()}" / "user-cache.mmap")
+        assert os.stat(tmp_path / f"calchub-{os.getuid()}").st_mode & 0o777 == 0o700
+        mapped.close()
+
+    def test_default_mmap_path_is_per_instance(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(cache_backends.tempfile, "gettempdir", lambda: str(tmp_path))
+        first = make_backend("mmap", "user", 10, instance_name("postgresql://db-a/app"))
+        second = make_backend("mmap", "user", 10, instance_name("postgresql://db-b/app"))
+        assert first.path != second.path
+        first.set("k", b"v", 60)
+        assert second.get("k") is None
+        first.close()
+        second.close()
+        monkeypatch.setattr(cache_backends, "CACHE_INSTANCE", "blue")
+        assert instance_name("postgresql://db-a/app") == "blue"
+
+    def test_default_directory_must_be_private(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(cache_backends.tempfile, "gettempdir", lambda: str(tmp_path))
+        shared = tmp_path / f"calchub-{os.getuid()}"
+        shared.mkdir()
+        shared.chmod(0o777)
+        with pytest.raises(PermissionError):
+            make_backend("mmap", "user", 10)
+
+    def test_unknown_spec(self):
+        with pytest.raises(ValueError):
+            make_backend("memcached://x", "user", 10)
@@ -1,6 +1,7 @@
 """
 Unit tests for calculation schemas, factory pattern, and operations.
 """
+import asyncio
 import pytest
 import sys
 import os
@@ -11,7 +12,14 @@ from uuid import UUID, uuid4
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.schemas import CalculationCreate, CalculationRead, OperationType
+from importlib.metadata import EntryPoint
+
+import app.factory as factory_module
+from app import executor
 from app.factory import (
+    BUILTIN_OPERATIONS,
+    OperationRegistry,
+    registry,
     CalculationFactory,
     AddOperation,
     SubtractOperation,
@@ -19,6 +27,7 @@ from app.factory import (
     DivideOperation,
     PowerOperation,
     ModuloOperation,
+    ExpressionOperation,
     Operation
 )
 
@@ -138,6 +147,26 @@ class TestCalculationCreateSchema:
         with pytest.raises(ValidationError):
             CalculationCreate(a=10.0)  # Missing b and type
     
+    def test_expression_requires_expression_text(self):
+        """Test that Expression calculations must include an expression."""
+        with pytest.raises(ValidationError):
+            CalculationCreate(a=1.0, b=2.0, type=OperationType.EXPRESSION)
+
+    def test_expression_is_normalized(self):
+        """Test that expressions are validated and normalized."""
+        calc = CalculationCreate(a=1.0, b=2.0, type=OperationType.EXPRESSION, expression="(a)+b*2")
+        assert calc.expression == "a + b * 2"
+
+    def test_expression_rejected_for_other_operations(self):
+        """Test that expression is rejected for non-Expression types."""
+        with pytest.raises(ValidationError):
+            CalculationCreate(a=1.0, b=2.0, type=OperationType.ADD, expression="a + b")
+
+    def test_invalid_expression_rejected(self):
+        """Test that expressions outside the grammar are rejected."""
+        with pytest.raises(ValidationError):
+            CalculationCreate(a=1.0, b=2.0, type=OperationType.EXPRESSION, expression="__import__('os')")
+    
     def test_negative_numbers(self):
         """Test calculations with negative numbers."""
         calc = CalculationCreate(a=-10.5, b=5.5, type=OperationType.ADD)
@@ -295,6 +324,29 @@ class TestPowerOperation:
         op = PowerOperation()
         assert op.calculate(5.0, 0.0) == 1.0
 
+    def test_power_overflow_raises_value_error(self):
+        op = PowerOperation()
+        with pytest.raises(ValueError, match="too large"):
+            op.calculate(10.0, 400.0)
+
+    def test_power_negative_base_fractional_exponent(self):
+        op = PowerOperation()
+        with pytest.raises(ValueError, match="not a real number"):
+            op.calculate(-8.0, 0.5)
+
+    def test_power_negative_base_integer_exponent(self):
+        op = PowerOperation()
+        assert op.calculate(-2.0, 3.0) == -8.0
+
+    def test_power_zero_base_negative_exponent(self):
+        op = PowerOperation()
+        with pytest.raises(ValueError):
+            op.calculate(0.0, -1.0)
+
+    def test_power_underflow_is_zero(self):
+        op = PowerOperation()
+        assert op.calculate(10.0, -400.0) == 0.0
+
 
 class TestModuloOperation:
     """Test suite for ModuloOperation."""
@@ -343,6 +395,18 @@ class TestCalculationFactory:
         op = CalculationFactory.create_operation("Modulo")
         assert isinstance(op, ModuloOperation)
     
+    def test_create_expression_operation(self):
+        """Test factory creates ExpressionOperation with its expression."""
+        op = CalculationFactory.create_operation("Expression", expression="a * b + 1")
+        assert isinstance(op, ExpressionOperation)
+        assert op.calculate(2.0, 3.0) == 7.0
+
+    def test_expression_operation_requires_expression(self):
+        """Test ExpressionOperation without an expression raises ValueError."""
+        op = CalculationFactory.create_operation("Expression")
+        with pytest.raises(ValueError):
+            op.calculate(1.0, 2.0)
+    
     def test_unsupported_operation_raises_error(self):
         """Test that unsupported operation type raises ValueError."""
         with pytest.raises(ValueError) as exc_info:
@@ -359,7 +423,8 @@ class TestCalculationFactory:
         assert "Divide" in operations
         assert "Power" in operations
         assert "Modulo" in operations
-        assert len(operations) == 6
+        assert "Expression" in operations
+        assert len(operations) == 7
     
     def test_calculate_convenience_method_add(self):
         """Test calculate convenience method for addition."""
@@ -397,6 +462,94 @@ class TestCalculationFactory:
             CalculationFactory.calculate("Divide", 10.0, 0.0)
 
 
+class DoubleSumOperation(Operation):
+    """Plugin operation used to exercise entry point loading."""
+
+    def calculate(self, a: float, b: float) -> float:
+        return 2 * (a + b)
+
+
+class TestOperationRegistry:
+    """Test suite for the operation registry and dispatch tables."""
+
+    def test_instances_are_shared(self):
+        """Test that stateless operations are flyweight singletons."""
+        assert CalculationFactory.create_operation("Add") is CalculationFactory.create_operation("Add")
+        assert registry.scalar["Add"] == registry.get("Add").calculate
+
+    def test_dispatch_accepts_enum_members(self):
+        """Test that OperationType members dispatch like their string values."""
+        assert registry.calculate(OperationType.MULTIPLY, 3.0, 4.0) == 12.0
+
+    def test_unknown_operation_in_dispatch(self):
+        """Test that unknown names raise a descriptive ValueError."""
+        with pytest.raises(ValueError, match="Unsupported operation type"):
+            registry.calculate("SquareRoot", 1.0, 2.0)
+
+    @pytest.mark.parametrize("name", ["Add", "Subtract", "Multiply", "Divide", "Power", "Modulo"])
+    def test_vector_kernel_matches_scalar(self, name):
+        """Test that vectorized kernels agree with scalar kernels."""
+        a = [2.0, -3.0, 10.5, 7.0]
+        b = [3.0, 2.0, 4.0, -2.0]
+        expected = [registry.calculate(name, x, y) for x, y in zip(a, b)]
+        assert list(registry.calculate_many(name, a, b)) == pytest.approx(expected)
+
+    def test_vector_kernel_errors(self):
+        """Test that vectorized kernels raise ValueError for invalid elements."""
+        with pytest.raises(ValueError):
+            registry.calculate_many("Divide", [1.0, 2.0], [1.0, 0.0])
+        with pytest.raises(ValueError):
+            registry.calculate_many("Power", [10.0], [400.0])
+
+    def test_expression_dispatch(self):
+        """Test that expressions are passed through the dispatch tables."""
+        assert registry.calculate("Expression", 2.0, 3.0, "a * b") == 6.0
+        assert list(registry.calculate_many("Expression", [1.0, 2.0], [3.0, 4.0], "a + b")) == [4.0, 6.0]
+
+    def test_entry_point_plugin_loaded_lazily(self, monkeypatch):
+        """Test that plugins are discovered from entry points and imported on first use."""
+        entry_point = EntryPoint(
+            name="DoubleSum",
+            value="tests.test_calculations:DoubleSumOperation",
+            group=factory_module.ENTRY_POINT_GROUP,
+        )
+        monkeypatch.setattr(factory_module, "entry_points", lambda group: [entry_point])
+        plugin_registry = OperationRegistry(BUILTIN_OPERATIONS)
+
+        assert "DoubleSum" in plugin_registry.names()
+        assert "DoubleSum" not in plugin_registry.scalar
+        assert plugin_registry.calculate("DoubleSum", 1.0, 2.0) == 6.0
+        assert list(plugin_registry.calculate_many("DoubleSum", [1.0], [1.0])) == [4.0]
+
+    def test_plugins_cannot_shadow_builtins(self, monkeypatch):
+        """Test that an entry point cannot replace a built-in operation."""
+        entry_point = EntryPoint(
+            name="Add",
+            value="tests.test_calculations:DoubleSumOperation",
+            group=factory_module.ENTRY_POINT_GROUP,
+        )
+        monkeypatch.setattr(factory_module, "entry_points", lambda group: [entry_point])
+        plugin_registry = OperationRegistry(BUILTIN_OPERATIONS)
+        assert plugin_registry.calculate("Add", 1.0, 2.0) == 3.0
+
+    def test_operations_declare_caching_and_cost(self):
+        """Test that caching and pool dispatch are decided by each operation."""
+        assert not registry.is_cacheable("Add")
+        assert registry.is_cacheable("Power")
+        assert not registry.exceeds_inline_cost("Multiply")
+        assert registry.get("Expression").cost("a + b") < registry.get("Expression").cost("a ** b ** a ** b")
+
+    def test_expensive_calculation_runs_in_pool(self, monkeypatch):
+        """Test that calculations over the inline cost limit are evaluated in the process pool."""
+        monkeypatch.setattr(executor, "INLINE_COST_LIMIT", 0)
+        try:
+            assert registry.exceeds_inline_cost("Expression", "a * b")
+            assert asyncio.run(registry.calculate_bounded("Expression", 2.0, 3.0, "a * b")) == 6.0
+            assert asyncio.run(registry.calculate_bounded("Add", 2.0, 3.0)) == 5.0
+        finally:
+            executor.shutdown_pool()
+
+
 class TestFactoryIntegration:
     """Integration tests for factory with all operations."""
     
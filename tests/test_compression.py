@@ -0,0 +1,120 @@
+"""
+Unit tests for the response compression middleware.
+"""
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app import compression
+from app.compression import CompressionMiddleware, negotiate_encoding
+
+LARGE = {"rows": [{"id": i, "type": "Add", "result": i * 1.5} for i in range(200)]}
+
+
+def make_app(minimum_size=500) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=minimum_size)
+
+    @app.get("/large")
+    def large():
+        return LARGE
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/tagged")
+    def tagged():
+        return PlainTextResponse("x" * 1000, headers={"ETag": '"abc"'})
+
+    @app.get("/binary")
+    def binary():
+        return StreamingResponse(iter([b"\x00" * 2000]), media_type="application/octet-stream")
+
+    @app.get("/encoded")
+    def encoded():
+        return PlainTextResponse(gzip.compress(b"y" * 1000), headers={"Content-Encoding": "gzip"})
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((f"line {i}\n" * 50 for i in range(20)), media_type="text/plain")
+
+    return app
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Exercise the gzip path deterministically whether or not brotli is installed
+    monkeypatch.setattr(compression, "brotli", None)
+    return TestClient(make_app())
+
+
+class TestNegotiateEncoding:
+    """Test Accept-Encoding negotiation."""
+
+    @pytest.mark.parametrize("header, expected", [
+        ("gzip", "gzip"),
+        ("gzip, br", "br"),
+        ("br;q=0.5, gzip", "gzip"),
+        ("br;q=0, gzip;q=0", None),
+        ("*", "br"),
+        ("identity", None),
+        ("", None),
+        ("gzip;q=bogus, br", "br"),
+    ])
+    def test_negotiation(self, header, expected):
+        assert negotiate_encoding(header, ["br", "gzip"]) == expected
+
+    def test_unavailable_coding_not_chosen(self):
+        assert negotiate_encoding("br", ["gzip"]) is None
+
+
+class TestCompressionMiddleware:
+    """Test suite for CompressionMiddleware."""
+
+    def test_large_json_gzipped(self, client):
+        response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert int(response.headers["content-length"]) < len(json.dumps(LARGE))
+        assert response.json() == LARGE
+
+    def test_small_body_not_compressed(self, client):
+        response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+        assert response.json() == {"ok": True}
+
+    def test_identity_when_not_accepted(self, client):
+        response = client.get("/large", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
+
+    def test_etag_weakened(self, client):
+        response = client.get("/tagged", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["etag"] == 'W/"abc"'
+
+    def test_binary_and_encoded_pass_through(self, client):
+        binary = client.get("/binary", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in binary.headers
+        assert binary.content == b"\x00" * 2000
+
+        encoded = client.get("/encoded", headers={"Accept-Encoding": "gzip"})
+        assert encoded.text == "y" * 1000
+
+    def test_streaming_compressed_incrementally(self, client):
+        expected = "".join(f"line {i}\n" * 50 for i in range(20))
+        response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        assert response.text == expected
+
+    def test_brotli_preferred_when_installed(self):
+        pytest.importorskip("brotli")
+        response = TestClient(make_app()).get(
+            "/large", headers={"Accept-Encoding": "gzip, br"}
+        )
+        assert response.headers["content-encoding"] == "br"
+        assert response.json() == LARGE
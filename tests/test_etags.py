@@ -0,0 +1,96 @@
+"""
+Unit tests for per-user data versions and ETag matching.
+"""
+import uuid
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+from app import etags
+from app.database import Base
+from app.etags import bump_data_version, bump_data_versions, etag_matches, make_etag
+from app.models import User, UserDataVersion
+from app.queries import get_user_version
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def users(db):
+    users = [User(username=f"v{i}", email=f"v{i}@example.com", password_hash="x") for i in range(2)]
+    db.add_all(users)
+    db.commit()
+    return users
+
+
+def request_with(header=None) -> Request:
+    headers = [(b"if-none-match", header.encode())] if header is not None else []
+    return Request({"type": "http", "headers": headers})
+
+
+class TestDataVersions:
+    """Test suite for version bumps."""
+
+    def test_version_starts_at_zero(self, db, users):
+        """Test that users without mutations have version 0."""
+        assert get_user_version(db, "v0") == (users[0].id, 0)
+        assert get_user_version(db, "nobody") is None
+
+    def test_bump_creates_and_increments(self, db, users):
+        """Test that bumps upsert the version row."""
+        assert bump_data_version(db, users[0].id) == 1
+        assert bump_data_versions(db, [users[0].id, users[1].id, None]) == {users[0].id: 2, users[1].id: 1}
+        db.commit()
+        assert get_user_version(db, "v0")[1] == 2
+        assert get_user_version(db, "v1")[1] == 1
+
+    def test_generic_fallback(self, db, users, monkeypatch):
+        """Test the update-then-insert path used on other databases."""
+        monkeypatch.setattr(etags, "UPSERT_DIALECTS", {})
+        assert bump_data_version(db, users[0].id) == 1
+        assert bump_data_versions(db, [users[0].id, users[1].id]) == {users[0].id: 2, users[1].id: 1}
+        db.commit()
+        versions = {row.user_id: row.version for row in db.query(UserDataVersion)}
+        assert versions == {users[0].id: 2, users[1].id: 1}
+
+    def test_rollback_discards_bump(self, db, users):
+        """Test that a bump is part of the caller's transaction."""
+        bump_data_version(db, users[0].id)
+        db.rollback()
+        assert get_user_version(db, "v0")[1] == 0
+
+
+class TestEtags:
+    """Test suite for ETag construction and If-None-Match matching."""
+
+    def test_etag_is_strong_and_varies(self):
+        """Test that ETags are quoted and depend on every input."""
+        user_id = uuid.uuid4()
+        etag = make_etag("calculations", user_id, 1, 0, 100)
+        assert etag.startswith('"') and etag.endswith('"')
+        assert etag == make_etag("calculations", user_id, 1, 0, 100)
+        assert etag != make_etag("calculations", user_id, 2, 0, 100)
+        assert etag != make_etag("calculations", user_id, 1, 0, 50)
+        assert etag != make_etag("summary", user_id, 1)
+        assert etag != make_etag("calculations", uuid.uuid4(), 1, 0, 100)
+
+    @pytest.mark.parametrize("header,expected", [
+        (None, False),
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"xyz", "abc"', True),
+        ("*", True),
+        ('"xyz"', False),
+    ])
+    def test_if_none_match(self, header, expected):
+        """Test list, weak and wildcard If-None-Match values."""
+        assert etag_matches(request_with(header), '"abc"') is expected
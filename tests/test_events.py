@@ -0,0 +1,222 @@
+"""
+Unit tests for calculation change events and the SSE stream.
+"""
+import asyncio
+import json
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app import events
+from app.events import (
+    CHANGED, CREATED, DELETED, RESET, ChangeEvent, EventBus, make_event, record_change, stream_events
+)
+
+
+def make_calc(**fields):
+    row = dict(id=uuid.uuid4(), a=1.0, b=2.0, type="Add", expression=None, a_ref=None, b_ref=None,
+               result=3.0, user_id=None, created_at=datetime(2024, 1, 1))
+    row.update(fields)
+    return SimpleNamespace(**row)
+
+
+def change(user="u1", version=1, kind=CREATED):
+    return ChangeEvent(user, version, kind, json.dumps({"type": kind, "version": version}))
+
+
+async def collect(stream, count):
+    return [await stream.__anext__() for _ in range(count)]
+
+
+class TestChangeEvents:
+    """Test suite for event construction."""
+
+    def test_event_body(self):
+        user_id, calc = uuid.uuid4(), make_calc()
+        created = make_event(user_id, 4, CREATED, [calc])
+        body = json.loads(created.data)
+        assert (created.user_id, created.version, created.type) == (user_id.hex, 4, CREATED)
+        assert body["calculations"][0]["id"] == str(calc.id)
+        assert body["calculations"][0]["result"] == 3.0
+        assert json.loads(make_event(user_id, 5, DELETED, deleted=[calc.id]).data)["deleted"] == [str(calc.id)]
+
+    def test_key_round_trip_and_frame(self):
+        created = make_event(uuid.uuid4(), 2, CREATED, [make_calc()])
+        assert ChangeEvent.from_key(created.to_key()) == created
+        frame = created.frame().decode()
+        assert frame.startswith("id: 2\nevent: created\ndata: {")
+        assert frame.endswith("\n\n")
+
+    def test_oversized_event_downgraded(self):
+        calcs = [make_calc() for _ in range(200)]
+        downgraded = make_event(uuid.uuid4(), 3, CREATED, calcs)
+        assert downgraded.type == CHANGED
+        assert json.loads(downgraded.data)["calculations"] == []
+
+
+class TestRecordChange:
+    """Test suite for commit-bound publishing."""
+
+    @pytest.fixture
+    def bus(self, monkeypatch):
+        bus = EventBus()
+        monkeypatch.setattr(events, "event_bus", bus)
+        return bus
+
+    def test_published_on_commit_only(self, bus):
+        db = Session(bind=create_engine("sqlite://"))
+        record_change(db, change(version=1))
+        db.rollback()
+        record_change(db, change(version=2))
+        assert bus.published == 0
+        db.commit()
+        assert [item.version for item in bus.replay("u1", 1, 2)] == [2]
+        assert bus.published == 1
+        db.close()
+
+
+class TestEventBus:
+    """Test suite for EventBus."""
+
+    def test_delivers_to_user_subscribers(self):
+        bus = EventBus()
+
+        async def run():
+            mine, other = bus.subscribe("u1"), bus.subscribe("u2")
+            bus.publish(change("u1", 1))
+            await asyncio.sleep(0)
+            return mine.queue.qsize(), other.queue.qsize(), bus.stats()
+
+        mine, other, stats = asyncio.run(run())
+        assert (mine, other) == (1, 0)
+        assert stats["subscribers"] == 2 and stats["users"] == 2
+
+    def test_overflow_collapses_to_reset(self):
+        bus = EventBus(queue_size=2)
+
+        async def run():
+            subscriber = bus.subscribe("u1")
+            for version in range(1, 5):
+                bus.publish(change("u1", version))
+            await asyncio.sleep(0)
+            return [subscriber.queue.get_nowait() for _ in range(subscriber.queue.qsize())], subscriber
+
+        queued, subscriber = asyncio.run(run())
+        assert [(item.type, item.version) for item in queued] == [(RESET, 3), (CREATED, 4)]
+        assert subscriber.overflows == 1
+
+    def test_replay_requires_contiguous_versions(self):
+        bus = EventBus(replay_size=3)
+        for version in (1, 2, 3, 4):
+            bus.publish(change("u1", version))
+        assert [item.version for item in bus.replay("u1", 2, 4)] == [3, 4]
+        assert bus.replay("u1", 0, 4) is None
+        assert bus.replay("u1", 4, 4) == []
+
+    def test_remote_events_and_reset(self):
+        bus = EventBus()
+        bus.on_invalidation([change("u1", 7).to_key(), "not json"])
+        assert [item.version for item in bus.replay("u1", 6, 7)] == [7]
+
+        async def run():
+            subscriber = bus.subscribe("u1")
+            bus.on_invalidation(None)
+            await asyncio.sleep(0)
+            return subscriber.queue.get_nowait()
+
+        assert asyncio.run(run()).type == RESET
+
+    def test_unsubscribe(self):
+        bus = EventBus()
+
+        async def run():
+            bus.unsubscribe(bus.subscribe("u1"))
+
+        asyncio.run(run())
+        assert bus.stats()["subscribers"] == 0
+
+
+class TestStreamEvents:
+    """Test suite for the SSE byte stream."""
+
+    def test_new_client_gets_ready_then_events_and_heartbeats(self):
+        bus = EventBus()
+
+        async def run():
+            subscriber = bus.subscribe("u1")
+            stream = stream_events(bus, subscriber, 3, None, heartbeat=0.01)
+            opening = await collect(stream, 2)
+            bus.publish(change("u1", 3))  # already covered by the ready version
+            bus.publish(change("u1", 4))
+            following = await collect(stream, 1)
+            heartbeat = await collect(stream, 1)
+            await stream.aclose()
+            return opening, following, heartbeat
+
+        opening, following, heartbeat = asyncio.run(run())
+        assert opening[0].startswith(b"retry: ")
+        assert opening[1].startswith(b"id: 3\nevent: ready\n")
+        assert following[0].startswith(b"id: 4\nevent: created\n")
+        assert heartbeat == [b": keepalive\n\n"]
+        assert bus.stats()["subscribers"] == 0
+
+    def test_out_of_order_events_fill_the_gap_or_reset(self):
+        bus = EventBus()
+
+        async def run():
+            subscriber = bus.subscribe("u1")
+            stream = stream_events(bus, subscriber, 4, None, heartbeat=1)
+            await collect(stream, 2)
+            # This worker's v6 overtakes v5 relayed from another worker
+            bus.publish(change("u1", 6))
+            reset = await collect(stream, 1)
+            bus.publish(change("u1", 5))  # covered by the reset
+            bus.publish(change("u1", 7))
+            bus.publish(change("u1", 9))
+            following = await collect(stream, 2)
+            await stream.aclose()
+            return reset, following
+
+        reset, following = asyncio.run(run())
+        assert reset[0].startswith(b"id: 6\nevent: reset\n")
+        assert following[0].startswith(b"id: 7\nevent: created\n")
+        assert following[1].startswith(b"id: 9\nevent: reset\n")
+
+    def test_skipped_versions_are_replayed_from_the_buffer(self):
+        bus = EventBus()
+
+        async def run():
+            subscriber = bus.subscribe("u1")
+            stream = stream_events(bus, subscriber, 1, None, heartbeat=1)
+            await collect(stream, 2)
+            # v2 reached the buffer without reaching this subscriber's queue
+            bus.unsubscribe(subscriber)
+            bus.publish(change("u1", 2))
+            bus._subscribers["u1"].add(subscriber)
+            bus.publish(change("u1", 3))
+            frames = await collect(stream, 2)
+            await stream.aclose()
+            return frames
+
+        frames = asyncio.run(run())
+        assert [frame.split(b"\n")[0] for frame in frames] == [b"id: 2", b"id: 3"]
+
+    def test_resume_replays_or_resets(self):
+        bus = EventBus()
+        for version in (1, 2):
+            bus.publish(change("u1", version))
+
+        async def run(last_event_id, current):
+            stream = stream_events(bus, bus.subscribe("u1"), current, last_event_id)
+            frames = await collect(stream, 3 if current - last_event_id == 2 else 2)
+            await stream.aclose()
+            return frames
+
+        replayed = asyncio.run(run(0, 2))
+        assert [frame.split(b"\n")[0] for frame in replayed[1:]] == [b"id: 1", b"id: 2"]
+        reset = asyncio.run(run(0, 5))
+        assert reset[1].startswith(b"id: 5\nevent: reset\n")
@@ -0,0 +1,80 @@
+"""
+Unit tests for the bounded calculation process pool.
+"""
+import asyncio
+import os
+import time
+
+import pytest
+
+from app import executor
+from app.executor import CalculationTimeout, run_bounded, shutdown_pool
+from app.expression import evaluate_expression
+
+
+def _sleep(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+class TestRunBounded:
+    """Test suite for run_bounded."""
+
+    def teardown_method(self):
+        shutdown_pool()
+
+    def test_returns_result(self):
+        """Test that results come back from the pool."""
+        result = asyncio.run(run_bounded(evaluate_expression, "a ** b", 2.0, 10.0))
+        assert result == 1024.0
+
+    def test_propagates_value_error(self):
+        """Test that evaluation errors propagate as ValueError."""
+        with pytest.raises(ValueError, match="too large"):
+            asyncio.run(run_bounded(evaluate_expression, "a ** b", 10.0, 400.0))
+
+    def test_time_budget_exceeded(self):
+        """Test that overrunning the budget raises CalculationTimeout."""
+        with pytest.raises(CalculationTimeout):
+            asyncio.run(run_bounded(_sleep, 5.0, timeout=0.5))
+
+    def test_pool_recovers_after_timeout(self):
+        """Test that the pool is usable again after a timeout."""
+        with pytest.raises(CalculationTimeout):
+            asyncio.run(run_bounded(_sleep, 5.0, timeout=0.5))
+        assert asyncio.run(run_bounded(_sleep, 0.0)) == 0.0
+
+    def test_timeout_spares_other_calls(self, monkeypatch):
+        """Test that a timed-out call only kills its own worker."""
+        async def both():
+            return await asyncio.gather(
+                run_bounded(_sleep, 5.0, timeout=0.5), run_bounded(_sleep, 1.0, timeout=3.0),
+                return_exceptions=True,
+            )
+
+        monkeypatch.setattr(executor, "CALCULATION_POOL_WORKERS", 2)
+        timed_out, finished = asyncio.run(both())
+        assert isinstance(timed_out, CalculationTimeout)
+        assert finished == 1.0
+
+    def test_budget_starts_when_a_worker_is_free(self, monkeypatch):
+        """Test that time spent queued for a worker does not count against the budget."""
+        async def queued():
+            return await asyncio.gather(*(run_bounded(_sleep, 0.4, timeout=0.6) for _ in range(3)))
+
+        monkeypatch.setattr(executor, "CALCULATION_POOL_WORKERS", 1)
+        # Start the worker first; importing this test module in it would eat into the budget
+        assert asyncio.run(run_bounded(_sleep, 0.0)) == 0.0
+        assert asyncio.run(queued()) == [0.4, 0.4, 0.4]
+
+    def test_workers_are_not_forked(self):
+        """Test that workers never fork the multi-threaded server process."""
+        assert executor.START_METHOD in ("forkserver", "spawn")
+        pool = executor.WorkerPool(1)
+        assert pool._context.get_start_method() == executor.START_METHOD
+
+    def test_dead_worker(self):
+        """Test that a worker dying mid-call fails only that call."""
+        with pytest.raises(CalculationTimeout, match="failed"):
+            asyncio.run(run_bounded(os._exit, 1))
+        assert asyncio.run(run_bounded(_sleep, 0.0)) == 0.0
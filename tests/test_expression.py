@@ -0,0 +1,82 @@
+"""
+Unit tests for the safe expression compiler.
+"""
+import pytest
+
+from app.expression import compile_expression, evaluate_expression, normalize_expression
+
+
+class TestExpressionCompilation:
+    """Test suite for parsing, normalization and caching."""
+
+    def test_normalization_ignores_formatting(self):
+        """Test that whitespace and redundant parentheses are normalized away."""
+        assert normalize_expression(" (a)+ b ") == "a + b"
+
+    def test_equivalent_text_shares_compilation(self):
+        """Test that differently formatted expressions hit the same cache entry."""
+        assert compile_expression("a*b") is compile_expression("(a) * (b)")
+
+    def test_variables_are_tracked(self):
+        """Test that referenced variables are recorded."""
+        assert compile_expression("a + 1").variables == frozenset({"a"})
+
+    @pytest.mark.parametrize("text", [
+        "__import__('os')",
+        "a.real",
+        "[a, b]",
+        "lambda: 1",
+        "a if b else 1",
+        "unknown + 1",
+        "sqrt(a, b)",
+        "'text'",
+        "",
+    ])
+    def test_unsafe_expressions_rejected(self, text):
+        """Test that anything outside the grammar is rejected."""
+        with pytest.raises(ValueError):
+            compile_expression(text)
+
+    def test_expression_too_complex(self):
+        """Test that overly large expressions are rejected."""
+        with pytest.raises(ValueError):
+            compile_expression(" + ".join(["a"] * 60))
+
+
+class TestExpressionEvaluation:
+    """Test suite for scalar and batch evaluation."""
+
+    def test_evaluate_scalar(self):
+        """Test evaluating an expression with functions and constants."""
+        assert evaluate_expression("sqrt(a**2 + b**2)", 3.0, 4.0) == 5.0
+        assert evaluate_expression("max(a, b) * 2", 3.0, 4.0) == 8.0
+
+    def test_division_by_zero(self):
+        """Test that division by zero raises ValueError."""
+        with pytest.raises(ValueError, match="Division by zero"):
+            evaluate_expression("a / b", 1.0, 0.0)
+
+    def test_overflow_is_value_error(self):
+        """Test that huge powers fail cleanly instead of overflowing."""
+        with pytest.raises(ValueError):
+            evaluate_expression("9 ** 9 ** 9", 0.0, 0.0)
+
+    def test_complex_result_rejected(self):
+        """Test that negative bases with fractional exponents are rejected."""
+        with pytest.raises(ValueError):
+            evaluate_expression("a ** 0.5", -8.0, 0.0)
+
+    def test_evaluate_batch(self):
+        """Test vectorized evaluation over operand batches."""
+        result = compile_expression("a * b + 1").evaluate_batch([1.0, 2.0, 3.0], [4.0, 5.0, 6.0])
+        assert list(result) == [5.0, 11.0, 19.0]
+
+    def test_evaluate_batch_constant_expression(self):
+        """Test that constant expressions broadcast to the batch size."""
+        result = compile_expression("2 + 2").evaluate_batch([1.0, 2.0], [3.0, 4.0])
+        assert list(result) == [4.0, 4.0]
+
+    def test_evaluate_batch_errors(self):
+        """Test that any failing element fails the batch."""
+        with pytest.raises(ValueError):
+            compile_expression("a / b").evaluate_batch([1.0, 2.0], [1.0, 0.0])
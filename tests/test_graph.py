@@ -0,0 +1,142 @@
+"""
+Unit tests for the calculation dependency graph.
+"""
+import asyncio
+import time
+import uuid
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import executor
+from app.database import Base
+from app.executor import CalculationTimeout, shutdown_pool
+from app.factory import Operation, registry
+from app.graph import (
+    check_reference, descendants, recompute_descendants, recompute_descendants_bounded, topological_layers,
+)
+from app.models import Calculation, User
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def user(db):
+    user = User(username="graph", email="graph@example.com", password_hash="x")
+    db.add(user)
+    db.commit()
+    return user
+
+
+class SlowOperation(Operation):
+    """An operation expensive enough to always run in the process pool."""
+
+    def calculate(self, a: float, b: float) -> float:
+        time.sleep(5.0)
+        return a + b
+
+    def cost(self, expression=None) -> int:
+        return executor.INLINE_COST_LIMIT + 1
+
+
+def make(db, user, type, a, b, result, a_ref=None, b_ref=None, expression=None):
+    calc = Calculation(
+        id=uuid.uuid4(), type=type, a=a, b=b, result=result,
+        a_ref=a_ref, b_ref=b_ref, expression=expression, user_id=user.id,
+    )
+    db.add(calc)
+    db.commit()
+    return calc
+
+
+class TestDependencyGraph:
+    """Test suite for descendant discovery and recomputation."""
+
+    def test_chain_recomputes_in_order(self, db, user):
+        """c = a + b; d = c * 2; e = d - c."""
+        c = make(db, user, "Add", 1.0, 2.0, 3.0)
+        d = make(db, user, "Multiply", 3.0, 2.0, 6.0, a_ref=c.id)
+        e = make(db, user, "Subtract", 6.0, 3.0, 3.0, a_ref=d.id, b_ref=c.id)
+        unrelated = make(db, user, "Add", 5.0, 5.0, 10.0)
+
+        c.a, c.result = 10.0, 12.0
+        updated = recompute_descendants(db, c)
+
+        assert [node.id for node in updated] == [d.id, e.id]
+        assert d.result == 24.0
+        assert (e.a, e.b, e.result) == (24.0, 12.0, 12.0)
+        assert unrelated.result == 10.0
+
+    def test_layers_batch_siblings(self, db, user):
+        root = make(db, user, "Add", 1.0, 1.0, 2.0)
+        left = make(db, user, "Multiply", 2.0, 3.0, 6.0, a_ref=root.id)
+        right = make(db, user, "Multiply", 2.0, 4.0, 8.0, a_ref=root.id)
+        layers = topological_layers(root, descendants(db, root))
+        assert len(layers) == 1
+        assert {node.id for node in layers[0]} == {left.id, right.id}
+
+    def test_expression_dependents(self, db, user):
+        root = make(db, user, "Add", 1.0, 2.0, 3.0)
+        child = make(db, user, "Expression", 3.0, 4.0, 25.0, a_ref=root.id, expression="a ** 2 + b ** 2")
+        root.a, root.result = -2.0, 0.0
+        recompute_descendants(db, root)
+        assert child.result == 16.0
+
+    def test_cycle_rejected(self, db, user):
+        c = make(db, user, "Add", 1.0, 2.0, 3.0)
+        d = make(db, user, "Multiply", 3.0, 2.0, 6.0, a_ref=c.id)
+        with pytest.raises(ValueError, match="cycle"):
+            check_reference(db, c, d.id)
+        with pytest.raises(ValueError, match="cycle"):
+            check_reference(db, c, c.id)
+
+    def test_failing_dependent_raises(self, db, user):
+        c = make(db, user, "Add", 1.0, 2.0, 3.0)
+        make(db, user, "Divide", 1.0, 3.0, 1.0 / 3.0, b_ref=c.id)
+        c.a, c.result = -2.0, 0.0
+        with pytest.raises(ValueError, match="Division by zero"):
+            recompute_descendants(db, c)
+
+
+class TestBoundedRecompute:
+    """Test suite for recomputation from request handlers."""
+
+    def teardown_method(self):
+        shutdown_pool()
+
+    def test_cheap_dependents_match_inline(self, db, user):
+        c = make(db, user, "Add", 1.0, 2.0, 3.0)
+        d = make(db, user, "Multiply", 3.0, 2.0, 6.0, a_ref=c.id)
+        e = make(db, user, "Expression", 6.0, 3.0, 9.0, a_ref=d.id, b_ref=c.id, expression="a + b")
+        c.a, c.result = 10.0, 12.0
+        updated = asyncio.run(recompute_descendants_bounded(db, c))
+        assert [node.id for node in updated] == [d.id, e.id]
+        assert (d.result, e.result) == (24.0, 36.0)
+
+    def test_expensive_dependents_run_in_pool(self, db, user, monkeypatch):
+        monkeypatch.setattr(executor, "INLINE_COST_LIMIT", 0)
+        root = make(db, user, "Add", 1.0, 2.0, 3.0)
+        left = make(db, user, "Expression", 3.0, 4.0, 25.0, a_ref=root.id, expression="a ** 2 + b ** 2")
+        right = make(db, user, "Expression", 3.0, 1.0, 10.0, a_ref=root.id, expression="a ** 2 + b ** 2")
+        root.a, root.result = -2.0, 0.0
+        asyncio.run(recompute_descendants_bounded(db, root))
+        assert (left.result, right.result) == (16.0, 1.0)
+
+    def test_expensive_dependent_hits_budget(self, db, user, monkeypatch):
+        """A dependent over the inline cost limit gets a time budget instead of stalling the loop."""
+        monkeypatch.setattr(executor, "CALCULATION_TIME_BUDGET", 0.5)
+        monkeypatch.setitem(registry._discover(), "Slow", SlowOperation)
+        monkeypatch.setitem(registry._instances, "Slow", SlowOperation())
+        root = make(db, user, "Add", 1.0, 2.0, 3.0)
+        make(db, user, "Slow", 3.0, 2.0, 5.0, a_ref=root.id)
+        root.a, root.result = 4.0, 6.0
+        with pytest.raises(CalculationTimeout):
+            asyncio.run(recompute_descendants_bounded(db, root))
@@ -0,0 +1,68 @@
+"""
+Unit tests for LISTEN/NOTIFY cache invalidation.
+"""
+import json
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app import invalidation
+from app.invalidation import InvalidationListener, dispatch, publish
+
+
+@pytest.fixture
+def handled(monkeypatch):
+    calls = []
+    monkeypatch.setattr(invalidation, "_handlers", {"user": calls.append})
+    return calls
+
+
+def payload(namespace="user", keys=("k",), origin="other-worker") -> str:
+    return json.dumps({"origin": origin, "namespace": namespace, "keys": list(keys)})
+
+
+class TestDispatch:
+    """Test routing of received notifications."""
+
+    def test_routes_keys_to_namespace_handler(self, handled):
+        dispatch(payload(keys=["id", "name"]))
+        assert handled == [["id", "name"]]
+
+    def test_ignores_own_and_unknown(self, handled):
+        dispatch(payload(origin=invalidation.ORIGIN))
+        dispatch(payload(namespace="calculations"))
+        dispatch("not json")
+        assert handled == []
+
+    def test_reset_all(self, handled):
+        invalidation.reset_all()
+        assert handled == [None]
+
+
+class TestPublish:
+    """Test emitting notifications."""
+
+    def test_noop_without_notify(self):
+        engine = create_engine("sqlite://")
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        with sessionmaker(bind=engine)() as db:
+            publish(db, "user", ["id", "name"])
+        assert statements == []
+
+    def test_payloads_split_under_limit(self):
+        keys = [f"{i:064d}" for i in range(400)]
+        chunks = [json.loads(chunk) for chunk in invalidation._payloads("calculations", keys)]
+        assert len(chunks) > 1
+        assert all(len(json.dumps(chunk)) <= invalidation.MAX_PAYLOAD for chunk in chunks)
+        assert [key for chunk in chunks for key in chunk["keys"]] == keys
+
+
+class TestListener:
+    """Test listener lifecycle."""
+
+    def test_not_started_on_sqlite(self):
+        listener = InvalidationListener()
+        assert listener.start(create_engine("sqlite://")) is False
+        listener.stop()
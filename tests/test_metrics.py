@@ -0,0 +1,110 @@
+"""
+Unit tests for the sharded metrics and their Prometheus rendering.
+"""
+import threading
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Mount, Route
+from starlette.testclient import TestClient
+
+from app import metrics
+from app.metrics import Counter, Gauge, Histogram, MetricsMiddleware, Registry, family
+
+
+def run_in_threads(func, count=4):
+    threads = [threading.Thread(target=func) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class TestShardedMetrics:
+    """Test suite for counters, gauges and histograms."""
+
+    def test_counter_sums_thread_shards(self):
+        counter = Counter("jobs_total", "Jobs.", ("kind",))
+        run_in_threads(lambda: [counter.inc(("a",)) for _ in range(1000)])
+        counter.inc(("b",), 2.5)
+        samples = {sample.labels["kind"]: sample.value for sample in counter.collect().samples}
+        assert samples == {"a": 4000, "b": 2.5}
+
+    def test_exited_threads_fold_into_base(self):
+        counter = Counter("jobs_total", "Jobs.")
+        run_in_threads(counter.inc, count=3)
+        counter.collect()
+        assert counter._shards == [] and counter._base == {(): 3.0}
+        counter.inc()
+        assert counter.collect().samples[0].value == 4
+
+    def test_gauge_track(self):
+        gauge = Gauge("busy", "Busy.", ("operation",))
+        with gauge.track(("hash",)):
+            assert gauge.collect().samples[0].value == 1
+        assert gauge.collect().samples[0].value == 0
+
+    def test_histogram_buckets(self):
+        histogram = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, ("/x",))
+        run_in_threads(lambda: histogram.observe(0.5, ("/x",)), count=2)
+        samples = histogram.collect().samples
+        buckets = [(sample.labels["le"], sample.value) for sample in samples if sample.suffix == "_bucket"]
+        assert buckets == [("0.1", 2), ("1", 5), ("+Inf", 6)]
+        totals = {sample.suffix: sample.value for sample in samples if sample.suffix != "_bucket"}
+        assert totals == {"_sum": 4.65, "_count": 6}
+
+
+class TestRegistry:
+    """Test suite for the text exposition format."""
+
+    def test_render(self):
+        registry = Registry()
+        registry.counter("ops_total", "Operations\nrun.", ("op",)).inc(('say "hi"\\',))
+        registry.register(lambda: [family("pool_size", "gauge", "Pool size.", {(): 5})])
+        text = registry.render().decode()
+        assert text.splitlines() == [
+            "# HELP ops_total Operations\\nrun.",
+            "# TYPE ops_total counter",
+            'ops_total{op="say \\"hi\\"\\\\"} 1',
+            "# HELP pool_size Pool size.",
+            "# TYPE pool_size gauge",
+            "pool_size 5",
+        ]
+
+    def test_duplicate_names_rejected(self):
+        registry = Registry()
+        registry.gauge("busy", "Busy.")
+        try:
+            registry.counter("busy", "Busy.")
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("duplicate metric accepted")
+
+
+class TestMetricsMiddleware:
+    """Test suite for per-route request metrics."""
+
+    def test_route_templates_and_statuses(self):
+        async def item(request):
+            return PlainTextResponse("ok", status_code=201)
+
+        app = Starlette(routes=[Mount("/files", app=Starlette(routes=[Route("/{name}", item)]))])
+        app.add_middleware(MetricsMiddleware)
+        metrics.registry.clear()
+        client = TestClient(app)
+        client.get("/files/a.txt")
+        client.get("/files/b.txt")
+        client.get("/nowhere")
+
+        counts = {
+            (sample.labels["route"], sample.labels["status"]): sample.value
+            for sample in metrics.HTTP_REQUESTS.collect().samples
+        }
+        # FastAPI routes are labelled with their path template (see the integration tests)
+        assert counts == {("/files/*", "201"): 2, ("unmatched", "404"): 1}
+        assert all(sample.value == 0 for sample in metrics.HTTP_IN_FLIGHT.collect().samples)
+        latency = [sample for sample in metrics.HTTP_REQUEST_SECONDS.collect().samples if sample.suffix == "_count"]
+        assert sum(sample.value for sample in latency) == 3
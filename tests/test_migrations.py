@@ -0,0 +1,116 @@
+"""
+Unit tests for the startup schema upgrades.
+"""
+import os
+import subprocess
+import sys
+import textwrap
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from app.migrations import ADDED_COLUMNS, add_column_ddl, upgrade_schema
+from app.models import Calculation
+
+
+@pytest.fixture
+def old_engine(tmp_path):
+    """A database with the calculations table as first released."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE users (id CHAR(32) PRIMARY KEY)"))
+        conn.execute(text(
+            "CREATE TABLE calculations (id CHAR(32) PRIMARY KEY, a FLOAT NOT NULL, b FLOAT NOT NULL, "
+            "type VARCHAR(20) NOT NULL, result FLOAT NOT NULL, user_id CHAR(32) REFERENCES users (id), "
+            "created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL)"
+        ))
+        conn.execute(text("INSERT INTO calculations (id, a, b, type, result) VALUES (:id, 1, 2, 'Add', 3)"),
+                     {"id": uuid.uuid4().hex})
+    return engine
+
+
+class TestUpgradeSchema:
+    """Test suite for adding columns to existing tables."""
+
+    def test_adds_missing_columns_once(self, old_engine):
+        added = upgrade_schema(old_engine)
+        model_columns = Calculation.__table__.c
+        expected = [(table, column) for table, column in ADDED_COLUMNS if column in model_columns]
+        assert added == [f"{table}.{column}" for table, column in expected]
+        columns = {column["name"] for column in inspect(old_engine).get_columns("calculations")}
+        assert {column for _, column in expected} <= columns
+        assert upgrade_schema(old_engine) == []
+        with old_engine.connect() as conn:
+            assert conn.execute(text("SELECT count(*) FROM calculations")).scalar() == 1
+
+    def test_missing_tables_are_left_to_create_all(self, tmp_path):
+        assert upgrade_schema(create_engine(f"sqlite:///{tmp_path / 'empty.db'}")) == []
+
+    def test_ddl(self, old_engine):
+        assert add_column_ddl(old_engine, "calculations", "expression") == (
+            "ALTER TABLE calculations ADD COLUMN expression VARCHAR(255)"
+        )
+        assert add_column_ddl(old_engine, "calculations", "a_ref") == (
+            "ALTER TABLE calculations ADD COLUMN a_ref CHAR(32) REFERENCES calculations (id) ON DELETE SET NULL"
+        )
+        assert add_column_ddl(old_engine, "calculations", "operands") == (
+            "ALTER TABLE calculations ADD COLUMN operands BLOB"
+        )
+
+    def test_reference_columns_get_their_indexes(self, old_engine):
+        upgrade_schema(old_engine)
+        indexed = {tuple(index["column_names"]) for index in inspect(old_engine).get_indexes("calculations")}
+        assert {("a_ref",), ("b_ref",)} <= indexed
+
+    def test_change_seq_gets_its_index(self, old_engine):
+        upgrade_schema(old_engine)
+        indexes = {index["name"]: index["column_names"] for index in inspect(old_engine).get_indexes("calculations")}
+        assert indexes["ix_calculations_user_id_change_seq"] == ["user_id", "change_seq"]
+
+    def test_upgraded_table_accepts_writes(self, old_engine):
+        upgrade_schema(old_engine)
+        with Session(old_engine) as session:
+            calc = Calculation(a=2, b=3, type="Multiply", result=6, change_seq=1)
+            session.add(calc)
+            session.commit()
+            calc.a, calc.result, calc.change_seq = 4, 12, 2
+            session.commit()
+            session.delete(calc)
+            session.commit()
+
+
+def _upgrade_in_database_mode(database_url):
+    """Run create_all and upgrade_schema with CALCULATION_RESULT_MODE=database."""
+    script = textwrap.dedent("""
+        from app.database import Base, engine
+        from app.migrations import upgrade_schema
+
+        Base.metadata.create_all(bind=engine)
+        print(upgrade_schema(engine))
+    """)
+    env = {**os.environ, "CALCULATION_RESULT_MODE": "database", "DATABASE_URL": database_url}
+    return subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+
+
+class TestDatabaseResultMode:
+    """Test the startup check for database result mode."""
+
+    def test_refuses_plain_result_column(self, old_engine, tmp_path):
+        completed = _upgrade_in_database_mode(f"sqlite:///{tmp_path / 'old.db'}")
+        assert completed.returncode != 0
+        assert "calculations.result to be a generated column" in completed.stderr
+        columns = {column["name"] for column in inspect(old_engine).get_columns("calculations")}
+        assert "stored_result" not in columns
+
+    def test_accepts_generated_result_column(self, tmp_path):
+        completed = _upgrade_in_database_mode(f"sqlite:///{tmp_path / 'new.db'}")
+        assert completed.returncode == 0, completed.stderr
+        assert completed.stdout.strip() == "[]"
@@ -0,0 +1,189 @@
+"""
+Unit tests for the read-side query layer.
+"""
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import queries
+from app.database import Base
+from app.models import Calculation, CalculationTombstone, User
+from app.queries import CalculationRecord
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def user(db):
+    user = User(username="reader", email="reader@example.com", password_hash="x")
+    db.add(user)
+    db.commit()
+    return user
+
+
+def add(db, user, type, a, b, result, created_at):
+    calc = Calculation(type=type, a=a, b=b, result=result, user_id=user.id, created_at=created_at)
+    db.add(calc)
+    db.commit()
+    return calc
+
+
+class TestReadQueries:
+    """Test suite for columnar reads."""
+
+    def test_records_are_slotted(self):
+        """Test that records carry no per-instance dict."""
+        record = CalculationRecord(uuid.uuid4(), 1.0, 2.0, "Add", None, None, None, 3.0, None, datetime.now())
+        assert not hasattr(record, "__dict__")
+
+    def test_list_does_not_populate_identity_map(self, db, user):
+        """Test that list reads return records without ORM instances."""
+        calc_id = add(db, user, "Add", 1.0, 2.0, 3.0, datetime(2024, 1, 1)).id
+        user_id = user.id
+        db.expunge_all()
+
+        records = queries.list_calculations(db, user_id)
+        assert [record.id for record in records] == [calc_id]
+        assert isinstance(records[0], CalculationRecord)
+        assert len(db.identity_map) == 0
+
+    def test_get_scoped_to_user(self, db, user):
+        """Test that other users' calculations are not returned."""
+        calc = add(db, user, "Add", 1.0, 2.0, 3.0, datetime(2024, 1, 1))
+        assert queries.get_calculation(db, calc.id, user.id).result == 3.0
+        assert queries.get_calculation(db, calc.id, uuid.uuid4()) is None
+
+    def test_get_user_id(self, db, user):
+        """Test the id-only user lookup."""
+        assert queries.get_user_id(db, "reader") == user.id
+        assert queries.get_user_id(db, "nobody") is None
+
+    def test_summary(self, db, user):
+        """Test totals, averages, breakdown and latest result."""
+        add(db, user, "Add", 1.0, 2.0, 3.0, datetime(2024, 1, 1))
+        add(db, user, "Add", 2.0, 2.0, 4.0, datetime(2024, 1, 2))
+        add(db, user, "Multiply", 2.0, 4.0, 8.0, datetime(2024, 1, 3))
+
+        stats = queries.calculation_summary(db, user.id)
+        assert stats.total == 3
+        assert stats.average_result == pytest.approx(5.0)
+        assert stats.last_result == 8.0
+        assert stats.operations_breakdown == {"Add": 2, "Multiply": 1}
+
+    def test_empty_summary(self, db, user):
+        """Test the summary of a user without calculations."""
+        stats = queries.calculation_summary(db, user.id)
+        assert (stats.total, stats.average_result, stats.last_result) == (0, None, None)
+        assert stats.operations_breakdown == {}
+
+
+class TestSparseFields:
+    """Test sparse fieldsets."""
+
+    def test_parse_fields_canonical_order(self):
+        """Test that field sets are deduplicated and put in CalculationRead order."""
+        assert queries.parse_fields("result, id,type,id") == ("id", "type", "result")
+        assert queries.parse_fields(None) == queries.CALCULATION_FIELDS
+
+    @pytest.mark.parametrize("fields", ["id,password_hash", "", " , "])
+    def test_parse_fields_rejects(self, fields):
+        """Test that unknown or empty field lists are rejected."""
+        with pytest.raises(ValueError):
+            queries.parse_fields(fields)
+
+    def test_record_type_cached_and_slotted(self):
+        """Test that one slotted record class is generated per field set."""
+        record = queries.record_type(("id", "result"))
+        assert queries.record_type(("id", "result")) is record
+        assert queries.record_type(queries.CALCULATION_FIELDS) is CalculationRecord
+        assert not hasattr(record(uuid.uuid4(), 1.0), "__dict__")
+
+    def test_select_only_requested_columns(self, db, user):
+        """Test that sparse reads select only the requested columns."""
+        from sqlalchemy import event
+
+        calc_id = add(db, user, "Add", 1.0, 2.0, 3.0, datetime(2024, 1, 1)).id
+        user_id = user.id
+        statements = []
+        event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+        records = queries.list_calculations(db, user_id, fields=("id", "result"))
+        assert [(record.id, record.result) for record in records] == [(calc_id, 3.0)]
+        selected = statements[0].split("FROM")[0]
+        assert "calculations.result" in selected and "created_at" not in selected and "user_id" not in selected
+
+    def test_get_with_fields(self, db, user):
+        """Test single reads with a field set."""
+        calc_id = add(db, user, "Add", 1.0, 2.0, 3.0, datetime(2024, 1, 1)).id
+        record = queries.get_calculation(db, calc_id, user.id, ("type",))
+        assert record.type == "Add"
+
+    def test_iter_calculations_batches(self, db, user):
+        """Test that exports stream every row, oldest first, in batches."""
+        for day in range(1, 6):
+            add(db, user, "Add", float(day), 0.0, float(day), datetime(2024, 1, day))
+        batches = list(queries.iter_calculations(db, user.id, ("a",), batch_size=2))
+        assert [len(batch) for batch in batches] == [2, 2, 1]
+        assert [record.a for batch in batches for record in batch] == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+class TestChanges:
+    """Test suite for delta sync queries."""
+
+    def stamp(self, db, user, seq, count=1, **fields):
+        calcs = [Calculation(type="Add", a=1.0, b=2.0, result=3.0, user_id=user.id, change_seq=seq,
+                             created_at=datetime(2024, 1, 1), **fields) for _ in range(count)]
+        db.add_all(calcs)
+        db.commit()
+        return calcs
+
+    def test_full_sync_includes_untracked_rows(self, db, user):
+        """Test that since=None returns every row, including ones from before tracking."""
+        old = self.stamp(db, user, None)[0]
+        new = self.stamp(db, user, 2)[0]
+        changes = queries.list_changes(db, user.id, None, 2)
+        assert [record.id for record in changes.calculations] == [old.id, new.id]
+        assert changes.deleted == [] and changes.until == 2 and not changes.has_more
+
+    def test_changes_and_tombstones_since(self, db, user):
+        """Test that only later versions are returned, with deletions."""
+        self.stamp(db, user, 1)
+        changed = self.stamp(db, user, 3)[0]
+        gone = uuid.uuid4()
+        db.add(CalculationTombstone(id=gone, user_id=user.id, change_seq=4))
+        db.commit()
+        changes = queries.list_changes(db, user.id, 1, 4)
+        assert [record.id for record in changes.calculations] == [changed.id]
+        assert changes.deleted == [gone]
+        assert queries.list_changes(db, user.id, 4, 4) == ([], [], 4, False)
+
+    def test_ignores_versions_after_current(self, db, user):
+        """Test that rows of a write committed after the version read wait for the next sync."""
+        self.stamp(db, user, 5)
+        changes = queries.list_changes(db, user.id, 0, 4)
+        assert changes.calculations == [] and changes.until == 4
+
+    def test_pages_end_on_version_boundaries(self, db, user):
+        """Test that a page never splits the rows of one mutation."""
+        self.stamp(db, user, 1, count=2)
+        self.stamp(db, user, 2, count=2)
+        self.stamp(db, user, 3)
+        first = queries.list_changes(db, user.id, 0, 3, limit=3)
+        assert len(first.calculations) == 2 and first.until == 1 and first.has_more
+        second = queries.list_changes(db, user.id, first.until, 3, limit=3)
+        assert len(second.calculations) == 3 and second.until == 3 and not second.has_more
+
+    def test_large_mutation_returned_whole(self, db, user):
+        """Test that one mutation bigger than the page comes back in one page."""
+        self.stamp(db, user, 1, count=4)
+        changes = queries.list_changes(db, user.id, 0, 1, limit=2)
+        assert len(changes.calculations) == 4 and changes.until == 1
@@ -0,0 +1,173 @@
+"""
+Unit tests for the chunked result recompute job.
+"""
+import uuid
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import CachedResult, Calculation, RecomputeCheckpoint, User
+from app import recompute
+from app.recompute import RecomputeJob, recompute_rows, run_parallel, split_id_space
+from app.sql_kernels import DB_COMPUTED_RESULTS
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'recompute.db'}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def seed(session_factory, count=25):
+    """Insert Power rows with deliberately stale results (every other row)."""
+    with session_factory() as db:
+        for i in range(count):
+            db.add(Calculation(
+                id=uuid.uuid4(), a=2.0, b=float(i), type="Power",
+                result=2.0 ** i if i % 2 else -1.0,
+            ))
+        db.add(Calculation(id=uuid.uuid4(), a=1.0, b=1.0, type="Add", result=-1.0))
+        db.commit()
+
+
+def results(session_factory):
+    with session_factory() as db:
+        return {(row.type, row.b): row.result for row in db.query(Calculation).all()}
+
+
+@pytest.mark.skipif(DB_COMPUTED_RESULTS, reason="the database generates results for arithmetic rows")
+class TestRecomputeJob:
+    """Test suite for RecomputeJob and run_parallel."""
+
+    def test_recompute_rows_reports_changes_only(self):
+        class Row:
+            def __init__(self, a, b, type, result, expression=None):
+                self.id, self.a, self.b, self.type = uuid.uuid4(), a, b, type
+                self.result, self.expression = result, expression
+
+        rows = [Row(2.0, 3.0, "Power", 8.0), Row(2.0, 4.0, "Power", 0.0), Row(1.0, 0.0, "Divide", 0.0)]
+        changed, failed = recompute_rows(rows)
+        assert [result for _, result in changed] == [16.0]
+        assert failed == 1
+
+    def test_job_fixes_stale_rows_in_chunks(self, session_factory):
+        seed(session_factory)
+        stats = RecomputeJob(session_factory, name="fix", chunk_size=4, types=["Power"]).run()
+        assert stats.processed == 25
+        assert stats.updated == 13
+        current = results(session_factory)
+        assert all(current[("Power", float(i))] == 2.0 ** i for i in range(25))
+        assert current[("Add", 1.0)] == -1.0  # filtered out by type
+
+    def test_job_stamps_changed_rows_for_delta_sync(self, session_factory):
+        with session_factory() as db:
+            user = User(username="owner", email="owner@example.com", password_hash="x")
+            db.add(user)
+            db.flush()
+            stale, fresh = uuid.uuid4(), uuid.uuid4()
+            db.add_all([
+                Calculation(id=stale, a=2.0, b=3.0, type="Power", result=-1.0, user_id=user.id),
+                Calculation(id=fresh, a=2.0, b=2.0, type="Power", result=4.0, user_id=user.id),
+            ])
+            db.commit()
+        RecomputeJob(session_factory, name="stamp", types=["Power"]).run()
+        with session_factory() as db:
+            assert db.get(Calculation, stale).change_seq == 1
+            assert db.get(Calculation, fresh).change_seq is None
+
+    def test_job_propagates_to_dependents(self, session_factory):
+        with session_factory() as db:
+            user = User(username="owner", email="owner@example.com", password_hash="x")
+            db.add(user)
+            db.flush()
+            root, child, grandchild = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+            db.add_all([
+                Calculation(id=root, a=2.0, b=3.0, type="Power", result=-1.0, user_id=user.id),
+                Calculation(id=child, a=-1.0, a_ref=root, b=1.0, type="Add", result=0.0, user_id=user.id),
+                Calculation(id=grandchild, a=0.0, a_ref=child, b=2.0, type="Multiply", result=0.0,
+                            user_id=user.id),
+            ])
+            db.commit()
+        stats = RecomputeJob(session_factory, name="propagate", types=["Power"]).run()
+        assert stats.updated == 3 and stats.failed == 0
+        with session_factory() as db:
+            assert (db.get(Calculation, child).a, db.get(Calculation, child).result) == (8.0, 9.0)
+            assert db.get(Calculation, grandchild).result == 18.0
+            assert {db.get(Calculation, row_id).change_seq for row_id in (root, child, grandchild)} == {1}
+
+    def test_job_skips_rows_edited_after_the_read(self, session_factory, monkeypatch):
+        with session_factory() as db:
+            edited, stale = uuid.uuid4(), uuid.uuid4()
+            db.add_all([
+                Calculation(id=edited, a=2.0, b=3.0, type="Power", result=-1.0),
+                Calculation(id=stale, a=2.0, b=4.0, type="Power", result=-1.0),
+                # Existing checkpoint, so the job holds no write lock before its write-back
+                RecomputeCheckpoint(job_name="race", last_id=None, processed=0, updated=0, failed=0,
+                                    finished=False),
+            ])
+            db.commit()
+
+        def recompute_then_edit(rows):
+            outcome = recompute_rows(rows)
+            # A PATCH commits between the chunk read and the write-back
+            with session_factory() as other:
+                calc = other.get(Calculation, edited)
+                calc.b, calc.result = 5.0, 32.0
+                other.commit()
+            return outcome
+
+        monkeypatch.setattr(recompute, "recompute_rows", recompute_then_edit)
+        stats = RecomputeJob(session_factory, name="race", types=["Power"]).run()
+        assert (stats.processed, stats.updated, stats.skipped) == (2, 1, 1)
+        with session_factory() as db:
+            assert (db.get(Calculation, edited).b, db.get(Calculation, edited).result) == (5.0, 32.0)
+            assert db.get(Calculation, stale).result == 16.0
+
+    def test_run_purges_cached_results_of_recomputed_types(self, session_factory):
+        with session_factory() as db:
+            db.add_all([
+                CachedResult(key="p" * 64, type="Power", result=1.0),
+                CachedResult(key="e" * 64, type="Expression", result=2.0),
+            ])
+            db.commit()
+        run_parallel(session_factory, name="purge", types=["Power"])
+        with session_factory() as db:
+            assert [row.type for row in db.query(CachedResult).all()] == ["Expression"]
+
+    def test_job_resumes_from_checkpoint(self, session_factory):
+        seed(session_factory, count=10)
+        job = RecomputeJob(session_factory, name="resume", chunk_size=3, types=["Power"])
+        with session_factory() as db:
+            first_ids = [row.id for row in db.query(Calculation).filter(Calculation.type == "Power")
+                         .order_by(Calculation.id).limit(6)]
+            db.add(RecomputeCheckpoint(job_name="resume", last_id=first_ids[-1], processed=6,
+                                       updated=0, failed=0, finished=False))
+            db.commit()
+        stats = job.run()
+        assert stats.processed == 4
+        with session_factory() as db:
+            checkpoint = db.get(RecomputeCheckpoint, "resume")
+            assert checkpoint.finished
+            assert checkpoint.processed == 10
+        # A finished job does nothing when rerun
+        assert job.run().processed == 0
+
+    def test_parallel_workers_cover_every_row_once(self, session_factory):
+        seed(session_factory, count=40)
+        stats = run_parallel(session_factory, name="parallel", workers=4, chunk_size=5)
+        assert stats.processed == 41
+        assert results(session_factory)[("Add", 1.0)] == 2.0
+        rerun = run_parallel(session_factory, name="parallel", workers=4, restart=True, chunk_size=5)
+        assert rerun.processed == 41
+        assert rerun.updated == 0
+
+    def test_split_id_space(self):
+        ranges = split_id_space(4)
+        assert ranges[0][0] is None and ranges[-1][1] is None
+        assert ranges[1][0] == uuid.UUID(int=2 ** 126)
+        assert all(high == next_low for (_, high), (next_low, _) in zip(ranges, ranges[1:]))
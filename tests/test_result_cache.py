@@ -0,0 +1,99 @@
+"""
+Unit tests for the content-addressed result cache.
+"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.factory import PowerOperation, registry
+from app.models import CachedResult
+from app.result_cache import ResultCache, result_key
+from app.schemas import OperationType
+
+
+class TestResultKey:
+    """Test suite for content addressing."""
+
+    def test_key_is_stable(self):
+        assert result_key("Power", 2.0, 3.0) == result_key("Power", 2.0, 3.0)
+
+    def test_enum_and_string_share_key(self):
+        assert result_key(OperationType.POWER, 2.0, 3.0) == result_key("Power", 2.0, 3.0)
+
+    def test_int_and_float_operands_share_key(self):
+        assert result_key("Power", 2, 3) == result_key("Power", 2.0, 3.0)
+
+    def test_inputs_change_key(self):
+        base = result_key("Power", 2.0, 3.0)
+        assert result_key("Power", 3.0, 2.0) != base
+        assert result_key("Expression", 2.0, 3.0, "a ** b") != base
+        assert result_key("Power", 2.0, 3.0000000000000004) != base
+
+    def test_kernel_version_changes_key(self, monkeypatch):
+        base = result_key("Power", 2.0, 3.0)
+        monkeypatch.setattr(PowerOperation, "version", PowerOperation.version + 1)
+        assert result_key("Power", 2.0, 3.0) != base
+
+    def test_cheap_operations_not_cacheable(self):
+        assert not registry.is_cacheable("Add")
+        assert registry.is_cacheable(OperationType.POWER)
+        assert registry.is_cacheable("Expression")
+
+
+class TestResultCache:
+    """Test suite for the in-memory LRU and shared table."""
+
+    def test_hit_and_miss_stats(self):
+        cache = ResultCache(maxsize=4, persist=False)
+        assert cache.get("k") is None
+        cache.put("k", 0.0)
+        assert cache.get("k") == 0.0
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_ratio"] == 0.5
+
+    def test_lru_eviction(self):
+        cache = ResultCache(maxsize=2, persist=False)
+        cache.put("a", 1.0)
+        cache.put("b", 2.0)
+        cache.get("a")
+        cache.put("c", 3.0)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1.0
+        assert cache.stats()["evictions"] == 1
+
+    def test_clear(self):
+        cache = ResultCache(maxsize=2, persist=False)
+        cache.put("a", 1.0)
+        cache.clear()
+        assert cache.get("a") is None
+        assert cache.stats()["size"] == 0
+
+    @pytest.fixture
+    def session(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine, tables=[CachedResult.__table__])
+        db = sessionmaker(bind=engine)()
+        yield db
+        db.close()
+
+    def test_shared_table_between_caches(self, session):
+        """Results persisted by one worker's cache are found by another's."""
+        writer = ResultCache(maxsize=2, persist=True)
+        writer.put("shared", 8.0, "Power", session)
+        session.commit()
+
+        reader = ResultCache(maxsize=2, persist=True)
+        assert reader.get("shared", session) == 8.0
+        assert reader.stats()["shared_hits"] == 1
+
+    def test_duplicate_persist_is_ignored(self, session):
+        first = ResultCache(maxsize=2, persist=True)
+        second = ResultCache(maxsize=2, persist=True)
+        first.put("dup", 1.0, "Power", session)
+        session.commit()
+        second.put("dup", 1.0, "Power", session)
+        session.commit()
+        assert session.query(CachedResult).count() == 1
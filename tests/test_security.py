@@ -1,8 +1,14 @@
 """
 Unit tests for password hashing and security utilities.
 """
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
-from app.security import hash_password, verify_password
+from app import security
+from app.metrics import BCRYPT_WAITING
+from app.security import hash_password, hash_password_async, verify_password, verify_password_async
 
 
 class TestPasswordHashing:
@@ -101,3 +107,73 @@ class TestPasswordVerification:
         hashed = hash_password(password)
         assert verify_password(password, hashed) is True
         assert verify_password("WrongPassword", hashed) is False
+
+
+def _waiting(operation):
+    samples = BCRYPT_WAITING.collect().samples
+    return sum(sample.value for sample in samples if sample.labels["operation"] == operation)
+
+
+class TestBcryptWorkers:
+    """Test suite for running bcrypt off the event loop."""
+
+    def test_async_hash_and_verify(self):
+        async def run():
+            hashed = await hash_password_async("testpassword123")
+            return await verify_password_async("testpassword123", hashed), await verify_password_async("nope", hashed)
+
+        assert asyncio.run(run()) == (True, False)
+
+    def test_async_hash_raises_value_error(self):
+        with pytest.raises(ValueError):
+            asyncio.run(hash_password_async(""))
+
+    def test_calls_beyond_the_workers_are_counted_as_waiting(self, monkeypatch):
+        monkeypatch.setattr(security, "_bcrypt_executor", ThreadPoolExecutor(max_workers=1))
+        started, release = threading.Event(), threading.Event()
+
+        def slow_hash(password):
+            started.set()
+            release.wait(5)
+            return password
+
+        monkeypatch.setattr(security, "hash_password", slow_hash)
+        before = _waiting("hash")
+
+        async def run():
+            calls = [asyncio.ensure_future(hash_password_async(f"pw{i}")) for i in range(3)]
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+            queued = _waiting("hash") - before
+            release.set()
+            return queued, await asyncio.gather(*calls)
+
+        queued, results = asyncio.run(run())
+        assert queued == 2
+        assert results == ["pw0", "pw1", "pw2"]
+        assert _waiting("hash") == before
+
+    def test_cancelled_waiting_call_is_no_longer_counted(self, monkeypatch):
+        monkeypatch.setattr(security, "_bcrypt_executor", ThreadPoolExecutor(max_workers=1))
+        started, release = threading.Event(), threading.Event()
+
+        def slow_hash(password):
+            started.set()
+            release.wait(5)
+            return password
+
+        monkeypatch.setattr(security, "hash_password", slow_hash)
+        before = _waiting("hash")
+
+        async def run():
+            running = asyncio.ensure_future(hash_password_async("first"))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+            queued = asyncio.ensure_future(hash_password_async("second"))
+            await asyncio.sleep(0)
+            queued.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await queued
+            release.set()
+            return await running
+
+        assert asyncio.run(run()) == "first"
+        assert _waiting("hash") == before
@@ -0,0 +1,87 @@
+"""
+Unit tests for the fast JSON serialization path.
+"""
+import json
+import uuid
+from datetime import datetime
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter
+
+from app import serialization
+from app.queries import CALCULATION_FIELDS, CalculationRecord
+from app.schemas import CalculationRead
+from app.serialization import JSONBytesResponse, calculation_records_json, dumps
+
+ROWS = [
+    (uuid.uuid4(), 1.5, 2.0, "Add", None, None, None, 3.5, uuid.uuid4(), datetime(2024, 1, 1, 12, 0, 0)),
+    (
+        uuid.uuid4(), 3.0, 4.0, "Expression", "sqrt(a ** 2 + b ** 2)", uuid.uuid4(), None,
+        5.0, uuid.uuid4(), datetime(2024, 1, 2, 8, 30, 15, 123456),
+    ),
+    (uuid.uuid4(), 1e300, 1e-300, "Multiply", None, None, None, 1.0, None, datetime(2024, 1, 3)),
+]
+
+RECORDS = [CalculationRecord(*row) for row in ROWS]
+
+
+def _pydantic_json(rows) -> bytes:
+    models = [CalculationRead(**dict(zip(CALCULATION_FIELDS, row))) for row in rows]
+    return TypeAdapter(List[CalculationRead]).dump_json(models)
+
+
+class TestCalculationRecordsJson:
+    """Test suite for record serialization."""
+
+    def test_matches_response_model_output(self):
+        """Test that the fast path produces the same JSON as CalculationRead."""
+        assert json.loads(calculation_records_json(RECORDS)) == json.loads(_pydantic_json(ROWS))
+
+    def test_type_adapter_fallback(self, monkeypatch):
+        """Test the TypeAdapter path used when orjson is unavailable."""
+        monkeypatch.setattr(serialization, "orjson", None)
+        assert json.loads(calculation_records_json(RECORDS)) == json.loads(_pydantic_json(ROWS))
+
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_single_record(self, monkeypatch, use_orjson):
+        """Test that one record serializes like one CalculationRead."""
+        if not use_orjson:
+            monkeypatch.setattr(serialization, "orjson", None)
+        assert json.loads(dumps(RECORDS[1])) == json.loads(_pydantic_json(ROWS[1:]))[0]
+
+    def test_empty(self):
+        """Test that no records serialize to an empty list."""
+        assert json.loads(calculation_records_json([])) == []
+
+
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_sparse_records(self, monkeypatch, use_orjson):
+        """Test that sparse records serialize to just their fields."""
+        from app.queries import record_type
+
+        if not use_orjson:
+            monkeypatch.setattr(serialization, "orjson", None)
+        record = record_type(("id", "type", "result"))
+        records = [record(row[0], row[3], row[7]) for row in ROWS]
+        assert json.loads(calculation_records_json(records)) == [
+            {"id": str(row[0]), "type": row[3], "result": row[7]} for row in ROWS
+        ]
+
+class TestJSONBytesResponse:
+    """Test suite for the pre-serialized response class."""
+
+    def test_bytes_pass_through(self):
+        """Test that serialized bodies are not re-encoded."""
+        response = JSONBytesResponse(b'[{"a":1}]')
+        assert response.body == b'[{"a":1}]'
+        assert response.media_type == "application/json"
+
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_payload_serialized(self, monkeypatch, use_orjson):
+        """Test that dict payloads with UUIDs are serialized."""
+        if not use_orjson:
+            monkeypatch.setattr(serialization, "orjson", None)
+        key = uuid.uuid4()
+        response = JSONBytesResponse({"id": key, "total": 2, "average": None})
+        assert json.loads(response.body) == {"id": str(key), "total": 2, "average": None}
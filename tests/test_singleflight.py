@@ -0,0 +1,105 @@
+"""
+Unit tests for request coalescing.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.singleflight import SingleFlight, coalesced_read
+
+
+class TestSingleFlight:
+    """Test suite for SingleFlight."""
+
+    def test_concurrent_calls_share_one_execution(self):
+        flights = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return b"body"
+
+        async def run():
+            return await asyncio.gather(*(flights.do(("summary", "u1", 3), work) for _ in range(5)))
+
+        assert asyncio.run(run()) == [b"body"] * 5
+        assert calls == [1]
+        stats = flights.stats()
+        assert (stats["executions"], stats["shared"], stats["in_flight"]) == (1, 4, 0)
+        assert stats["collapse_ratio"] == pytest.approx(0.8)
+        assert stats["routes"]["summary"]["shared"] == 4
+
+    def test_different_keys_run_separately(self):
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            return 1
+
+        async def run():
+            await asyncio.gather(flights.do(("summary", "u1", 1), work), flights.do(("summary", "u1", 2), work))
+
+        asyncio.run(run())
+        assert flights.stats()["executions"] == 2
+
+    def test_sequential_calls_do_not_share(self):
+        flights = SingleFlight()
+
+        async def work():
+            return 1
+
+        async def run():
+            await flights.do(("list",), work)
+            await flights.do(("list",), work)
+
+        asyncio.run(run())
+        assert flights.stats()["shared"] == 0
+
+    def test_errors_reach_every_waiter(self):
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        async def run():
+            return await asyncio.gather(*(flights.do(("list",), work) for _ in range(3)), return_exceptions=True)
+
+        results = asyncio.run(run())
+        assert all(isinstance(result, ValueError) for result in results)
+        assert flights.stats()["in_flight"] == 0
+
+    def test_cancelled_waiter_does_not_cancel_flight(self):
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        async def run():
+            first = asyncio.ensure_future(flights.do(("list",), work))
+            second = asyncio.ensure_future(flights.do(("list",), work))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            return await second
+
+        assert asyncio.run(run()) == "done"
+
+
+class TestCoalescedRead:
+    """Test reads run through coalesced_read."""
+
+    def test_read_uses_its_own_session(self):
+        engine = create_engine("sqlite://")
+        request_session = sessionmaker(bind=engine)()
+        seen = []
+
+        def read(session):
+            seen.append(session)
+            return session.execute(text("SELECT 42")).scalar()
+
+        assert asyncio.run(coalesced_read(request_session, ("probe",), read)) == 42
+        assert seen[0] is not request_session
@@ -0,0 +1,120 @@
+"""
+Unit tests for the slow-query log.
+"""
+import json
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app import database, slow_queries
+from app.database import instrument
+from app.slow_queries import SLOW_QUERIES, RateLimiter, SlowQuery, SlowQueryLog, explain, redact, redacted_values
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # A file database, so the writer thread's connection sees the same tables
+    engine = instrument(create_engine(f"sqlite:///{tmp_path / 'slow.db'}"))
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+        conn.execute(text("INSERT INTO items (name) VALUES ('a'), ('b')"))
+    return engine
+
+
+def read_entries(path):
+    with open(path) as log:
+        return [json.loads(line) for line in log]
+
+
+def outcomes():
+    return {sample.labels["outcome"]: sample.value for sample in SLOW_QUERIES.collect().samples}
+
+
+class TestRedaction:
+    """Test suite for parameter redaction."""
+
+    def test_keeps_numbers_only(self):
+        user_id = uuid.uuid4()
+        parameters = {"user_id": user_id, "name": "alice", "limit": 100, "flag": True, "missing": None}
+        assert redact(parameters) == {
+            "user_id": "<UUID>", "name": "<str>", "limit": 100, "flag": True, "missing": None,
+        }
+        assert redact([("bob", 1.5), ("carol", 2.5)]) == [["<str>", 1.5], ["<str>", 2.5]]
+        assert sorted(redacted_values(parameters)) == sorted([str(user_id), "alice"])
+
+
+class TestRateLimiter:
+    """Test suite for the token bucket."""
+
+    def test_refills_per_minute(self):
+        now = [0.0]
+        limiter = RateLimiter(2, clock=lambda: now[0])
+        assert [limiter.allow() for _ in range(3)] == [True, True, False]
+        now[0] = 30.0
+        assert [limiter.allow() for _ in range(2)] == [True, False]
+
+
+class TestExplain:
+    """Test suite for plan capture."""
+
+    def test_sqlite_query_plan(self, engine):
+        plan = explain(engine, "SELECT * FROM items WHERE name = ?", ("a",))
+        assert "SCAN items" in plan
+
+    def test_statements_without_plans(self, engine):
+        assert explain(engine, "CREATE TABLE other (id INTEGER)", ()) is None
+        assert explain(engine, "PRAGMA table_info(items)", ()) is None
+
+
+class TestSlowQueryLog:
+    """Test suite for sampling, rate limiting and the written entries."""
+
+    def test_writes_redacted_entries(self, engine, tmp_path, monkeypatch):
+        path = tmp_path / "logs" / "slow.log"
+        log = SlowQueryLog(threshold_ms=0.000001, max_per_minute=100, path=str(path))
+        monkeypatch.setattr(database, "slow_query_log", log)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT * FROM items WHERE name = :name LIMIT :limit"), {"name": "secret", "limit": 5})
+        log.stop()
+
+        entry = read_entries(path)[0]
+        assert entry["statement"] == "SELECT * FROM items WHERE name = ? LIMIT ?"
+        assert entry["parameters"] == ["<str>", 5]
+        assert "SCAN items" in entry["plan"]
+        assert entry["method"] is None and entry["duration_ms"] > 0
+
+    def test_plan_values_scrubbed(self, monkeypatch):
+        monkeypatch.setattr(slow_queries, "explain", lambda *args: "Filter: (email = 'a@example.com'::text)")
+        log = SlowQueryLog(threshold_ms=1)
+        item = SlowQuery(None, "SELECT 1", {"email": "a@example.com"}, False, 2.5, "GET", "/users",
+                         datetime.now(timezone.utc))
+        entry = log.capture(item)
+        assert entry["plan"] == "Filter: (email = '<redacted>'::text)"
+        assert entry["duration_ms"] == 2500 and entry["route"] == "/users"
+
+    def test_executemany_rows(self):
+        log = SlowQueryLog(threshold_ms=1)
+        rows = [(str(index),) for index in range(20)]
+        item = SlowQuery(None, "INSERT INTO items (name) VALUES (?)", rows, True, 1.0, None, None,
+                         datetime.now(timezone.utc))
+        entry = log.capture(item)
+        assert entry["rows"] == 20 and len(entry["parameters"]) == 10 and "plan" not in entry
+
+    def test_threshold_sampling_and_rate_limit(self, tmp_path):
+        before = outcomes()
+        path = str(tmp_path / "slow.log")
+
+        SlowQueryLog(threshold_ms=1000, path=path).observe(None, "SELECT 1", (), False, 0.5)
+        SlowQueryLog(threshold_ms=0, path=path).observe(None, "SELECT 1", (), False, 5.0)
+        SlowQueryLog(threshold_ms=1, sample_rate=0, path=path).observe(None, "SELECT 1", (), False, 5.0)
+        limited = SlowQueryLog(threshold_ms=1, max_per_minute=1, capture_plans=False, path=path)
+        for _ in range(3):
+            limited.observe(None, "SELECT 1", (), False, 5.0)
+        limited.stop()
+
+        after = outcomes()
+        changes = {outcome: after.get(outcome, 0) - before.get(outcome, 0) for outcome in after}
+        assert changes == {"logged": 1, "rate_limited": 2, "sampled_out": 1}
+        assert len(read_entries(path)) == 1
@@ -0,0 +1,123 @@
+"""
+Unit tests for the SQL arithmetic kernels and database-computed results.
+"""
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+from sqlalchemy import Float, column, create_engine, literal, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from app.factory import registry
+from app.sql_kernels import SQL_KERNELS, is_kernel_error, result_expression
+
+CASES = [
+    (7.0, 3.0),
+    (-7.0, 3.0),
+    (7.0, -3.0),
+    (2.5, 0.5),
+    (2.0, 10.0),
+    (1e17, 3.0),
+    (-1e17, 3.0),
+]
+
+
+@pytest.fixture(scope="module")
+def sqlite_engine():
+    return create_engine("sqlite://")
+
+
+def _evaluate(engine, operation_type, a, b):
+    expression = result_expression(literal(operation_type), literal(a), literal(b))
+    with engine.connect() as connection:
+        return connection.scalar(select(expression))
+
+
+class TestSqlKernels:
+    """Test that SQL kernels agree with the Python operations."""
+
+    @pytest.mark.parametrize("operation_type", list(SQL_KERNELS))
+    @pytest.mark.parametrize("a,b", CASES)
+    def test_matches_registry(self, sqlite_engine, operation_type, a, b):
+        expected = registry.calculate(operation_type, a, b)
+        assert _evaluate(sqlite_engine, operation_type, a, b) == pytest.approx(expected)
+
+    def test_modulo_follows_divisor_sign(self, sqlite_engine):
+        """Test that modulo matches Python's sign convention."""
+        assert _evaluate(sqlite_engine, "Modulo", -7.0, 3.0) == -7.0 % 3.0
+        assert _evaluate(sqlite_engine, "Modulo", 7.0, -3.0) == 7.0 % -3.0
+
+    def test_modulo_exact_at_large_magnitudes(self, sqlite_engine):
+        """Test that modulo does not lose the remainder to floating-point rounding."""
+        assert _evaluate(sqlite_engine, "Modulo", 1e17, 3.0) == 1e17 % 3.0 == 1.0
+
+    def test_modulo_on_postgresql_uses_numeric_mod(self):
+        """Test that PostgreSQL gets mod() on numeric with the sign moved to the divisor's."""
+        sql = str(SQL_KERNELS["Modulo"](column("a", Float), column("b", Float)).compile(dialect=postgresql.dialect()))
+        assert "mod(CAST(a AS NUMERIC), CAST(b AS NUMERIC))" in sql
+        assert "= -sign(CAST(b AS NUMERIC))" in sql and "floor" not in sql
+
+    def test_power_overflow_raises(self, sqlite_engine):
+        """Test that overflow raises instead of storing infinity."""
+        with pytest.raises(DBAPIError):
+            _evaluate(sqlite_engine, "Power", 10.0, 400.0)
+
+    @pytest.mark.parametrize("a,b", [(10.0, 400.0), (-8.0, 0.5)])
+    def test_kernel_failures_are_data_errors(self, sqlite_engine, a, b):
+        """Test that overflow and undefined powers are classified as the data's fault."""
+        with pytest.raises(DBAPIError) as failure:
+            _evaluate(sqlite_engine, "Power", a, b)
+        assert is_kernel_error(failure.value)
+
+    def test_database_failures_are_not_data_errors(self, sqlite_engine):
+        """Test that locks and other operational failures are not blamed on the data."""
+        with pytest.raises(OperationalError) as failure:
+            with sqlite_engine.connect() as connection:
+                connection.exec_driver_sql("SELECT * FROM missing_table")
+        assert not is_kernel_error(failure.value)
+        locked = OperationalError("UPDATE calculations ...", {}, Exception("deadlock detected"))
+        assert not is_kernel_error(locked)
+
+    def test_unknown_type_uses_fallback(self, sqlite_engine):
+        """Test that types without a kernel evaluate to NULL."""
+        assert _evaluate(sqlite_engine, "Expression", 1.0, 2.0) is None
+
+
+def test_database_result_mode():
+    """Test the generated result column in a fresh interpreter, since the mode is read at import."""
+    script = textwrap.dedent("""
+        from sqlalchemy import create_engine, update
+        from sqlalchemy.orm import Session
+        from app.database import Base
+        from app.models import Calculation, User
+
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            user = User(username="u", email="u@example.com", password_hash="x")
+            db.add(user)
+            db.flush()
+            calc = Calculation(a=6.0, b=4.0, type="Multiply", result=24.0, user_id=user.id)
+            expr = Calculation(a=1.0, b=2.0, type="Expression", expression="a + b", result=3.0, user_id=user.id)
+            db.add_all([calc, expr])
+            db.commit()
+            assert (calc.result, expr.result) == (24.0, 3.0)
+
+            table = Calculation.__table__
+            db.execute(update(table).values(b=table.c.b * 2))
+            db.commit()
+            db.refresh(calc)
+            assert calc.result == 48.0
+    """)
+    env = {**os.environ, "CALCULATION_RESULT_MODE": "database", "DATABASE_URL": "sqlite://"}
+    completed = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    assert completed.returncode == 0, completed.stderr
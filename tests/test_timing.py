@@ -0,0 +1,123 @@
+"""
+Unit tests for per-request statement counting and Server-Timing.
+"""
+import logging
+import re
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app import timing
+from app.database import instrument
+from app.timing import RequestTiming, ServerTimingMiddleware, auth_phase, current_timing
+
+
+@pytest.fixture
+def request_timing():
+    request = RequestTiming()
+    token = current_timing.set(request)
+    yield request
+    current_timing.reset(token)
+
+
+class TestRequestTiming:
+    """Test suite for the per-request totals."""
+
+    def test_server_timing_header(self):
+        request = RequestTiming()
+        request.record_query("SELECT 1", 0.002)
+        request.record_query("SELECT 1", 0.001)
+        request.auth_seconds = 0.0005
+        assert request.server_timing(0.01) == 'db;dur=3.00;desc="2 queries", auth;dur=0.50, app;dur=6.50'
+
+    def test_repeated(self):
+        request = RequestTiming()
+        for statement in ("SELECT a", "SELECT b", "SELECT a", "SELECT a"):
+            request.record_query(statement, 0.0)
+        assert request.repeated(2) == [("SELECT a", 3)]
+        assert request.repeated(0) == []
+
+    def test_auth_phase_counts_once_without_queries(self, request_timing, monkeypatch):
+        clock = iter([10.0, 18.0])
+        monkeypatch.setattr(timing.time, "perf_counter", lambda: next(clock))
+        with auth_phase():
+            with auth_phase():
+                request_timing.record_query("SELECT user", 5.0)
+        assert request_timing.auth_seconds == 3.0
+        assert request_timing.db_seconds == 5.0
+
+    def test_auth_phase_outside_request(self):
+        with auth_phase():
+            pass
+        assert current_timing.get() is None
+
+
+class TestEngineHooks:
+    """Test suite for the statement hooks in app.database."""
+
+    def test_counts_statements(self, request_timing):
+        engine = instrument(create_engine("sqlite://"))
+        with engine.connect() as conn:
+            for value in range(3):
+                conn.execute(text("SELECT :value"), {"value": value})
+            conn.execute(text("SELECT 2"))
+        assert request_timing.queries == 4
+        assert request_timing.repeated(2) == [("SELECT ?", 3)]
+        assert request_timing.db_seconds > 0
+
+    def test_failed_statement_and_no_request(self, request_timing):
+        engine = instrument(create_engine("sqlite://"))
+        with engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM missing"))
+            assert conn.info["query_started"] == []
+            token = current_timing.set(None)
+            conn.execute(text("SELECT 1"))
+            current_timing.reset(token)
+        assert request_timing.queries == 0
+
+
+class TestServerTimingMiddleware:
+    """Test suite for the Server-Timing header and query logging."""
+
+    def make_client(self, monkeypatch, queries):
+        engine = instrument(create_engine("sqlite://"))
+
+        async def endpoint(request):
+            with engine.connect() as conn:
+                for value in range(queries):
+                    conn.execute(text("SELECT :value"), {"value": value})
+            return PlainTextResponse("ok")
+
+        monkeypatch.setattr(timing, "SQL_QUERY_BUDGET", 3)
+        monkeypatch.setattr(timing, "SQL_REPEAT_THRESHOLD", 2)
+        app = Starlette(routes=[Route("/items", endpoint)])
+        app.add_middleware(ServerTimingMiddleware)
+        return TestClient(app)
+
+    def test_header(self, monkeypatch, caplog):
+        client = self.make_client(monkeypatch, queries=1)
+        with caplog.at_level(logging.WARNING, logger="app.timing"):
+            response = client.get("/items")
+        assert re.fullmatch(r'db;dur=[\d.]+;desc="1 queries", auth;dur=[\d.]+, app;dur=[\d.]+',
+                            response.headers["server-timing"])
+        assert caplog.records == []
+
+    def test_budget_and_repeats_logged(self, monkeypatch, caplog):
+        client = self.make_client(monkeypatch, queries=4)
+        with caplog.at_level(logging.WARNING, logger="app.timing"):
+            client.get("/items")
+        messages = [record.getMessage() for record in caplog.records]
+        assert len(messages) == 2
+        assert messages[0].startswith("GET unmatched ran 4 SQL statements (budget 3) taking ")
+        assert messages[1] == "Possible N+1 in GET unmatched: statement ran 4 times: SELECT ?"
+
+    def test_disabled_header(self, monkeypatch):
+        client = self.make_client(monkeypatch, queries=0)
+        monkeypatch.setattr(timing, "SERVER_TIMING_ENABLED", False)
+        assert "server-timing" not in client.get("/items").headers
@@ -0,0 +1,155 @@
+"""
+Unit tests for the user profile cache.
+"""
+import json
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app import cache_backends
+from app.cache_backends import MemoryBackend, SharedMemoryBackend
+from app.models import User
+from app.user_cache import UserCache, UserIdentity
+
+
+def make_user(username="alice", **fields) -> User:
+    now = datetime(2024, 1, 1, 12, 0, 0)
+    return User(
+        id=uuid.uuid4(), username=username, email=f"{username}@example.com",
+        password_hash="secret-hash", created_at=now, updated_at=now, **fields,
+    )
+
+
+class TestUserCache:
+    """Test suite for UserCache."""
+
+    def test_lookup_by_id_and_username(self):
+        cache = UserCache()
+        user = make_user()
+        cache.put(user)
+        assert cache.get(user.id).identity == UserIdentity(user.id, "alice")
+        assert cache.get(str(user.id)).identity.id == user.id
+        assert cache.get_by_username("alice").identity.id == user.id
+
+    def test_payload_matches_user_read_without_password(self):
+        cache = UserCache()
+        user = make_user(full_name="Alice A")
+        payload = json.loads(cache.put(user).payload)
+        assert payload["id"] == str(user.id)
+        assert payload["full_name"] == "Alice A"
+        assert "password_hash" not in payload
+
+    def test_miss_and_invalid_id(self):
+        cache = UserCache()
+        assert cache.get(uuid.uuid4()) is None
+        assert cache.get("not-a-uuid") is None
+        assert cache.get_by_username("nobody") is None
+        assert cache.stats()["misses"] == 3
+
+    def test_lru_eviction(self):
+        # Each user takes an id entry and a username entry
+        cache = UserCache(backend=MemoryBackend(maxsize=4))
+        first, second, third = make_user("a"), make_user("b"), make_user("c")
+        cache.put(first)
+        cache.put(second)
+        cache.get(first.id)
+        cache.get_by_username("a")
+        cache.put(third)
+        assert cache.get(second.id) is None
+        assert cache.get_by_username("b") is None
+        assert cache.get(first.id) is not None
+        assert cache.stats()["evictions"] == 2
+
+    def test_ttl_expiry(self, monkeypatch):
+        clock = [100.0]
+        monkeypatch.setattr(cache_backends.time, "monotonic", lambda: clock[0])
+        cache = UserCache(ttl=10, backend=MemoryBackend())
+        user = make_user()
+        cache.put(user)
+        clock[0] = 109.0
+        assert cache.get(user.id) is not None
+        clock[0] = 111.0
+        assert cache.get(user.id) is None
+        assert cache.stats()["expirations"] == 1
+
+    def test_rename_drops_old_username(self):
+        cache = UserCache()
+        user = make_user("old")
+        cache.put(user)
+        user.username = "new"
+        cache.put(user)
+        assert cache.get_by_username("old") is None
+        assert cache.get_by_username("new").identity.username == "new"
+
+    @pytest.mark.parametrize("by", ["id", "username"])
+    def test_invalidate(self, by):
+        cache = UserCache()
+        user = make_user()
+        cache.put(user)
+        if by == "id":
+            cache.invalidate(user_id=str(user.id))
+        else:
+            cache.invalidate(username="alice")
+        assert cache.get(user.id) is None
+        assert cache.get_by_username("alice") is None
+        assert cache.stats()["invalidations"] == 1
+
+    def test_clear_and_hit_ratio(self):
+        cache = UserCache()
+        user = make_user()
+        cache.put(user)
+        cache.get(user.id)
+        cache.get(user.id)
+        cache.get(uuid.uuid4())
+        stats = cache.stats()
+        assert stats["hits"] == 2
+        assert stats["hit_ratio"] == pytest.approx(2 / 3)
+        assert cache.clear() == 2
+        assert cache.stats()["size"] == 0
+
+    def test_stale_username_pointer_is_a_miss(self):
+        cache = UserCache()
+        user = make_user("old")
+        cache.put(user)
+        # Another worker renamed the user and refreshed only the id entry
+        user.username = "new"
+        cache.put(user)
+        cache.backend.set("name:old", user.id.hex.encode(), 60)
+        assert cache.get_by_username("old") is None
+
+    def test_shared_backend_across_instances(self, tmp_path):
+        path = str(tmp_path / "users.mmap")
+        writer = UserCache(backend=SharedMemoryBackend(path, slots=64))
+        reader = UserCache(backend=SharedMemoryBackend(path, slots=64))
+        user = make_user()
+        writer.put(user)
+        assert reader.get_by_username("alice").identity.id == user.id
+        writer.invalidate(user.id)
+        assert reader.get(user.id) is None
+
+
+class TestInvalidationHandler:
+    """Test how broadcast invalidations reach the user cache."""
+
+    def test_drops_local_entries(self):
+        cache = UserCache()
+        user = make_user()
+        cache.put(user)
+        cache.on_invalidation([user.id.hex, "alice"])
+        assert cache.get(user.id) is None
+        assert cache.get_by_username("alice") is None
+
+    def test_reset_clears_everything(self):
+        cache = UserCache()
+        cache.put(make_user("a"))
+        cache.put(make_user("b"))
+        cache.on_invalidation(None)
+        assert cache.stats()["size"] == 0
+
+    def test_shared_backend_untouched(self, tmp_path):
+        cache = UserCache(backend=SharedMemoryBackend(str(tmp_path / "users.mmap"), slots=64))
+        user = make_user()
+        cache.put(user)
+        cache.on_invalidation([user.id.hex, "alice"])
+        assert cache.get(user.id) is not None
@@ -0,0 +1,95 @@
+"""
+Unit tests for vector calculations and their binary encoding.
+"""
+import base64
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from app.schemas import VectorCalculationCreate, VectorCalculationRead
+from app.vectors import MAX_VECTOR_LENGTH, coerce_vector, compute_vector, decode_array, encode_array
+
+
+class TestEncoding:
+    """Test suite for float64 blob encoding."""
+
+    def test_round_trip(self):
+        """Test that arrays survive encode/decode unchanged."""
+        values = np.array([1.5, -2.0, 3.25])
+        data = encode_array(values)
+        assert len(data) == 24
+        assert list(decode_array(data)) == [1.5, -2.0, 3.25]
+
+    def test_decode_rejects_partial_values(self):
+        """Test that byte strings not divisible by 8 are rejected."""
+        with pytest.raises(ValueError):
+            decode_array(b"\x00" * 7)
+
+    def test_coerce_base64(self):
+        """Test that base64 strings decode to float64 arrays."""
+        encoded = base64.b64encode(encode_array(np.array([1.0, 2.0]))).decode()
+        assert list(coerce_vector(encoded)) == [1.0, 2.0]
+
+    @pytest.mark.parametrize("value", [[], [float("nan")], "not base64!", [[1.0], [2.0]]])
+    def test_coerce_rejects_invalid(self, value):
+        """Test that empty, non-finite, malformed and nested vectors are rejected."""
+        with pytest.raises(ValueError):
+            coerce_vector(value)
+
+    def test_coerce_rejects_too_long(self):
+        """Test the element limit."""
+        with pytest.raises(ValueError):
+            coerce_vector(np.zeros(MAX_VECTOR_LENGTH + 1))
+
+
+class TestComputeVector:
+    """Test suite for vector kernels."""
+
+    def test_dot(self):
+        assert compute_vector("Dot", np.array([1.0, 2.0, 3.0]), np.array([4.0, 5.0, 6.0])) == 32.0
+
+    def test_elementwise(self):
+        a, b = np.array([1.0, 2.0]), np.array([3.0, 4.0])
+        assert list(compute_vector("ElementwiseAdd", a, b)) == [4.0, 6.0]
+        assert list(compute_vector("ElementwiseMultiply", a, b)) == [3.0, 8.0]
+
+    def test_reductions(self):
+        a = np.array([3.0, 4.0])
+        assert compute_vector("Norm", a) == 5.0
+        assert compute_vector("VectorSum", a) == 7.0
+        assert compute_vector("VectorMean", a) == 3.5
+
+    def test_length_mismatch(self):
+        with pytest.raises(ValueError):
+            compute_vector("Dot", np.array([1.0]), np.array([1.0, 2.0]))
+
+    def test_overflow(self):
+        with pytest.raises(ValueError):
+            compute_vector("ElementwiseMultiply", np.array([1e200]), np.array([1e200]))
+
+
+class TestVectorSchemas:
+    """Test suite for vector calculation schemas."""
+
+    def test_binary_operation_requires_b(self):
+        with pytest.raises(ValidationError):
+            VectorCalculationCreate(type="Dot", a=[1.0, 2.0])
+
+    def test_unary_operation_rejects_b(self):
+        with pytest.raises(ValidationError):
+            VectorCalculationCreate(type="Norm", a=[1.0], b=[2.0])
+
+    def test_arrays_available_after_validation(self):
+        calc = VectorCalculationCreate(type="Dot", a=[1.0, 2.0], b=[3.0, 4.0])
+        assert calc.a_array.dtype == np.float64
+        assert list(calc.b_array) == [3.0, 4.0]
+
+    def test_read_encodes_blobs(self):
+        from datetime import datetime
+        from uuid import uuid4
+        read = VectorCalculationRead(
+            id=uuid4(), type="ElementwiseAdd", length=1, result=None, user_id=uuid4(),
+            created_at=datetime.now(), result_data=encode_array(np.array([2.0])),
+        )
+        assert base64.b64decode(read.result_data) == encode_array(np.array([2.0]))
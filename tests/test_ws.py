@@ -0,0 +1,132 @@
+"""
+Unit tests for the WebSocket session helpers.
+"""
+import asyncio
+import time
+import uuid
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, insert, select
+
+from app.events import CHANGED, event_bus, make_event, record_change
+from app.ws import GroupCommitter, Handler, Principal, WriteOp, error_reply
+
+metadata = MetaData()
+items = Table("items", metadata, Column("value", Integer, primary_key=True))
+
+
+class Model(BaseModel):
+    value: int
+
+
+async def insert_value(db, value, principal):
+    if value < 0:
+        raise HTTPException(status_code=400, detail="negative")
+    db.execute(insert(items).values(value=value))
+    return {"value": value}
+
+
+INSERT = Handler(int, insert_value, writes=True)
+
+
+def run_committer(values, max_group=64, handler=INSERT):
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    replies, released = [], []
+
+    async def reply(message):
+        replies.append(message)
+
+    async def run():
+        committer = GroupCommitter(engine, Principal(None, None), reply, lambda: released.append(1), max_group, 0)
+        for request_id, value in enumerate(values):
+            committer.submit(WriteOp(request_id, handler, value))
+        await committer.close()
+        await committer.run()
+        return committer
+
+    committer = asyncio.run(run())
+    with engine.connect() as conn:
+        stored = sorted(conn.execute(select(items.c.value)).scalars())
+    return committer, replies, stored, len(released)
+
+
+class TestErrorReply:
+    """Test suite for mapping exceptions to replies."""
+
+    def test_statuses(self):
+        assert error_reply(1, HTTPException(status_code=404, detail="Not found")) == {
+            "id": 1, "ok": False, "status": 404, "detail": "Not found",
+        }
+        try:
+            Model(value="x")
+        except ValidationError as exc:
+            assert error_reply(2, exc)["status"] == 422
+        assert error_reply(3, ValueError("bad"))["status"] == 400
+        assert error_reply(4, RuntimeError("secret")) == {
+            "id": 4, "ok": False, "status": 500, "detail": "Internal error",
+        }
+
+
+class TestPrincipal:
+    """Test suite for token expiry."""
+
+    def test_expired(self):
+        assert not Principal(None, None).expired()
+        assert not Principal(None, time.time() + 60).expired()
+        assert Principal(None, time.time() - 1).expired()
+
+
+class TestGroupCommitter:
+    """Test suite for group commits."""
+
+    def test_queued_writes_share_a_commit(self):
+        committer, replies, stored, released = run_committer([1, 2, 3])
+        assert stored == [1, 2, 3]
+        assert [reply["id"] for reply in replies] == [0, 1, 2]
+        assert committer.groups == 1 and committer.writes == 3 and released == 3
+
+    def test_group_size_limit(self):
+        committer, _, stored, _ = run_committer([1, 2, 3, 4, 5], max_group=2)
+        assert stored == [1, 2, 3, 4, 5]
+        assert committer.groups == 3
+
+    def test_failed_write_is_isolated(self):
+        committer, replies, stored, released = run_committer([1, -1, 2])
+        assert stored == [1, 2]
+        by_id = {reply["id"]: reply for reply in replies}
+        assert by_id[1]["status"] == 400
+        assert by_id[0]["ok"] and by_id[2]["ok"]
+        assert committer.groups == 1 and committer.failed == 1 and committer.writes == 2 and released == 3
+
+    def test_writes_run_once(self):
+        calls = []
+
+        async def counted(db, value, principal):
+            calls.append(value)
+            return await insert_value(db, value, principal)
+
+        committer, _, stored, _ = run_committer([1, -1, 2], handler=Handler(int, counted, writes=True))
+        assert calls == [1, -1, 2] and stored == [1, 2]
+
+    def test_failed_write_publishes_no_event(self, monkeypatch):
+        published = []
+        monkeypatch.setattr(event_bus, "publish", published.append)
+        user_id = uuid.uuid4()
+
+        async def announced(db, value, principal):
+            record_change(db, make_event(user_id, abs(value), CHANGED))
+            return await insert_value(db, value, principal)
+
+        _, replies, stored, _ = run_committer([1, -2, 3], handler=Handler(int, announced, writes=True))
+        assert stored == [1, 3] and replies[1]["status"] == 400
+        assert [change.version for change in published] == [1, 3]
+
+    def test_failed_write_keeps_no_partial_changes(self):
+        async def half(db, value, principal):
+            db.execute(insert(items).values(value=value))
+            raise ValueError("after the insert")
+
+        _, replies, stored, _ = run_committer([3], handler=Handler(int, half, writes=True))
+        assert stored == [] and replies[0]["status"] == 400